@@ -79,7 +79,8 @@ class BinanceFormatter(Formatter):
 
     @staticmethod
     def order_book(data, *args, **kwargs):
-        return {'bids': data['bids'],
+        return {'lastUpdateId': data.get('lastUpdateId'),
+                'bids': data['bids'],
                 'asks': data['asks']}
 
 
@@ -1,6 +1,9 @@
 import logging
+import time
 from abc import ABC, abstractmethod
 
+from exchanges.WS.capture import CaptureWriter
+
 TRADE_QUEUE_SIZE = 100  # deque size for trades
 
 
@@ -11,6 +14,7 @@ class WSClientAPI(ABC):
         super(WSClientAPI, self).__init__()
         self._init_logger()
         self._info_handler = None
+        self._capture = None    # CaptureWriter of the raw frames, while capturing
 
     def __str__(self):
         return self.name()
@@ -41,6 +45,14 @@ class WSClientAPI(ABC):
         """
         pass
 
+    @classmethod
+    def exchange(cls):
+        """Return the name of the exchange whose data the client provides, which is the name of the client
+        except for the clients replaying a capture (see exchanges.WS.replay). The REST client of the exchange
+        is created by this name.
+        """
+        return cls.name()
+
     @abstractmethod
     def connect(self, info_handler=None):
         """Connect to the exchange via websocket stream.
@@ -55,6 +67,25 @@ class WSClientAPI(ABC):
         """Disconnect from the exchange."""
         pass
 
+    def start_capture(self, directory, **kwargs):
+        """Starts writing every raw frame received by the client to a capture (see exchanges.WS.capture)
+        :param directory:  the directory of the capture segment files
+        :param kwargs:     the options of CaptureWriter (compression, segment_size, segment_duration, ...)
+        :return: the CaptureWriter, which counts the written and the dropped frames
+        :raises WSException if the compression is not available
+        The segment files are named after the exchange, the capture ends with stop_capture or disconnect.
+        """
+        self.stop_capture()
+        kwargs.setdefault('prefix', self.name().lower())
+        self._capture = CaptureWriter(directory, **kwargs)
+        return self._capture
+
+    def stop_capture(self):
+        """Stops the capture, writing the frames received until now"""
+        capture, self._capture = self._capture, None
+        if capture is not None:
+            capture.close()
+
     @abstractmethod
     def subscribe(self, channel, **kwargs):
         """Generic method to subscribe to a channel of an exchange.
@@ -67,7 +98,7 @@ class WSClientAPI(ABC):
     def unsubscribe(self, channel, update_handler=None):
         """Generic method to unsubscribe from the channel.
         :param channel:         id of the channel to unsubscribe from
-        :param update_handler:  a handler used by a listener to receive updates from dispatcher.
+        :param update_handler:  a handler used by a listener to receive updates from the event bus.
         A channel must be one of the following: ticker, book, trades or candles.
         A remainder of the arguments is passed directly to concrete methods
         for subscribing to a given channel.
@@ -75,16 +106,19 @@ class WSClientAPI(ABC):
         pass
 
     @abstractmethod
-    def subscribe_ticker(self, symbol, update_handler=None):
+    def subscribe_ticker(self, symbol, update_handler=None, rate=None):
         """Subscribe to ticker channel.
         :param symbol:            A string that represents a ticker symbol (pair).
         :param update_handler:  A callback handler that should handle the asynchronous update of a ticker.
+        :param rate:            The maximum number of updates per second delivered to the handler (None for all).
         :return: A string that represents a stream (channel) identifier. Specific for each exchange.
         :raises ExchangeException
-        Data is returned by dispatcher via update_handler in the following format:
+        Data is returned by the event bus via update_handler in the following format:
            [ BID, BID_SIZE, ASK, ASK_SIZE, DAY_CHANGE, DAY_CHANGE_PERCENT, LAST_PRICE, VOLUME, HIGH, LOW ]
         Return type:
            [ all floats ]
+        The ticker is a Ticker event, the list with the values also available by name
+        and the metadata of the message (see exchanges.WS.marketdata).
         """
         pass
 
@@ -94,50 +128,71 @@ class WSClientAPI(ABC):
         :param symbol:          A symbol for a ticker (pair).
         :param update_handler:  A callback handler that should handle the asynchronous update of the order book.
         :param kwargs:          Additional parameters that differ between exchanges.
+                                All exchanges support delta=True to select the delta mode
+                                and rate to limit the number of updates per second delivered to the handler.
         :raises ExchangeException
-        Data is returned by dispatcher as a dictionary with two keys: bids and asks,
+        Data is returned by the event bus as a dictionary with two keys: bids and asks,
             {'bids': bids, 'asks': asks}
         where bids and asks are OrderedDict objects ordered by the price from low to high.
         The format is:
            { PRICE (float) : AMOUNT (float) }
+        In the delta mode data is returned by the event bus as a (type, data) tuple:
+            ('snapshot', {'bids': bids, 'asks': asks})   a complete book in the format above
+            ('delta', {'bids': changes, 'asks': changes}) only the changed price levels
+        where changes are lists of (PRICE, AMOUNT) pairs and the amount 0 removes the price level.
+        The changes are a BookDelta event carrying the metadata of the message (see exchanges.WS.marketdata).
+        With a limited rate, the handler receives only the latest book, or the changes merged
+        since the last update in the delta mode.
         """
         pass
 
     @abstractmethod
-    def subscribe_trades(self, symbol, update_handler=None):
+    def subscribe_trades(self, symbol, update_handler=None, rate=None):
         """Subscribe to the channel for trades.
         :param symbol:          A symbol for a ticker (pair).
         :param update_handler:  A callback handler that should handle the asynchronous update of trades.
+        :param rate:            The maximum number of updates per second delivered to the handler (None for all).
         :return: A string that represents a stream (channel) identifier. Specific for each exchange.
         :raises ExchangeException
-        Data is returned by dispatcher as a (type, data) tuple,
+        Data is returned by the event bus as a (type, data) tuple,
         where the type informs the user how he should treat the data.
         Type can be one of these two options:
-            ('snapshot', list(trades))    data is a a complete snapshot
+            ('snapshot', trades)          data is a a complete snapshot
             ('update', new_trade)         data is an update of the most recent trade
+            ('batch', list(trades))       the trades received since the last update, from the least recent
+                                          (only with a limited rate, trades are batched and never dropped)
         The format of a single trade is a list:
             [ TIMESTAMP, AMOUNT, PRICE ]  -> [int, float, float]
         If the amount is negative, that was a sell order. Otherwise it was a buy order.
+        The updated trades are Trade events carrying the trade id and the metadata of the message.
         The snapshot returns the trades in the order from the most recent to the least recent.
+        It is a TRADE_DTYPE array copy of the TradeTape of the channel, its records are indexed
+        the same way as the trade lists (and also by the field names), see TradeTape.
+        The copy is taken once per version of the data and shared by the listeners, so it must not be modified.
         """
         pass
 
     @abstractmethod
-    def subscribe_candles(self, symbol, interval='1m', update_handler=None):
+    def subscribe_candles(self, symbol, interval='1m', update_handler=None, rate=None):
         """Subscribe to the channel fro candles.
         :param symbol:          A symbol for a ticker (pair).
         :param interval         Time interval for a candle.
         :param update_handler:  A callback handler that should handle the asynchronous update of trades.
+        :param rate:            The maximum number of updates per second delivered to the handler (None for all).
         :return: A string that represents a stream (channel) identifier. Specific for each exchange.
         :raises ExchangeException
-        Data is returned by dispatcher as a (type, data) tuple,
+        Data is returned by the event bus as a (type, data) tuple,
         where the type informs the user how he should treat the data.
         Type can be one of these three options:
-            ('snapshot', list(candles))    data is a a complete snapshot
+            ('snapshot', candles)          data is a a complete snapshot
             ('add', candle)                data is a new candle
             ('update', candle)             data is an update of the last candle
         The format of a candle is a list:
             [ TIMESTAMP, OPEN, CLOSE, HIGH, LOW, VOLUME ] -> [int, float, float, float, float, float]
+        The added and updated candles are Candle events carrying the metadata of the message.
+        The snapshot is an (n, 6) float64 NumPy array of candles in the same order of values,
+        from the least to the most recent. It is a copy of the CandleBuffer of the channel
+        taken once per version of the data and shared by the listeners, so it must not be modified.
         """
         pass
 
@@ -162,7 +217,7 @@ class WSClientAPI(ABC):
         """Subscribe to user orders channel.
         :param update_handler:  A callback handler that should handle the asynchronous update of user orders.
         :return: A string that represents a stream (channel) identifier. Specific for each exchange.
-        Data is returned by dispatcher in the form of list of orders:
+        Data is returned by the event bus in the form of list of orders:
            [ ID, TIMESTAMP, SYMBOL, TYPE, SIDE, PRICE, AMOUNT, FILED%, TOTAL ]
         Return type:
            [ [int, int, string, string, string, float, float, string, float] ]
@@ -174,7 +229,7 @@ class WSClientAPI(ABC):
         """Subscribe to user trades channel.
         :param update_handler:  A callback handler that should handle the asynchronous update of user trades.
         :return: A string that represents a stream (channel) identifier. Specific for each exchange.
-        Data is returned by dispatcher in the form of list of trades:
+        Data is returned by the event bus in the form of list of trades:
            [ TIMESTAMP, SYMBOL, TYPE, SIDE, PRICE, AMOUNT, FILLED, TOTAL, STATUS ]
         Return type:
            [ [int, string, string, string, float, float, float, float, string] ]
@@ -186,7 +241,7 @@ class WSClientAPI(ABC):
         """Subscribe to balances channel.
         :param update_handler:  A callback handler that should handle the asynchronous update of user balances.
         :return: A string that represents a stream (channel) identifier. Specific for each exchange.
-        Data is returned by dispatcher as a dictionary of balances:
+        Data is returned by the event bus as a dictionary of balances:
            { currency : balance }
         Return type:
            { string : float }
@@ -203,7 +258,7 @@ class ChannelData(ABC):
     a corresponding data object will be created for that channel.
     Since receiving the data from a websocket is asynchronous,
     the first user will be updated by sending entire snapshot
-    via dispatcher. Subsequent subscribes will immediately get
+    via the event bus. Subsequent subscribes will immediately get
     the snapshot from the data object as a return data from the
     subscribe method.
 
@@ -211,14 +266,46 @@ class ChannelData(ABC):
     but the communication is kept to the minimum by avoiding to send
     the full data on every update.
 
+    The data is updated on the websocket threads while the snapshots are taken on other threads
+    (i.e. by the gui subscribing a channel), without any locking. Every update increments the version
+    of the data, which is odd while an update is being applied (see _begin_update and _end_update).
+    A snapshot is taken at most once per version: it is built by _take_snapshot only when the version
+    is even and stays the same meanwhile, otherwise it is taken again. The (version, snapshot) pair is then
+    kept by a single reference assignment and shared by all readers of that version, so the snapshots
+    must not be modified. A consumer can compare the version with the one of its last snapshot
+    (see versioned_snapshot) to skip redrawing data that did not change.
+
     See the WSClientAPI subscribe methods description for the format
-    of data returned by a dispatcher or a snapshot.
+    of data returned by the event bus or a snapshot.
     """
-    MAX_TRADES  = 100       # the maximum number of trades kept by trades data object
+    MAX_TRADES  = 100000    # the maximum number of trades kept by trades data object
     MAX_CANDLES = 10000     # the maximum number of candles kept by candles data object
+    SNAPSHOT_RETRIES = 100  # attempts to take a snapshot between updates, before it is taken during one
 
     def __init__(self):
         super(ChannelData, self).__init__()
+        self.timestamp = None   # exchange time of the last update in ms, if the exchange provides it
+        self.latency = None     # ms from the exchange time to the reception of the last update
+        self.received = None    # local time of the reception of the last update in ms
+        self.sequence = None    # sequence number of the last update, if the exchange provides it
+        self.version = 0        # incremented by every update, odd while an update is being applied
+        self._snapshot = (-1, None)     # (version, snapshot) of the last snapshot taken
+
+    def stamp(self, timestamp, sequence=None, received=None):
+        """Stores the metadata of the message about to be applied, carried by the published events
+        :param timestamp:  exchange time of the message in ms or None
+        :param sequence:   sequence number of the message or None
+        :param received:   local time of the reception in ms, now by default
+        """
+        self.received = received if received is not None else time.time() * 1000
+        self.timestamp = timestamp
+        self.sequence = sequence
+        if timestamp is not None:
+            self.latency = self.received - timestamp
+
+    def _event(self, event_type, values, **kwargs):
+        """Creates a normalized event (see exchanges.WS.marketdata) with the metadata of the last message"""
+        return event_type(values, self.timestamp, self.received, self.sequence, **kwargs)
 
     @abstractmethod
     def update(self, data):
@@ -228,9 +315,58 @@ class ChannelData(ABC):
         """
         pass
 
-    @abstractmethod
     def snapshot(self):
         """Returns the current snapshot of the data.
         The intention is immediately provide the data if available to a user,
+        the snapshot is shared by all users of the same version and must not be modified.
         """
+        return self.versioned_snapshot()[1]
+
+    def versioned_snapshot(self):
+        """Returns the current snapshot of the data together with its version -> (version, snapshot)"""
+        current = self._snapshot
+        if current[0] == self.version:
+            return current
+        for _ in range(self.SNAPSHOT_RETRIES):
+            version = self.version
+            if not version & 1:
+                try:
+                    snapshot = self._take_snapshot()
+                except (KeyError, IndexError, RuntimeError):
+                    pass    # the data was changed while the snapshot was taken
+                else:
+                    if self.version == version:
+                        current = self._snapshot = (version, snapshot)
+                        return current
+            time.sleep(0)
+        # the data keeps changing (or an update failed half way), the snapshot is not kept
+        try:
+            return self.version, self._take_snapshot()
+        except (KeyError, IndexError, RuntimeError):
+            if self._snapshot[1] is None:
+                raise
+            # the last snapshot taken is older, but consistent
+            return self._snapshot
+
+    @abstractmethod
+    def _take_snapshot(self):
+        """Builds a snapshot of the current data, called by versioned_snapshot when the version changed"""
         pass
+
+    def _begin_update(self):
+        """Marks the data as being updated, the snapshots taken until _end_update are discarded"""
+        if not self.version & 1:
+            self.version += 1
+
+    def _end_update(self):
+        """Marks the end of an update, the next snapshot is taken anew.
+        An update replacing the data by a single assignment only has to call this method.
+        """
+        self.version += 1 if self.version & 1 else 2
+
+    def _commit(self, snapshot):
+        """Marks the end of an update with a snapshot of the updated data built along with it,
+        which is then returned to the readers of the new version
+        """
+        self._end_update()
+        self._snapshot = (self.version, snapshot)
@@ -1,11 +1,21 @@
 import websocket
 import ssl
 import json
+import re
+import time
 import threading
-from pydispatch import dispatcher
-from collections import OrderedDict, deque
+import numpy as np
+from functools import partial
+from collections import deque
 
 from exchanges.WS.api import WSClientAPI, ChannelData
+from exchanges.WS.orderbook import PriceLevels, SortedOrderBook, delta_signal
+from exchanges.WS.buffers import CandleBuffer, TradeTape, TickerTable, NO_TRADE_ID, TICKER_FIELDS
+from exchanges.WS.marketdata import Ticker, Trade, Candle
+from exchanges.WS.transport import AsyncioEngine, Reconnector, Deduplicator, RateMeter, THREAD_ENGINE, ASYNCIO_ENGINE
+from exchanges.WS.decoder import get_decoder, BinanceNumericParser
+from exchanges.WS.events import bus, DispatcherKeyError
+from exchanges.WS import conflation
 from exchanges.REST.binance import BinanceRESTClient
 from exchanges.exception import *
 
@@ -14,6 +24,11 @@ from exchanges.exception import *
 #   Ticker
 # ==========================================================================================
 
+# the ticker values in the order of TICKER_FIELDS
+TICKER_KEYS = ['b', 'B', 'a', 'A', 'p', 'P', 'c', 'v', 'h', 'l']
+NAN = float('nan')
+
+
 class BinanceTicker(ChannelData):
     """Binance per-channel ticker"""
 
@@ -31,139 +46,367 @@ class BinanceTicker(ChannelData):
         :param ticker:  a new ticker received from exchange via websocket
         :return: None
         :raises: WSException
-        Updates all listeners via dispatcher.
+        Updates all listeners via the event bus.
         """
-        self.data = [float(ticker[key]) for key in ['b', 'B', 'a', 'A', 'p', 'P', 'c', 'v', 'h', 'l']]
-        dispatcher.send(signal=self.name, sender='binance', data=self.data)
+        self.data = self._event(Ticker, [float(ticker[key]) for key in TICKER_KEYS])
+        self._commit(self.data)
+        bus.publish(self.name, 'binance', self.data)
 
-    def snapshot(self):
+    def _take_snapshot(self):
         """Get the current snapshot of the ticker"""
         return self.data
 
 
+def mini_ticker_values(ticker):
+    """Converts a mini ticker to the values of a full ticker (in the order of TICKER_FIELDS).
+    The mini ticker carries the close, open, high and low prices and the volumes of the last 24 hours:
+        { "e": "24hrMiniTicker", "E": 123456789, "s": "BNBBTC",
+          "c": "0.0025", "o": "0.0010", "h": "0.0025", "l": "0.0010", "v": "10000", "q": "18" }
+    The daily change is computed from the open and close prices, the bid and ask are not known (NaN).
+    """
+    close, open_price = float(ticker['c']), float(ticker['o'])
+    change = close - open_price
+    return [NAN, NAN, NAN, NAN, change, 100 * change / open_price if open_price else 0.0,
+            close, float(ticker['v']), float(ticker['h']), float(ticker['l'])]
+
+
+class BinanceMiniTicker(BinanceTicker):
+    """Binance per-channel mini ticker (the @miniTicker stream of the lighter profiles).
+    Publishes the same ticker list as BinanceTicker, see mini_ticker_values.
+    """
+
+    def update(self, ticker):
+        """Update the ticker
+        :param ticker:  a new mini ticker received from exchange via websocket
+        :return: None
+        Updates all listeners via the event bus.
+        """
+        self.data = self._event(Ticker, mini_ticker_values(ticker))
+        self._commit(self.data)
+        bus.publish(self.name, 'binance', self.data)
+
+
 # ==========================================================================================
 #   All Tickers
 # ==========================================================================================
 
 class BinanceAllTickers(ChannelData):
-    """Binance specific channel that returns tickers for all symbols traded on the exchange."""
+    """Binance specific channel that returns tickers for all symbols traded on the exchange.
+
+    The tickers are kept in a symbol-indexed TickerTable updated in place, and only the tickers
+    that changed since the previous message are published, as a (symbols, values) tuple:
+    a list of k symbols and a (k, 10) float array of their
+    [BID, BID_SIZE, ASK, ASK_SIZE, CHANGE, CHANGE_PERCENT, LAST_PRICE, VOLUME, HIGH, LOW] values.
+    The snapshot has the same form and contains all tickers.
+    """
 
     def __init__(self, name):
         """Initialize a new tracker for all-symbols tickers
-        :param name:   ticker name (i.e. 'ticker_' + symbol)
-        Sets the name of the ticker data handler and sets data to empty list.
-        Adds a symbol as a first element of the ticker list.
+        :param name:   channel name (i.e. '!ticker@arr')
+        Sets the name of the ticker data handler and creates an empty ticker table.
         """
         super(BinanceAllTickers, self).__init__()
         self.name = name
-        self.data = []
+        self.table = TickerTable(TICKER_FIELDS)
 
     def update(self, tickers):
         """Update all tickers
-        :param tickers:  a new ticker received from exchange via websocket
+        :param tickers:  a list of tickers received from exchange via websocket
         :return: None
         :raises: WSException
-        Updates all listeners via dispatcher.
+        Updates all listeners via the event bus with the tickers that changed.
         """
-        self.data = []
-        for tickers in tickers:
-            self.data.append([tickers['s']] +
-                             [float(tickers[key]) for key in ['b', 'B', 'a', 'A', 'p', 'P', 'c', 'v', 'h', 'l']])
-        dispatcher.send(signal=self.name, sender='binance', data=self.data)
+        symbols = [ticker['s'] for ticker in tickers]
+        values = self._values(tickers)
+        self._begin_update()
+        try:
+            changed = self.table.update(symbols, values)
+        finally:
+            self._end_update()
+        if len(changed):
+            bus.publish(self.name, 'binance', self.table.take(changed))
 
-    def snapshot(self):
-        """Get the current snapshot of the ticker"""
-        return self.data
+    @staticmethod
+    def _values(tickers):
+        return np.array([[ticker[key] for key in TICKER_KEYS] for ticker in tickers], dtype=np.float64)
+
+    def _take_snapshot(self):
+        """Get the current snapshot of all tickers -> (symbols, values)"""
+        return self.table.snapshot()
+
+
+class BinanceAllMiniTickers(BinanceAllTickers):
+    """Binance channel of the mini tickers of all symbols (the !miniTicker@arr stream of the lighter profiles).
+    Publishes the same (symbols, values) tuples as BinanceAllTickers, see mini_ticker_values.
+    """
+
+    @staticmethod
+    def _values(tickers):
+        return np.array([mini_ticker_values(ticker) for ticker in tickers], dtype=np.float64)
 
 
 # ==========================================================================================
 #   OrderBook
 # ==========================================================================================
 
-class BinanceOrderBook(ChannelData):
-    """Binance per-channel order book."""
+class BinanceOrderBook(SortedOrderBook):
+    """Binance per-channel order book.
+
+    The book is kept in sync with the exchange following the procedure documented by Binance:
+      1. the diff events are buffered from the moment the stream is opened,
+      2. the depth snapshot is obtained using the REST api,
+      3. the buffered events older than the snapshot (u <= lastUpdateId) are dropped,
+         the first applied event must contain the snapshot (U <= lastUpdateId + 1 <= u),
+      4. every following event must continue where the previous one ended (U == previous u + 1).
+    When a gap is detected, the book is resynchronized in the background: the events are buffered
+    again while a new snapshot is loaded. The listeners keep the stale book until the new
+    snapshot is ready and published. The number of resyncs is counted in resyncs.
+    A snapshot is only requested once a diff event is buffered, otherwise it may predate
+    the first event received and the book would get out of sync with it. If no event arrives
+    within EVENT_TIMEOUT, the initial load waits for it in the background. The initial snapshot
+    may still predate the first buffered event, so the initial load is retried the same way
+    as a resync, but only the resyncs of a book that was already synced are counted.
+    """
+    SENDER = 'binance'
+    BUFFER_SIZE = 10000         # the maximum number of buffered diff events
+    RETRY_DELAY = 3             # seconds between attempts to load a snapshot
+    EVENT_TIMEOUT = 3           # seconds load waits for the first diff event before loading in the background
 
-    def __init__(self, name, snapshot):
+    def __init__(self, name, snapshot=None, loader=None):
         """Initialize a new order book
-        :param name:      channel name (i.e. 'book_' + symbol + '_' + prec + '_' + freq)
+        :param name:      channel name (i.e. symbol + '@depth')
         :param snapshot:  data to initialize the order book
+        :param loader:    a function returning a new snapshot (used by load and to resync the book)
         :raises: WSException
-        A new dictionary of bids and asks is created and sent to all listener via dispatcher
+        New sorted price levels for bids and asks are created from the snapshot.
         Binance snapshot is obtained using the REST api request.
         It has the following form:
             {
+                "lastUpdateId": id,
                 "bids" : [ [price (str), amount (str)], .... ]
                 "asks" : [ [price (str), amount (str)], .... ]
             }
+        Without a snapshot, the diff events are buffered until the book is loaded.
 
         Since the snapshot is obtained using the REST api we do not need to publish the snapshot.
         The users, including the one that first subscribes to the channel, get the snapshot
         directly via the subscribe method.
         """
-        super(BinanceOrderBook, self).__init__()
-        self.name = name
-        self.asks = {}
-        self.bids = {}
-        self.lastUpdateId = snapshot.get('lastUpdateId', 0)
-        try:
-            self.bids = {float(bid[0]): float(bid[1]) for bid in snapshot['bids']}
-            self.asks = {float(ask[0]): float(ask[1]) for ask in snapshot['asks']}
-        except Exception as e:
-            raise WSException("Error initializing order book channel {}: {}".format(self.name, e))
-        # self._publish()
+        super(BinanceOrderBook, self).__init__(name)
+        self.lastUpdateId = 0
+        self.synced = False
+        self.resyncs = 0
+        self._loader = loader
+        self._loaded = False        # the book was synced at least once, the following syncs are resyncs
+        self._buffer = deque(maxlen=self.BUFFER_SIZE)
+        self._buffered = threading.Event()  # set while a diff event is buffered
+        self._first = True          # the next event is the first one after the snapshot
+        self._resyncing = False
+        self._closed = False
+        self._lock = threading.RLock()
+        if snapshot is not None:
+            self._set_snapshot(snapshot)
+
+    def load(self):
+        """Loads the snapshot using the loader and applies the buffered diff events.
+        The snapshot is loaded after the first diff event is buffered. If it does not arrive
+        within EVENT_TIMEOUT, the snapshot cannot be loaded, or there is a gap in the buffered events,
+        the book is resynchronized in the background.
+        """
+        snapshot = None
+        if self._buffered.wait(self.EVENT_TIMEOUT):
+            try:
+                snapshot = self._loader()
+            except Exception:
+                pass
+        with self._lock:
+            if not snapshot or not self._set_snapshot(snapshot):
+                self._resync()
+
+    def close(self):
+        """Stops the background resync of the book (used when the channel is unsubscribed)"""
+        self._closed = True
+
+    def reload(self):
+        """Resynchronizes the book after its stream was reopened, since the diff events were missed meanwhile.
+        The listeners keep the current book until the new snapshot is published.
+        """
+        with self._lock:
+            self._resync()
 
     def update(self, update):
         """Update the order book
         :param update:  an update received from exchange via websocket
         :return: None
         :raises WSException
-        When the internal order book dictionary is updated all listeners are also updated via dispatcher.
+        When the internal order book is updated all listeners are also updated via the event bus,
+        either with the full book or only with the changed price levels (see SortedOrderBook).
+        """
+        self._update(update['U'], update['u'], update['b'], update['a'])
+
+    def update_numeric(self, update):
+        """Update the order book from an update parsed by BinanceNumericParser.parse_depth
+        :param update:  (first update id, last update id, [[price, amount], ...] for bids, [[price, amount], ...] for asks)
+        :return: None
+        """
+        self._update(*update)
+
+    def _update(self, first_id, last_id, bids, asks):
+        with self._lock:
+            if not self.synced:
+                self._buffer.append((first_id, last_id, bids, asks))
+                self._buffered.set()
+                return
+            try:
+                applied = self._apply(first_id, last_id, bids, asks)
+            except Exception:
+                # the levels set before the error start the update, which has to end anyway
+                if self.version & 1:
+                    self._end_update()
+                raise
+            if not applied:
+                self._end_update()
+                # the event may already contain the next snapshot
+                self._buffer.append((first_id, last_id, bids, asks))
+                self._buffered.set()
+                self._resync()
+                return
+            self._publish()
+
+    def _apply(self, first_id, last_id, bids, asks):
+        """Applies a diff event
+        :return: False if there is a gap between the event and the book, True otherwise
+        :raises WSException
         """
         # Drop any event where 'u' (final update ID in event) is <= lastUpdateId
-        if update['u'] <= self.lastUpdateId:
+        if last_id <= self.lastUpdateId:
+            return True
+        if first_id > self.lastUpdateId + 1 or (not self._first and first_id != self.lastUpdateId + 1):
+            return False
+        self._first = False
+        self.lastUpdateId = last_id
+        try:
+            for price, amount in bids:
+                self._set_bid(float(price), float(amount))
+            for price, amount in asks:
+                self._set_ask(float(price), float(amount))
+        except Exception as e:
+            raise WSException("Error updating order book channel {}: {}".format(self.name, e))
+        return True
+
+    def _set_snapshot(self, snapshot):
+        """Replaces the book with a snapshot and applies the buffered events
+        :return: True if the book is synced, False if there is a gap in the buffered events
+                 or no event is buffered yet (the snapshot of a loader may predate the first event)
+        :raises: WSException
+        """
+        if self._loader is not None and not self._buffer:
+            return False
+        try:
+            bids = PriceLevels((float(bid[0]), float(bid[1])) for bid in snapshot['bids'])
+            asks = PriceLevels((float(ask[0]), float(ask[1])) for ask in snapshot['asks'])
+        except Exception as e:
+            raise WSException("Error initializing order book channel {}: {}".format(self.name, e))
+        self._begin_update()
+        try:
+            self.bids, self.asks = bids, asks
+            self.lastUpdateId = snapshot.get('lastUpdateId') or 0
+            self._first = True
+            buffered, self._buffer = self._buffer, deque(maxlen=self.BUFFER_SIZE)
+            self._buffered.clear()
+            while buffered:
+                if not self._apply(*buffered[0]):
+                    # the snapshot is older than the events, they are kept for the next one
+                    self._buffer.extend(buffered)
+                    self._buffered.set()
+                    return False
+                buffered.popleft()
+            self._bid_changes.clear()
+            self._ask_changes.clear()
+            self.synced = self._loaded = True
+            return True
+        finally:
+            self._end_update()
+
+    def _resync(self):
+        """Starts buffering the diff events and loads a new snapshot in the background.
+        :raises WSException if the book cannot be resynchronized (there is no loader)
+        """
+        self.synced = False
+        if self._resyncing:
             return
-        self.lastUpdateId = update['u']
+        if self._loader is None:
+            raise WSException("Gap in diff events of order book channel {}".format(self.name))
+        self._resyncing = True
+        if self._loaded:
+            self.resyncs += 1
+        thread = threading.Thread(target=self._run_resync, name=self.name + '-resync')
+        thread.daemon = True
+        thread.start()
+
+    def _run_resync(self):
+        while not self._closed:
+            if not self._buffered.wait(self.RETRY_DELAY):
+                # the snapshot is requested after the first diff event
+                continue
+            try:
+                snapshot = self._loader()
+            except Exception:
+                snapshot = None
+            if snapshot:
+                with self._lock:
+                    if self._set_snapshot(snapshot):
+                        self._resyncing = False
+                        self._publish_snapshot()
+                        return
+            time.sleep(self.RETRY_DELAY)
+        self._resyncing = False
+
+
+class BinancePartialOrderBook(SortedOrderBook):
+    """Binance per-channel partial order book (the @depth<levels> streams of the lighter profiles).
+
+    Every message carries the complete top levels of the book:
+        { "lastUpdateId": 160, "bids": [ ["0.0024", "10"], ... ], "asks": [ ["0.0026", "100"], ... ] }
+    so the book needs neither a REST snapshot nor a sync procedure: the levels missing from
+    a message are removed, the changed ones are set, and the listeners get the same full book
+    and delta messages as from BinanceOrderBook. The book starts empty and its first message
+    is published as a delta of all its levels.
+    """
+    SENDER = 'binance'
 
+    def __init__(self, name):
+        """Initialize an empty partial order book
+        :param name:   channel name (i.e. symbol + '@depth20')
+        """
+        super(BinancePartialOrderBook, self).__init__(name)
+        self.lastUpdateId = 0
+
+    def update(self, update):
+        """Update the order book
+        :param update:  the top levels of the book received from exchange via websocket
+        :return: None
+        :raises WSException
+        """
+        if update['lastUpdateId'] <= self.lastUpdateId:
+            return
+        self.lastUpdateId = update['lastUpdateId']
         try:
-            for bid in update['b']:
-                price = float(bid[0])
-                quantity = float(bid[1])
-                if quantity == 0.0:
-                    if self.bids.get(price, None):
-                        self.bids.pop(price)
-                    # elif self.asks.get(price, None):
-                    #    self.asks.pop(price)
-                else:
-                    self.bids[price] = quantity
-            for ask in update['a']:
-                price = float(ask[0])
-                quantity = float(ask[1])
-                if quantity == 0.0:
-                    if self.asks.get(price, None):
-                        self.asks.pop(price)
-                    # elif self.bids.get(price, None):
-                    #    self.bids.pop(price)
-                else:
-                    self.asks[price] = quantity
+            bids = {float(price): float(amount) for price, amount in update['bids']}
+            asks = {float(price): float(amount) for price, amount in update['asks']}
         except Exception as e:
             raise WSException("Error updating order book channel {}: {}".format(self.name, e))
+        self._replace(self.bids, bids, self._set_bid)
+        self._replace(self.asks, asks, self._set_ask)
         self._publish()
 
-    def snapshot(self):
-        """Get the latest snapshot of the order book"""
-        bids, asks = self._sort_book()
-        return {'bids': bids, 'asks': asks}
-
-    def _sort_book(self):
-        """Get the latest snapshot of the order book"""
-        bids = OrderedDict(sorted(self.bids.items(), key=lambda t: t[0]))
-        asks = OrderedDict(sorted(self.asks.items(), key=lambda t: t[0]))
-        return bids, asks
-
-    def _publish(self):
-        """Sends updated book to listeners"""
-        bids, asks = self._sort_book()
-        dispatcher.send(signal=self.name, sender='binance', data={'bids': bids, 'asks': asks})
+    @staticmethod
+    def _replace(levels, new_levels, set_level):
+        for price in [price for price in levels if price not in new_levels]:
+            set_level(price, 0)
+        for price, amount in new_levels.items():
+            if levels.get(price) != amount:
+                set_level(price, amount)
 
 
 # ==========================================================================================
@@ -172,6 +415,8 @@ class BinanceOrderBook(ChannelData):
 
 class BinanceTrades(ChannelData):
     """Binance per-channel trades."""
+    ID_KEY = 't'    # the field of the trade id in the updates
+
     def __init__(self, name, trades):
         """Initializes a new trades object
         :param name:   channel name (i.e. 'trades_' + symbol)
@@ -190,16 +435,16 @@ class BinanceTrades(ChannelData):
         """
         super(BinanceTrades, self).__init__()
         self.name = name
-        self.trades = deque(maxlen=self.MAX_TRADES)
+        self.trades = TradeTape(self.MAX_TRADES)
+        self.backfilled = 0     # time of the last trade added by patch, older updates are duplicates
+        self._patched = []      # (amount, price) of the patched trades at the time of the last one
         trades = trades[-self.MAX_TRADES:]
         try:
-            for trade in trades:
-                self.trades.appendleft([int(trade[0]),
-                                        -float(trade[2]) if trade[-1] == 'sell' else float(trade[2]),
-                                        float(trade[1])])
+            self.trades.extend([[int(trade[0]), -float(trade[2]) if trade[-1] == 'sell' else float(trade[2]),
+                                 float(trade[1])] for trade in trades])
         except Exception as e:
             raise WSException("Error initializing trades channel {}: {}".format(self.name, e))
-        # dispatcher.send(signal=self.name, sender='binance', data=('snapshot', list(self.trades)))
+        # bus.publish(self.name, 'binance', self.snapshot())
 
     def update(self, trade):
         """Update trades
@@ -223,17 +468,114 @@ class BinanceTrades(ChannelData):
             }
         """
         try:
-            self.trades.appendleft( [int(trade['T']),
-                                     -float(trade['q']) if trade['m'] else float(trade['q']),
-                                     float(trade['p'])] )
+            trade_id = trade.get(self.ID_KEY, NO_TRADE_ID)
+            values = [int(trade['T']), -float(trade['q']) if trade['m'] else float(trade['q']), float(trade['p'])]
         except Exception as e:
             raise WSException("Error initializing trades channel {}: {}".format(self.name, e))
-        dispatcher.send(signal=self.name, sender='binance', data=('update', self.trades[0]))
-
-
-    def snapshot(self):
-        """Get the current snapshot of the trades"""
-        return 'snapshot', list(self.trades)
+        if self._duplicate(*values, trade_id):
+            return
+        update = self._event(Trade, values, trade_id=trade_id)
+        self._begin_update()
+        self.trades.append(*update, trade_id=trade_id)
+        self._end_update()
+        bus.publish(self.name, 'binance', ('update', update))
+
+    def update_numeric(self, trade):
+        """Update trades from a trade parsed by BinanceNumericParser.parse_trade
+        :param trade:  (timestamp, amount, price, trade id)
+        :return: None
+        """
+        if self._duplicate(*trade):
+            return
+        self._begin_update()
+        self.trades.append(*trade)
+        self._end_update()
+        bus.publish(self.name, 'binance', ('update', self._event(Trade, trade[:3], trade_id=trade[3])))
+
+    def patch(self, trades):
+        """Adds the trades missed while the stream was down
+        :param trades:  recent trades obtained using the REST api (in the same form as the snapshot)
+        :return: None
+        :raises WSException
+        Only the trades more recent than the last kept trade are added, and they are published
+        at once as ('batch', [trade, ...]) from the least to the most recent.
+        The REST trades have no id, so the ones at the time of the last kept trade are matched
+        with the kept trades of that time by their amount and price.
+        The stream updates already included in the patch are dropped afterwards (see _duplicate).
+        """
+        last = self.trades.last_timestamp or 0
+        kept = self._trades_at(last)
+        received = time.time() * 1000
+        missed = []
+        try:
+            for trade in trades:
+                trade = Trade([int(trade[0]), -float(trade[2]) if trade[-1] == 'sell' else float(trade[2]),
+                               float(trade[1])], receive_ts=received)
+                if trade[0] < last:
+                    continue
+                if trade[0] == last and (trade[1], trade[2]) in kept:
+                    kept.remove((trade[1], trade[2]))
+                    continue
+                missed.append(trade)
+        except Exception as e:
+            raise WSException("Error patching trades channel {}: {}".format(self.name, e))
+        if not missed:
+            return
+        self._begin_update()
+        self.trades.extend(missed)
+        self._end_update()
+        self.backfilled = missed[-1][0]
+        self._patched = [(trade[1], trade[2]) for trade in missed if trade[0] == self.backfilled]
+        bus.publish(self.name, 'binance', ('batch', missed))
+
+
+    def _trades_at(self, timestamp):
+        """Gets the (amount, price) of the kept trades of a time"""
+        trades = []
+        for trade in self.trades:
+            if trade[0] != timestamp:
+                break
+            trades.append((trade[1], trade[2]))
+        return trades
+
+    def _duplicate(self, timestamp, amount, price, trade_id=NO_TRADE_ID):
+        """Checks if a stream trade was already added
+        The trades received from another connection (i.e. during a rotation) are recognized by their id,
+        the trades added by the last patch by their time, amount and price (the REST trades have no id).
+        """
+        if trade_id != NO_TRADE_ID and trade_id <= self.trades.last_id:
+            return True
+        if timestamp < self.backfilled:
+            return True
+        if timestamp == self.backfilled and (amount, price) in self._patched:
+            self._patched.remove((amount, price))
+            return True
+        return False
+
+    def _take_snapshot(self):
+        """Get the current snapshot of the trades, a copy of the trade tape from the most recent trade"""
+        return 'snapshot', self.trades.recent().copy()
+
+
+class BinanceAggTrades(BinanceTrades):
+    """Binance per-channel aggregate trades (the @aggTrade stream of the lighter profiles).
+    The fills of a taker order at the same price are aggregated to a single update:
+        {
+            "e": "aggTrade",  // Event type
+            "E": 123456789,   // Event time
+            "s": "BNBBTC",    // Symbol
+            "a": 12345,       // Aggregate trade ID
+            "p": "0.001",     // Price
+            "q": "100",       // Quantity
+            "f": 100,         // First trade ID
+            "l": 105,         // Last trade ID
+            "T": 123456785,   // Trade time
+            "m": true,        // Is the buyer the market maker?
+            "M": true         // Ignore
+        }
+    which is kept and published the same way as a trade, with the aggregate trade id.
+    """
+    ID_KEY = 'a'
 
 
 # ==========================================================================================
@@ -268,7 +610,7 @@ class BinanceCandles(ChannelData):
         :param name:   channel name (i.e. 'candles_' + symbol)
         :param candles: a candles snapshot received from the exchange
         :raises WSException
-        Keeps candles in a deque with size limited to MAX_CANDLES elements (just a safety).
+        Keeps candles in a CandleBuffer with size limited to MAX_CANDLES elements (just a safety).
         Since the snapshot is obtained using the REST api we do not need publish the snapshot.
         The users, including the one that first subscribes to the channel, get the snapshot
         directly via the subscribe method.
@@ -276,11 +618,11 @@ class BinanceCandles(ChannelData):
         super(BinanceCandles, self).__init__()
         self.name = name
         try:
-            self.candles = deque([ [int(candle[0])] + [float(c) for c in candle[1:6]] for candle in candles ],
-                                 maxlen=self.MAX_CANDLES)
+            self.candles = CandleBuffer(self.MAX_CANDLES)
+            self.candles.extend([[int(candle[0])] + [float(c) for c in candle[1:6]] for candle in candles])
         except Exception as e:
             raise WSException("Error initializing candles channel {}: {}".format(self.name, e))
-        # dispatcher.send(signal=self.name, sender='binance', data=('snapshot', list(self.candles)))
+        # bus.publish(self.name, 'binance', self.snapshot())
 
     def update(self, update):
         """Update the candles
@@ -316,38 +658,264 @@ class BinanceCandles(ChannelData):
             }
         """
         try:
-            candle = [int(update['k']['t']),
-                      float(update['k']['o']),
-                      float(update['k']['h']),
-                      float(update['k']['l']),
-                      float(update['k']['c']),
-                      float(update['k']['v'])]
-
-            if candle[0] > self.candles[-1][0]:
+            candle = self._event(Candle, [int(update['k']['t']),
+                                          float(update['k']['o']),
+                                          float(update['k']['h']),
+                                          float(update['k']['l']),
+                                          float(update['k']['c']),
+                                          float(update['k']['v'])])
+            added = candle[0] > self.candles.last_timestamp
+            if not added and candle[0] < self.candles.last_timestamp:
+                # in case we got some stale update just ignore it.
+                return
+        except Exception as e:
+            raise WSException("Error updating candles channel {}: {}".format(self.name, e))
+        self._begin_update()
+        try:
+            if added:
                 # add new candle
                 self.candles.append(candle)
-                dispatcher.send(signal=self.name, sender='binance', data=('add', candle))
-            elif candle[0] == self.candles[-1][0]:
-                # update last candle
-                self.candles[-1] = candle
-                dispatcher.send(signal=self.name, sender='binance', data=('update', candle))
             else:
-                # in case we got some stale update just ignore it.
-                return
+                # update last candle
+                self.candles.update_last(candle)
         except Exception as e:
             raise WSException("Error updating candles channel {}: {}".format(self.name, e))
+        finally:
+            self._end_update()
+        # the listeners get the candle once the buffer is consistent again
+        bus.publish(self.name, 'binance', ('add' if added else 'update', candle))
+
+    def patch(self, candles):
+        """Updates the candles missed while the stream was down
+        :param candles:  recent candles obtained using the REST api (in the same form as the snapshot)
+        :return: None
+        :raises WSException
+        The last kept candle is updated and the newer candles are added,
+        the same way as if they were received from the stream.
+        """
+        received = time.time() * 1000
+        events = []
+        self._begin_update()
+        try:
+            for candle in candles:
+                candle = Candle([int(candle[0])] + [float(c) for c in candle[1:6]], receive_ts=received)
+                if not self.candles or candle[0] > self.candles.last_timestamp:
+                    self.candles.append(candle)
+                    events.append(('add', candle))
+                elif candle[0] == self.candles.last_timestamp:
+                    self.candles.update_last(candle)
+                    events.append(('update', candle))
+        except Exception as e:
+            raise WSException("Error patching candles channel {}: {}".format(self.name, e))
+        finally:
+            self._end_update()
+        # the listeners get the candles once the buffer is consistent again
+        for event in events:
+            bus.publish(self.name, 'binance', event)
 
-    def snapshot(self):
-        """Get the current snapshot of the candles"""
-        return 'snapshot', list(self.candles)
+    def _take_snapshot(self):
+        """Get the current snapshot of the candles, an (n, 6) array copy of the candle buffer"""
+        return 'snapshot', self.candles.array().copy()
 
 
 # ==========================================================================================
 #   Client
 # ==========================================================================================
 
-WEBSOCKET_URI = 'wss://stream.binance.com:9443/ws/'
-REST_URI      = 'https://api.binance.com'
+STREAM_URI     = 'wss://stream.binance.com:9443'
+WEBSOCKET_PATH = '/ws/'                 # the raw stream endpoint of a dedicated connection
+COMBINED_PATH  = '/stream?streams='     # the combined stream endpoint of a pooled connection
+WEBSOCKET_URI  = STREAM_URI + WEBSOCKET_PATH
+COMBINED_URI   = STREAM_URI + COMBINED_PATH
+REST_URI       = 'https://api.binance.com'
+
+MAX_STREAMS_PER_CONNECTION = 1024   # Binance limit of streams on a single connection
+MAX_REQUESTS_PER_SECOND    = 5      # Binance limit of incoming (control) messages per connection
+BOOK_SNAPSHOT_DEPTH        = 1000   # the number of price levels of the depth snapshot used to sync a book
+BACKFILL_TRADES            = 100    # the number of recent trades requested to patch a reopened trades stream
+BACKFILL_CANDLES           = 10     # the number of recent candles requested to patch a reopened candles stream
+CONNECTION_LIFETIME        = 23 * 3600  # seconds after which a pooled connection is rotated (Binance drops it at 24h)
+ROTATION_TIMEOUT           = 30     # seconds to wait for the streams of a replacement connection to get in sync
+
+PRIMARY = 'primary'     # the connection of a stream
+STANDBY = 'standby'     # the hot-standby connection of a redundant stream
+COMBINED = ''           # the capture source of the messages of the combined stream endpoint
+REST     = 'rest'       # the capture source of the REST responses the channels are initialized with
+
+# Stream granularity profiles: the streams subscribed for the ticker, book, trades and all tickers channels.
+# The lighter profiles trade the fidelity of the data for CPU and bandwidth: partial books instead of
+# the diff events, aggregate trades and mini tickers, while their data objects publish the same output.
+FULL_PROFILE     = 'full'       # diff depth events every second, every trade, full tickers (the default)
+REALTIME_PROFILE = 'realtime'   # diff depth events every 100ms
+TOP_PROFILE      = 'top'        # top 10 levels every 100ms
+OVERVIEW_PROFILE = 'overview'   # top 20 levels every second, aggregate trades, mini tickers
+MINIMAL_PROFILE  = 'minimal'    # top 5 levels every second, aggregate trades, mini tickers
+
+STREAM_PROFILES = {
+    FULL_PROFILE:     {'book': '@depth',         'trades': '@trade',    'ticker': '@ticker',
+                       'all_tickers': '!ticker@arr'},
+    REALTIME_PROFILE: {'book': '@depth@100ms',   'trades': '@trade',    'ticker': '@ticker',
+                       'all_tickers': '!ticker@arr'},
+    TOP_PROFILE:      {'book': '@depth10@100ms', 'trades': '@trade',    'ticker': '@ticker',
+                       'all_tickers': '!ticker@arr'},
+    OVERVIEW_PROFILE: {'book': '@depth20',       'trades': '@aggTrade', 'ticker': '@miniTicker',
+                       'all_tickers': '!miniTicker@arr'},
+    MINIMAL_PROFILE:  {'book': '@depth5',        'trades': '@aggTrade', 'ticker': '@miniTicker',
+                       'all_tickers': '!miniTicker@arr'},
+}
+
+_PARTIAL_DEPTH = re.compile(r'@depth\d+')
+
+
+class BinanceStreamConnection(object):
+    """A single websocket connection to the Binance combined stream endpoint.
+
+    The connection carries multiple streams. The streams known when the connection is created
+    are given in the connection url, and the streams added or removed later are (un)subscribed
+    with live SUBSCRIBE/UNSUBSCRIBE requests. Whenever the connection (re)opens, the streams
+    added or removed since the url was created are (un)subscribed, so the server side always
+    matches the streams of the connection. Every message on the combined endpoint is wrapped as
+        { "stream": <stream name>, "data": <raw payload> }
+    so the messages are routed by the client using the stream field.
+    A dropped connection is reopened with a jittered exponential backoff (see Reconnector)
+    until it is closed.
+    """
+    def __init__(self, name, streams, on_message, logger, engine=None, on_open=None, uri=COMBINED_URI):
+        """Creates a new connection (the connection is opened by start)
+        :param name:        the name of the connection and its thread
+        :param streams:     a list of streams to subscribe when the connection opens
+        :param on_message:  a callback receiving the raw messages from the websocket and the connection
+        :param logger:      client logger
+        :param engine:      AsyncioEngine serving the connection or None for a dedicated thread
+        :param on_open:     a callback receiving the connection whenever it (re)opens
+        :param uri:         the url of the combined stream endpoint, followed by the streams
+        """
+        self.name = name
+        self.uri = uri
+        self.streams = set(streams)     # all streams carried by the connection
+        self.connected = False
+        self.reconnector = Reconnector()
+        self._url_streams = set(streams)
+        self._on_message = on_message
+        self._on_open = on_open
+        self._closed = False
+        self._logger = logger
+        self._engine = engine
+        self._request_id = 0
+        self._request_times = deque(maxlen=MAX_REQUESTS_PER_SECOND)
+        self._lock = threading.Lock()
+        self.ws = None
+        self.thread = None              # there is no dedicated thread when served by the engine
+        if engine is None:
+            self.ws = websocket.WebSocketApp(uri + '/'.join(streams),
+                                             on_open=self._handle_open,
+                                             on_message=self._handle_message,
+                                             on_error=self._handle_error,
+                                             on_close=self._handle_close)
+            self.thread = threading.Thread(target=self._run, name=name)
+            self.thread.daemon = True
+
+    def start(self):
+        """Starts the connection thread or opens the connection on the engine"""
+        self._logger.info('Starting connection {} for {}'.format(self.name, ','.join(self.streams)))
+        if self._engine is None:
+            self.thread.start()
+        else:
+            self.ws = self._engine.open(self.uri + '/'.join(self._url_streams),
+                                        on_open=self._handle_open,
+                                        on_message=self._handle_message,
+                                        on_error=self._handle_error,
+                                        on_close=self._handle_close,
+                                        verify=False,
+                                        logger=self._logger,
+                                        reconnector=self.reconnector)
+
+    def close(self):
+        """Closes the connection which terminates the thread"""
+        self._closed = True
+        self.ws.close()
+
+    def reconnect(self):
+        """Drops the socket, which is then reopened"""
+        if self._engine is None:
+            self.ws.close()
+        else:
+            self.ws.reconnect()
+
+    def add(self, stream):
+        """Adds a stream to the connection"""
+        with self._lock:
+            self.streams.add(stream)
+            if not self.connected:
+                return
+        self._request('SUBSCRIBE', [stream])
+
+    def remove(self, stream):
+        """Removes a stream from the connection"""
+        with self._lock:
+            self.streams.discard(stream)
+            if not self.connected:
+                return
+        self._request('UNSUBSCRIBE', [stream])
+
+    def _run(self):
+        while True:
+            self.ws.run_forever(sslopt={"cert_reqs": ssl.CERT_NONE})
+            self.connected = False
+            if self._closed:
+                break
+            self.reconnector.dropped()
+            delay = self.reconnector.delay()
+            self._logger.info('Connection {} dropped, reconnecting in {:.1f}s'.format(self.name, delay))
+            time.sleep(delay)
+            if self._closed:
+                break
+        self._logger.info('Thread exit for {}'.format(self.name))
+
+    def _request(self, method, streams):
+        """Sends a SUBSCRIBE or UNSUBSCRIBE request.
+        Requests are throttled to stay within the Binance limit of incoming messages,
+        since exceeding it makes the server drop the connection.
+        """
+        with self._lock:
+            if len(self._request_times) == MAX_REQUESTS_PER_SECOND:
+                wait = self._request_times[0] + 1.0 - time.time()
+                if wait > 0:
+                    time.sleep(wait)
+            self._request_times.append(time.time())
+            self._request_id += 1
+            self._logger.info('{} {} on {} (id {})'.format(method, ','.join(streams), self.name, self._request_id))
+            self.ws.send(json.dumps({'method': method, 'params': streams, 'id': self._request_id}))
+
+    # Websocket handlers
+    # The handlers take variable arguments since websocket-client passes the websocket
+    # object to bound methods only in newer versions. The message or error is always the last argument.
+
+    def _handle_open(self, *args):
+        self._logger.info('Websocket connection open for {}'.format(self.name))
+        if self._engine is None:
+            # the engine records the opening itself
+            self.reconnector.opened()
+        with self._lock:
+            self.connected = True
+            added = list(self.streams - self._url_streams)
+            removed = list(self._url_streams - self.streams)
+        if added:
+            self._request('SUBSCRIBE', added)
+        if removed:
+            self._request('UNSUBSCRIBE', removed)
+        if self._on_open:
+            self._on_open(self)
+
+    def _handle_message(self, *args):
+        self._on_message(args[-1], self)
+
+    def _handle_error(self, *args):
+        self._logger.error('Websocket error on {}: {}'.format(self.name, args[-1]))
+
+    def _handle_close(self, *args):
+        self.connected = False
+        self._logger.info('Websocket connection closed for {}'.format(self.name))
 
 
 class BinanceWSClient(WSClientAPI):
@@ -356,24 +924,89 @@ class BinanceWSClient(WSClientAPI):
     - Client should be used via factory.
     - It implements common websocket api WSClientAPI,
       which means that only those calls should be used by a user.
-    - The updates are propagated to a user code asynchronously via dispatcher.
+    - The updates are propagated to a user code asynchronously via the event bus.
       User is supposed to provide a callback handler that should handle
       the updates in the user space. Subscribe methods return the channel name
       and the initial data (useful to reduce communication cost for candles and trades)
     - Public channels are subscribed as requested.
     - Private channels are subscribed automatically after successful authentication.
-    - Each channel is handled by a separate dedicated thread. Since Binance does not have
+    - By default, each channel is handled by a separate dedicated thread. Since Binance does not have
       a subscription handshake protocol, channels are subscribed as soon as we send a request
       for a particular stream. That means that each thread work on the dedicated websocket.
+    - In the multiplexed mode, streams share connections to the combined stream endpoint
+      (see BinanceStreamConnection) and messages are routed by their stream field.
+      A connection carries up to max_streams streams, after which a new connection
+      is added to the pool, up to max_connections connections.
+    - With the asyncio engine, connections (dedicated or multiplexed) do not have their own threads,
+      but run as coroutines on the single event loop thread of the AsyncioEngine, which also
+      pings the server and reopens dropped connections.
+    - Dropped connections are reopened with a jittered exponential backoff and their streams
+      are resubscribed. The data objects of the streams are kept: order books are resynchronized
+      and the trades and candles missed meanwhile are patched using the REST api.
+      The reconnects are measured (see get_reconnects).
+    - Binance closes connections after 24 hours. Pooled connections are rotated before that
+      (make-before-break): a replacement connection subscribes the same streams, every stream
+      is switched to it as soon as it is in sync with the data, and then the old connection
+      is closed, so the listeners see no gap. Dedicated connections are reopened and backfilled.
+    - Latency sensitive streams can be received redundantly (see add_standby): a hot-standby connection
+      carries the same streams, the first copy of every message is used and the later copy is dropped.
+      The arrivals are measured (see get_redundancy).
+    - The ticker, book and trades channels are subscribed with a stream profile (see STREAM_PROFILES),
+      which selects between the full streams and the lighter ones. The messages of every stream
+      are counted and get_message_rates reports the rate produced by each profile.
+    - Messages are decoded with orjson when it is installed, and with json otherwise.
+      In the numeric mode, depth and trade messages skip the json decoding and are parsed
+      directly to numbers (see BinanceNumericParser).
+    - The raw messages of the streams can be captured to compressed files (see start_capture).
     - All websocket communication is logged.
     """
-    def __init__(self):
-        """Creates Binance websocket client"""
+    def __init__(self, multiplex=False, max_streams=MAX_STREAMS_PER_CONNECTION, max_connections=5,
+                 engine=THREAD_ENGINE, decoder=None, numeric=False, rotate=True,
+                 stream_uri=STREAM_URI, rest_uri=REST_URI):
+        """Creates Binance websocket client
+        :param multiplex:        use the multiplexed mode
+        :param max_streams:      the maximum number of streams per connection in the multiplexed mode
+        :param max_connections:  the maximum number of connections in the multiplexed mode
+        :param engine:           THREAD_ENGINE or ASYNCIO_ENGINE
+        :param decoder:          'json', 'orjson' or None for the fastest available json decoder
+        :param numeric:          parse depth and trade messages directly to numbers
+        :param rotate:           rotate the pooled connections before they expire (see CONNECTION_LIFETIME)
+        :param stream_uri:       the websocket server of the streams (i.e. a local stand-in, see exchanges.standin)
+        :param rest_uri:         the REST server of the snapshots and of the user data stream
+        :raises WSException if the asyncio engine or the decoder is requested, but not available
+        """
         super(BinanceWSClient, self).__init__()
+        self.stream_uri = stream_uri
+        self.rest_uri = rest_uri
         self._threads = []        # a list of all spawned threads
         self._data = {}           # stream -> data
-        self._subscriptions = {}  # stream -> thread
-        self._connections = {}    # stream -> websocket
+        self._subscriptions = {}  # stream -> thread (None with the asyncio engine)
+        self._connections = {}    # stream -> websocket (or BinanceStreamConnection when multiplexed)
+        self._reconnectors = {}   # stream -> Reconnector of a dedicated connection
+        self._profiles = {}       # stream -> the profile it was subscribed with
+        self._meters = {}         # stream -> RateMeter of the stream messages
+        self._closing = False     # set while disconnecting, so the dropped connections are not reopened
+
+        self.engine = engine
+        self._engine = AsyncioEngine.instance() if engine == ASYNCIO_ENGINE else None
+
+        # message decoding
+        self._decoder = get_decoder(decoder)
+        self.numeric = numeric
+
+        # multiplexed mode
+        self.multiplex = multiplex
+        self.max_streams = min(max_streams, MAX_STREAMS_PER_CONNECTION)
+        self.max_connections = max_connections
+        self._pool = []           # a list of BinanceStreamConnection objects
+        self._pool_counter = 0
+        self.rotate = rotate
+        self._rotations = {}      # replacement connection -> the rotated connection
+        self._timers = {}         # connection -> Timer rotating the connection
+
+        # redundant streams
+        self._standby = None      # BinanceStreamConnection carrying the redundant streams
+        self._redundant = {}      # stream -> Deduplicator
 
         # authenticated streams
         self.authenticated = False
@@ -390,30 +1023,65 @@ class BinanceWSClient(WSClientAPI):
         return 'Binance'
 
     def _connect(self):
-        """Create a websocket connection to Bitfinex."""
-        stream = threading.current_thread().getName()
-        self.logger.info('Connecting to websocket for stream %s' % stream)
-        # websocket.enableTrace(True)
-        ws = websocket.WebSocketApp(WEBSOCKET_URI + stream,
-                                    on_message=self._on_message,
-                                    on_error=self._on_error,
-                                    on_close=self._on_close)
-        ws.on_open = self._on_open
-        self._connections[stream] = ws
-        ws.run_forever(sslopt={"cert_reqs": ssl.CERT_NONE})  # TODO see if we can solve this using ssl
+        """Create a websocket connection to Binance for the stream of the current thread.
+        The connection is supervised: when it drops, it is reopened after a backoff delay
+        for as long as the thread handles a subscribed stream.
+        """
+        thread = threading.current_thread()
+        stream = thread.getName()
+        reconnector = self._reconnectors[stream]
+        while not self._closing and self._subscriptions.get(stream) is thread:
+            self.logger.info('Connecting to websocket for stream %s' % stream)
+            # websocket.enableTrace(True)
+            ws = websocket.WebSocketApp(self.stream_uri + WEBSOCKET_PATH + stream,
+                                        on_message=self._on_message,
+                                        on_error=self._on_error,
+                                        on_close=self._on_close)
+            ws.on_open = self._on_open
+            self._connections[stream] = ws
+            ws.run_forever(sslopt={"cert_reqs": ssl.CERT_NONE})  # TODO see if we can solve this using ssl
+            if self._closing or self._subscriptions.get(stream) is not thread:
+                break
+            reconnector.dropped()
+            delay = reconnector.delay()
+            self.logger.info('Connection dropped for {}, reconnecting in {:.1f}s'.format(stream, delay))
+            time.sleep(delay)
         self.logger.info('Thread exit for {}'.format(stream))
 
-    def _reconnect(self):
-        """Reconnect to a websocket and resubscribe to all used channels.
-        This method is intended to be used in case a websocket connection is dropped.
-        All the stream should be reconnected automatically.
+    def _reconnect(self, stream):
+        """Drops the connection of a stream, so it is reopened and the stream is resubscribed.
+        In the multiplexed mode, all streams of the pooled connection are reopened.
+        :raises KeyError if there is no connection for the stream
         """
-        self._connect()
+        connection = self._connections[stream]
+        if self.multiplex or self._engine:
+            connection.reconnect()
+        else:
+            connection.close()      # the thread of the stream opens a new connection
 
     def _subscribe(self, stream):
         """Starts a websocket listener thread for a given stream.
         The name of the thread is the name of the stream it handles.
+        In the multiplexed mode the stream is added to a pooled connection instead.
         """
+        if self.multiplex:
+            self._subscribe_multiplexed(stream)
+            return
+        reconnector = Reconnector()
+        self._reconnectors[stream] = reconnector
+        if self._engine:
+            self.logger.info('Opening a new connection for {}'.format(stream))
+            self._connections[stream] = self._engine.open(self.stream_uri + WEBSOCKET_PATH + stream,
+                                                          on_open=partial(self._stream_opened, stream, [stream],
+                                                                          reconnector),
+                                                          on_message=partial(self._handle_message, stream),
+                                                          on_error=self._on_error,
+                                                          on_close=partial(self._log_connection, stream, 'closed'),
+                                                          verify=False,
+                                                          logger=self.logger,
+                                                          reconnector=reconnector)
+            self._subscriptions[stream] = None
+            return
         self.logger.info('Starting a new thread for {}'.format(stream))
         thread = threading.Thread(target=self._connect, name=stream)
         thread.daemon = True
@@ -421,6 +1089,155 @@ class BinanceWSClient(WSClientAPI):
         self._threads.append(thread)
         thread.start()
 
+    def _subscribe_multiplexed(self, stream):
+        """Adds a stream to the first pooled connection that has room for it.
+        If all connections are full, a new connection is added to the pool.
+        :raises ExchangeException if the pool is full
+        """
+        connection = next((c for c in self._pool if len(c.streams) < self.max_streams), None)
+        if connection is None:
+            if len(self._pool) >= self.max_connections:
+                raise ExchangeException(self.name(), 'Reached the limit of {} connections with {} streams each'
+                                        .format(self.max_connections, self.max_streams))
+            connection = self._new_connection([stream])
+            self._pool.append(connection)
+        else:
+            connection.add(stream)
+        self._subscriptions[stream] = connection.thread
+        self._connections[stream] = connection
+
+    def _new_connection(self, streams):
+        """Creates and starts a pooled connection, which is rotated before it expires
+        :param streams:  the streams of the connection
+        :return: BinanceStreamConnection
+        """
+        self._pool_counter += 1
+        connection = BinanceStreamConnection('binance-mux-{}'.format(self._pool_counter), streams,
+                                             self._on_stream_message, self.logger, self._engine,
+                                             on_open=self._on_connection_open,
+                                             uri=self.stream_uri + COMBINED_PATH)
+        if connection.thread:
+            self._threads.append(connection.thread)
+        connection.start()
+        if self.rotate:
+            timer = threading.Timer(CONNECTION_LIFETIME, self._rotate, (connection,))
+            timer.daemon = True
+            self._timers[connection] = timer
+            timer.start()
+        return connection
+
+    def _close_connection(self, connection):
+        """Closes a pooled connection and cancels its rotation"""
+        timer = self._timers.pop(connection, None)
+        if timer:
+            timer.cancel()
+        connection.close()
+
+    def _unsubscribe(self, stream):
+        """Stops receiving a stream.
+        Closes the stream connection, or in the multiplexed mode sends an unsubscribe request
+        and closes the pooled connection only when it carries no more streams.
+        :raises KeyError if there is no connection for the stream
+        """
+        connection = self._connections.pop(stream)
+        if self.multiplex:
+            connection.remove(stream)
+            # a connection being rotated shares its streams with the replacement
+            for replacement, rotated in list(self._rotations.items()):
+                if connection is rotated:
+                    replacement.remove(stream)
+                elif connection is replacement:
+                    rotated.remove(stream)
+            if connection.streams:
+                return
+            if connection in self._pool:
+                self._pool.remove(connection)
+            self._close_connection(connection)
+            return
+        connection.close()   # this will terminate the thread
+
+    def _rotate(self, connection):
+        """Replaces a pooled connection without a gap in the data (make-before-break).
+        A replacement connection subscribes the same streams. Its messages are dropped until
+        a stream gets in sync (see _in_sync), after which the stream is routed from the replacement
+        and the messages of the old connection are dropped. When all streams are switched, the old
+        connection is closed. The streams that do not get in sync within ROTATION_TIMEOUT
+        are switched anyway and backfilled.
+        :param connection:  a pooled connection
+        """
+        if self._closing or connection not in self._pool:
+            return
+        self._timers.pop(connection, None)
+        self.logger.info('Rotating connection {} ...'.format(connection.name))
+        replacement = self._new_connection(list(connection.streams))
+        self._rotations[replacement] = connection
+        deadline = time.time() + ROTATION_TIMEOUT
+        while time.time() < deadline and not self._closing and \
+                any(self._connections.get(stream) is connection for stream in list(replacement.streams)):
+            time.sleep(0.1)
+        if self._closing:
+            return
+        missed = [stream for stream in list(replacement.streams) if self._connections.get(stream) is connection]
+        for stream in missed:
+            self._switch(replacement, stream)
+        index = len(self._pool)
+        if connection in self._pool:
+            index = self._pool.index(connection)
+            self._pool.remove(connection)
+        if replacement.streams:
+            self._pool.insert(index, replacement)
+        # the old connection is closed before the rotation ends, since its messages are filtered until then
+        self._close_connection(connection)
+        self._rotations.pop(replacement, None)
+        if not replacement.streams:
+            self._close_connection(replacement)
+        self.logger.info('Rotated connection {} to {}'.format(connection.name, replacement.name))
+        if missed and not self._closing:
+            self.logger.info('Streams {} did not get in sync, backfilling'.format(','.join(missed)))
+            self._backfill(missed)
+
+    def _switch(self, replacement, stream):
+        """Routes a stream from the replacement of its connection"""
+        # the trades received from both connections are dropped by their id (see BinanceTrades._duplicate)
+        self._connections[stream] = replacement
+        self._subscriptions[stream] = replacement.thread
+
+    def _in_sync(self, stream, msg):
+        """Checks if a message from the replacement connection can continue the data of a stream.
+        An order book diff event must not skip any update of the book and a trade must not
+        skip any trade id (or be newer than the last received trade, if it has no id).
+        The other streams carry their complete state.
+        """
+        data = self._data.get(stream)
+        if isinstance(data, BinanceOrderBook):
+            return not data.synced or msg['U'] <= data.lastUpdateId + 1
+        if isinstance(data, BinanceTrades):
+            if not data.trades:
+                return True
+            if data.trades.last_id == NO_TRADE_ID:
+                return msg['T'] <= data.trades.last_timestamp
+            return msg.get(data.ID_KEY, NO_TRADE_ID) <= data.trades.last_id + 1
+        return True
+
+    def _accept(self, connection, message):
+        """Filters the messages of the connections taking part in a rotation
+        :param connection:  the connection that received the message
+        :param message:     a raw message from the combined stream endpoint
+        :return: True if the message should be handled
+        """
+        msg = self._decoder.loads(message)
+        stream = msg.get('stream')
+        if stream is None or self._connections.get(stream) is connection:
+            return True
+        if connection not in self._rotations:
+            # the stream was already switched from this connection to its replacement
+            return False
+        if not self._in_sync(stream, msg['data']):
+            return False
+        self.logger.info('Switching {} to {}'.format(stream, connection.name))
+        self._switch(connection, stream)
+        return True
+
     def _log_active_threads(self):
         """A helper method to log all active threads."""
         threads = [thr.getName() for thr in threading.enumerate()]
@@ -432,18 +1249,65 @@ class BinanceWSClient(WSClientAPI):
 
     def _on_open(self):
         stream = threading.current_thread().getName()
-        self.logger.info('Websocket connection open for {}'.format(stream))
+        reconnector = self._reconnectors[stream]
+        reconnector.opened()
+        self._stream_opened(stream, [stream], reconnector)
+
+    def _on_connection_open(self, connection):
+        self._stream_opened(connection.name, list(connection.streams), connection.reconnector)
+
+    def _stream_opened(self, name, streams, reconnector):
+        """Handles the (re)opening of a connection
+        :param name:         the name of the connection (the stream of a dedicated connection)
+        :param streams:      the streams carried by the connection
+        :param reconnector:  Reconnector of the connection, which already recorded the opening
+        """
+        self._log_connection(name, 'open')
+        if not reconnector.reopened:
+            return
+        self.logger.info('Reconnected {} after {:.2f}s ({} reconnects)'.format(name, reconnector.last_latency,
+                                                                             reconnector.reconnects))
+        bus.publish('info', 'binance', {'info': 'reconnected'})
+        if self._engine:
+            # the REST requests must not block the event loop
+            thread = threading.Thread(target=self._backfill, args=(streams,), name=name + '-backfill')
+            thread.daemon = True
+            thread.start()
+        else:
+            # the messages wait in the socket until the data is patched
+            self._backfill(streams)
+
+    def _backfill(self, streams):
+        """Patches the data of reopened streams with the updates missed while they were down.
+        Order books are resynchronized, trades and candles are patched using the REST api.
+        Tickers and partial books need nothing, since every update carries their complete state.
+        """
+        for stream in streams:
+            data = self._data.get(stream)
+            symbol = stream.split('@')[0]
+            try:
+                if isinstance(data, BinanceOrderBook):
+                    data.reload()
+                elif isinstance(data, BinanceTrades):
+                    data.patch(self._rest_client().trades(symbol, limit=BACKFILL_TRADES) or [])
+                elif isinstance(data, BinanceCandles):
+                    interval = stream.split('_')[-1]
+                    data.patch(self._rest_client().candles(symbol, interval=interval, limit=BACKFILL_CANDLES) or [])
+            except Exception as e:
+                self.logger.error('Backfill of {} failed: {}'.format(stream, e))
 
     def _on_close(self):
-        stream = threading.current_thread().getName()
-        self.logger.info('Websocket connection closed for {}'.format(stream))
+        self._log_connection(threading.current_thread().getName(), 'closed')
+
+    def _log_connection(self, stream, state):
+        self.logger.info('Websocket connection {} for {}'.format(state, stream))
 
     def _on_error(self, error):
         """Handles the error message received from the websocket.
         :param error:  error message
         :raises ExchangeException
         Logs the message and sends the error notification to listeners
-        via dispatcher using 'info' signal.
+        via the event bus using 'info' signal.
         """
         self.logger.info('Websocket error:')
         try:
@@ -453,33 +1317,70 @@ class BinanceWSClient(WSClientAPI):
                 return
             err = json.loads(error)
             self.logger.info('Error {} : {}'.format(err['code'], err['msg']))
-            dispatcher.send(signal='info', sender='binance', data={'error': err['msg]']})
+            bus.publish('info', 'binance', {'error': err['msg]']})
         except json.decoder.JSONDecodeError as e:
             raise ExchangeException(self.name(), 'Exception caught while decoding json object from a websocket!',
                                     data=error, orig_exception=e, logger=self.logger)
 
 
     def _on_message(self, message):
-        """Handles regular messages (updates) received from the websocket.
+        """Handles regular messages (updates) received from the websocket of a stream thread.
+        :param message:   a message from the websocket
+        :return None
+        :raises ExchangeException
+        The name of the stream is the name of the thread.
+        """
+        self._handle_message(threading.current_thread().getName(), message)
+
+    def _handle_message(self, stream, message):
+        """Handles regular messages (updates) received from the websocket of a given stream.
+        :param stream:    the name of the stream
         :param message:   a message from the websocket
         :return None
         :raises ExchangeException
         """
-        msg = json.loads(message)
+        if self._capture is not None:
+            self._capture.write(stream, message)
+        if self.numeric and self._route_numeric(stream, message):
+            return
+        msg = self._decoder.loads(message)
         try:
-            stream = threading.current_thread().getName()
-            # TICKER, ORDER BOOK, TRADES or CANDLES
-            if 'ticker' in stream or \
-                    'depth' in stream or \
-                    'trade' in stream or \
-                    'kline' in stream:
-                self._data[stream].update(msg)
-            # AUTHENTICATED
-            elif self._listenKey == stream:
-                self._handle_auth_update(msg)
+            self._route(stream, msg)
+        except KeyError:
+            pass
+        except Exception as e:
+            raise ExchangeException(self.name(), 'Exception caught while handling a websocket channel message',
+                                    data=msg, orig_exception=e, logger=self.logger)
+
+
+    def _on_stream_message(self, message, connection=None, source=PRIMARY):
+        """Handles messages received from a connection to the combined stream endpoint.
+        :param message:     a message from the websocket
+        :param connection:  the connection that received the message
+        :param source:      PRIMARY or STANDBY for the standby connection of the redundant streams
+        :return None
+        :raises ExchangeException
+        Stream updates are wrapped as {"stream": <stream name>, "data": <raw payload>}.
+        Other messages are responses to SUBSCRIBE/UNSUBSCRIBE requests.
+        """
+        if self._rotations and connection is not None and source == PRIMARY and \
+                not self._accept(connection, message):
+            return
+        if self._capture is not None and source == PRIMARY:
+            self._capture.write(COMBINED, message)
+        if self.numeric and source == PRIMARY:
+            stream = BinanceNumericParser.stream(message)
+            if stream and self._route_numeric(stream, message):
+                return
+        msg = self._decoder.loads(message)
+        try:
+            if 'stream' in msg:
+                self._route(msg['stream'], msg['data'], source)
+            elif 'error' in msg:
+                self.logger.info('Request {} failed: {}'.format(msg.get('id'), msg['error']))
+                bus.publish('info', 'binance', {'error': msg['error'].get('msg')})
             else:
-                self.logger.info('Update not handled for stream {}'.format(stream))
-                self.logger.info('Message:\n{}'.format(msg))
+                self.logger.info('Request {} done'.format(msg.get('id')))
         except KeyError:
             pass
         except Exception as e:
@@ -487,6 +1388,91 @@ class BinanceWSClient(WSClientAPI):
                                     data=msg, orig_exception=e, logger=self.logger)
 
 
+    def _on_standby_message(self, message, connection=None):
+        """Handles messages received from the standby connection of the redundant streams"""
+        self._on_stream_message(message, connection, STANDBY)
+
+    def _route_numeric(self, stream, message):
+        """Passes a depth or trade update parsed directly from the raw message to the data object of a stream.
+        :param stream:   the name of the stream
+        :param message:  a message from the websocket
+        :return: True if the message was handled, False if it has to be decoded as json
+        :raises ExchangeException
+        The redundant streams are decoded as json, since they are deduplicated by the ids of the messages.
+        """
+        if stream in self._redundant:
+            return False
+        data = self._data.get(stream)
+        try:
+            if type(data) is BinanceOrderBook:
+                update = BinanceNumericParser.parse_depth(message)
+                data.stamp(None, update[1])
+                data.update_numeric(update)
+            elif type(data) is BinanceTrades:
+                trade = BinanceNumericParser.parse_trade(message)
+                data.stamp(trade[0], trade[3])
+                data.update_numeric(trade)
+            else:
+                return False
+        except Exception as e:
+            raise ExchangeException(self.name(), 'Exception caught while handling a websocket channel message',
+                                    data=message, orig_exception=e, logger=self.logger)
+        meter = self._meters.get(stream)
+        if meter is not None:
+            meter.count += 1
+        return True
+
+    def _route(self, stream, msg, source=PRIMARY):
+        """Passes an update to the data object of a stream.
+        :param stream:  the name of the stream
+        :param msg:     decoded update
+        :param source:  PRIMARY or STANDBY, the connection that received the update
+        :raises KeyError if there is no data object for a stream (i.e. the stream is being unsubscribed)
+        """
+        deduplicator = self._redundant.get(stream)
+        if deduplicator is None:
+            if source == STANDBY:
+                # the stream is not redundant anymore
+                return
+        elif not deduplicator.accept(source, self._sequence_id(stream, msg)):
+            return
+        meter = self._meters.get(stream)
+        if meter is not None:
+            meter.count += 1
+        kind = stream.lower()   # i.e. @aggTrade and @miniTicker
+        # AUTHENTICATED
+        if self._listenKey == stream:
+            self._handle_auth_update(msg)
+        # TICKER, ORDER BOOK, TRADES or CANDLES
+        elif 'ticker' in kind or \
+                'depth' in kind or \
+                'trade' in kind or \
+                'kline' in kind:
+            data = self._data[stream]
+            if type(msg) is dict:
+                # the update ids of the books and the trade ids are the sequence of the stream
+                data.stamp(msg.get('E'), self._sequence_id(stream, msg) if 'depth' in kind or 'trade' in kind else None)
+            data.update(msg)
+        else:
+            self.logger.info('Update not handled for stream {}'.format(stream))
+            self.logger.info('Message:\n{}'.format(msg))
+
+
+    @staticmethod
+    def _sequence_id(stream, msg):
+        """Returns the exchange identifier of a stream message used to deduplicate redundant streams:
+        the last update id of depth events and partial books, the (aggregate) trade id of trades
+        and the event time otherwise.
+        """
+        if '@depth' in stream:
+            return msg['u'] if 'u' in msg else msg['lastUpdateId']
+        if '@trade' in stream:
+            return msg['t']
+        if '@aggTrade' in stream:
+            return msg['a']
+        return msg['E']
+
+
     # Public interface methods
     # ---------------------------------------------------------------------------------
 
@@ -500,31 +1486,40 @@ class BinanceWSClient(WSClientAPI):
         exchange events, such as maintenance, or connection issues.
         """
         self._info_handler = info_handler
-        dispatcher.connect(info_handler, signal='info', sender='binance')
+        if info_handler:
+            bus.subscribe(info_handler, signal='info', sender='binance')
 
     def disconnect(self):
         """Disconnects a client from the exchange.
         This method first unsubscribes a client from all subscribed channels,
         closes the websocket connections and waits for the each socket thread to terminate.
-        Next, it disconnects all listeners from the dispatcher for this client,
+        Next, it disconnects all listeners from the event bus for this client,
         and finally it stops the logger.
         """
         self.logger.info('Disconnecting ...')
+        self._closing = True
 
         # close all sockets
+        for timer in self._timers.values():
+            timer.cancel()
+        for replacement in list(self._rotations):
+            replacement.close()
+        if self._standby:
+            self._standby.close()
         for stream, thread in self._subscriptions.items():
             try:
                 socket = self._connections[stream]
                 socket.close()
-                thread.join()
+                if thread:
+                    thread.join()
             except KeyError:
                 self.logger.info(f'No connection for stream {stream}')
 
-        # disconnect all listeners from the dispatcher
+        # disconnect all listeners from the event bus
         if self._info_handler:
-            dispatcher.disconnect(self._info_handler, signal='info', sender='binance')
-        for d in dispatcher.getAllReceivers(sender='binance'):
-            d.disconnect()
+            bus.unsubscribe_handler(self._info_handler, signal='info', sender='binance')
+        conflation.disconnect_all('binance')
+        bus.clear('binance')
 
         # make sure that there are no zombie threads
         for thread in self._threads:
@@ -538,7 +1533,17 @@ class BinanceWSClient(WSClientAPI):
         self._data.clear()
         self._connections.clear()
         self._subscriptions.clear()
-
+        self._reconnectors.clear()
+        self._profiles.clear()
+        self._meters.clear()
+        self._pool.clear()
+        self._timers.clear()
+        self._rotations.clear()
+        self._redundant.clear()
+        self._standby = None
+        self._closing = False
+
+        self.stop_capture()
         self._stop_logger()
 
 
@@ -569,24 +1574,34 @@ class BinanceWSClient(WSClientAPI):
         """Generic method to unsubscribe from the channel.
         :param stream:          a name of the channel
         :param update_handler:  arbitrary keyword arguments. Depend on the specific exchange.
-        The method first removes the listener from a dispatcher and then sends
+        The method first removes the listener from the event bus and then sends
         an unsubscribe message to a websocket if there are no more listeners on a stream.
         """
         if update_handler:
+            self.logger.info(f'Removing listener for {stream} ...')
             try:
-                self.logger.info(f'Removing listener for {stream} ...')
-                dispatcher.disconnect(update_handler, signal=stream, sender='binance')
-            except dispatcher.errors.DispatcherKeyError as e:
-                self.logger.error(e)
+                conflation.disconnect(update_handler, signal=stream, sender='binance')
+            except DispatcherKeyError as e:
+                # order book listeners can also be registered for the delta mode
+                try:
+                    conflation.disconnect(update_handler, signal=delta_signal(stream), sender='binance')
+                except DispatcherKeyError:
+                    self.logger.error(e)
 
         # unsubscribe if no one is listening
-        if not dispatcher.getReceivers(sender='binance', signal=stream):
+        if not bus.has_subscribers(stream, 'binance') and \
+                not bus.has_subscribers(delta_signal(stream), 'binance'):
             self.logger.info(f'Unsubscribing from {stream} ...')
             try:
-                self._data.pop(stream)                    # remove data object
+                data = self._data.pop(stream)             # remove data object
+                if isinstance(data, BinanceOrderBook):
+                    data.close()
                 self._subscriptions.pop(stream)           # remove subscription
-                socket = self._connections.pop(stream)    # remove connection
-                socket.close()                            # this will terminate the thread
+                self._reconnectors.pop(stream, None)
+                self._profiles.pop(stream, None)
+                self._meters.pop(stream, None)
+                self._remove_standby(stream)
+                self._unsubscribe(stream)                 # remove connection
                 self.logger.info(f'Unsubscribed from {stream}')
                 # parent thread does not call join here to avoid blocking
             except KeyError:
@@ -596,22 +1611,25 @@ class BinanceWSClient(WSClientAPI):
     # Public Channels
     # ---------------------------------------------------------------------------------
 
-    def subscribe_ticker(self, symbol, update_handler=None):
+    def subscribe_ticker(self, symbol, update_handler=None, rate=None, profile=FULL_PROFILE):
         """Subscribe to ticker channel.
         :param symbol:            A string that represents a ticker symbol (pair).
         :param update_handler:  A callback handler that should handle the asynchronous update of a ticker.
+        :param rate:            The maximum number of updates per second delivered to the handler (None for all).
+        :param profile:         The stream profile (see STREAM_PROFILES), the lighter profiles use the mini ticker.
         :return: A tuple of a string that represents a stream (channel) identifier and a snapshot.
         :raises ExchangeException
         """
+        stream = symbol.lower() + self._profile_stream('ticker', profile)
         try:
-            stream = symbol.lower() + '@ticker'
 
             if update_handler:
-                dispatcher.connect(update_handler, signal=stream, sender='binance')
+                conflation.connect(update_handler, signal=stream, sender='binance', rate=rate)
 
             if stream not in self._subscriptions:
                 self.logger.info(f'Subscribing to ticker for {symbol} ...')
-                self._data[stream] = BinanceTicker(stream)
+                self._data[stream] = BinanceTicker(stream) if stream.endswith('@ticker') else BinanceMiniTicker(stream)
+                self._add_meter(stream, profile)
                 self._subscribe(stream)
                 return stream, None
             else:
@@ -622,21 +1640,28 @@ class BinanceWSClient(WSClientAPI):
                                     orig_exception=e, logger=self.logger)
 
 
-    def subscribe_all_tickers(self, update_handler=None):
+    def subscribe_all_tickers(self, update_handler=None, rate=None, profile=FULL_PROFILE):
         """Subscribe to all tickers channel.
         :param update_handler:  A callback handler that should handle the asynchronous update of a ticker.
+        :param rate:            The maximum number of updates per second delivered to the handler (None for all).
+        :param profile:         The stream profile (see STREAM_PROFILES), the lighter profiles use the mini tickers.
         :return: A tuple of a string that represents a stream (channel) identifier and a snapshot.
         :raises ExchangeException
         """
+        stream = self._profile_stream('all_tickers', profile)
         try:
-            stream = '!ticker@arr'
 
             if update_handler:
-                dispatcher.connect(update_handler, signal=stream, sender='binance')
+                conflation.connect(update_handler, signal=stream, sender='binance', rate=rate,
+                                   policy=conflation.MergeTickers)
 
             if stream not in self._subscriptions:
                 self.logger.info('Subscribing to all pairs tickers')
-                self._data[stream] = BinanceAllTickers(stream)
+                if stream == '!ticker@arr':
+                    self._data[stream] = BinanceAllTickers(stream)
+                else:
+                    self._data[stream] = BinanceAllMiniTickers(stream)
+                self._add_meter(stream, profile)
                 self._subscribe(stream)
                 return stream, None
             else:
@@ -652,27 +1677,45 @@ class BinanceWSClient(WSClientAPI):
         :param symbol:          A symbol for a ticker (pair).
         :param update_handler:  A callback handler that should handle the asynchronous update of the order book.
         :param kwargs:          Additional parameters that differ between exchanges.
+                                delta   - if True, the handler receives only the changed price levels
+                                rate    - the maximum number of updates per second delivered to the handler
+                                profile - the stream profile (see STREAM_PROFILES), the full diff depth by default,
+                                          the partial books of the lighter profiles need no snapshot
         :return: A tuple of a string that represents a stream (channel) identifier and a snapshot.
         :raises ExchangeException
         """
+        symbol  = symbol.lower()
+        profile = kwargs.get('profile', FULL_PROFILE)
+        stream  = symbol + self._profile_stream('book', profile)
         try:
-            symbol = symbol.lower()
-            stream = symbol + '@depth'
+            delta  = kwargs.get('delta', False)
 
             if update_handler is not None:
-                dispatcher.connect(update_handler, signal=stream, sender='binance')
+                if delta:
+                    conflation.connect(update_handler, signal=delta_signal(stream), sender='binance',
+                                       rate=kwargs.get('rate'), policy=conflation.MergeBookDeltas)
+                else:
+                    conflation.connect(update_handler, signal=stream, sender='binance', rate=kwargs.get('rate'))
 
-            if stream not in self._subscriptions:
+            if stream not in self._subscriptions and _PARTIAL_DEPTH.search(stream):
+                self.logger.info(f'Subscribing to partial order book for {symbol} ...')
+                self._data[stream] = BinancePartialOrderBook(stream)
+                self._add_meter(stream, profile)
+                self._subscribe(stream)
+            elif stream not in self._subscriptions:
                 self.logger.info(f'Subscribing to order book for {symbol} ...')
-                # Get a depth snapshot using the rest api
-                init_book_data = BinanceRESTClient().order_book(symbol)
-                if not init_book_data:
-                    init_book_data = {'bids': [], 'asks': []}
-                self._data[stream] = BinanceOrderBook(stream, init_book_data)
+                # The diff events are buffered from the moment the stream is opened,
+                # and applied on top of the depth snapshot obtained using the rest api.
+                book = self._new_order_book(stream, symbol)
+                self._data[stream] = book
+                self._add_meter(stream, profile)
                 self._subscribe(stream)
+                book.load()
             else:
                 self.logger.info(f'Already subscribed to {symbol} book')
 
+            if delta:
+                return stream, ('snapshot', self._data[stream].snapshot())
             return stream, self._data[stream].snapshot()
 
         except Exception as e:
@@ -680,27 +1723,163 @@ class BinanceWSClient(WSClientAPI):
                                     orig_exception=e, logger=self.logger)
 
 
-    def subscribe_trades(self, symbol, update_handler=None):
+    def _profile_stream(self, channel, profile):
+        """Returns the stream suffix of a channel (or the stream of all tickers) for a given profile
+        :raises ExchangeException if the profile is unknown
+        """
+        try:
+            return STREAM_PROFILES[profile][channel]
+        except KeyError:
+            raise ExchangeException(self.name(), f'Unknown stream profile {profile}. '
+                                                 f'Must be one of {list(STREAM_PROFILES)}')
+
+    def _add_meter(self, stream, profile):
+        """Starts counting the messages of a stream subscribed with a given profile"""
+        self._profiles[stream] = profile
+        self._meters[stream] = RateMeter()
+
+    def get_message_rates(self, reset=False):
+        """Returns the message rates of the ticker, book and trades streams grouped by their profiles
+        :param reset:  start measuring the rates anew (see RateMeter)
+        :return: { profile : {'streams': { stream : metrics }, 'messages': count, 'rate': messages per second} }
+                 where the messages and the rate are the totals of the streams of the profile
+        """
+        rates = {}
+        for stream, meter in list(self._meters.items()):
+            metrics = meter.metrics(reset)
+            profile = rates.setdefault(self._profiles.get(stream), {'streams': {}, 'messages': 0, 'rate': 0.0})
+            profile['streams'][stream] = metrics
+            profile['messages'] += metrics['messages']
+            profile['rate'] += metrics['rate']
+        return rates
+
+    def _new_order_book(self, stream, symbol):
+        """Creates the order book of a diff depth stream, synced with the snapshots of _load_order_book"""
+        return BinanceOrderBook(stream, loader=partial(self._load_order_book, symbol))
+
+    def _load_order_book(self, symbol):
+        """Gets a depth snapshot of an order book using the rest api
+        :return: {'lastUpdateId': id, 'bids': [...], 'asks': [...]} or None
+        """
+        self.logger.info(f'Loading order book snapshot for {symbol} ...')
+        snapshot = self._rest_client().order_book(symbol, limit=BOOK_SNAPSHOT_DEPTH)
+        self._capture_response('depth', symbol, snapshot)
+        return snapshot
+
+    def _load_trades(self, symbol):
+        """Gets the recent trades using the rest api
+        :return: a list of [ TIMESTAMP, PRICE, AMOUNT, 'sell' or 'buy' ]
+        """
+        trades = self._rest_client().trades(symbol) or []
+        self._capture_response('trades', symbol, trades)
+        return trades
+
+    def _load_candles(self, symbol, interval):
+        """Gets the recent candles using the rest api
+        :return: a list of [ MTS, OPEN, HIGH, LOW, CLOSE, VOLUME ]
+        """
+        candles = self._rest_client().candles(symbol, interval=interval) or []
+        self._capture_response('candles', symbol, candles, interval=interval)
+        return candles
+
+    def _rest_client(self, **kwargs):
+        """Creates a REST client of the server of the client (see rest_uri)
+        :param kwargs:  BinanceRESTClient parameters (i.e. the keys)
+        """
+        return BinanceRESTClient(url=self.rest_uri, **kwargs)
+
+    def _capture_response(self, request, symbol, response, **params):
+        """Writes a REST response a channel is initialized with to the capture, so the channel can be replayed
+        :param request:   'depth', 'trades' or 'candles'
+        :param symbol:    the symbol of the request (lower case)
+        :param response:  the response of the REST client
+        :param params:    other parameters of the request (i.e. interval)
+        """
+        if self._capture is not None and response is not None:
+            self._capture.write(REST, json.dumps(dict(params, request=request, symbol=symbol, data=response)))
+
+    def get_resyncs(self):
+        """Returns the number of order book resyncs caused by gaps in diff events
+        :return: { stream : number of resyncs }
+        """
+        return {stream: data.resyncs for stream, data in self._data.items() if isinstance(data, BinanceOrderBook)}
+
+    def get_reconnects(self):
+        """Returns the reconnect metrics of the connections (see Reconnector.metrics)
+        :return: { stream or the name of a pooled connection : metrics }
+        """
+        metrics = {stream: reconnector.metrics() for stream, reconnector in list(self._reconnectors.items())}
+        metrics.update({connection.name: connection.reconnector.metrics() for connection in self._pool})
+        return metrics
+
+
+    def add_standby(self, stream):
+        """Receives a subscribed stream redundantly over a hot-standby connection.
+        The standby connection carries all redundant streams. Every message of a redundant stream
+        is passed to the data object by the connection that delivers it first, the later copy is dropped.
+        :param stream:  the name of a subscribed ticker, depth, trade or kline stream
+        :raises ExchangeException if the stream is not subscribed or cannot be deduplicated
+        """
+        if stream not in self._subscriptions:
+            raise ExchangeException(self.name(), 'Not subscribed to {}'.format(stream))
+        if not any(kind in stream for kind in ['@ticker', '@miniTicker', '@depth', '@trade', '@aggTrade', '@kline']):
+            raise ExchangeException(self.name(), 'Stream {} cannot be received redundantly'.format(stream))
+        if stream in self._redundant:
+            return
+        self._redundant[stream] = Deduplicator()
+        if self._standby is None:
+            self._standby = BinanceStreamConnection('binance-standby', [stream], self._on_standby_message,
+                                                    self.logger, self._engine, uri=self.stream_uri + COMBINED_PATH)
+            if self._standby.thread:
+                self._threads.append(self._standby.thread)
+            self._standby.start()
+        else:
+            self._standby.add(stream)
+        self.logger.info('Receiving {} redundantly on {}'.format(stream, self._standby.name))
+
+    def _remove_standby(self, stream):
+        """Stops receiving a stream redundantly, the standby connection is closed with its last stream"""
+        if self._redundant.pop(stream, None) is None:
+            return
+        self._standby.remove(stream)
+        if not self._standby.streams:
+            self._standby.close()
+            self._standby = None
+
+    def get_redundancy(self):
+        """Returns the arrival metrics of the redundant streams (see Deduplicator.metrics),
+        where the connections are PRIMARY and STANDBY
+        :return: { stream : metrics }
+        """
+        return {stream: deduplicator.metrics() for stream, deduplicator in list(self._redundant.items())}
+
+
+    def subscribe_trades(self, symbol, update_handler=None, rate=None, profile=FULL_PROFILE):
         """Subscribe to the channel for trades.
         :param symbol:          A symbol for a ticker (pair).
         :param update_handler:  A callback handler that should handle the asynchronous update of trades.
+        :param rate:            The maximum number of updates per second delivered to the handler (None for all).
+        :param profile:         The stream profile (see STREAM_PROFILES), the lighter profiles use aggregate trades.
         :return: A tuple of a string that represents a stream (channel) identifier and a snapshot.
         :raises ExchangeException
         """
+        symbol = symbol.lower()
+        stream = symbol + self._profile_stream('trades', profile)
         try:
-            symbol = symbol.lower()
-            stream = symbol + '@trade'
 
             if update_handler:
-                dispatcher.connect(update_handler, signal=stream, sender='binance')
+                conflation.connect(update_handler, signal=stream, sender='binance', rate=rate,
+                                   policy=conflation.BatchTrades)
 
             if stream not in self._subscriptions:
                 self.logger.info(f'Subscribing to trades for {symbol} ...')
                 # get trades snapshot using the REST api
-                init_trade_data = BinanceRESTClient().trades(symbol.lower())
-                if init_trade_data is None:
-                    init_trade_data = []
-                self._data[stream] = BinanceTrades(stream, init_trade_data)
+                init_trade_data = self._load_trades(symbol)
+                if stream.endswith('@trade'):
+                    self._data[stream] = BinanceTrades(stream, init_trade_data)
+                else:
+                    self._data[stream] = BinanceAggTrades(stream, init_trade_data)
+                self._add_meter(stream, profile)
                 self._subscribe(stream)
             else:
                 self.logger.info(f'Already subscribed to {symbol} trades')
@@ -712,11 +1891,12 @@ class BinanceWSClient(WSClientAPI):
                                     orig_exception=e, logger=self.logger)
 
 
-    def subscribe_candles(self, symbol, interval='1m', update_handler=None):
+    def subscribe_candles(self, symbol, interval='1m', update_handler=None, rate=None):
         """Subscribe to the channel for candles.
         :param symbol:          A symbol for a ticker (pair).
         :param interval         Time interval for a candle.
         :param update_handler:  A callback handler that should handle the asynchronous update of trades.
+        :param rate:            The maximum number of updates per second delivered to the handler (None for all).
         :return: A tuple of a string that represents a stream (channel) identifier and a snapshot.
         :raises ExchangeException
         """
@@ -729,14 +1909,13 @@ class BinanceWSClient(WSClientAPI):
             stream = symbol.lower() + '@kline_' + interval
 
             if update_handler is not None:
-                dispatcher.connect(update_handler, signal=stream, sender='binance')
+                conflation.connect(update_handler, signal=stream, sender='binance', rate=rate,
+                                   policy=conflation.MergeCandles)
 
             if stream not in self._subscriptions:
                 self.logger.info(f'Subscribing to {interval} candles for {symbol} ...')
                 # Get candle snapshot using the rest api
-                init_candle_data = BinanceRESTClient().candles(symbol.lower(), interval=interval)
-                if init_candle_data is None:
-                    init_candle_data = []
+                init_candle_data = self._load_candles(symbol.lower(), interval)
                 self._data[stream] = BinanceCandles(stream, init_candle_data)
                 self._subscribe(stream)
             else:
@@ -765,7 +1944,7 @@ class BinanceWSClient(WSClientAPI):
         self._keyFile = key_file
 
         self.logger.info('Authenticating ...')
-        rest_client = BinanceRESTClient(key=key, secret=secret, key_file=key_file)
+        rest_client = self._rest_client(key=key, secret=secret, key_file=key_file)
         ret = rest_client.create_listen_key()
         try:
             self._listenKey = ret['listenKey']
@@ -809,9 +1988,9 @@ class BinanceWSClient(WSClientAPI):
         :return: A string that represents a stream (channel) identifier. Specific for each exchange.
         """
         self.logger.info('Subscribing to orders channel')
-        dispatcher.connect(update_handler, signal='orders', sender='binance')
+        bus.subscribe(update_handler, signal='orders', sender='binance')
         if self._orders:
-            dispatcher.send(signal='orders', sender='binance', data=list(reversed(self._orders)))
+            bus.publish('orders', 'binance', list(reversed(self._orders)))
         return 'orders'
 
     def subscribe_user_trades(self, update_handler):
@@ -820,9 +1999,9 @@ class BinanceWSClient(WSClientAPI):
         :return: A string that represents a stream (channel) identifier. Specific for each exchange.
         """
         self.logger.info('Subscribing to user trades channel')
-        dispatcher.connect(update_handler, signal='user_trades', sender='binance')
+        bus.subscribe(update_handler, signal='user_trades', sender='binance')
         if self._trades:
-            dispatcher.send(signal='user_trades', sender='binance', data=list(reversed(self._trades)))
+            bus.publish('user_trades', 'binance', list(reversed(self._trades)))
         return 'user_trades'
 
     def subscribe_balances(self, update_handler):
@@ -831,9 +2010,9 @@ class BinanceWSClient(WSClientAPI):
         :return: A string that represents a stream (channel) identifier. Specific for each exchange.
         """
         self.logger.info('Subscribing to balances channel')
-        dispatcher.connect(update_handler, signal='balances', sender='binance')
+        bus.subscribe(update_handler, signal='balances', sender='binance')
         if self._balances:
-            dispatcher.send(signal='balances', sender='binance', data=self._balances)
+            bus.publish('balances', 'binance', self._balances)
         return 'balances'
 
 
@@ -841,13 +2020,13 @@ class BinanceWSClient(WSClientAPI):
         """Handles updates for authenticated streams received from a websocket
         :param msg     an update message
         :returns None
-        Processes received order updates and sends them to listeners via dispatcher.
+        Processes received order updates and sends them to listeners via the event bus.
         """
         if msg['e'] == 'outboundAccountInfo':
             self._handle_balance_update(msg)
         elif msg['e'] == 'executionReport':
             if msg['x'] == 'REJECTED':
-                dispatcher.send(signal='info', sender='binance', data=msg['r'])
+                bus.publish('info', 'binance', msg['r'])
             else:
                 self._handle_order_update(msg)
         else:
@@ -858,7 +2037,7 @@ class BinanceWSClient(WSClientAPI):
         """Handles order updates received from a websocket
         :param msg      order update message
         :returns None
-        Processes received order updates and sends them to listeners via dispatcher.
+        Processes received order updates and sends them to listeners via the event bus.
         If the order was executed it generates trades update.
         """
         order_id   = int(msg['i'])
@@ -889,28 +2068,28 @@ class BinanceWSClient(WSClientAPI):
                     break
             if is_new_order:
                 self._orders.append(order_update)
-            dispatcher.send(signal='orders', sender='binance', data=list(reversed(self._orders)))
+            bus.publish('orders', 'binance', list(reversed(self._orders)))
         else:
             # delete from orders
             for i, order in enumerate(self._orders):
                 if order[0] == order_id:
                     del self._orders[i]
-                    dispatcher.send(signal='orders', sender='binance', data=list(reversed(self._orders)))
+                    bus.publish('orders', 'binance', list(reversed(self._orders)))
             # add to trades
             self._trades.append(trade_update)
             print('Sending trade update')
-            dispatcher.send(signal='user_trades', sender='binance', data=list(reversed(self._trades)))
+            bus.publish('user_trades', 'binance', list(reversed(self._trades)))
 
 
     def _handle_balance_update(self, msg):
         """Handles balance updates received from a websocket
         :param msg      a balance update message
         :returns None
-        Processes received balance updates and sends them to listeners via dispatcher.
+        Processes received balance updates and sends them to listeners via the event bus.
         """
         for wallet in msg['B']:
             self._balances[wallet['a']] = wallet['f']
-        dispatcher.send(signal='balances', sender='binance', data=self._balances)
+        bus.publish('balances', 'binance', self._balances)
 
 
 
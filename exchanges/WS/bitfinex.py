@@ -3,12 +3,19 @@ import json
 import hashlib
 import hmac
 import time
-from threading import Thread
-from pydispatch import dispatcher
-from collections import OrderedDict, deque
+import zlib
+from decimal import Decimal
+from threading import Thread, Event, RLock, current_thread
 
 from exchanges.exception import *
 from exchanges.WS.api import *
+from exchanges.WS.orderbook import OrderTable, PriceLevels, SortedOrderBook, delta_signal
+from exchanges.WS.buffers import CandleBuffer, TradeTape, NO_TRADE_ID
+from exchanges.WS.marketdata import Ticker, Trade, Candle
+from exchanges.WS.transport import AsyncioEngine, Deduplicator, THREAD_ENGINE, ASYNCIO_ENGINE
+from exchanges.WS.decoder import get_decoder
+from exchanges.WS.events import bus, DispatcherKeyError
+from exchanges.WS import conflation
 
 
 # ==========================================================================================
@@ -28,7 +35,7 @@ class BitfinexTicker(ChannelData):
         super(BitfinexTicker, self).__init__()
         self.name = name
         try:
-            self.data = [float(x) for x in ticker]
+            self.data = Ticker(float(x) for x in ticker)
         except Exception as e:
             raise WSException("Error initializing ticker channel {}: {}".format(name, e))
         self._publish()
@@ -38,28 +45,29 @@ class BitfinexTicker(ChannelData):
         :param ticker:  a new ticker received from exchange via websocket
         :return: None
         :raises: WSException
-        Updates all listeners via dispatcher.
+        Updates all listeners via the event bus.
         """
         try:
-            self.data = [float(x) for x in ticker]
+            self.data = self._event(Ticker, [float(x) for x in ticker])
         except Exception as e:
             raise WSException("Error updating ticker channel {}: {}".format(self.name, e))
         self._publish()
 
-    def snapshot(self):
+    def _take_snapshot(self):
         """Get the current snapshot of the ticker"""
         return self.data
 
     def _publish(self):
         """Send ticker to listeners"""
-        dispatcher.send(signal=self.name, sender='bitfinex', data=self.data)
+        self._commit(self.data)
+        bus.publish(self.name, 'bitfinex', self.data)
 
 
 # ==========================================================================================
 #   OrderBook
 # ==========================================================================================
 
-class BitfinexOrderBook(ChannelData):
+class BitfinexOrderBook(SortedOrderBook):
     """Bitfinex per-channel order book.
     Bitfinex sends the data in the form of a list of orders,
     where each order is in the form of:
@@ -71,75 +79,181 @@ class BitfinexOrderBook(ChannelData):
         if amount = 1 then remove from bids
         if amount = -1 then remove from asks
     """
+    SENDER = 'bitfinex'
+    CHECKSUM_DEPTH = 25     # the number of price levels of each side covered by the checksum
+
     def __init__(self, name, orders):
         """Initialize a new order book
-        :param name:   channel name (i.e. 'book_' + symbol + '_' + prec + '_' + freq)
+        :param name:   channel name (i.e. 'book_' + symbol + '_' + prec + '_' + freq + '_' + len)
         :param orders: order book data from the exchange
         :raises: WSException
-        A new dictionary of bids and asks is created and sent to all listener via dispatcher
+        New sorted price levels for bids and asks are created and sent to all listener via the event bus.
+        Listeners of the delta mode receive it as ('snapshot', book).
         """
-        super(BitfinexOrderBook, self).__init__()
-        self.name = name
-        self.asks = {}
-        self.bids = {}
+        super(BitfinexOrderBook, self).__init__(name)
         try:
-            for order in orders:
-                price  = float(order[0])
-                amount = float(order[2])
-                if amount > 0:
-                    self.bids[price] = amount
-                else:
-                    self.asks[price] = -amount
+            self._load(orders)
         except Exception as e:
             raise WSException("Error initializing order book channel {}: {}".format(self.name, e))
-        self._publish()
+        self._publish_snapshot()
+
+    def _load(self, orders):
+        """Creates the price levels from the orders of a snapshot"""
+        bids = []
+        asks = []
+        for order in orders:
+            price  = float(order[0])
+            amount = float(order[2])
+            if amount > 0:
+                bids.append((price, amount))
+            else:
+                asks.append((price, -amount))
+        self.bids = PriceLevels(bids)
+        self.asks = PriceLevels(asks)
 
 
     def update(self, update):
         """Update the order book
-        :param update:  an update received from exchange via websocket
+        :param update:  an update received from exchange via websocket, either a single order
+                        or a list of orders batched by the exchange (BULK_UPDATES)
         :return: None
         :raises WSException
-        When the internal order book dictionary is updated
-        all listeners are also updated via dispatcher.
+        When the internal order book is updated
+        all listeners are also updated via the event bus,
+        either with the full book or only with the changed price levels (see SortedOrderBook).
+        All orders of a batch are applied first, so the listeners are updated only once.
         """
         try:
-            price  = float(update[0])
-            count  = int(update[1])
-            amount = float(update[2])
-            if count > 0:
-                if amount > 0:
-                    self.bids[price] = amount
-                else:
-                    self.asks[price] = -amount
+            if isinstance(update[0], list):
+                for order in update:
+                    self._apply(order)
             else:
-                if amount == 1:
-                    if self.bids.get(price, None):
-                        self.bids.pop(price)
-                elif amount == -1:
-                    if self.asks.get(price, None):
-                        self.asks.pop(price)
+                self._apply(update)
         except Exception as e:
             raise WSException("Error updating order book channel {}: {}".format(self.name, e))
         self._publish()
 
-    def snapshot(self):
-        """Get the latest snapshot of the order book"""
-        bids, asks = self._sort_book()
-        return {'bids': bids, 'asks': asks}
-
-    def _sort_book(self):
-        """Create two ordered lists, one for asks and the other for bids
-        :return: (OrderedDict, OrderedDict)
+    def _apply(self, order):
+        """Apply a single order [ PRICE, COUNT, AMOUNT ] to the price levels"""
+        price  = float(order[0])
+        count  = int(order[1])
+        amount = float(order[2])
+        if count > 0:
+            if amount > 0:
+                self._set_bid(price, amount)
+            else:
+                self._set_ask(price, -amount)
+        else:
+            if amount == 1:
+                self._set_bid(price, 0)
+            elif amount == -1:
+                self._set_ask(price, 0)
+
+    def checksum(self):
+        """Calculates the checksum of the order book the way Bitfinex does it for the cs messages.
+        The top CHECKSUM_DEPTH bids (from the highest price) and asks (from the lowest price)
+        are interleaved into a string 'bid_price:bid_amount:ask_price:-ask_amount:...'
+        with the numbers formatted as in javascript.
+        :return: signed 32-bit CRC32 of the string
+        """
+        bids = self.bids.top(self.CHECKSUM_DEPTH, descending=True)
+        asks = self.asks.top(self.CHECKSUM_DEPTH)
+        values = []
+        for i in range(self.CHECKSUM_DEPTH):
+            if i < len(bids):
+                values.extend((bids[i][0], bids[i][1]))
+            if i < len(asks):
+                values.extend((asks[i][0], -asks[i][1]))
+        return _checksum(values)
+
+    def verify(self, checksum):
+        """Compares the checksum received from the exchange with the checksum of the order book
+        :param checksum:  the checksum of a cs message
+        :return: True if the order book is in sync with the exchange
         """
-        bids = OrderedDict( sorted(self.bids.items(), key=lambda t: t[0]) )
-        asks = OrderedDict( sorted(self.asks.items(), key=lambda t: t[0]) )
-        return bids, asks
+        return self.checksum() == checksum
 
-    def _publish(self):
-        """Sends updated book to listeners"""
-        bids, asks = self._sort_book()
-        dispatcher.send(signal=self.name, sender='bitfinex', data={'bids': bids, 'asks': asks})
+
+class BitfinexRawOrderBook(BitfinexOrderBook):
+    """Bitfinex per-channel raw order book (precision R0).
+    Raw books send the individual orders instead of price levels,
+    where each order is in the form of:
+        [ ORDER_ID, PRICE, AMOUNT ]
+    when price > 0 then we have to add or update the order
+        if amount > 0 then it is a bid
+        if amount < 0 then it is an ask
+    when price = 0 then we have to delete the order.
+    The orders are kept in an OrderTable and only the price levels of the orders changed by an update
+    are aggregated again, so the book is published in the same form as the other books.
+    """
+
+    def _load(self, orders):
+        """Creates the order table and aggregates its price levels from the orders of a snapshot"""
+        self.orders = OrderTable(len(orders))
+        for order in orders:
+            self.orders.set(int(order[0]), float(order[1]), float(order[2]))
+        self.bids, self.asks = self.orders.aggregate()
+
+    def _apply(self, order):
+        """Apply a single order [ ORDER_ID, PRICE, AMOUNT ] to the order table and its price levels"""
+        order_id = int(order[0])
+        price    = float(order[1])
+        amount   = float(order[2])
+        if price == 0:
+            previous = self.orders.remove(order_id)
+        else:
+            previous = self.orders.set(order_id, price, amount)
+            self._aggregate(price, amount > 0)
+        if previous is not None and (previous[0] != price or (previous[1] > 0) != (amount > 0)):
+            self._aggregate(previous[0], previous[1] > 0)
+
+    def _aggregate(self, price, bid):
+        """Sets a price level to the total amount of its orders"""
+        if bid:
+            self._set_bid(price, self.orders.level(price, bid=True))
+        else:
+            self._set_ask(price, self.orders.level(price, bid=False))
+
+    def checksum(self):
+        """Calculates the checksum of the order book the way Bitfinex does it for the cs messages of raw books.
+        The top CHECKSUM_DEPTH bid orders (from the highest price) and ask orders (from the lowest price)
+        are interleaved into a string 'bid_id:bid_amount:ask_id:ask_amount:...', the orders
+        of the same price in the order of their arrival, with the numbers formatted as in javascript.
+        :return: signed 32-bit CRC32 of the string
+        """
+        bid_ids, _, bid_amounts = self.orders.orders(bid=True)
+        ask_ids, _, ask_amounts = self.orders.orders(bid=False)
+        bids = list(zip(bid_ids[:self.CHECKSUM_DEPTH].tolist(), bid_amounts[:self.CHECKSUM_DEPTH].tolist()))
+        asks = list(zip(ask_ids[:self.CHECKSUM_DEPTH].tolist(), ask_amounts[:self.CHECKSUM_DEPTH].tolist()))
+        values = []
+        for i in range(self.CHECKSUM_DEPTH):
+            if i < len(bids):
+                values.extend(bids[i])
+            if i < len(asks):
+                values.extend(asks[i])
+        return _checksum(values)
+
+
+def _checksum(values):
+    """Returns the signed 32-bit CRC32 of the values joined by colons, the numbers formatted as in javascript"""
+    crc = zlib.crc32(':'.join(map(_js_number, values)).encode())
+    return crc - (1 << 32) if crc >= (1 << 31) else crc
+
+
+def _js_number(value):
+    """Formats a number the same way as javascript (the format used by Bitfinex checksums):
+    integers without the decimal point and the exponent notation only below 1e-6 or from 1e21.
+    """
+    if value == int(value) and abs(value) < 1e21:
+        return str(int(value))
+    text = repr(value)
+    if 'e' not in text:
+        return text
+    mantissa, exponent = text.split('e')
+    exponent = int(exponent)
+    if -7 < exponent < 21:
+        return format(Decimal(text), 'f')
+    return '{}e{}{}'.format(mantissa, '+' if exponent > 0 else '-', abs(exponent))
 
 
 # ==========================================================================================
@@ -158,14 +272,16 @@ class BitfinexTrades(ChannelData):
         """
         super(BitfinexTrades, self).__init__()
         self.name = name
-        self.trades = deque(maxlen=self.MAX_TRADES)
+        self.trades = TradeTape(self.MAX_TRADES)
+        self.resumed = NO_TRADE_ID  # id of the last trade kept when the channel was resumed, older updates are duplicates
         try:
-            for trade in trades:
-                self.trades.append(trade[1:])
+            # the snapshot starts with the most recent trade
+            for trade in reversed(trades[:self.MAX_TRADES]):
+                self.trades.append(trade[1], trade[2], trade[3], trade_id=trade[0])
         except Exception as e:
             raise WSException("Error initializing trades channel {}: {}".format(self.name, e))
         # publish full list of trades
-        dispatcher.send(signal=self.name, sender='bitfinex', data=('snapshot', list(self.trades)))
+        bus.publish(self.name, 'bitfinex', self.snapshot())
 
     def update(self, trade):
         """Update trades
@@ -174,15 +290,44 @@ class BitfinexTrades(ChannelData):
         :raises WSException
         Also update all listeners.
         """
+        if trade[0] <= self.resumed:
+            return
+        self._begin_update()
         try:
-            self.trades.appendleft(trade[1:])
+            self.trades.append(trade[1], trade[2], trade[3], trade_id=trade[0])
         except Exception as e:
             raise WSException("Error updating trades channel {}: {}".format(self.name, e))
-        dispatcher.send(signal=self.name, sender='bitfinex', data=('update', trade[1:]))
+        finally:
+            self._end_update()
+        bus.publish(self.name, 'bitfinex', ('update', self._event(Trade, trade[1:4], trade_id=trade[0])))
 
-    def snapshot(self):
-        """Get the current snapshot of the trades"""
-        return 'snapshot', list(self.trades)
+    def resume(self, trades):
+        """Continues the trades from the snapshot of a new subscription of the channel (i.e. on a rotated connection)
+        :param trades:  the snapshot, from the most recent trade
+        :return: None
+        :raises WSException
+        The kept trades stay, only the trades newer than the last kept trade are added, and they are
+        published at once as ('batch', [trade, ...]) from the least to the most recent.
+        The updates of the kept trades are dropped afterwards.
+        """
+        self.resumed = self.trades.last_id
+        try:
+            missed = [trade for trade in reversed(trades) if trade[0] > self.resumed]
+            events = [self._event(Trade, trade[1:4], trade_id=trade[0]) for trade in missed]
+        except Exception as e:
+            raise WSException("Error resuming trades channel {}: {}".format(self.name, e))
+        if not missed:
+            return
+        self._begin_update()
+        for trade in missed:
+            self.trades.append(trade[1], trade[2], trade[3], trade_id=trade[0])
+        self._end_update()
+        self.resumed = self.trades.last_id
+        bus.publish(self.name, 'bitfinex', ('batch', events))
+
+    def _take_snapshot(self):
+        """Get the current snapshot of the trades, a copy of the trade tape from the most recent trade"""
+        return 'snapshot', self.trades.recent().copy()
 
 
 # ==========================================================================================
@@ -201,7 +346,7 @@ class BitfinexCandles(ChannelData):
         :param name:   channel name (i.e. 'candles_' + symbol)
         :param candles: a candles snapshot received from the exchange
         :raises WSException
-        Keeps candles in a deque with size limited to MAX_CANDLES elements (just a safety).
+        Keeps candles in a CandleBuffer with size limited to MAX_CANDLES elements (just a safety).
         """
         super(BitfinexCandles, self).__init__()
         self.name = name
@@ -214,10 +359,11 @@ class BitfinexCandles(ChannelData):
                 # swap columns 3->2 4->3 2->4
                 candle[2], candle[3] = candle[3], candle[2]
                 candle[3], candle[4] = candle[4], candle[3]
-            self.candles = deque(list(reversed(candles)), maxlen=self.MAX_CANDLES)
+            self.candles = CandleBuffer(self.MAX_CANDLES)
+            self.candles.extend(list(reversed(candles)))
         except Exception as e:
             raise WSException("Error initializing candles channel {}: {}".format(self.name, e))
-        dispatcher.send(signal=self.name, sender='bitfinex', data=('snapshot', list(self.candles)))
+        bus.publish(self.name, 'bitfinex', self.snapshot())
 
     def update(self, candle):
         """Update the candles
@@ -228,55 +374,310 @@ class BitfinexCandles(ChannelData):
         to see if we need to update the last we have or add a new one.
         """
         try:
-            # swap the order of candle data
-            candle[2], candle[3] = candle[3], candle[2]
-            candle[3], candle[4] = candle[4], candle[3]
+            # reorder [MTS, OPEN, CLOSE, HIGH, LOW, VOLUME] to the standard ohlc form
+            candle = self._event(Candle, [candle[0], candle[1], candle[3], candle[4], candle[2], candle[5]])
             # compare the timestamps of the last and new candle
-            if candle[0] > self.candles[-1][0]:
+            added = candle[0] > self.candles.last_timestamp
+            if not added and candle[0] < self.candles.last_timestamp:
+                # bitfinex sometimes sends old candles. We just ignore it.
+                return
+        except Exception as e:
+            raise WSException("Error updating candles channel {}: {}".format(self.name, e))
+        self._begin_update()
+        try:
+            if added:
                 # add new candle
                 self.candles.append(candle)
-                dispatcher.send(signal=self.name, sender='bitfinex', data=('add', candle))
-            elif candle[0] == self.candles[-1][0]:
-                # update last candle
-                self.candles[-1] = candle
-                dispatcher.send(signal=self.name, sender='bitfinex', data=('update', candle))
             else:
-                # bitfinex sometimes sends old candles. We just ignore it.
-                return
+                # update last candle
+                self.candles.update_last(candle)
         except Exception as e:
             raise WSException("Error updating candles channel {}: {}".format(self.name, e))
+        finally:
+            self._end_update()
+        # the listeners get the candle once the buffer is consistent again
+        bus.publish(self.name, 'bitfinex', ('add' if added else 'update', candle))
+
+    def resume(self, candles):
+        """Continues the candles from the snapshot of a new subscription of the channel (i.e. on a rotated connection)
+        :param candles:  the snapshot, from the most recent candle
+        :return: None
+        :raises WSException
+        The kept candles stay, the last one is updated and the newer candles are added,
+        the same way as if they were received as updates.
+        """
+        for candle in reversed(candles):
+            if candle[0] >= self.candles.last_timestamp:
+                self.update(candle)
 
-    def snapshot(self):
-        """Get the current snapshot of the candles"""
-        return 'snapshot', list(self.candles)
+    def _take_snapshot(self):
+        """Get the current snapshot of the candles, an (n, 6) array copy of the candle buffer"""
+        return 'snapshot', self.candles.array().copy()
 
 
 # ==========================================================================================
 #   Client
 # ==========================================================================================
 
+WEBSOCKET_URI   = 'wss://api.bitfinex.com/ws/2'
+CONNECT_TIMEOUT  = 30    # seconds to wait for the connection to open
+RECONNECT_DELAY  = 1     # seconds to wait before reopening a dropped connection
+ROTATION_TIMEOUT = 30    # seconds to wait for the channels of a replacement connection to get in sync
+
+CHANNELS_PER_CONNECTION = 25    # the limit of public channels on a single connection (error 10305 above it)
+MAX_CONNECTIONS         = 10    # the default maximum number of public connections
+
+# configuration flags of the conf event
+TIMESTAMP    = 32768      # every message carries the exchange time in ms as the last element
+SEQ_ALL      = 65536      # every message carries a sequence number (followed by the timestamp, if enabled)
+OB_CHECKSUM  = 131072     # order book channels send a checksum of the top 25 levels after every update
+BULK_UPDATES = 536870912  # order book updates are batched into lists of orders
+
+MIN_TIMESTAMP = 10 ** 12  # timestamps are in ms, so they are larger than any sequence number
+
+# Order book profiles: the parameters of the book channels for the views of different fidelity.
+# The throttled books (F1) are sent at most every 2 seconds, the raw books (R0) send the individual orders.
+RAW_PRECISION = 'R0'
+
+FULL_PROFILE     = 'full'       # 25 price levels in real time (the default)
+REALTIME_PROFILE = 'realtime'   # 100 price levels in real time, for the active pair
+OVERVIEW_PROFILE = 'overview'   # 25 price levels throttled, for overview panes
+RAW_PROFILE      = 'raw'        # 100 orders of each side in real time, aggregated to price levels
+
+BOOK_PROFILES = {
+    FULL_PROFILE:     {'prec': 'P0',          'freq': 'F0', 'len': '25'},
+    REALTIME_PROFILE: {'prec': 'P0',          'freq': 'F0', 'len': '100'},
+    OVERVIEW_PROFILE: {'prec': 'P0',          'freq': 'F1', 'len': '25'},
+    RAW_PROFILE:      {'prec': RAW_PRECISION, 'freq': 'F0', 'len': '100'},
+}
+
+
+def _book_channel(symbol, prec, freq, length):
+    """Returns the name of a book channel, the books of different parameters are separate channels"""
+    return 'book_' + symbol + '_' + prec + '_' + freq + '_' + length
+
+
+PRIMARY = 'primary'     # the pooled connection of a channel
+STANDBY = 'standby'     # the hot-standby connection of a redundant channel
+
+
+class BitfinexConnection(object):
+    """A single websocket connection to Bitfinex.
+
+    The connection only transports the messages, which are handled by the client,
+    so a connection is passed to every client callback. Channel IDs are only valid
+    on the connection that subscribed them. The connection also keeps its own
+    configuration flags and sequence numbers, since both are negotiated per socket.
+    A dropped connection is reopened until it is closed by the client.
+    """
+    def __init__(self, name, on_open, on_message, on_close, logger, engine=None, uri=WEBSOCKET_URI):
+        """Creates a new connection (the connection is opened by start)
+        :param name:        the name of the connection and its thread
+        :param on_open:     a callback receiving the connection when it (re)opens
+        :param on_message:  a callback receiving the connection and a raw message
+        :param on_close:    a callback receiving the connection when it closes
+        :param logger:      client logger
+        :param engine:      AsyncioEngine serving the connection or None for a dedicated thread
+        :param uri:         the url of the websocket API
+        """
+        self.name = name
+        self.uri = uri
+        self.connected = False
+        self.opened = Event()       # set while the connection is open
+        self.flags = 0              # the flags accepted by the exchange on the current connection
+        self.sequence = None        # sequence number of the last message
+        self.sequence_gaps = 0      # the number of detected gaps in the sequence numbers
+        self.retired = False        # set when the connection was replaced, its messages are ignored
+        self._on_open = on_open
+        self._on_message = on_message
+        self._on_close = on_close
+        self._logger = logger
+        self._engine = engine
+        self._closed = False
+        self.ws = None
+        self.thread = None          # there is no dedicated thread when served by the engine
+
+    def start(self):
+        """Starts the connection thread or opens the connection on the engine"""
+        self._logger.info('Connecting {} to bitfinex websocket API ...'.format(self.name))
+        if self._engine is None:
+            self.ws = websocket.WebSocketApp(self.uri,
+                                             on_open=self._handle_open,
+                                             on_message=self._handle_message,
+                                             on_error=self._handle_error,
+                                             on_close=self._handle_close)
+            self.thread = Thread(target=self._run, name=self.name)
+            self.thread.daemon = True
+            self.thread.start()
+        else:
+            self.ws = self._engine.open(self.uri,
+                                        on_open=self._handle_open,
+                                        on_message=self._handle_message,
+                                        on_error=self._handle_error,
+                                        on_close=self._handle_close,
+                                        logger=self._logger)
+
+    def wait(self, timeout=CONNECT_TIMEOUT):
+        """Waits until the connection is open
+        :return: True if the connection is open
+        """
+        return self.opened.wait(timeout)
+
+    def send(self, payload):
+        """Sends a message (str) to the exchange"""
+        self.ws.send(payload)
+
+    def reconnect(self):
+        """Drops the socket, which is then reopened"""
+        self._logger.info('Reconnecting {} ...'.format(self.name))
+        if self._engine is None:
+            # run_forever returns and _run opens the socket again
+            self.ws.close()
+        else:
+            self.ws.reconnect()
+
+    def close(self):
+        """Closes the connection for good, which terminates the thread"""
+        self._closed = True
+        if self.ws:
+            self.ws.close()
+        if self.thread and self.thread is not current_thread():
+            self.thread.join(timeout=3)
+
+    def _run(self):
+        while not self._closed:
+            self.ws.run_forever()
+            if not self._closed:
+                time.sleep(RECONNECT_DELAY)
+        self._logger.info('Thread exit for {}'.format(self.name))
+
+    # Websocket handlers
+    # The handlers take variable arguments since websocket-client passes the websocket
+    # object to bound methods only in newer versions. The message or error is always the last argument.
+
+    def _handle_open(self, *args):
+        self.connected = True
+        self.flags = 0
+        self.sequence = None
+        self.opened.set()
+        self._on_open(self)
+
+    def _handle_message(self, *args):
+        self._on_message(self, args[-1])
+
+    def _handle_error(self, *args):
+        self._logger.error('Bitfinex websocket error on {}:'.format(self.name))
+        self._logger.error(args[-1])
+        bus.publish('info', 'bitfinex', {'error': args[-1]})
+
+    def _handle_close(self, *args):
+        self.connected = False
+        self.opened.clear()
+        self._on_close(self)
+
+
+class BitfinexRotation(object):
+    """A connection being replaced by a new one without a gap in the data (see BitfinexWSClient._rotate).
+
+    The replacement connection subscribes the channels of the rotated connection, while the rotated
+    connection keeps publishing. The messages received by the replacement are buffered, until every
+    channel received its snapshot. Then the channels are switched to the replacement and the buffered
+    messages are handled.
+    """
+    def __init__(self, connection):
+        """
+        :param connection:  the rotated connection
+        """
+        self.connection = connection
+        self.messages = {}          # channel_name -> [(message, timestamp), ...] received by the replacement
+        self.switched = False       # set when the buffered messages are handled
+
+    def add(self, channel_name, msg, timestamp):
+        """Buffers a channel message received by the replacement"""
+        self.messages.setdefault(channel_name, []).append((msg, timestamp))
+
+
 class BitfinexWSClient(WSClientAPI):
     """Websocket client for Bitfinex
 
     - Client should be used via factory.
     - It implements common websocket api WSClientAPI,
       which means that only those calls should be used by a user.
-    - The updates are propagated to a user code asynchronously via dispatcher.
+    - The updates are propagated to a user code asynchronously via the event bus.
       User is supposed to provide a callback handler that should handle
       the updates in the user space. Subscribe methods return the channel name
       and the initial data (useful to reduce communication cost for candles and trades)
     - Public channels are subscribed as requested.
+    - Public channels are spread over a pool of connections (see BitfinexConnection). A connection
+      carries up to max_channels channels, after which a new connection is added to the pool,
+      up to max_connections connections. Each connection has its own receiving thread.
+      When channels are unsubscribed and the remaining channels fit into fewer connections,
+      the channels of the least loaded connection are moved to the others and the empty
+      connection is closed.
     - Private channels are subscribed automatically after successful authentication.
+      They use a separate connection, opened by authenticate.
+    - With the asyncio engine, the connections run as coroutines on the event loop thread
+      of the AsyncioEngine instead of dedicated threads.
+    - Channels are resubscribed whenever their connection is reopened.
+    - When the exchange asks to reconnect (code 20051), a public connection is rotated (make-before-break):
+      its channels are subscribed on a new connection, which replaces the old one as soon as every
+      channel received its snapshot, so the listeners see no gap (see BitfinexRotation).
+    - Latency sensitive channels can be received redundantly (see add_standby): a hot-standby connection
+      carries the same channels, the first copy of every message is used and the later copy is dropped.
+      The arrivals are measured (see get_redundancy).
+    - Messages are decoded with orjson when it is installed, and with json otherwise.
+    - Order books are verified against the checksums sent by the exchange. A book that got out
+      of sync is resubscribed alone, without touching the other channels (see get_resyncs).
+    - Sequence numbers of the messages are checked and the gaps are logged and counted.
+    - Order book updates are received in batches, which are applied and published at once.
+    - Order books are subscribed with a book profile (see BOOK_PROFILES): throttled books for overview panes,
+      100 levels for the active pair, or the raw book of orders kept in an OrderTable (see BitfinexRawOrderBook).
+    - The exchange timestamps of the messages are kept by the channel data together with the latency
+      (see get_latencies).
+    - The flags of these features are negotiated with the conf event whenever a connection opens.
+    - The raw frames of the connections can be captured to compressed files (see start_capture).
     - All websocket communication is logged.
     """
-    def __init__(self):
-        """Creates Bitfinex websocket client"""
+    def __init__(self, engine=THREAD_ENGINE, decoder=None, checksum=True, sequence=True, bulk=True,
+                 timestamps=True, max_channels=CHANNELS_PER_CONNECTION, max_connections=MAX_CONNECTIONS,
+                 rotate=True, uri=WEBSOCKET_URI):
+        """Creates Bitfinex websocket client
+        :param engine:   THREAD_ENGINE or ASYNCIO_ENGINE
+        :param decoder:  'json', 'orjson' or None for the fastest available json decoder
+        :param checksum: verify the order books with the checksums sent by the exchange (OB_CHECKSUM)
+        :param sequence: check the sequence numbers of the messages (SEQ_ALL)
+        :param bulk:     receive the order book updates in batches (BULK_UPDATES)
+        :param timestamps: receive the exchange timestamps of the messages (TIMESTAMP)
+        :param max_channels:    the maximum number of public channels per connection
+        :param max_connections: the maximum number of public connections
+        :param rotate:   rotate the public connections instead of reconnecting them when asked by the exchange
+        :param uri:      the url of the websocket API (i.e. a local stand-in, see exchanges.standin)
+        :raises WSException if the asyncio engine or the decoder is requested, but not available
+        """
         super(BitfinexWSClient, self).__init__()
-        self._thread = None         # socket thread
-        self._ws = None             # websocket
-        self._connected = False
-        self._subscriptions  = {}   # subscriptions : channel_id -> channel_name
-        self._data = {}             # channel_id -> channel data
+        self.uri = uri
+        self.engine = engine
+        self._engine = AsyncioEngine.instance() if engine == ASYNCIO_ENGINE else None
+        self._decoder = get_decoder(decoder)
+        self.max_channels = max_channels
+        self.max_connections = max_connections
+        self._connections = []      # pool of connections for public channels
+        self._auth_connection = None
+        self._connection_id = 0     # the number of created connections, used for their names
+        self._lock = RLock()
+        self._channels = {}         # channel_name -> the connection carrying the channel
+        self._subscriptions  = {}   # subscriptions : (connection, channel_id) -> channel_name
+        self._data = {}             # (connection, channel_id) -> channel data
+        self._payloads = {}         # channel_name -> subscription request
+        self._moving = {}           # channel_name -> the connection to subscribe after unsubscribing
+        self._resyncs = {}          # channel_name -> number of resyncs
+        self._rotations = {}        # the replacement connection -> BitfinexRotation
+        self.rotate = rotate
+        self._standby = None        # the connection carrying the redundant channels
+        self._redundant = {}        # channel_name -> Deduplicator
+        self._standby_ready = set() # the redundant channels that received their snapshot on the standby connection
+        self._flags = (OB_CHECKSUM if checksum else 0) | (SEQ_ALL if sequence else 0) | \
+                      (BULK_UPDATES if bulk else 0) | (TIMESTAMP if timestamps else 0)
 
         # authenticated channels
         self.authenticated = False
@@ -290,85 +691,302 @@ class BitfinexWSClient(WSClientAPI):
     def name():
         return 'Bitfinex'
 
+    @property
+    def sequence_gaps(self):
+        """The number of gaps in the sequence numbers detected on all connections"""
+        connections = self._connections + [c for c in [self._auth_connection, self._standby] if c]
+        return sum(connection.sequence_gaps for connection in connections)
+
 
     def _get_channel_id(self, channel_name):
         """Finds the channel ID for a given channel name.
         :param channel_name:   the name of the channel
-        :return str           channel ID
+        :return (connection, channel ID) or None
         """
         channel_id = None
-        for key, value in self._subscriptions.items():
+        connection = self._channels.get(channel_name)
+        for key, value in list(self._subscriptions.items()):
             if value == channel_name:
                 channel_id = key
+                if key[0] is connection:
+                    # prefer the connection carrying the channel (a rotated channel is on two connections)
+                    break
         return channel_id
 
 
-    def _connect(self):
-        """Create a websocket connection to Bitfinex.
-        Uses Bitfinex API version 2.
-        """
-        self.logger.info('Connecting to bitfinex websocket API ...')
-        # websocket.enableTrace(True)
-        self._ws = websocket.WebSocketApp('wss://api.bitfinex.com/ws/2',
-                                          on_message=self._on_message,
-                                          on_error=self._on_error,
-                                          on_close=self._on_close)
-        self._ws.on_open = self._on_open
-        self._ws.run_forever()
-
+    # Connection pool
+    # ---------------------------------------------------------------------------------
 
-    def _reconnect(self):
-        """Reconnect to a websocket and resubscribe to all used channels.
-        This method is intended to be used in case a websocket connection is dropped.
+    def _new_connection(self):
+        """Creates a new connection (not started)"""
+        self._connection_id += 1
+        return BitfinexConnection('bitfinex-{}'.format(self._connection_id),
+                                  on_open=self._on_open,
+                                  on_message=self._on_message,
+                                  on_close=self._on_close,
+                                  logger=self.logger,
+                                  engine=self._engine,
+                                  uri=self.uri)
+
+    def _open_connection(self):
+        """Opens a new connection and halts the calling thread until it is up
+        :return: BitfinexConnection
+        :raises ExchangeException if the connection does not open within CONNECT_TIMEOUT
         """
-        self._connect()
-        self._resubscribe_all()
-
-
-    def _unsubscribe_all(self):
-        """Unsubscribe from all subscribed channels."""
-        for chanId in self._subscriptions.keys():
-            self.logger.info('Unsubscribing from %s ...' % self._subscriptions[chanId])
-            self._ws.send(json.dumps({"event": "unsubscribe", "chanId": chanId}))
-
-
-    def _resubscribe_all(self):
-        """Renew subscription to all the channels used before the connection was dropped."""
-        subscriptions = self._subscriptions.keys()
-        self._subscriptions.clear()
-        for chan in subscriptions:
-            ch = chan.split('_')
-            if len(ch) == 3:
-                self.subscribe(ch[0], symbol=ch[1], interval=ch[2])
+        connection = self._new_connection()
+        connection.start()
+        if not connection.wait(CONNECT_TIMEOUT):
+            connection.close()
+            raise ExchangeException(self.name(), 'Timed out while connecting to the websocket API',
+                                    logger=self.logger)
+        return connection
+
+    def _load(self, connection):
+        """Returns the number of channels carried by a connection"""
+        return sum(1 for c in list(self._channels.values()) if c is connection)
+
+    def _assign(self, channel_name, opened=None):
+        """Assigns a channel to the least loaded connection with a free slot.
+        When all connections are full, a new connection is needed: it is opened by the caller
+        without holding the lock (see _handle_subscription) and passed in the next call.
+        :param channel_name:  the name of the channel
+        :param opened:        a connection opened for the channel or None
+        :return: BitfinexConnection or None if a new connection has to be opened first
+        """
+        connection = min(self._connections, key=self._load) if self._connections else None
+        if connection is None or self._load(connection) >= self.max_channels:
+            if len(self._connections) < self.max_connections:
+                if opened is None:
+                    return None
+                connection = opened
+                self._connections.append(connection)
             else:
-                self.subscribe(ch[0], symbol=ch[1])
-        if self.authenticated is True:
+                self.logger.info('All {} connections are full, {} may be refused'.format(len(self._connections),
+                                                                                       channel_name))
+        self._channels[channel_name] = connection
+        return connection
+
+    def _move(self, channel_name, target):
+        """Moves a channel to a connection (or subscribes it again on the same connection).
+        The channel is unsubscribed first and subscribed again with the original request
+        when the unsubscription is confirmed. The messages of the channel are ignored meanwhile.
+        The listeners stay connected and receive the new snapshot.
+        :param channel_name:  the name of the channel
+        :param target:        the connection to carry the channel
+        """
+        key = self._get_channel_id(channel_name)
+        if key is None or channel_name in self._moving:
+            return
+        self._moving[channel_name] = target
+        self._channels[channel_name] = target
+        key[0].send(json.dumps({"event": "unsubscribe", "chanId": key[1]}))
+
+    def _rebalance(self):
+        """Closes the empty connections and, if the channels fit into fewer connections,
+        moves the channels of the least loaded connection to the others.
+        The first connection is always kept open.
+        """
+        with self._lock:
+            for connection in self._connections[1:]:
+                if self._load(connection) == 0 and connection not in self._moving.values() and \
+                        not any(key[0] is connection for key in self._subscriptions):
+                    self.logger.info('Closing empty connection {}'.format(connection.name))
+                    self._connections.remove(connection)
+                    connection.close()
+            if len(self._connections) < 2 or \
+                    len(self._channels) > self.max_channels * (len(self._connections) - 1):
+                return
+            source = min(self._connections[1:], key=self._load)
+            for channel_name, connection in list(self._channels.items()):
+                if connection is source:
+                    target = min([c for c in self._connections if c is not source], key=self._load)
+                    self.logger.info('Moving {} from {} to {}'.format(channel_name, source.name, target.name))
+                    self._move(channel_name, target)
+
+    def _rotate(self, connection):
+        """Replaces a public connection without a gap in the data (make-before-break).
+        The channels of the connection are subscribed on a new connection. When every channel
+        received its snapshot there, the channels are switched to the new connection at once
+        and the old connection is closed. If the channels do not get in sync within ROTATION_TIMEOUT,
+        the rotation is abandoned and the old connection is reconnected.
+        :param connection:  a connection of the pool
+        """
+        if any(rotation.connection is connection for rotation in list(self._rotations.values())):
+            return
+        self.logger.info('Rotating {} ...'.format(connection.name))
+        try:
+            replacement = self._open_connection()
+        except ExchangeException:
+            connection.reconnect()
+            return
+        rotation = BitfinexRotation(connection)
+        with self._lock:
+            self._rotations[replacement] = rotation
+            for channel_name, c in list(self._channels.items()):
+                if c is connection:
+                    self.logger.info('Subscribing to {} on {} ...'.format(channel_name, replacement.name))
+                    replacement.send(self._payloads[channel_name])
+
+        deadline = time.time() + ROTATION_TIMEOUT
+        while time.time() < deadline and not self._rotation_ready(rotation):
+            time.sleep(0.1)
+
+        with self._lock:
+            switched = connection in self._connections and self._rotation_ready(rotation)
+            if switched:
+                self._switch(replacement, rotation)
+            else:
+                self._rotations.pop(replacement, None)
+                for key in [key for key in list(self._subscriptions) if key[0] is replacement]:
+                    self._subscriptions.pop(key, None)
+                    self._data.pop(key, None)
+        if switched:
+            connection.close()
+            self.logger.info('Rotated {} to {}'.format(connection.name, replacement.name))
+            return
+        replacement.close()
+        if connection in self._connections:
+            self.logger.info('Channels of {} did not get in sync, reconnecting'.format(connection.name))
+            connection.reconnect()
+
+    def _rotation_ready(self, rotation):
+        """Checks if all channels of a rotated connection received their snapshots on the replacement"""
+        return all(rotation.messages.get(channel_name)
+                   for channel_name, c in list(self._channels.items()) if c is rotation.connection)
+
+    def _switch(self, replacement, rotation):
+        """Switches the channels of a rotated connection to the replacement (called with the lock)"""
+        connection = rotation.connection
+        connection.retired = True
+        kept = {}       # channel_name -> the trades and candles data continued on the replacement
+        for key in [key for key in list(self._subscriptions) if key[0] is connection]:
+            channel_name = self._subscriptions.pop(key, None)
+            data = self._data.pop(key, None)
+            if isinstance(data, (BitfinexTrades, BitfinexCandles)):
+                kept[channel_name] = data
+        for channel_name, c in list(self._channels.items()):
+            if c is connection:
+                self._channels[channel_name] = replacement
+                self._moving.pop(channel_name, None)
+        self._connections[self._connections.index(connection)] = replacement
+        rotation.switched = True
+        for channel_name, messages in rotation.messages.items():
+            if self._channels.get(channel_name) is replacement:
+                data = kept.get(channel_name)
+                if data is not None:
+                    # the history of the trades and candles is kept, the first message is the snapshot
+                    (msg, timestamp), messages = messages[0], messages[1:]
+                    self._data[(replacement, msg[0])] = data
+                    data.stamp(timestamp, replacement.sequence if replacement.flags & SEQ_ALL else None)
+                    data.resume(msg[1])
+                for msg, timestamp in messages:
+                    self._update_channel(replacement, msg, timestamp)
+        # the channels unsubscribed or moved meanwhile
+        for key, channel_name in list(self._subscriptions.items()):
+            if key[0] is replacement and self._channels.get(channel_name) is not replacement:
+                replacement.send(json.dumps({"event": "unsubscribe", "chanId": key[1]}))
+        self._rotations.pop(replacement)
+
+
+    def _unsubscribe_all(self, connection):
+        """Unsubscribe from all channels of a connection."""
+        for key, channel_name in list(self._subscriptions.items()):
+            if key[0] is connection:
+                self.logger.info('Unsubscribing from %s ...' % channel_name)
+                connection.send(json.dumps({"event": "unsubscribe", "chanId": key[1]}))
+
+
+    def _resubscribe_all(self, connection):
+        """Renew subscription to all the channels of a connection.
+        Channel IDs are not valid on a new connection, so the channels are subscribed again
+        with their original requests and their data is recreated from the new snapshots.
+        The listeners stay connected.
+        """
+        for key in [key for key in list(self._subscriptions) if key[0] is connection]:
+            self._subscriptions.pop(key, None)
+            self._data.pop(key, None)
+        for channel_name, c in list(self._channels.items()):
+            if c is connection:
+                self._moving.pop(channel_name, None)
+                self.logger.info('Subscribing to {} ...'.format(channel_name))
+                connection.send(self._payloads[channel_name])
+        if connection is self._auth_connection and self.authenticated is True:
             self.authenticated = False
             self.authenticate(key=self._key, secret=self._secret)
 
 
+    def _resync(self, key):
+        """Resubscribes a single channel that got out of sync.
+        :param key:  (connection, channel ID)
+        """
+        channel_name = self._subscriptions[key]
+        if channel_name in self._moving:
+            return
+        self._resyncs[channel_name] = self._resyncs.get(channel_name, 0) + 1
+        self.logger.info('Resyncing channel {} ...'.format(channel_name))
+        self._move(channel_name, key[0])
+
+
+    def _check_sequence(self, connection, msg):
+        """Checks the sequence number of a channel message (SEQ_ALL).
+        Public messages carry the sequence number as the last element. Messages of the
+        authenticated channel carry it as the second to last element, followed by their own
+        sequence number, except for the heartbeats and notifications of requests.
+        A gap is logged and counted. The order books are protected by the checksums,
+        so no resync is needed.
+        :param connection:  the connection of the message
+        :param msg:         a channel message
+        """
+        if msg[0] == 0 and msg[1] != 'hb':
+            if msg[1] == 'n' or len(msg) < 4:
+                return
+            sequence = msg[-2]
+        else:
+            sequence = msg[-1]
+        if type(sequence) is not int:
+            return
+        if connection.sequence is not None and sequence != connection.sequence + 1:
+            connection.sequence_gaps += 1
+            self.logger.warning('Sequence gap on {}: expected {}, received {}'.format(connection.name,
+                                                                                   connection.sequence + 1, sequence))
+        connection.sequence = sequence
+
+
+    def _take_timestamp(self, msg):
+        """Removes the exchange timestamp appended to a channel message (TIMESTAMP).
+        The timestamp is expected as the last element, but it is only taken if it looks
+        like a time in ms, so the messages without it are left untouched.
+        :param msg:     a channel message
+        :return: the timestamp in ms or None
+        """
+        if len(msg) > 2 and type(msg[-1]) is int and msg[-1] >= MIN_TIMESTAMP:
+            return msg.pop()
+        return None
+
+
     # Websocket handlers
     # ---------------------------------------------------------------------------------
 
-    def _on_open(self):
-        self._connected = True
-        self.logger.info('Bitfinex websocket connection open.')
-
-    def _on_close(self):
-        self.logger.info('Bitfinex websocket connection closed.')
+    def _on_open(self, connection):
+        self.logger.info('Bitfinex websocket connection {} open.'.format(connection.name))
+        if self._flags:
+            connection.send(json.dumps({"event": "conf", "flags": self._flags}))
+        if any(rotation.connection is connection for rotation in list(self._rotations.values())):
+            # the channels are being subscribed on the replacement
+            return
+        if connection is self._standby:
+            self._resubscribe_standby()
+            return
+        if connection in self._channels.values() or connection is self._auth_connection:
+            self._resubscribe_all(connection)
 
-    def _on_error(self, error):
-        """Handles the error message received from the websocket.
-        Logs the message and sends the error notification to listeners
-        via dispatcher using 'info' signal.
-        """
-        self.logger.error('Bitfinex websocket error:')
-        self.logger.error(error)
-        dispatcher.send(signal='info', sender='bitfinex', data={'error': error})
+    def _on_close(self, connection):
+        self.logger.info('Bitfinex websocket connection {} closed.'.format(connection.name))
 
-    def _on_message(self, message):
+    def _on_message(self, connection, message):
         """Handles regular messages received from the websocket.
-        :param message:   a message from the websocket
+        :param connection: the connection that received the message
+        :param message:    a message from the websocket
         :return None
         :raises ExchangeException
 
@@ -387,8 +1005,13 @@ class BitfinexWSClient(WSClientAPI):
             10401 : Not subscribed
         """
 
+        if connection.retired:
+            return
+        if self._capture is not None and connection is not self._standby:
+            self._capture.write(connection.name, message)
+
         # Websocket client returns message as string. Convert it to json
-        msg = json.loads(message)
+        msg = self._decoder.loads(message)
 
         try:
             # EVENT MESSAGE
@@ -399,7 +1022,7 @@ class BitfinexWSClient(WSClientAPI):
                 elif event == 'pong':
                     self.logger.info('Pong received.')
                 elif event == 'error':
-                    dispatcher.send(signal='info', sender='bitfinex', data={'error': msg['msg']})
+                    bus.publish('info', 'bitfinex', {'error': msg['msg']})
                     self.logger.info('Error ' + str(msg['code']) + ' : ' + str(msg['msg']))
                 elif event == 'info':
                     if 'version' in msg.keys():
@@ -407,27 +1030,49 @@ class BitfinexWSClient(WSClientAPI):
                     elif 'code' in msg.keys():
                         self.logger.info('Received code' + str(msg['code']) + ' : ' + msg['msg'])
                         if   msg['code'] == 20051:
-                            dispatcher.send(signal='info', sender='bitfinex', data={'info': 'reconnecting'})
-                            self._reconnect()
+                            bus.publish('info', 'bitfinex', {'info': 'reconnecting'})
+                            if self.rotate and connection in self._connections:
+                                # the rotation waits for the new connection, so it must not block this one
+                                thread = Thread(target=self._rotate, args=(connection,),
+                                                name=connection.name + '-rotation')
+                                thread.daemon = True
+                                thread.start()
+                            else:
+                                connection.reconnect()
                         elif msg['code'] == 20060:
-                            dispatcher.send(signal='info', sender='bitfinex', data={'info': 'pause'})
-                            self._unsubscribe_all()
+                            bus.publish('info', 'bitfinex', {'info': 'pause'})
+                            self._unsubscribe_all(connection)
                         elif msg['code'] == 20061:
-                            dispatcher.send(signal='info', sender='bitfinex', data={'info': 'unpause'})
-                            self._resubscribe_all()
+                            bus.publish('info', 'bitfinex', {'info': 'unpause'})
+                            self._resubscribe_all(connection)
+                elif event == 'conf':
+                    if msg.get('status') == 'OK':
+                        connection.flags = msg.get('flags', self._flags)
+                        self.logger.info('Configuration flags {} accepted on {}.'.format(connection.flags,
+                                                                                       connection.name))
+                    else:
+                        # continue without the flags, the messages keep their plain format
+                        connection.flags = 0
+                        self.logger.info('Configuration flags {} rejected : {}'.format(self._flags, msg))
                 elif event == 'subscribed':
-                    self._channel_subscribed(msg)
+                    self._channel_subscribed(connection, msg)
                 elif event == 'unsubscribed':
-                    self._data.pop(msg['chanId'])                               # remove data object
-                    channel_name = self._subscriptions.pop(msg['chanId'])       # remove subscription
+                    key = (connection, msg['chanId'])
+                    self._data.pop(key, None)                                   # remove data object
+                    channel_name = self._subscriptions.pop(key)                 # remove subscription
                     self.logger.info('Unsubscribed from channel %s' % channel_name)
+                    if connection is not self._standby:
+                        target = self._moving.pop(channel_name, None)
+                        if target is not None:
+                            target.send(self._payloads[channel_name])
+                        self._rebalance()
                 elif event == 'auth':
                     if msg['status'] == 'OK':
                         self.authenticated = True
                         self.userId = msg['userId']
                         self.logger.info('Authenticated - userId %s' % self.userId)
                     else:
-                        dispatcher.send(signal='info', sender='bitfinex', data={'error': 'Authentication FAILED!'})
+                        bus.publish('info', 'bitfinex', {'error': 'Authentication FAILED!'})
                         self.logger.info('Authentication FAILED : %s' % msg['code'])
                 else:
                     self.logger.info('Unhandled WS event!')
@@ -435,55 +1080,59 @@ class BitfinexWSClient(WSClientAPI):
             # CHANNEL UPDATE
             else:
                 channel_id = msg[0]
+                timestamp = self._take_timestamp(msg) if connection.flags & TIMESTAMP else None
+                if connection.flags & SEQ_ALL:
+                    self._check_sequence(connection, msg)
                 if channel_id == 0:   # Account info always uses channel_id 0
                     self._update_auth_channel(msg)
                 else:
-                    self._update_channel(msg)
+                    self._update_channel(connection, msg, timestamp)
 
         except Exception as e:
             # a more specific exception message is provided in the exception itself.
             raise ExchangeException(self.name(), '', data=msg, orig_exception=e, logger=self.logger)
 
 
-    def _channel_subscribed(self, msg):
+    def _channel_subscribed(self, connection, msg):
         """Handles subscription notification messages received from websocket.
-        :param msg:     a confirmation subscription message
+        :param connection: the connection that subscribed the channel
+        :param msg:        a confirmation subscription message
         :returns None
         :raises Exception
         """
         try:
+            key = (connection, msg['chanId'])
             channel = msg['channel']
             if channel == 'ticker':
                 symbol = msg['pair']
-                self._subscriptions[msg['chanId']] = 'ticker_' + symbol
+                self._subscriptions[key] = 'ticker_' + symbol
                 self.logger.info('New subscription to ticker for %s' % symbol)
             elif channel == 'book':
                 symbol = msg['symbol'][1:]
-                prec = msg['prec']
-                freq = msg['freq']
-                self._subscriptions[msg['chanId']] = 'book_' + symbol + '_' + prec + '_' + freq
+                self._subscriptions[key] = _book_channel(symbol, msg['prec'], msg['freq'], msg.get('len', '25'))
                 self.logger.info('New subscription to order book channel for %s' % symbol)
             elif channel == 'trades':
                 symbol = msg['symbol'][1:]
-                self._subscriptions[msg['chanId']] = 'trades_' + symbol
+                self._subscriptions[key] = 'trades_' + symbol
                 self.logger.info('New subscription to trades channel for %s' % symbol)
             elif channel == 'candles':
                 symbol = msg['key'].split(':')[-1][1:].upper()
                 interval = msg['key'].split(':')[1]
-                self._subscriptions[msg['chanId']] = 'candles_' + symbol + '_' + interval
+                self._subscriptions[key] = 'candles_' + symbol + '_' + interval
                 self.logger.info('New subscription to candles channel for %s' % symbol)
             else:
                 self.logger.info('No channel handler for channel - ' + channel)
-                dispatcher.send(signal='info', sender='bitfinex',
-                                data={ 'error': 'No channel handler for channel - ' + channel})
+                bus.publish('info', 'bitfinex', {'error': 'No channel handler for channel - ' + channel})
         except Exception as e:
             ex_msg = 'Exception caught while processing subscription confirmation message:\n{}\n{}'.format(msg, e)
             raise(type(e), ex_msg)
 
 
-    def _update_channel(self, msg):
+    def _update_channel(self, connection, msg, timestamp=None):
         """Handles updates from public channels.
-        :param msg:     update message
+        :param connection: the connection that received the message
+        :param msg:        update message
+        :param timestamp:  exchange time of the message in ms or None
         :returns None
         :raises Exception
         """
@@ -492,30 +1141,90 @@ class BitfinexWSClient(WSClientAPI):
             return
 
         try:
-            channel_id = msg[0]
-            channel_name = self._subscriptions[channel_id]
+            key = (connection, msg[0])
+            channel_name = self._subscriptions[key]
+            if self._rotations:
+                with self._lock:
+                    rotation = self._rotations.get(connection)
+                    if rotation is not None and not rotation.switched:
+                        rotation.add(channel_name, msg, timestamp)
+                        return
+            if channel_name in self._moving:
+                return
+            if connection is self._standby or channel_name in self._redundant:
+                key = self._first_arrival(connection, key, channel_name, msg, timestamp)
+                if key is None:
+                    return
             data = msg[1]
-            if self._data.get(channel_id, None) is None:
+            if data == 'cs':
+                # checksum of the order book
+                book = self._data.get(key)
+                if book is not None and not book.verify(msg[2]):
+                    self.logger.warning('Checksum mismatch of {}'.format(channel_name))
+                    self._resync(key)
+            elif self._data.get(key, None) is None:
                 # snapshot message
                 if channel_name.startswith('ticker'):
-                    self._data[channel_id] = BitfinexTicker(channel_name, data)
+                    self._data[key] = BitfinexTicker(channel_name, data)
+                elif channel_name.startswith('book') and '_' + RAW_PRECISION + '_' in channel_name:
+                    self._data[key] = BitfinexRawOrderBook(channel_name, data)
                 elif channel_name.startswith('book'):
-                    self._data[channel_id] = BitfinexOrderBook(channel_name, data)
+                    self._data[key] = BitfinexOrderBook(channel_name, data)
                 elif channel_name.startswith('trades'):
-                    self._data[channel_id] = BitfinexTrades(channel_name, data)
+                    self._data[key] = BitfinexTrades(channel_name, data)
                 elif channel_name.startswith('candles'):
-                    self._data[channel_id] = BitfinexCandles(channel_name, data)
+                    self._data[key] = BitfinexCandles(channel_name, data)
+                self._data[key].stamp(timestamp, connection.sequence if connection.flags & SEQ_ALL else None)
             else:
                 # update
+                self._data[key].stamp(timestamp, connection.sequence if connection.flags & SEQ_ALL else None)
                 if channel_name.startswith('trades'):
-                    self._data[channel_id].update(msg[2])
+                    self._data[key].update(msg[2])
                 else:
-                    self._data[channel_id].update(data)
+                    self._data[key].update(data)
         except Exception as e:
             ex_msg = 'Exception caught while processing public channel update message:\n{}\n{}'.format(msg, e)
             raise(type(e), ex_msg)
 
 
+    def _first_arrival(self, connection, key, channel_name, msg, timestamp):
+        """Deduplicates a message of a redundant channel received by its primary or standby connection.
+        Both subscriptions update the data object of the primary subscription. Trades are identified
+        by their IDs and the other messages by their exchange timestamps and contents, since the SEQ_ALL
+        sequence numbers are counted per connection and so they differ between the connections.
+        :param connection:   the connection that received the message
+        :param key:          (connection, channel ID) of the message
+        :param channel_name: the name of the channel
+        :param msg:          the channel message
+        :param timestamp:    exchange time of the message in ms or None
+        :return: the key of the data object to update, or None if the message is dropped
+        """
+        deduplicator = self._redundant.get(channel_name)
+        source = PRIMARY
+        if connection is self._standby:
+            if deduplicator is None:
+                # the channel is not redundant anymore
+                return None
+            if channel_name not in self._standby_ready:
+                # the snapshot is taken from the primary subscription only
+                self._standby_ready.add(channel_name)
+                return None
+            key = self._get_channel_id(channel_name)
+            source = STANDBY
+        if key is None or key[0] is self._standby or self._data.get(key) is None:
+            # the primary subscription is not in sync yet, or this is its snapshot
+            return key if source == PRIMARY else None
+        payload = msg[1:-1] if connection.flags & SEQ_ALL else msg[1:]
+        if payload[0] == 'te' or payload[0] == 'tu':
+            sequence, identity = payload[1][0], (payload[0], payload[1][0])
+        elif timestamp is not None:
+            sequence, identity = timestamp, (timestamp, str(payload))
+        else:
+            # the message cannot be matched, only the primary subscription is used
+            return key if source == PRIMARY else None
+        return key if deduplicator.accept(source, sequence, identity) else None
+
+
     def _update_auth_channel(self, msg):
         """Handles updates from authenticated (private) channels.
         :param msg:     update message
@@ -546,49 +1255,60 @@ class BitfinexWSClient(WSClientAPI):
         """Connects to the exchange via websocket stream.
         :param info_handler:   a callback handler for info messages
         :returns None
+        :raises ExchangeException if the connection does not open within CONNECT_TIMEOUT
         Info messages cover any information that is not related to concrete data from the exchange,
         but rather about the protocol or various exchange events, such as maintenance, or connection issues.
         """
-        # start websocket listener thread
-        self._thread = Thread(target=self._connect)
-        self._thread.daemon = True
-        self._thread.start()
-
         # register a handler for receiving info and error messages from websocket thread
         self._info_handler = info_handler
-        dispatcher.connect(info_handler, signal='info', sender='bitfinex')
+        if info_handler:
+            bus.subscribe(info_handler, signal='info', sender='bitfinex')
 
-        # halt the calling thread until the connection is up
-        while not self._connected:
-            time.sleep(1)
+        # open the first connection of the pool, the others are opened as needed
+        if self._connections:
+            return
+        connection = self._open_connection()
+        with self._lock:
+            if not self._connections:
+                self._connections.append(connection)
+                return
+        connection.close()
 
 
     def disconnect(self):
         """Disconnects a client from the exchange.
         This method first unsubscribes a client from all subscribed channels,
-        then it closes the websocket connection and waits for the socket thread to terminate.
-        Next, it disconnects all listeners from the dispatcher for this client,
+        then it closes the websocket connections and waits for the socket threads to terminate.
+        Next, it disconnects all listeners from the event bus for this client,
         and finally it stops the logger.
         """
-        self._unsubscribe_all()
-        self._subscriptions.clear()
-        self._data.clear()
-
-        # close connection
-        if self._ws:
-            self._ws.close()
-            self._ws = None
-            self._connected = False
-
-        # wait for the thread to terminate
-        if self._thread:
-            self._thread.join(timeout=3)
-            self._thread = None
+        with self._lock:
+            for connection in self._connections:
+                self._unsubscribe_all(connection)
+            self._channels.clear()
+            self._subscriptions.clear()
+            self._data.clear()
+            self._moving.clear()
+            for replacement in list(self._rotations):
+                replacement.close()
+            self._rotations.clear()
+            if self._standby:
+                self._standby.close()
+                self._standby = None
+            self._redundant.clear()
+            self._standby_ready.clear()
+
+            # close connections and wait for the threads to terminate
+            for connection in self._connections + ([self._auth_connection] if self._auth_connection else []):
+                connection.close()
+            self._connections = []
+            self._auth_connection = None
 
         # disconnect all listeners
-        for d in dispatcher.getAllReceivers(sender='bitfinex'):
-            d.disconnect()
+        conflation.disconnect_all('bitfinex')
+        bus.clear('bitfinex')
 
+        self.stop_capture()
         self._stop_logger()
 
 
@@ -619,67 +1339,99 @@ class BitfinexWSClient(WSClientAPI):
         """Generic method to unsubscribe from the channel.
         :param channel_name:    a name of the channel
         :param update_handler:  Arbitrary keyword arguments. Depend on the specific exchange.
-        The method first removes the listener from a dispatcher and then sends
+        The method first removes the listener from the event bus and then sends
         an unsubscribe message to a websocket.
         """
         # remove listener
         if update_handler is not None:
+            self.logger.info('Removing listener for %s ...' % channel_name)
             try:
-                self.logger.info('Removing listener for %s ...' % channel_name)
-                dispatcher.disconnect(update_handler, signal=channel_name, sender='bitfinex')
-            except dispatcher.errors.DispatcherKeyError:
-                exc_msg = 'Tried to remove unrecognized listener while unsubscribing ' + \
-                        'from a channel {}'.format(channel_name)
-                self.logger.info(exc_msg)
+                conflation.disconnect(update_handler, signal=channel_name, sender='bitfinex')
+            except DispatcherKeyError:
+                # order book listeners can also be registered for the delta mode
+                try:
+                    conflation.disconnect(update_handler, signal=delta_signal(channel_name), sender='bitfinex')
+                except DispatcherKeyError:
+                    exc_msg = 'Tried to remove unrecognized listener while unsubscribing ' + \
+                            'from a channel {}'.format(channel_name)
+                    self.logger.info(exc_msg)
 
         # authenticated channels all have channel_id 0 and are automatically subscribed
         if channel_name in ['orders', 'user_trades', 'balances']:
             return
 
-        # get the channel_id of public channels
-        channel_id = self._get_channel_id(channel_name)
-        if channel_id is None:
+        # get the connection and channel_id of public channels
+        key = self._get_channel_id(channel_name)
+        if key is None:
             self.logger.info('Not subscribed to %s' % channel_name)
             return
 
         # unsubscribe if no one is listening
-        if not dispatcher.getReceivers(sender='bitfinex', signal=channel_name):
+        if not bus.has_subscribers(channel_name, 'bitfinex') and \
+                not bus.has_subscribers(delta_signal(channel_name), 'bitfinex'):
             self.logger.info('Unsubscribing from %s ...' % channel_name)
-            self._ws.send(json.dumps({"event": "unsubscribe", "chanId": channel_id}))
+            with self._lock:
+                self._channels.pop(channel_name, None)
+                self._remove_standby(channel_name)
+                if self._moving.pop(channel_name, None) is None:
+                    key[0].send(json.dumps({"event": "unsubscribe", "chanId": key[1]}))
 
 
     # Public Channels
     # ---------------------------------------------------------------------------------
 
-    def _handle_subscription(self, channel_name, payload, channel_type, symbol, update_handler=None):
+    def _handle_subscription(self, channel_name, payload, channel_type, symbol, update_handler=None, delta=False,
+                             rate=None, policy=conflation.KeepLatest):
         """Handles a common part of subscribing to a public channel
         :param channel_name:    a name of the channel to subscribe to
         :param payload:         a json object to send to a websocket
         :param channel_type:    one of 'ticker', 'book', 'trades' or 'candles'
         :param symbol:          a trading pair for which we request a subscription
-        :param update_handler:  a callback to be used for updates by a dispatcher.
+        :param update_handler:  a callback to be used for updates by the event bus.
+        :param delta:           register the handler for the delta mode of the order book
+        :param rate:            the maximum number of updates per second delivered to the handler
+        :param policy:          the conflation policy used when the rate is limited
         :return: None
-        This method registers a listener to a dispatcher for a given channel,
-        sends the payload to a websocket.
+        This method registers a listener to the event bus for a given channel,
+        assigns the channel to a connection of the pool and sends the payload to its websocket.
         """
         if update_handler:
-            dispatcher.connect(update_handler, signal=channel_name, sender='bitfinex')
-
-        if channel_name not in self._subscriptions.values():
-            self.logger.info('Subscribing to {} for {} ...'.format(channel_type, symbol))
-            self._ws.send(payload)
-        else:
-            self.logger.info('Already subscribed to {} for {}.'.format(channel_type, symbol))
-            channel_id = self._get_channel_id(channel_name)
-            if channel_id:
-                return self._data[channel_id].snapshot()
+            signal = delta_signal(channel_name) if delta else channel_name
+            conflation.connect(update_handler, signal=signal, sender='bitfinex', rate=rate, policy=policy)
+
+        opened = None
+        while True:
+            with self._lock:
+                self._payloads[channel_name] = payload
+                subscribed = channel_name in self._channels
+                connection = None if subscribed else self._assign(channel_name, opened)
+                if connection is not None:
+                    self.logger.info('Subscribing to {} for {} on {} ...'.format(channel_type, symbol,
+                                                                              connection.name))
+                    connection.send(payload)
+            if opened is not None and opened is not connection:
+                opened.close()      # the channel found a place meanwhile
+            if connection is not None:
+                return None
+            if subscribed:
+                break
+            # the new connection is opened without the lock, so the other connections keep receiving meanwhile
+            opened = self._open_connection()
+
+        self.logger.info('Already subscribed to {} for {}.'.format(channel_type, symbol))
+        key = self._get_channel_id(channel_name)
+        if key and key in self._data:
+            if delta:
+                return 'snapshot', self._data[key].snapshot()
+            return self._data[key].snapshot()
         return None
 
 
-    def subscribe_ticker(self, symbol, update_handler=None):
+    def subscribe_ticker(self, symbol, update_handler=None, rate=None):
         """Subscribe to ticker channel.
         :param symbol:            A string that represents a ticker symbol (pair).
         :param update_handler:  A callback handler that should handle the asynchronous update of a ticker.
+        :param rate:            The maximum number of updates per second delivered to the handler (None for all).
         :return: A tuple of a string that represents a stream (channel) identifier and a snapshot.
         :raises ExchangeException
         """
@@ -689,7 +1441,7 @@ class BitfinexWSClient(WSClientAPI):
             payload = json.dumps({ "event": "subscribe",
                                    "channel": "ticker",
                                    "symbol": symbol  })
-            ret = self._handle_subscription(channel_name, payload, 'ticker', symbol, update_handler)
+            ret = self._handle_subscription(channel_name, payload, 'ticker', symbol, update_handler, rate=rate)
             return channel_name, ret
         except Exception as e:
             raise ExchangeException(self.name(), 'Exception while trying to subscribe to a ticker',
@@ -701,19 +1453,26 @@ class BitfinexWSClient(WSClientAPI):
         :param symbol:          A symbol for a ticker (pair).
         :param update_handler:  A callback handler that should handle the asynchronous update of the order book.
         :param kwargs:          Additional parameters that differ between exchanges.
+                                profile - the book profile (see BOOK_PROFILES), overrides prec, freq and len
+                                prec, freq, len - Bitfinex book parameters, R0 is the raw book of orders
+                                delta - if True, the handler receives only the changed price levels
+                                rate  - the maximum number of updates per second delivered to the handler
         :return: A tuple of a string that represents a stream (channel) identifier and a snapshot.
         :raises ExchangeException
         """
+        if 'profile' in kwargs:
+            kwargs = dict(kwargs, **self._book_profile(kwargs['profile']))
         try:
             symbol = symbol.upper()
+            delta  = kwargs.get('delta', False)
             prec   = kwargs.get('prec', 'P0')
             freq   = kwargs.get('freq', 'F0')
-            length = kwargs.get('len', '25')
-            if prec not in ['P0', 'P1', 'P2', 'P3']: prec = 'P0'
+            length = str(kwargs.get('len', '25'))
+            if prec not in ['P0', 'P1', 'P2', 'P3', RAW_PRECISION]: prec = 'P0'
             if freq not in ['F0', 'F1']: freq = 'F0'
-            if length not in ['25', '100']: length = '25'
+            if length not in ['1', '25', '100', '250']: length = '25'
 
-            channel_name = 'book_' + symbol + '_' + prec + '_' + freq
+            channel_name = _book_channel(symbol, prec, freq, length)
             payload = json.dumps({ "event":   "subscribe",
                                    "channel": "book",
                                    "symbol":   symbol,
@@ -721,17 +1480,122 @@ class BitfinexWSClient(WSClientAPI):
                                    "freq":     freq,
                                    "len":      length
                                    })
-            ret = self._handle_subscription(channel_name, payload, 'order book', symbol, update_handler)
+            ret = self._handle_subscription(channel_name, payload, 'order book', symbol, update_handler, delta,
+                                            rate=kwargs.get('rate'),
+                                            policy=conflation.MergeBookDeltas if delta else conflation.KeepLatest)
             return channel_name, ret
         except Exception as e:
             raise ExchangeException(self.name(), 'Exception while trying to subscribe to an order book',
                                     orig_exception=e, logger=self.logger)
 
 
-    def subscribe_trades(self, symbol, update_handler=None):
+    def _book_profile(self, profile):
+        """Returns the prec, freq and len parameters of a book profile
+        :raises ExchangeException if the profile is unknown
+        """
+        try:
+            return BOOK_PROFILES[profile]
+        except KeyError:
+            raise ExchangeException(self.name(), f'Unknown book profile {profile}. '
+                                                 f'Must be one of {list(BOOK_PROFILES)}')
+
+
+    def get_resyncs(self):
+        """Returns the number of order book resyncs caused by checksum mismatches
+        :return: { channel_name : number of resyncs }
+        """
+        return dict(self._resyncs)
+
+
+    def get_latencies(self):
+        """Returns the latency of the last message of every channel that received exchange timestamps
+        :return: { channel_name : ms from the exchange time to the reception of the message }
+        """
+        return {self._subscriptions[key]: data.latency for key, data in list(self._data.items())
+                if data.latency is not None and key in self._subscriptions}
+
+
+    def add_standby(self, channel_name):
+        """Receives a subscribed public channel redundantly over a hot-standby connection.
+        The standby connection carries all redundant channels. Every message of a redundant channel
+        updates the channel data when it arrives first, the later copy is dropped.
+        Except for trades, the messages are matched by their exchange timestamps (TIMESTAMP).
+        :param channel_name:  the name of a subscribed public channel
+        :raises ExchangeException if the channel is not subscribed or cannot be received redundantly
+        """
+        opened = None
+        try:
+            while True:
+                with self._lock:
+                    if channel_name not in self._channels:
+                        raise ExchangeException(self.name(), 'Not subscribed to {}'.format(channel_name),
+                                                logger=self.logger)
+                    if channel_name in self._redundant:
+                        return
+                    if not channel_name.startswith('trades') and not self._flags & TIMESTAMP:
+                        raise ExchangeException(self.name(), 'Channel {} can be received redundantly only with '
+                                                'timestamps'.format(channel_name), logger=self.logger)
+                    if len(self._redundant) >= self.max_channels:
+                        raise ExchangeException(self.name(), 'The standby connection is full', logger=self.logger)
+                    if self._standby is None and opened is not None:
+                        self._standby, opened = opened, None
+                    if self._standby is not None:
+                        self._redundant[channel_name] = Deduplicator()
+                        self.logger.info('Receiving {} redundantly on {}'.format(channel_name, self._standby.name))
+                        self._standby.send(self._payloads[channel_name])
+                        return
+                # the standby connection is opened without the lock, so the other connections keep receiving
+                opened = self._open_connection()
+        finally:
+            if opened is not None:
+                opened.close()
+
+    def _remove_standby(self, channel_name):
+        """Stops receiving a channel redundantly, the standby connection is closed with its last channel"""
+        if self._redundant.pop(channel_name, None) is None:
+            return
+        self._standby_ready.discard(channel_name)
+        if not self._redundant:
+            standby, self._standby = self._standby, None
+            for key in [key for key in list(self._subscriptions) if key[0] is standby]:
+                self._subscriptions.pop(key, None)
+            standby.close()
+            return
+        for key, name in list(self._subscriptions.items()):
+            if key[0] is self._standby and name == channel_name:
+                self._standby.send(json.dumps({"event": "unsubscribe", "chanId": key[1]}))
+
+    def _resubscribe_standby(self):
+        """Subscribes the redundant channels again when the standby connection is reopened"""
+        for key in [key for key in list(self._subscriptions) if key[0] is self._standby]:
+            self._subscriptions.pop(key, None)
+        self._standby_ready.clear()
+        for channel_name in list(self._redundant):
+            self.logger.info('Subscribing to {} on {} ...'.format(channel_name, self._standby.name))
+            self._standby.send(self._payloads[channel_name])
+
+    def get_redundancy(self):
+        """Returns the arrival metrics of the redundant channels (see Deduplicator.metrics),
+        where the connections are PRIMARY and STANDBY
+        :return: { channel_name : metrics }
+        """
+        return {channel_name: deduplicator.metrics() for channel_name, deduplicator in list(self._redundant.items())}
+
+
+    def get_connections(self):
+        """Returns the channels carried by each public connection of the pool
+        :return: { connection name : [channel_name, ...] }
+        """
+        with self._lock:
+            return {connection.name: sorted(name for name, c in self._channels.items() if c is connection)
+                    for connection in self._connections}
+
+
+    def subscribe_trades(self, symbol, update_handler=None, rate=None):
         """Subscribe to the channel for trades.
         :param symbol:          A symbol for a ticker (pair).
         :param update_handler:  A callback handler that should handle the asynchronous update of trades.
+        :param rate:            The maximum number of updates per second delivered to the handler (None for all).
         :return: A tuple of a string that represents a stream (channel) identifier and a snapshot.
         :raises ExchangeException
         """
@@ -741,18 +1605,20 @@ class BitfinexWSClient(WSClientAPI):
             payload = json.dumps({ "event": "subscribe",
                                    "channel": "trades",
                                    "symbol": symbol  })
-            ret = self._handle_subscription(channel_name, payload, 'trades', symbol, update_handler)
+            ret = self._handle_subscription(channel_name, payload, 'trades', symbol, update_handler,
+                                            rate=rate, policy=conflation.BatchTrades)
             return channel_name, ret
         except Exception as e:
             raise ExchangeException(self.name(), 'Exception while trying to subscribe to a channel for trades',
                                     orig_exception=e, logger=self.logger)
 
 
-    def subscribe_candles(self, symbol, interval='1m', update_handler=None):
+    def subscribe_candles(self, symbol, interval='1m', update_handler=None, rate=None):
         """Subscribe to the channel for candles.
         :param symbol:          A symbol for a ticker (pair).
         :param interval         Time interval for a candle.
         :param update_handler:  A callback handler that should handle the asynchronous update of trades.
+        :param rate:            The maximum number of updates per second delivered to the handler (None for all).
         :return: A tuple of a string that represents a stream (channel) identifier and a snapshot.
         :raises ExchangeException
         """
@@ -767,7 +1633,8 @@ class BitfinexWSClient(WSClientAPI):
                                    "channel": "candles",
                                    "key": 'trade:' + interval + ':t' + symbol
                                    })
-            ret = self._handle_subscription(channel_name, payload, 'candles', symbol, update_handler)
+            ret = self._handle_subscription(channel_name, payload, 'candles', symbol, update_handler,
+                                            rate=rate, policy=conflation.MergeCandles)
             return channel_name, ret
         except Exception as e:
             raise ExchangeException(self.name(), 'Exception while trying to subscribe to a channel for candles',
@@ -796,18 +1663,22 @@ class BitfinexWSClient(WSClientAPI):
         if not self._key or not self._secret:
             return False
 
+        # private channels use their own connection
+        if self._auth_connection is None:
+            self._auth_connection = self._open_connection()
+
         nonce = str(int(time.time() * 10000000))
         auth_string = 'AUTH' + nonce
         auth_sig = hmac.new(self._secret.encode(), auth_string.encode(), hashlib.sha384).hexdigest()
 
-        self.logger.info('Authenticating ...')
-        self._ws.send(json.dumps({'event':        'auth',
-                                  'apiKey':       self._key,
-                                  'authSig':      auth_sig,
-                                  'authPayload':  auth_string,
-                                  'authNonce':    nonce,
-                                  'filter':       ['trading', 'balance', 'wallet']
-                                  }))
+        self.logger.info('Authenticating on {} ...'.format(self._auth_connection.name))
+        self._auth_connection.send(json.dumps({'event':        'auth',
+                                               'apiKey':       self._key,
+                                               'authSig':      auth_sig,
+                                               'authPayload':  auth_string,
+                                               'authNonce':    nonce,
+                                               'filter':       ['trading', 'balance', 'wallet']
+                                               }))
         return True
 
 
@@ -817,9 +1688,9 @@ class BitfinexWSClient(WSClientAPI):
         :return: A string that represents a stream (channel) identifier. Specific for each exchange.
         """
         self.logger.info('Subscribing to orders channel')
-        dispatcher.connect(update_handler, signal='orders', sender='bitfinex')
+        bus.subscribe(update_handler, signal='orders', sender='bitfinex')
         if self._orders:
-            dispatcher.send(signal='orders', sender='bitfinex', data=list(reversed(self._orders)))
+            bus.publish('orders', 'bitfinex', list(reversed(self._orders)))
         return 'orders'
 
     def subscribe_user_trades(self, update_handler):
@@ -828,9 +1699,9 @@ class BitfinexWSClient(WSClientAPI):
         :return: A string that represents a stream (channel) identifier. Specific for each exchange.
         """
         self.logger.info('Subscribing to user trades channel')
-        dispatcher.connect(update_handler, signal='user_trades', sender='bitfinex')
+        bus.subscribe(update_handler, signal='user_trades', sender='bitfinex')
         if self._trades:
-            dispatcher.send(signal='user_trades', sender='bitfinex', data=list(reversed(self._trades)))
+            bus.publish('user_trades', 'bitfinex', list(reversed(self._trades)))
         return 'user_trades'
 
     def subscribe_balances(self, update_handler):
@@ -839,9 +1710,9 @@ class BitfinexWSClient(WSClientAPI):
         :return: A string that represents a stream (channel) identifier. Specific for each exchange.
         """
         self.logger.info('Subscribing to balances channel')
-        dispatcher.connect(update_handler, signal='balances', sender='bitfinex')
+        bus.subscribe(update_handler, signal='balances', sender='bitfinex')
         if self._balances:
-            dispatcher.send(signal='balances', sender='bitfinex', data=self._balances)
+            bus.publish('balances', 'bitfinex', self._balances)
         return 'balances'
 
 
@@ -849,7 +1720,7 @@ class BitfinexWSClient(WSClientAPI):
         """Handles order updates received from a websocket
         :param orders   a list of orders
         :returns None
-        Processes received order updates and sends them to listeners via dispatcher.
+        Processes received order updates and sends them to listeners via the event bus.
         """
         for order in orders:
             id         = order[0]
@@ -895,17 +1766,17 @@ class BitfinexWSClient(WSClientAPI):
             if canceled:
                 trade_update = [timestamp, symbol, order_type, side, price, amount, filled, total, 'cancelled']
                 self._trades.append(trade_update)
-                dispatcher.send(signal='user_trades', sender='bitfinex', data=list(reversed(self._trades)))
+                bus.publish('user_trades', 'bitfinex', list(reversed(self._trades)))
 
         # publish orders
-        dispatcher.send(signal='orders', sender='bitfinex', data=list(reversed(self._orders)))
+        bus.publish('orders', 'bitfinex', list(reversed(self._orders)))
 
 
     def _handle_user_trades(self, trade):
         """Handles trade updates received from a websocket
         :param trade   a single trade update
         :returns None
-        Processes received trade update and sends it to listeners via dispatcher.
+        Processes received trade update and sends it to listeners via the event bus.
         """
         timestamp  = trade[2]
         symbol     = trade[1][1:]
@@ -929,14 +1800,14 @@ class BitfinexWSClient(WSClientAPI):
 
         trade_update = [timestamp, symbol, order_type, side, price, amount, filled, total, status]
         self._trades.append(trade_update)
-        dispatcher.send(signal='user_trades', sender='bitfinex', data=list(reversed(self._trades)))
+        bus.publish('user_trades', 'bitfinex', list(reversed(self._trades)))
 
 
     def _handle_balance_update(self, balances):
         """Handles balance updates received from a websocket
         :param balances   a list of balances
         :returns None
-        Processes received balance updates and sends them to listeners via dispatcher.
+        Processes received balance updates and sends them to listeners via the event bus.
         """
         for balance in balances:
             if balance[0] != 'exchange':
@@ -945,5 +1816,5 @@ class BitfinexWSClient(WSClientAPI):
             available_balance = balance[2]
             self._balances[currency] = available_balance
 
-        dispatcher.send(signal='balances', sender='bitfinex', data=self._balances)
+        bus.publish('balances', 'bitfinex', self._balances)
 
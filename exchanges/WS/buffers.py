@@ -0,0 +1,317 @@
+import numpy as np
+
+
+# ==========================================================================================
+#   Candles
+# ==========================================================================================
+
+class CandleBuffer(object):
+    """A preallocated columnar ring buffer of candles.
+
+    The candles are kept in NumPy columns, the timestamps as int64 and the OHLCV values
+    as float64 in a (6, n) matrix whose first row mirrors the timestamps, so the chart
+    and the indicators get the whole candles in the form they compute with without any copying.
+    The columns are twice as long as the capacity. The candles are appended one after
+    another and only when the end of the columns is reached, the last capacity - 1 candles
+    are copied to their beginning. Thus appending and updating the last candle is O(1)
+    (amortized for appending) and the kept candles are always contiguous,
+    so the whole buffer is available as a view.
+
+    The views share the memory with the buffer: their last candle follows the updates
+    of the last candle and they are overwritten once the buffer wraps around,
+    at the latest after capacity appends. They are meant for the owner of the buffer,
+    the snapshots handed to other threads (i.e. the snapshots of the candle channels) are copies.
+    """
+
+    def __init__(self, capacity):
+        """Creates an empty buffer
+        :param capacity:  the maximum number of kept candles, the oldest candles are dropped over it
+        """
+        self.capacity = capacity
+        self._time = np.zeros(2 * capacity, dtype=np.int64)
+        self._data = np.zeros((6, 2 * capacity), dtype=np.float64)   # MTS, OPEN, HIGH, LOW, CLOSE, VOLUME
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    def __getitem__(self, index):
+        """Returns a candle as a [MTS, OPEN, HIGH, LOW, CLOSE, VOLUME] list -> [int, float, float, float, float, float]"""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('candle index out of range')
+        i = self._start + index
+        return [int(self._time[i])] + self._data[1:, i].tolist()
+
+    @property
+    def last_timestamp(self):
+        """The timestamp of the most recent candle or None if the buffer is empty"""
+        return int(self._time[self._end - 1]) if self._end > self._start else None
+
+    def append(self, candle):
+        """Adds a new candle [MTS, OPEN, HIGH, LOW, CLOSE, VOLUME], dropping the oldest one if the buffer is full"""
+        if self._end == len(self._time):
+            # wrap around, the buffer is full at this point
+            keep = self.capacity - 1
+            self._time[:keep] = self._time[self._end - keep:self._end]
+            self._data[:, :keep] = self._data[:, self._end - keep:self._end]
+            self._start, self._end = 0, keep
+        elif self._end - self._start == self.capacity:
+            self._start += 1
+        self._end += 1
+        self._set(self._end - 1, candle)
+
+    def update_last(self, candle):
+        """Replaces the most recent candle"""
+        if self._end == self._start:
+            raise IndexError('no candle to update')
+        self._set(self._end - 1, candle)
+
+    def extend(self, candles):
+        """Appends candles in the order from the oldest to the most recent
+        :param candles:  a list of candles or an (n, 6) array, i.e. a snapshot of another buffer
+        """
+        candles = np.asarray(candles, dtype=np.float64).reshape(-1, 6)[-self.capacity:]
+        if len(self) + len(candles) > self.capacity or self._end + len(candles) > len(self._time):
+            # make room for the new candles at the end of the columns
+            keep = min(len(self), self.capacity - len(candles))
+            self._time[:keep] = self._time[self._end - keep:self._end]
+            self._data[:, :keep] = self._data[:, self._end - keep:self._end]
+            self._start, self._end = 0, keep
+        start, self._end = self._end, self._end + len(candles)
+        self._time[start:self._end] = candles[:, 0]
+        self._data[:, start:self._end] = candles.T
+
+    def clear(self):
+        """Removes all candles"""
+        self._start = self._end = 0
+
+    def timestamps(self):
+        """Returns the int64 timestamps of the candles (a view)"""
+        return self._time[self._start:self._end]
+
+    def columns(self):
+        """Returns the candles as a (6, n) float64 array of the MTS, OPEN, HIGH, LOW, CLOSE and VOLUME rows (a view)"""
+        return self._data[:, self._start:self._end]
+
+    def array(self):
+        """Returns the candles as an (n, 6) float64 array of [MTS, OPEN, HIGH, LOW, CLOSE, VOLUME] rows (a view)"""
+        return self.columns().T
+
+    def _set(self, i, candle):
+        self._time[i] = candle[0]
+        self._data[:, i] = candle[:6]
+
+
+# ==========================================================================================
+#   Trades
+# ==========================================================================================
+
+TRADE_DTYPE = np.dtype([('timestamp', np.int64),    # trade time in ms
+                        ('amount', np.float64),     # negative for sells
+                        ('price', np.float64),
+                        ('side', np.int8),          # BUY or SELL
+                        ('id', np.int64)])          # trade id of the exchange or NO_TRADE_ID
+
+BUY         = 1
+SELL        = -1
+NO_TRADE_ID = -1    # the id of trades received without it (i.e. the trades of Binance REST api)
+
+
+class TradeTape(object):
+    """A preallocated ring buffer of trades in a NumPy structured array (see TRADE_DTYPE).
+
+    A trade takes 33 bytes instead of a list of three boxed numbers, so the channels can keep
+    a long history of trades. The tape works the same way as CandleBuffer: the array is twice
+    as long as the capacity and the kept trades are always contiguous, so records and recent
+    return views of the tape, with the same caveats for keeping them and passing them to other threads.
+
+    The indexing and the iteration follow the order of the trade lists of the channels,
+    from the most recent to the least recent trade, and give the trades as
+    [TIMESTAMP, AMOUNT, PRICE] lists -> [int, float, float].
+    """
+
+    def __init__(self, capacity):
+        """Creates an empty tape
+        :param capacity:  the maximum number of kept trades, the oldest trades are dropped over it
+        """
+        self.capacity = capacity
+        self._tape = np.zeros(2 * capacity, dtype=TRADE_DTYPE)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    def __getitem__(self, index):
+        """Returns a trade as a [TIMESTAMP, AMOUNT, PRICE] list, the index 0 is the most recent trade"""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('trade index out of range')
+        trade = self._tape[self._end - 1 - index]
+        return [int(trade['timestamp']), float(trade['amount']), float(trade['price'])]
+
+    def __iter__(self):
+        for trade in self.recent():
+            yield [int(trade['timestamp']), float(trade['amount']), float(trade['price'])]
+
+    @property
+    def last_timestamp(self):
+        """The time of the most recent trade or None if the tape is empty"""
+        return int(self._tape['timestamp'][self._end - 1]) if self._end > self._start else None
+
+    @property
+    def last_id(self):
+        """The id of the most recent trade, NO_TRADE_ID if the tape is empty or the trade has no id"""
+        return int(self._tape['id'][self._end - 1]) if self._end > self._start else NO_TRADE_ID
+
+    def append(self, timestamp, amount, price, trade_id=NO_TRADE_ID):
+        """Adds a new trade, dropping the oldest one if the tape is full"""
+        if self._end == len(self._tape):
+            # wrap around, the tape is full at this point
+            keep = self.capacity - 1
+            self._tape[:keep] = self._tape[self._end - keep:self._end]
+            self._start, self._end = 0, keep
+        elif self._end - self._start == self.capacity:
+            self._start += 1
+        self._tape[self._end] = (timestamp, amount, price, SELL if amount < 0 else BUY, trade_id)
+        self._end += 1
+
+    def extend(self, trades):
+        """Appends trades in the order from the least to the most recent
+        :param trades:  a list of [TIMESTAMP, AMOUNT, PRICE] trades or a TRADE_DTYPE array
+        """
+        if isinstance(trades, np.ndarray) and trades.dtype == TRADE_DTYPE:
+            records = trades[-self.capacity:]
+        else:
+            values = np.asarray(trades, dtype=np.float64).reshape(-1, 3)[-self.capacity:]
+            records = np.zeros(len(values), dtype=TRADE_DTYPE)
+            records['timestamp'] = values[:, 0]
+            records['amount'] = values[:, 1]
+            records['price'] = values[:, 2]
+            records['side'] = np.where(values[:, 1] < 0, SELL, BUY)
+            records['id'] = NO_TRADE_ID
+        if len(self) + len(records) > self.capacity or self._end + len(records) > len(self._tape):
+            # make room for the new trades at the end of the array
+            keep = min(len(self), self.capacity - len(records))
+            self._tape[:keep] = self._tape[self._end - keep:self._end]
+            self._start, self._end = 0, keep
+        start, self._end = self._end, self._end + len(records)
+        self._tape[start:self._end] = records
+
+    def clear(self):
+        """Removes all trades"""
+        self._start = self._end = 0
+
+    def records(self):
+        """Returns the trades from the least to the most recent (a contiguous view)"""
+        return self._tape[self._start:self._end]
+
+    def recent(self, n=None):
+        """Returns up to n most recent trades (all by default) from the most recent one (a reversed view)"""
+        records = self.records()
+        if n is not None:
+            records = records[max(0, len(records) - n):]
+        return records[::-1]
+
+
+# ==========================================================================================
+#   Tickers
+# ==========================================================================================
+
+TICKER_FIELDS = ('bid', 'bid_size', 'ask', 'ask_size', 'change', 'change_percent',
+                 'last_price', 'volume', 'high', 'low')
+
+
+class TickerTable(object):
+    """A symbol-indexed table of tickers in a 2D NumPy array.
+
+    Every symbol gets a row the first time it is seen and keeps it, so an update of the table
+    assigns the new values in place and returns only the rows that actually changed.
+    The all-market ticker streams send the tickers of over a thousand symbols every second,
+    while only a fraction of them changes between two messages: the table lets the channel
+    publish, and the gui redraw, just those rows.
+
+    The values are float64, one column per field (see TICKER_FIELDS for the all-market tickers),
+    the symbols are kept in the order of their rows in the symbols list.
+    The values a ticker does not carry are NaN, which is regarded as unchanged by update.
+    """
+
+    def __init__(self, fields=TICKER_FIELDS, capacity=1024):
+        """Creates an empty table
+        :param fields:    the names of the value columns
+        :param capacity:  the initial number of rows, the table grows as needed
+        """
+        self.fields = tuple(fields)
+        self.symbols = []
+        self._rows = {}
+        self._values = np.zeros((max(capacity, 1), len(self.fields)), dtype=np.float64)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self._rows
+
+    def index(self, symbol):
+        """Returns the row of a symbol
+        :raises KeyError if the symbol is not in the table
+        """
+        return self._rows[symbol]
+
+    def row(self, symbol):
+        """Returns the ticker of a symbol as a [SYMBOL, values...] list"""
+        return [symbol] + self._values[self._rows[symbol]].tolist()
+
+    def values(self):
+        """Returns the values of all rows as an (n, fields) float64 array (a view)"""
+        return self._values[:len(self.symbols)]
+
+    def column(self, field):
+        """Returns the values of a single field of all rows (a view)"""
+        return self.values()[:, self.fields.index(field)]
+
+    def update(self, symbols, values):
+        """Assigns the values of the tickers of a number of symbols, adding the new symbols
+        :param symbols:  a list of symbols
+        :param values:   a list of value lists or an (n, fields) array, in the order of the symbols
+        :return: the int64 array of the rows that changed (including the new ones)
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(-1, len(self.fields))
+        rows = np.fromiter((self._rows.get(symbol, -1) for symbol in symbols), dtype=np.int64, count=len(symbols))
+        new = rows < 0
+        if new.any():
+            for i in np.flatnonzero(new):
+                rows[i] = self._add(symbols[i])
+        old = self._values[rows]
+        # the missing values (NaN) are equal to each other
+        changed = new | np.any((old != values) & ~(np.isnan(old) & np.isnan(values)), axis=1)
+        self._values[rows] = values
+        return rows[changed]
+
+    def take(self, rows):
+        """Returns the symbols and the values of the given rows -> (list, (k, fields) array copy)"""
+        return [self.symbols[row] for row in rows], self._values[rows]
+
+    def snapshot(self):
+        """Returns the symbols and the values of all rows -> (list, (n, fields) array copy)"""
+        return list(self.symbols), self.values().copy()
+
+    def clear(self):
+        """Removes all symbols"""
+        self.symbols = []
+        self._rows = {}
+
+    def _add(self, symbol):
+        row = self._rows.get(symbol)
+        if row is None:
+            if len(self.symbols) == len(self._values):
+                values = np.zeros((2 * len(self._values), len(self.fields)), dtype=np.float64)
+                values[:len(self._values)] = self._values
+                self._values = values
+            row = self._rows[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return row
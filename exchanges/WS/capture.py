@@ -0,0 +1,333 @@
+import gzip
+import os
+import queue
+import struct
+import threading
+import time
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from exchanges.exception import WSException
+
+
+# ==========================================================================================
+#   Compression of the capture blocks
+# ==========================================================================================
+
+class GzipCompression(object):
+    """Compresses the blocks of the capture segments as gzip members"""
+    name = 'gzip'
+    extension = '.gz'
+
+    @staticmethod
+    def available():
+        return True
+
+    @staticmethod
+    def compress(data):
+        return gzip.compress(data, compresslevel=6)
+
+    @staticmethod
+    def decompress(data):
+        return gzip.decompress(data)
+
+
+class ZstdCompression(GzipCompression):
+    """Compresses the blocks of the capture segments as zstd frames, faster and smaller than gzip"""
+    name = 'zstd'
+    extension = '.zst'
+
+    @staticmethod
+    def available():
+        return zstandard is not None
+
+    @staticmethod
+    def compress(data):
+        return zstandard.ZstdCompressor(level=3).compress(data)
+
+    @staticmethod
+    def decompress(data):
+        return zstandard.ZstdDecompressor().decompress(data)
+
+
+COMPRESSIONS = {compression.name: compression for compression in [GzipCompression, ZstdCompression]}
+
+
+def get_compression(name=None):
+    """Returns a compression class
+    :param name:  'gzip', 'zstd' or None for zstd if it is installed and gzip otherwise
+    :return: GzipCompression or ZstdCompression
+    :raises WSException if the compression is unknown or its package is not installed
+    """
+    if name is None:
+        return ZstdCompression if ZstdCompression.available() else GzipCompression
+    compression = COMPRESSIONS.get(name)
+    if compression is None:
+        raise WSException('Unknown compression {}. Must be one of {}'.format(name, list(COMPRESSIONS.keys())))
+    if not compression.available():
+        raise WSException('Compression {} is not available. Install the zstandard package.'.format(name))
+    return compression
+
+
+# ==========================================================================================
+#   Capture files
+# ==========================================================================================
+#   A capture is a series of append-only segment files in a directory, named
+#       <prefix>-<time of the first frame in ms>-<number>.cap.gz (or .cap.zst)
+#   so their names sort in the order of time. A segment is a sequence of blocks, each compressed
+#   on its own (a gzip member or a zstd frame), and a block is a sequence of records:
+#       received (float64 ms)  binary (uint8)  source length (uint16)  frame length (uint32)  source  frame
+#   The source is the connection (or the stream) that received the frame, the frame is kept
+#   exactly as received (str frames as utf-8, binary=0; bytes frames as they are, binary=1).
+#   Every segment has a text index <segment>.idx with a line per block:
+#       <received of the first frame> <received of the last frame> <file offset> <length> <frames>
+#   which lets a reader seek by time to the first block it needs and decompress from there.
+#   A block is written, and indexed, only once it is complete, so a segment is readable
+#   up to its last indexed block even when the writer was killed.
+
+RECORD          = struct.Struct('<dBHI')
+SEGMENT_SUFFIX  = '.cap'
+INDEX_SUFFIX    = '.idx'
+
+
+class CaptureWriter(object):
+    """Writes raw websocket frames to the segment files of a capture on a background thread.
+
+    write only puts the frame in a queue, so capturing costs the receiving thread a timestamp
+    and a queue put. The writer thread batches the frames in blocks, compresses the complete
+    blocks and appends them to the current segment, which is rotated by size and by age.
+    When the writer falls behind and the queue is full, the frames are dropped and counted
+    (see dropped) rather than blocking the receive loop.
+    """
+
+    def __init__(self, directory, prefix='capture', compression=None, segment_size=64 * 1024 * 1024,
+                 segment_duration=3600, block_size=256 * 1024, block_interval=1.0, queue_size=100000):
+        """Creates a writer and starts its thread
+        :param directory:         the directory of the segment files, created if it does not exist
+        :param prefix:            the name prefix of the segment files
+        :param compression:       'gzip', 'zstd' or None for zstd if it is installed and gzip otherwise
+        :param segment_size:      the compressed size in bytes after which a new segment is started
+        :param segment_duration:  the age in seconds after which a new segment is started
+        :param block_size:        the uncompressed size in bytes after which a block is written
+        :param block_interval:    the age in seconds after which a block is written,
+                                  which is also the longest time a frame waits to reach the file
+        :param queue_size:        the maximum number of frames waiting for the writer thread
+        :raises WSException if the compression is not available
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.compression = get_compression(compression)
+        self.segment_size = segment_size
+        self.segment_duration = segment_duration
+        self.block_size = block_size
+        self.block_interval = block_interval
+        self.written = 0            # the number of frames written to the files
+        self.dropped = 0            # the number of frames dropped because the queue was full
+        self.segments = []          # the paths of the segments in the order they were started
+        self.error = None           # OSError that stopped the writer
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._block = bytearray()
+        self._block_first = None    # received of the first frame of the block
+        self._block_last = None
+        self._block_count = 0
+        self._file = None
+        self._index = None
+        self._segment_start = None  # received of the first frame of the segment
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='capture-' + prefix, daemon=True)
+        self._thread.start()
+
+    @property
+    def closed(self):
+        return not self._thread.is_alive()
+
+    def write(self, source, frame, received=None):
+        """Queues a frame to be written, it never blocks
+        :param source:    the name of the connection or the stream that received the frame
+        :param frame:     the frame (str or bytes)
+        :param received:  the local time of the reception in ms, now by default
+        """
+        try:
+            self._queue.put_nowait((received if received is not None else time.time() * 1000, source, frame))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=None):
+        """Writes the queued frames, closes the files and stops the thread"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            while True:
+                try:
+                    record = self._queue.get(timeout=self.block_interval)
+                except queue.Empty:
+                    self._write_block()
+                    continue
+                if record is None:
+                    break
+                self._append(*record)
+            self._write_block()
+        except OSError as e:
+            self.error = e
+        finally:
+            self._close_segment()
+
+    def _append(self, received, source, frame):
+        if self._block_count and received - self._block_first >= self.block_interval * 1000:
+            self._write_block()
+        binary = isinstance(frame, (bytes, bytearray))
+        source = source.encode()
+        frame = frame if binary else frame.encode()
+        self._block += RECORD.pack(received, binary, len(source), len(frame))
+        self._block += source
+        self._block += frame
+        if not self._block_count:
+            self._block_first = received
+        self._block_last = received
+        self._block_count += 1
+        if len(self._block) >= self.block_size:
+            self._write_block()
+
+    def _write_block(self):
+        if not self._block_count:
+            return
+        if self._file is None:
+            self._open_segment(self._block_first)
+        data = self.compression.compress(bytes(self._block))
+        offset = self._file.tell()
+        self._file.write(data)
+        self._file.flush()
+        self._index.write('{!r} {!r} {} {} {}\n'.format(self._block_first, self._block_last, offset, len(data),
+                                                         self._block_count))
+        self._index.flush()
+        self.written += self._block_count
+        self._block.clear()
+        self._block_count = 0
+        if offset + len(data) >= self.segment_size or \
+                self._block_last - self._segment_start >= self.segment_duration * 1000:
+            self._close_segment()
+
+    def _open_segment(self, start):
+        name = '{}-{:013d}-{:04d}{}{}'.format(self.prefix, int(start), len(self.segments),
+                                               SEGMENT_SUFFIX, self.compression.extension)
+        path = os.path.join(self.directory, name)
+        self._file = open(path, 'ab')
+        self._index = open(path + INDEX_SUFFIX, 'a')
+        self._segment_start = start
+        self.segments.append(path)
+
+    def _close_segment(self):
+        if self._file is not None:
+            self._file.close()
+            self._index.close()
+            self._file = self._index = None
+
+
+class CaptureBlock(object):
+    """An index entry of a segment: a block of frames received from first to last (ms)"""
+    __slots__ = ('first', 'last', 'offset', 'length', 'count')
+
+    def __init__(self, first, last, offset, length, count):
+        self.first = first
+        self.last = last
+        self.offset = offset
+        self.length = length
+        self.count = count
+
+
+class CaptureSegment(object):
+    """A segment file of a capture and its index"""
+
+    def __init__(self, path):
+        """:param path:  the path of the segment file
+        :raises WSException if the compression of the segment is not available
+        """
+        self.path = path
+        self.compression = next((compression for compression in COMPRESSIONS.values()
+                                 if path.endswith(SEGMENT_SUFFIX + compression.extension)), GzipCompression)
+        if not self.compression.available():
+            raise WSException('Segment {} needs the zstandard package.'.format(path))
+        self.blocks = []
+        with open(path + INDEX_SUFFIX) as index:
+            for line in index:
+                values = line.split()
+                if len(values) == 5:    # the last line is incomplete if the writer was killed
+                    self.blocks.append(CaptureBlock(float(values[0]), float(values[1]),
+                                                    int(values[2]), int(values[3]), int(values[4])))
+
+    @property
+    def start(self):
+        """The received time of the first frame in ms or None if the segment is empty"""
+        return self.blocks[0].first if self.blocks else None
+
+    @property
+    def end(self):
+        """The received time of the last frame in ms or None if the segment is empty"""
+        return self.blocks[-1].last if self.blocks else None
+
+    def __len__(self):
+        return sum(block.count for block in self.blocks)
+
+    def frames(self, start=None, end=None):
+        """Yields the frames received from start to end (ms, inclusive) -> (received, source, frame)"""
+        with open(self.path, 'rb') as file:
+            for block in self.blocks:
+                if start is not None and block.last < start:
+                    continue
+                if end is not None and block.first > end:
+                    break
+                file.seek(block.offset)
+                data = self.compression.decompress(file.read(block.length))
+                for record in self._records(data):
+                    if start is not None and record[0] < start:
+                        continue
+                    if end is not None and record[0] > end:
+                        return
+                    yield record
+
+    @staticmethod
+    def _records(data):
+        position, size = 0, len(data)
+        while position < size:
+            received, binary, source_length, frame_length = RECORD.unpack_from(data, position)
+            position += RECORD.size
+            source = data[position:position + source_length].decode()
+            position += source_length
+            frame = data[position:position + frame_length]
+            position += frame_length
+            yield received, source, frame if binary else frame.decode()
+
+
+class CaptureReader(object):
+    """Reads the frames of a capture in the order they were received, from any point in time"""
+
+    def __init__(self, directory, prefix='capture'):
+        """:param directory:  the directory of the segment files
+        :param prefix:     the name prefix of the segment files
+        """
+        self.directory = directory
+        self.prefix = prefix
+
+    def segments(self):
+        """Returns the segments of the capture in the order of time"""
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.startswith(self.prefix + '-') and SEGMENT_SUFFIX in name
+                       and not name.endswith(INDEX_SUFFIX))
+        return [CaptureSegment(os.path.join(self.directory, name)) for name in names]
+
+    def frames(self, start=None, end=None):
+        """Yields the frames received from start to end (ms, inclusive) -> (received, source, frame)
+        The segments and the blocks ending before start are skipped without being read.
+        """
+        for segment in self.segments():
+            if not segment.blocks or (start is not None and segment.end < start):
+                continue
+            if end is not None and segment.start > end:
+                break
+            yield from segment.frames(start, end)
@@ -0,0 +1,429 @@
+import heapq
+import logging
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from exchanges.WS.events import bus, DispatcherKeyError
+from exchanges.WS.marketdata import BookDelta
+
+logger = logging.getLogger(__name__)
+
+
+# ==========================================================================================
+#   Merge policies
+# ==========================================================================================
+#   A policy merges a new message of a channel into the list of messages pending for delivery.
+#   The pending list is delivered message by message when the conflation timer fires,
+#   after the policy finalized it with finish.
+#   A Mailbox also bounds the pending list: size tells how many updates are pending
+#   and trim drops the oldest of them down to the capacity of the mailbox.
+
+MAILBOX_CAPACITY = 1000     # the default maximum number of updates pending in a Mailbox
+
+
+class MergePolicy(object):
+    """Base class of the merge policies"""
+
+    @staticmethod
+    def merge(pending, data):
+        pending.append(data)
+
+    @staticmethod
+    def finish(pending):
+        return pending
+
+    @staticmethod
+    def size(pending):
+        """Returns the number of pending updates"""
+        return len(pending)
+
+    @staticmethod
+    def trim(pending, capacity):
+        """Drops the oldest pending updates above the capacity and returns their number"""
+        dropped = max(0, len(pending) - capacity)
+        del pending[:dropped]
+        return dropped
+
+
+class KeepLatest(MergePolicy):
+    """Only the latest state is delivered (tickers, full order books)"""
+
+    @staticmethod
+    def merge(pending, data):
+        pending[:] = [data]
+
+    @staticmethod
+    def finish(pending):
+        return pending
+
+
+class MergeBookDeltas(MergePolicy):
+    """Merges the messages of an order book in the delta mode.
+    Changes of the same price level are merged, so a single ('delta', changes) message
+    with the last amount of each changed level is delivered. A snapshot replaces everything
+    pending before it, and the deltas following a snapshot are applied to it.
+    The merged delta carries the metadata of the last merged one.
+    """
+
+    @staticmethod
+    def merge(pending, data):
+        kind, book = data
+        if kind == 'snapshot' or not pending:
+            pending[:] = [(kind, {'bids': dict(book['bids']), 'asks': dict(book['asks'])}, book)]
+            return
+        levels = pending[0][1]
+        for side in ('bids', 'asks'):
+            for price, amount in book[side]:
+                if amount == 0 and pending[0][0] == 'snapshot':
+                    levels[side].pop(price, None)
+                else:
+                    levels[side][price] = amount
+        pending[0] = pending[0][:2] + (book,)
+
+    @staticmethod
+    def finish(pending):
+        kind, levels, last = pending[0]
+        if kind == 'snapshot':
+            # snapshots are delivered in their original form of OrderedDicts sorted by the price
+            return [(kind, {side: OrderedDict(sorted(levels[side].items())) for side in ('bids', 'asks')})]
+        return [(kind, BookDelta(list(levels['bids'].items()), list(levels['asks'].items()),
+                                 getattr(last, 'exchange_ts', None), getattr(last, 'receive_ts', None),
+                                 getattr(last, 'seq', None)))]
+
+
+class BatchTrades(MergePolicy):
+    """Trades are never dropped, the updates are batched instead.
+    The pending updates are delivered as a single ('batch', [trade, ...]) message
+    with the trades in the order of arrival (from the least to the most recent).
+    A snapshot replaces everything pending before it and is delivered first.
+    A Mailbox over its capacity drops the oldest trades of the batches.
+    """
+
+    @staticmethod
+    def merge(pending, data):
+        kind, trades = data
+        if kind == 'snapshot':
+            pending[:] = [data]
+        elif kind == 'update':
+            if not pending or pending[-1][0] != 'batch':
+                pending.append(('batch', []))
+            pending[-1][1].append(trades)
+        else:
+            pending.append(data)
+
+    @staticmethod
+    def finish(pending):
+        return pending
+
+    @staticmethod
+    def size(pending):
+        return sum(len(trades) if kind == 'batch' else 1 for kind, trades in pending)
+
+    @staticmethod
+    def trim(pending, capacity):
+        dropped = 0
+        excess = BatchTrades.size(pending) - capacity
+        for kind, trades in pending:
+            if excess <= 0:
+                break
+            if kind == 'batch':
+                n = min(excess, len(trades))
+                del trades[:n]
+                excess -= n
+                dropped += n
+        pending[:] = [(kind, trades) for kind, trades in pending if kind != 'batch' or trades]
+        return dropped
+
+
+class MergeCandles(MergePolicy):
+    """Repeated updates of the same candle are merged, so only its latest state is delivered.
+    Added candles are delivered in order, since every candle is needed to build the chart.
+    A snapshot replaces everything pending before it. The snapshots are shared with the channel
+    and the other listeners, so the updates following a snapshot are queued after it
+    instead of being written into it.
+    """
+
+    @staticmethod
+    def merge(pending, data):
+        kind, candle = data
+        if kind == 'snapshot':
+            pending[:] = [data]
+        elif kind == 'update' and pending and pending[-1][0] in ('add', 'update') and \
+                pending[-1][1][0] == candle[0]:
+            # keep 'add' if the candle was added in this interval
+            pending[-1] = (pending[-1][0], candle)
+        else:
+            pending.append(data)
+
+    @staticmethod
+    def finish(pending):
+        return pending
+
+
+class MergeTickers(MergePolicy):
+    """Merges the changed tickers of an all-market ticker channel.
+    Every message carries only the tickers that changed, as a (symbols, values) tuple,
+    so a single (symbols, values) message with the latest values of every symbol
+    changed since the last delivery is delivered.
+    """
+
+    @staticmethod
+    def merge(pending, data):
+        if not pending:
+            pending.append({})
+        tickers = pending[0]
+        for symbol, values in zip(*data):
+            tickers[symbol] = values
+
+    @staticmethod
+    def finish(pending):
+        tickers = pending[0]
+        return [(list(tickers), np.array(list(tickers.values()), dtype=np.float64))]
+
+    @staticmethod
+    def size(pending):
+        return len(pending[0]) if pending else 0
+
+    @staticmethod
+    def trim(pending, capacity):
+        # the tickers of the distinct symbols are never dropped, there is one per symbol at most
+        return 0
+
+
+# ==========================================================================================
+#   Conflator
+# ==========================================================================================
+
+class Conflator(object):
+    """A bus listener that limits the rate of updates delivered to a handler.
+
+    The first update after a quiet period is delivered immediately. The updates received
+    within 1/rate seconds after a delivery are merged by the policy and delivered together
+    when the conflation timer fires. Therefore, the handler is called at most rate times
+    per second (per message kept by the policy) and it always ends up with the latest state.
+    The handler is called either from the publishing thread or from the timer thread,
+    but never concurrently.
+    """
+
+    def __init__(self, handler, rate, policy=KeepLatest):
+        """Creates a conflator
+        :param handler:  the listener callback receiving the data
+        :param rate:     the maximum number of deliveries per second
+        :param policy:   the merge policy of the channel (KeepLatest, MergeBookDeltas, BatchTrades or MergeCandles)
+        """
+        self.handler = handler
+        self.rate = rate
+        self.policy = policy
+        self.interval = 1.0 / rate
+        self.received = 0           # the number of received updates
+        self.delivered = 0          # the number of deliveries
+        self._pending = []
+        self._scheduled = False
+        self._closed = False
+        self._last = 0.0
+        self._lock = threading.Lock()
+        self._deliver_lock = threading.Lock()
+
+    def __call__(self, data):
+        """Receives an update from the bus"""
+        with self._lock:
+            if self._closed:
+                return
+            self.received += 1
+            self.policy.merge(self._pending, data)
+            if self._scheduled:
+                return
+            due = self._last + self.interval
+            if due > time.monotonic():
+                self._scheduled = True
+                ConflationTimer.instance().schedule(due, self)
+                return
+        self.flush()
+
+    def flush(self):
+        """Delivers the pending updates"""
+        with self._deliver_lock:
+            with self._lock:
+                self._scheduled = False
+                if not self._pending or self._closed:
+                    return
+                pending, self._pending = self.policy.finish(self._pending), []
+                self._last = time.monotonic()
+            for data in pending:
+                self.delivered += 1
+                self.handler(data)
+
+    def close(self):
+        """Drops the pending updates and stops the deliveries"""
+        with self._lock:
+            self._closed = True
+            self._pending = []
+
+
+class Mailbox(object):
+    """A bounded mailbox of a channel between the publishing thread and a consumer
+    that drains it periodically (i.e. the gui thread on a timer).
+
+    The updates put into the mailbox are merged by the policy, so a slow consumer
+    only gets the merged state instead of every update. The number of pending updates is
+    bounded by the capacity: once it is exceeded, the policy drops the oldest updates
+    (KeepLatest and MergeBookDeltas never hold more than one). The mailbox counts
+    the received, delivered and dropped updates and tracks its depth, see stats.
+    """
+
+    def __init__(self, policy=KeepLatest, capacity=MAILBOX_CAPACITY):
+        """Creates a mailbox
+        :param policy:    the merge policy of the channel (KeepLatest, MergeBookDeltas, BatchTrades or MergeCandles)
+        :param capacity:  the maximum number of pending updates
+        """
+        self.policy = policy
+        self.capacity = capacity
+        self.received = 0           # the number of received updates
+        self.delivered = 0          # the number of updates returned by drain
+        self.dropped = 0            # the number of updates dropped over the capacity
+        self.max_depth = 0          # the largest number of pending updates since the last reset
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def put(self, data):
+        """Merges an update into the pending ones, called by the publishing thread"""
+        with self._lock:
+            self.received += 1
+            self.policy.merge(self._pending, data)
+            depth = self.policy.size(self._pending)
+            if depth > self.capacity:
+                self.dropped += self.policy.trim(self._pending, self.capacity)
+                depth = self.policy.size(self._pending)
+            self.max_depth = max(self.max_depth, depth)
+
+    def drain(self):
+        """Returns the pending updates in the order of delivery and empties the mailbox"""
+        with self._lock:
+            if not self._pending:
+                return []
+            pending, self._pending = self.policy.finish(self._pending), []
+            self.delivered += len(pending)
+            return pending
+
+    def clear(self):
+        """Drops the pending updates (i.e. when the channel is unsubscribed)"""
+        with self._lock:
+            self._pending = []
+
+    def depth(self):
+        """Returns the number of pending updates"""
+        with self._lock:
+            return self.policy.size(self._pending)
+
+    def stats(self, reset=False):
+        """Returns the statistics of the mailbox
+        :param reset:  start tracking the maximum depth anew
+        :return: {'depth': int, 'max_depth': int, 'received': int, 'delivered': int, 'dropped': int}
+        """
+        with self._lock:
+            stats = {'depth': self.policy.size(self._pending), 'max_depth': self.max_depth,
+                     'received': self.received, 'delivered': self.delivered, 'dropped': self.dropped}
+            if reset:
+                self.max_depth = stats['depth']
+            return stats
+
+
+class ConflationTimer(object):
+    """A single timer thread that flushes all conflators when they are due"""
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        self._queue = []            # heap of (due time, sequence, conflator)
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name='conflation-timer')
+        self.thread.daemon = True
+        self.thread.start()
+
+    @classmethod
+    def instance(cls):
+        """Returns the shared timer, starting it if necessary"""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def schedule(self, due, conflator):
+        """Flushes a conflator at a given time (time.monotonic)"""
+        with self._condition:
+            self._sequence += 1
+            heapq.heappush(self._queue, (due, self._sequence, conflator))
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue or self._queue[0][0] > time.monotonic():
+                    self._condition.wait(self._queue[0][0] - time.monotonic() if self._queue else None)
+                _, _, conflator = heapq.heappop(self._queue)
+            try:
+                conflator.flush()
+            except Exception:
+                # errors of the handlers must not stop the timer
+                logger.exception('Conflated delivery to {} failed'.format(conflator.handler))
+
+
+# ==========================================================================================
+#   Bus helpers
+# ==========================================================================================
+
+_conflators = {}        # (sender, signal, handler) -> Conflator
+_conflators_lock = threading.Lock()     # connect and disconnect run on the threads of the callers
+
+
+def connect(handler, signal, sender, rate=None, policy=KeepLatest):
+    """Connects a listener to a channel, optionally with a limited update rate.
+    :param handler:  the listener callback
+    :param signal:   the channel signal
+    :param sender:   the exchange sender
+    :param rate:     the maximum number of updates per second or None for every update
+    :param policy:   the merge policy of the channel used when the rate is limited
+    :return: the Subscription of the listener (or of its conflator)
+    """
+    if not rate:
+        return bus.subscribe(handler, signal=signal, sender=sender)
+    key = (sender, signal, handler)
+    with _conflators_lock:
+        if key in _conflators:
+            return bus.find(_conflators[key], signal=signal, sender=sender)
+        conflator = Conflator(handler, rate, policy)
+        _conflators[key] = conflator
+        return bus.subscribe(conflator, signal=signal, sender=sender)
+
+
+def disconnect(handler, signal, sender):
+    """Disconnects a listener connected with connect
+    :raises events.DispatcherKeyError if the listener is not connected
+    """
+    with _conflators_lock:
+        conflator = _conflators.pop((sender, signal, handler), None)
+    if conflator is None:
+        bus.unsubscribe_handler(handler, signal=signal, sender=sender)
+        return
+    conflator.close()
+    bus.unsubscribe_handler(conflator, signal=signal, sender=sender)
+
+
+def disconnect_all(sender):
+    """Disconnects all rate limited listeners of an exchange"""
+    with _conflators_lock:
+        keys = [key for key in _conflators if key[0] == sender]
+    for key in keys:
+        try:
+            disconnect(key[2], key[1], sender)
+        except DispatcherKeyError:
+            # disconnected meanwhile by another thread
+            pass
+
+
+def get_conflator(handler, signal, sender):
+    """Returns the conflator of a rate limited listener or None"""
+    with _conflators_lock:
+        return _conflators.get((sender, signal, handler))
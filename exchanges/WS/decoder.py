@@ -0,0 +1,127 @@
+import json
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from exchanges.exception import WSException
+
+
+# ==========================================================================================
+#   JSON decoders
+# ==========================================================================================
+
+class JSONDecoder(object):
+    """Decodes websocket messages using the json module of the standard library"""
+    name = 'json'
+
+    @staticmethod
+    def available():
+        return True
+
+    @staticmethod
+    def loads(message):
+        """Decode a message (str or bytes) to python objects"""
+        return json.loads(message)
+
+
+class OrjsonDecoder(JSONDecoder):
+    """Decodes websocket messages using orjson, which is several times faster than json"""
+    name = 'orjson'
+
+    @staticmethod
+    def available():
+        return orjson is not None
+
+    loads = staticmethod(orjson.loads) if orjson else JSONDecoder.loads
+
+
+DECODERS = {decoder.name: decoder for decoder in [JSONDecoder, OrjsonDecoder]}
+
+
+def get_decoder(name=None):
+    """Returns a decoder class
+    :param name:  'json', 'orjson' or None for the fastest available decoder
+    :return: JSONDecoder or OrjsonDecoder
+    :raises WSException if the decoder is unknown or its package is not installed
+    """
+    if name is None:
+        return OrjsonDecoder if OrjsonDecoder.available() else JSONDecoder
+    decoder = DECODERS.get(name)
+    if decoder is None:
+        raise WSException('Unknown decoder {}. Must be one of {}'.format(name, list(DECODERS.keys())))
+    if not decoder.available():
+        raise WSException('Decoder {} is not available. Install the {} package.'.format(name, name))
+    return decoder
+
+
+# ==========================================================================================
+#   Binance numeric parser
+# ==========================================================================================
+
+_STREAM_PREFIX = '{"stream":"'
+_TRADE_PRICE   = re.compile(r'"t":(\d+),"p":"([^"]*)","q":"([^"]*)"')
+_TRADE_TIME    = re.compile(r'"T":(\d+),"m":(t|f)')
+
+
+class BinanceNumericParser(object):
+    """Parses Binance depth and trade messages straight from the raw text into numbers.
+
+    The hot channels only need a few fields of each message, but decoding it to json
+    builds a dictionary with all of them and a string for every number, after which
+    every numeric string is converted to float again by the channel. The parser extracts
+    only the needed fields and converts them once:
+      - depth:  the quotes are stripped from the price levels, so the json decoder
+                returns the levels as floats directly
+      - trades: the fields are matched in the raw text
+    It works on both the raw stream messages and the messages wrapped by the combined stream endpoint.
+    The parser relies on the compact formatting and the field order of Binance messages,
+    so it is opt-in (see the numeric parameter of BinanceWSClient).
+    """
+    loads = get_decoder().loads
+
+    @staticmethod
+    def stream(message):
+        """Returns the stream name of a message from the combined stream endpoint or None"""
+        if message.startswith(_STREAM_PREFIX):
+            return message[len(_STREAM_PREFIX):message.index('"', len(_STREAM_PREFIX))]
+        return None
+
+    @classmethod
+    def parse_depth(cls, message):
+        """Parses a diff depth event
+            {"e":"depthUpdate","E":123456789,"s":"BNBBTC","U":157,"u":160,
+             "b":[["0.0024","10"]],"a":[["0.0026","100"]]}
+        :return: (first update id, last update id, [[price, amount], ...] for bids, [[price, amount], ...] for asks)
+        :raises WSException if the message is not a depth event
+        """
+        first_id = message.find('"U":')
+        last_id = message.find('"u":')
+        levels = message.find('"b":[')
+        if first_id < 0 or last_id < 0 or levels < 0 or message.find(',"a":[', levels) < 0:
+            raise WSException('Not a depth update: {}'.format(message))
+        levels = message[levels + 4:message.rindex(']') + 1].replace(',"a":', ',').replace('"', '')
+        bids, asks = cls.loads('[' + levels + ']')
+        return (int(message[first_id + 4:message.index(',', first_id)]),
+                int(message[last_id + 4:message.index(',', last_id)]),
+                bids, asks)
+
+    @staticmethod
+    def parse_trade(message):
+        """Parses a trade event
+            {"e":"trade","E":123456789,"s":"BNBBTC","t":12345,"p":"0.001","q":"100",
+             "b":88,"a":50,"T":123456785,"m":true,"M":true}
+        :return: (trade time, amount, price, trade id) where the amount is negative if the buyer was the market maker
+        :raises WSException if the message is not a trade event
+        """
+        price = _TRADE_PRICE.search(message)
+        trade_time = _TRADE_TIME.search(message)
+        if price is None or trade_time is None:
+            raise WSException('Not a trade: {}'.format(message))
+        amount = float(price.group(3))
+        return (int(trade_time.group(1)),
+                -amount if trade_time.group(2) == 't' else amount,
+                float(price.group(2)),
+                int(price.group(1)))
@@ -0,0 +1,201 @@
+import inspect
+import threading
+
+
+# ==========================================================================================
+#   Event bus
+# ==========================================================================================
+#   The channels publish every update of the exchange through the bus, so publishing has to
+#   be cheap: the receivers of a channel are kept in a tuple that is only rebuilt when
+#   the channel is subscribed or unsubscribed, and publishing a message is a dictionary
+#   lookup followed by a plain call of every receiver. The signatures of the handlers
+#   are inspected once, when they subscribe, never when a message is published.
+
+class DispatcherKeyError(KeyError):
+    """Raised when a handler that is not subscribed to a channel is unsubscribed.
+    Named after the error of PyDispatcher, so the code written for it keeps working.
+    """
+
+
+class Subscription(object):
+    """A handle of a handler subscribed to a channel, returned by EventBus.subscribe"""
+    __slots__ = ('bus', 'signal', 'sender', 'handler', 'receiver')
+
+    def __init__(self, bus, signal, sender, handler, receiver):
+        self.bus = bus
+        self.signal = signal
+        self.sender = sender
+        self.handler = handler      # the subscribed handler
+        self.receiver = receiver    # the callable receiving the data of the channel
+
+    @property
+    def active(self):
+        """True until the subscription is cancelled"""
+        return self in self.bus._subscriptions.get((self.sender, self.signal), ())
+
+    def cancel(self):
+        """Unsubscribes the handler, cancelling a cancelled subscription does nothing"""
+        self.bus.unsubscribe(self)
+
+
+def _receiver(handler, signal, sender):
+    """Returns a callable receiving the data of a channel for a given handler.
+
+    The handlers written for PyDispatcher can take any of the signal, sender and data
+    keyword arguments (or **kwargs for all of them). The signature is inspected here,
+    so a handler taking just the data (by far the most common case) is called directly
+    and the others get a wrapper passing the arguments they ask for.
+    """
+    try:
+        parameters = inspect.signature(handler).parameters
+    except (TypeError, ValueError):
+        return handler
+    if any(p.kind == inspect.Parameter.VAR_KEYWORD for p in parameters.values()):
+        names = ('signal', 'sender', 'data')
+    else:
+        names = tuple(name for name in ('signal', 'sender', 'data') if name in parameters)
+    positional = [p for p in parameters.values()
+                  if p.kind in (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)]
+    if names == ('data',) and positional and positional[0].name == 'data':
+        return handler
+    if not names and len(positional) == 1 and positional[0].default is inspect.Parameter.empty:
+        # a handler with a single argument of another name receives the data
+        return handler
+
+    fixed = {name: value for name, value in (('signal', signal), ('sender', sender)) if name in names}
+    if 'data' not in names:
+        return lambda data: handler(**fixed)
+    return lambda data: handler(data=data, **fixed)
+
+
+class EventBus(object):
+    """In-process publish/subscribe of the exchange channels.
+
+    A channel is identified by the (sender, signal) pair, i.e. ('binance', 'btcusdt@trade').
+    The handlers are called synchronously on the publishing thread in the order of subscription
+    and they are referenced strongly, so they have to be unsubscribed explicitly
+    (by cancelling their Subscription or with unsubscribe_handler).
+    Subscribing and unsubscribing are thread safe; publishing takes no lock, it works on the tuple
+    of the receivers current at the time of the call.
+    """
+
+    def __init__(self):
+        self._receivers = {}        # (sender, signal) -> tuple of receivers called on publish
+        self._subscriptions = {}    # (sender, signal) -> tuple of Subscriptions
+        self._lock = threading.Lock()
+
+    def subscribe(self, handler, signal, sender):
+        """Subscribes a handler to a channel
+        :param handler:  a callback taking the data of the channel (or signal, sender and data keywords)
+        :param signal:   the channel signal
+        :param sender:   the exchange sender
+        :return: Subscription, the existing one if the handler is already subscribed to the channel
+        """
+        key = (sender, signal)
+        with self._lock:
+            subscriptions = self._subscriptions.get(key, ())
+            for subscription in subscriptions:
+                if subscription.handler == handler:
+                    return subscription
+            subscription = Subscription(self, signal, sender, handler, _receiver(handler, signal, sender))
+            self._update(key, subscriptions + (subscription,))
+            return subscription
+
+    def unsubscribe(self, subscription):
+        """Cancels a subscription
+        :return: True if the subscription was active
+        """
+        key = (subscription.sender, subscription.signal)
+        with self._lock:
+            subscriptions = self._subscriptions.get(key, ())
+            if subscription not in subscriptions:
+                return False
+            self._update(key, tuple(s for s in subscriptions if s is not subscription))
+            return True
+
+    def unsubscribe_handler(self, handler, signal, sender):
+        """Unsubscribes a handler from a channel
+        :raises DispatcherKeyError if the handler is not subscribed to the channel
+        """
+        subscription = self.find(handler, signal, sender)
+        if subscription is None or not self.unsubscribe(subscription):
+            raise DispatcherKeyError(f'No handler {handler} for signal {signal} of sender {sender}')
+
+    def find(self, handler, signal, sender):
+        """Returns the Subscription of a handler to a channel or None"""
+        for subscription in self._subscriptions.get((sender, signal), ()):
+            if subscription.handler == handler:
+                return subscription
+        return None
+
+    def publish(self, signal, sender, data):
+        """Sends the data to all handlers subscribed to a channel"""
+        for receiver in self._receivers.get((sender, signal), ()):
+            receiver(data)
+
+    def has_subscribers(self, signal, sender):
+        """True if any handler is subscribed to a channel"""
+        return (sender, signal) in self._receivers
+
+    def subscriptions(self, sender, signal=None):
+        """Returns the Subscriptions of a sender, optionally only those of a single signal"""
+        if signal is not None:
+            return list(self._subscriptions.get((sender, signal), ()))
+        return [s for key, subscriptions in list(self._subscriptions.items()) if key[0] == sender
+                for s in subscriptions]
+
+    def clear(self, sender):
+        """Unsubscribes all handlers of a sender"""
+        with self._lock:
+            for key in [key for key in self._subscriptions if key[0] == sender]:
+                self._update(key, ())
+
+    def _update(self, key, subscriptions):
+        # the tuples are replaced, never modified, so a publish in progress is not affected
+        if subscriptions:
+            self._subscriptions[key] = subscriptions
+            self._receivers[key] = tuple(s.receiver for s in subscriptions)
+        else:
+            self._subscriptions.pop(key, None)
+            self._receivers.pop(key, None)
+
+
+bus = EventBus()
+
+
+# ==========================================================================================
+#   PyDispatcher compatibility
+# ==========================================================================================
+
+class _Errors(object):
+    DispatcherKeyError = DispatcherKeyError
+
+
+class Dispatcher(object):
+    """The subset of the pydispatch.dispatcher module used with the exchange clients, backed by the bus.
+    Lets the code written for PyDispatcher keep working unchanged: `from exchanges.WS.events import dispatcher`.
+    Unlike PyDispatcher the handlers are always referenced strongly (weak is accepted and ignored)
+    and only the data keyword is delivered by send.
+    """
+    errors = _Errors
+
+    def __init__(self, bus):
+        self.bus = bus
+
+    def connect(self, receiver, signal, sender, weak=True):
+        self.bus.subscribe(receiver, signal, sender)
+
+    def disconnect(self, receiver, signal, sender, weak=True):
+        self.bus.unsubscribe_handler(receiver, signal, sender)
+
+    def send(self, signal, sender, data=None):
+        self.bus.publish(signal, sender, data)
+
+    def getReceivers(self, sender, signal):
+        return [s.handler for s in self.bus.subscriptions(sender, signal)]
+
+    def getAllReceivers(self, sender, signal=None):
+        return [s.handler for s in self.bus.subscriptions(sender, signal)]
+
+
+dispatcher = Dispatcher(bus)
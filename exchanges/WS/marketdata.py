@@ -0,0 +1,115 @@
+from operator import itemgetter
+
+from exchanges.WS.buffers import TICKER_FIELDS, NO_TRADE_ID
+
+
+# ==========================================================================================
+#   Normalized market data events
+# ==========================================================================================
+#   The channels of all exchanges publish their updates as the events below. An event keeps
+#   the values in the list (or dictionary) form the listeners always received, so the consumers
+#   indexing them (i.e. ticker[6] or delta['bids']) keep working, and adds the named fields
+#   and the metadata of the message it comes from in slots of the same object:
+#       exchange_ts   the exchange time of the message in ms (None if the exchange does not send it)
+#       receive_ts    the local time the message was received in ms
+#       seq           the sequence number of the message (the update id of Binance books, the trade id
+#                     of Binance trades, the SEQ_ALL number of the Bitfinex connection; None if unknown)
+#   The all-market tickers are published in bulk as (symbols, values) arrays (see TickerTable)
+#   and the snapshots of trades and candles are arrays of their buffers.
+
+class MarketEvent(list):
+    """Base class of the list events. The values are the items of the list in the order of FIELDS,
+    which are also available as read-only attributes of the same name.
+    """
+    __slots__ = ('exchange_ts', 'receive_ts', 'seq')
+    FIELDS = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for i, name in enumerate(cls.FIELDS):
+            setattr(cls, name, property(itemgetter(i)))
+
+    def __init__(self, values=(), exchange_ts=None, receive_ts=None, seq=None):
+        """Creates an event
+        :param values:       the values in the order of FIELDS
+        :param exchange_ts:  the exchange time of the message in ms
+        :param receive_ts:   the time the message was received in ms
+        :param seq:          the sequence number of the message
+        """
+        super(MarketEvent, self).__init__(values)
+        self.exchange_ts = exchange_ts
+        self.receive_ts = receive_ts
+        self.seq = seq
+
+    def __repr__(self):
+        return '{}({}, exchange_ts={}, receive_ts={}, seq={})'.format(
+            self.__class__.__name__, list.__repr__(self), self.exchange_ts, self.receive_ts, self.seq)
+
+    def __reduce__(self):
+        return self.__class__, (list(self), self.exchange_ts, self.receive_ts, self.seq)
+
+    def as_dict(self):
+        """Returns the named values and the metadata of the event as a dictionary"""
+        event = dict(zip(self.FIELDS, self))
+        event.update(exchange_ts=self.exchange_ts, receive_ts=self.receive_ts, seq=self.seq)
+        return event
+
+
+class Ticker(MarketEvent):
+    """A ticker [ BID, BID_SIZE, ASK, ASK_SIZE, DAY_CHANGE, DAY_CHANGE_PERCENT, LAST_PRICE, VOLUME, HIGH, LOW ]
+    The values of a mini ticker that are not known are NaN.
+    """
+    __slots__ = ()
+    FIELDS = TICKER_FIELDS
+
+
+class Trade(MarketEvent):
+    """A trade [ TIMESTAMP, AMOUNT, PRICE ] with the amount negative for sells, and the trade id of the exchange"""
+    __slots__ = ('trade_id',)
+    FIELDS = ('timestamp', 'amount', 'price')
+
+    def __init__(self, values=(), exchange_ts=None, receive_ts=None, seq=None, trade_id=NO_TRADE_ID):
+        super(Trade, self).__init__(values, exchange_ts, receive_ts, seq)
+        self.trade_id = trade_id
+
+    def __reduce__(self):
+        return self.__class__, (list(self), self.exchange_ts, self.receive_ts, self.seq, self.trade_id)
+
+    def as_dict(self):
+        event = super(Trade, self).as_dict()
+        event['trade_id'] = self.trade_id
+        return event
+
+
+class Candle(MarketEvent):
+    """A candle [ TIMESTAMP, OPEN, HIGH, LOW, CLOSE, VOLUME ]"""
+    __slots__ = ()
+    FIELDS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+
+class BookDelta(dict):
+    """The changed price levels of an order book {'bids': [(price, amount), ...], 'asks': [(price, amount), ...]}
+    where the amount 0 means that the price level was removed
+    """
+    __slots__ = ('exchange_ts', 'receive_ts', 'seq')
+
+    def __init__(self, bids, asks, exchange_ts=None, receive_ts=None, seq=None):
+        super(BookDelta, self).__init__(bids=bids, asks=asks)
+        self.exchange_ts = exchange_ts
+        self.receive_ts = receive_ts
+        self.seq = seq
+
+    def __repr__(self):
+        return 'BookDelta({}, exchange_ts={}, receive_ts={}, seq={})'.format(
+            dict.__repr__(self), self.exchange_ts, self.receive_ts, self.seq)
+
+    def __reduce__(self):
+        return self.__class__, (self['bids'], self['asks'], self.exchange_ts, self.receive_ts, self.seq)
+
+    @property
+    def bids(self):
+        return self['bids']
+
+    @property
+    def asks(self):
+        return self['asks']
@@ -0,0 +1,457 @@
+from bisect import bisect_left, insort
+from collections import OrderedDict
+import numpy as np
+from exchanges.WS.events import bus
+
+from exchanges.WS.api import ChannelData
+from exchanges.WS.marketdata import BookDelta
+
+
+DELTA_SUFFIX = '@delta'   # suffix of the bus signal used for publishing order book deltas
+
+
+def delta_signal(name):
+    """Returns the name of the bus signal for order book deltas of a given channel"""
+    return name + DELTA_SUFFIX
+
+
+# ==========================================================================================
+#   Price levels
+# ==========================================================================================
+
+class PriceLevels(object):
+    """One side of an order book (bids or asks) kept sorted by price.
+
+    Price levels are stored in a dictionary { PRICE : AMOUNT } for O(1) lookups and updates
+    of existing levels, and the prices are additionally kept in a sorted list.
+    Adding or removing a price level locates its position with a binary search (O(log n)),
+    so the side never has to be re-sorted. The best price is always at one of the ends
+    of the sorted list which makes best bid/ask O(1) and top-N iteration a simple slice.
+
+    The class supports the read-only part of the dictionary interface (len, in, [],
+    get, keys, values, items) so the existing consumers of the order book keep working.
+    The keys, values and items are always returned in the order of the price from low to high.
+    """
+    __slots__ = ('_prices', '_levels')
+
+    def __init__(self, levels=None):
+        """Creates a new side of the order book
+        :param levels:  an optional iterable of (price, amount) pairs
+        """
+        self._levels = {}
+        self._prices = []
+        if levels:
+            for price, amount in levels:
+                self._levels[price] = amount
+            self._prices = sorted(self._levels)
+
+    def __len__(self):
+        return len(self._prices)
+
+    def __contains__(self, price):
+        return price in self._levels
+
+    def __getitem__(self, price):
+        return self._levels[price]
+
+    def __setitem__(self, price, amount):
+        self.set(price, amount)
+
+    def __iter__(self):
+        return iter(self._prices)
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, self.items())
+
+    def get(self, price, default=None):
+        """Get the amount at a given price level or default if there is no such level"""
+        return self._levels.get(price, default)
+
+    def set(self, price, amount):
+        """Add a new price level or update the amount of the existing one
+        :param price:   price level (float)
+        :param amount:  amount at the price level (float)
+        """
+        if price not in self._levels:
+            insort(self._prices, price)
+        self._levels[price] = amount
+
+    def remove(self, price):
+        """Remove a price level
+        :param price:   price level (float)
+        :return: True if the price level existed and was removed, False otherwise
+        """
+        if self._levels.pop(price, None) is None:
+            return False
+        del self._prices[bisect_left(self._prices, price)]
+        return True
+
+    def pop(self, price, default=None):
+        """Remove a price level and return its amount or default if there is no such level"""
+        amount = self._levels.get(price, default)
+        self.remove(price)
+        return amount
+
+    def apply(self, changes):
+        """Apply a list of changed price levels
+        :param changes:  a list of (price, amount) pairs, where the amount 0 removes the price level
+        """
+        for price, amount in changes:
+            if amount == 0:
+                self.remove(price)
+            else:
+                self.set(price, amount)
+
+    def clear(self):
+        """Remove all price levels"""
+        self._levels.clear()
+        self._prices.clear()
+
+    def keys(self):
+        """Prices from low to high"""
+        return list(self._prices)
+
+    def values(self):
+        """Amounts ordered by the price from low to high"""
+        return list(map(self._levels.__getitem__, self._prices))
+
+    def items(self):
+        """(price, amount) pairs ordered by the price from low to high"""
+        return list(zip(self._prices, map(self._levels.__getitem__, self._prices)))
+
+    def lowest(self):
+        """The (price, amount) pair with the lowest price or None if there are no price levels"""
+        if not self._prices:
+            return None
+        price = self._prices[0]
+        return price, self._levels[price]
+
+    def highest(self):
+        """The (price, amount) pair with the highest price or None if there are no price levels"""
+        if not self._prices:
+            return None
+        price = self._prices[-1]
+        return price, self._levels[price]
+
+    def top(self, n, descending=False):
+        """Returns up to n price levels starting from the lowest (or the highest) price
+        :param n:           the number of levels
+        :param descending:  start from the highest price if True
+        :return: a list of (price, amount) pairs
+        """
+        prices = self._prices[:-n-1:-1] if descending else self._prices[:n]
+        return list(zip(prices, map(self._levels.__getitem__, prices)))
+
+    def ordered(self):
+        """Returns the price levels as an OrderedDict ordered by the price from low to high"""
+        return OrderedDict(zip(self._prices, map(self._levels.__getitem__, self._prices)))
+
+
+# ==========================================================================================
+#   Order table
+# ==========================================================================================
+
+class OrderTable(object):
+    """The orders of a raw (order-level) book in a compact order-id-indexed structure.
+
+    The orders are kept in preallocated NumPy columns (id, price, amount and arrival sequence)
+    with a dictionary { ORDER_ID : slot } for O(1) updates. A removed order is replaced by the last one,
+    so the orders always take the first len(table) slots and removing is O(1) as well.
+    The amounts are signed as sent by the exchanges: positive for bids and negative for asks.
+
+    A raw book has many more entries than price levels and most of its updates change a single order,
+    so the price levels are not maintained along with the orders. They are aggregated on demand,
+    either for a single price (level) or for the whole book (aggregate).
+    """
+
+    def __init__(self, capacity=256):
+        """Creates an empty table
+        :param capacity:  the initial number of orders, the table grows as needed
+        """
+        capacity = max(capacity, 1)
+        self._slots = {}
+        self._id = np.zeros(capacity, dtype=np.int64)
+        self._price = np.zeros(capacity, dtype=np.float64)
+        self._amount = np.zeros(capacity, dtype=np.float64)
+        self._seq = np.zeros(capacity, dtype=np.int64)
+        self._next_seq = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, order_id):
+        return order_id in self._slots
+
+    def get(self, order_id):
+        """Returns the (price, amount) of an order or None if there is no such order"""
+        slot = self._slots.get(order_id)
+        if slot is None:
+            return None
+        return float(self._price[slot]), float(self._amount[slot])
+
+    def set(self, order_id, price, amount):
+        """Adds a new order or updates the existing one, which keeps its place in the order of arrival
+        :param order_id:  order id (int)
+        :param price:     order price (float)
+        :param amount:    order amount, negative for asks (float)
+        :return: the previous (price, amount) of the order or None if the order is new
+        """
+        slot = self._slots.get(order_id)
+        if slot is None:
+            slot = self._slots[order_id] = len(self._slots)
+            if slot == len(self._id):
+                self._grow()
+            self._id[slot] = order_id
+            self._seq[slot] = self._next_seq
+            self._next_seq += 1
+            previous = None
+        else:
+            previous = float(self._price[slot]), float(self._amount[slot])
+        self._price[slot] = price
+        self._amount[slot] = amount
+        return previous
+
+    def remove(self, order_id):
+        """Removes an order
+        :return: the (price, amount) of the removed order or None if there was no such order
+        """
+        slot = self._slots.pop(order_id, None)
+        if slot is None:
+            return None
+        removed = float(self._price[slot]), float(self._amount[slot])
+        last = len(self._slots)
+        if slot != last:
+            # move the last order to the freed slot
+            for column in (self._id, self._price, self._amount, self._seq):
+                column[slot] = column[last]
+            self._slots[int(self._id[slot])] = slot
+        return removed
+
+    def clear(self):
+        """Removes all orders"""
+        self._slots = {}
+
+    def level(self, price, bid):
+        """Aggregates the orders of a single price level
+        :param price:  price level (float)
+        :param bid:    True for the bids, False for the asks
+        :return: the total amount at the price level, positive for both sides, 0 if there are no orders
+        """
+        n = len(self._slots)
+        amounts = self._amount[:n]
+        orders = (self._price[:n] == price) & ((amounts > 0) if bid else (amounts < 0))
+        if not orders.any():
+            return 0.0
+        return abs(float(amounts[orders].sum()))
+
+    def aggregate(self):
+        """Aggregates all orders to price levels
+        :return: (bids, asks) as PriceLevels with positive amounts
+        """
+        n = len(self._slots)
+        prices, amounts = self._price[:n], self._amount[:n]
+        bids = amounts > 0
+        return self._levels(prices[bids], amounts[bids]), self._levels(prices[~bids], -amounts[~bids])
+
+    def orders(self, bid):
+        """Returns the orders of a side from the best price, the orders of the same price in the order of arrival
+        :param bid:  True for the bids, False for the asks
+        :return: (ids, prices, amounts) arrays
+        """
+        n = len(self._slots)
+        amounts = self._amount[:n]
+        side = np.flatnonzero((amounts > 0) if bid else (amounts < 0))
+        prices = self._price[side]
+        side = side[np.lexsort((self._seq[side], -prices if bid else prices))]
+        return self._id[side], self._price[side], self._amount[side]
+
+    @staticmethod
+    def _levels(prices, amounts):
+        levels, inverse = np.unique(prices, return_inverse=True)
+        totals = np.bincount(inverse.ravel(), weights=amounts, minlength=len(levels))
+        return PriceLevels(zip(levels.tolist(), totals.tolist()))
+
+    def _grow(self):
+        columns = (self._id, self._price, self._amount, self._seq)
+        self._id, self._price, self._amount, self._seq = (np.concatenate((c, np.zeros_like(c))) for c in columns)
+
+
+# ==========================================================================================
+#   Sorted order book
+# ==========================================================================================
+
+class SortedOrderBook(ChannelData):
+    """Base class for the exchange specific order book channels.
+    Keeps bids and asks as sorted PriceLevels, so the book never has to be sorted again
+    when publishing it or taking a snapshot. Subclasses only have to translate
+    exchange specific updates to the changes of price levels using _set_bid and _set_ask,
+    and call _publish once the update is applied.
+
+    The book is published in two modes, each on its own bus signal:
+      - full:   the whole book is sent on every update on the channel signal (name)
+                in the form {'bids': OrderedDict, 'asks': OrderedDict}
+      - delta:  only the levels changed by the update are sent on the delta signal (delta_signal(name))
+                in the form ('delta', {'bids': [(price, amount), ...], 'asks': [(price, amount), ...]})
+                where the amount 0 means that the price level was removed. The changes are a BookDelta,
+                which also carries the metadata of the last message applied (see ChannelData.stamp).
+                A complete book is sent as ('snapshot', {'bids': OrderedDict, 'asks': OrderedDict})
+                when the book is (re)initialized.
+    A mode is only published if there are listeners for it.
+
+    Changing a price level begins an update of the book (see ChannelData) which is ended by publishing it,
+    so the snapshots are never taken half way through an update. The full book published to the listeners
+    is also kept as the snapshot of its version.
+    """
+    SENDER = None    # the sender used for bus signals, defined by the subclass
+
+    def __init__(self, name):
+        """Initialize an empty order book
+        :param name:   channel name
+        """
+        super(SortedOrderBook, self).__init__()
+        self.name = name
+        self.delta_name = delta_signal(name)
+        self.bids = PriceLevels()
+        self.asks = PriceLevels()
+        self._bid_changes = {}
+        self._ask_changes = {}
+
+    def best_bid(self):
+        """Returns the (price, amount) of the highest bid or None if there are no bids"""
+        return self.bids.highest()
+
+    def best_ask(self):
+        """Returns the (price, amount) of the lowest ask or None if there are no asks"""
+        return self.asks.lowest()
+
+    def top_bids(self, n):
+        """Returns up to n best bids as (price, amount) pairs starting from the highest price"""
+        return self.bids.top(n, descending=True)
+
+    def top_asks(self, n):
+        """Returns up to n best asks as (price, amount) pairs starting from the lowest price"""
+        return self.asks.top(n)
+
+    def _take_snapshot(self):
+        """Get the latest snapshot of the order book"""
+        bids, asks = self._sort_book()
+        return {'bids': bids, 'asks': asks}
+
+    def _sort_book(self):
+        """Create two ordered dictionaries, one for bids and the other for asks.
+        The price levels are already sorted so this is a linear copy.
+        :return: (OrderedDict, OrderedDict)
+        """
+        return self.bids.ordered(), self.asks.ordered()
+
+    def _set_bid(self, price, amount):
+        """Set the amount of a bid price level and record the change (amount 0 removes the level)"""
+        self._begin_update()
+        if amount == 0:
+            if self.bids.remove(price):
+                self._bid_changes[price] = 0.0
+        else:
+            self.bids.set(price, amount)
+            self._bid_changes[price] = amount
+
+    def _set_ask(self, price, amount):
+        """Set the amount of an ask price level and record the change (amount 0 removes the level)"""
+        self._begin_update()
+        if amount == 0:
+            if self.asks.remove(price):
+                self._ask_changes[price] = 0.0
+        else:
+            self.asks.set(price, amount)
+            self._ask_changes[price] = amount
+
+    def _take_delta(self):
+        """Returns the price levels changed since the last call and starts recording anew
+        :return: BookDelta {'bids': [(price, amount), ...], 'asks': [(price, amount), ...]} or None if nothing changed
+        """
+        if not self._bid_changes and not self._ask_changes:
+            return None
+        delta = BookDelta(list(self._bid_changes.items()), list(self._ask_changes.items()),
+                          self.timestamp, self.received, self.sequence)
+        self._bid_changes = {}
+        self._ask_changes = {}
+        return delta
+
+    def _publish_snapshot(self):
+        """Sends the complete book to listeners of both modes.
+        Used when the book is (re)initialized.
+        """
+        self._bid_changes = {}
+        self._ask_changes = {}
+        bids, asks = self._sort_book()
+        self._commit({'bids': bids, 'asks': asks})
+        bus.publish(self.delta_name, self.SENDER, ('snapshot', {'bids': bids, 'asks': asks}))
+        bus.publish(self.name, self.SENDER, {'bids': bids, 'asks': asks})
+
+    def _publish(self):
+        """Sends the changes of the book to delta listeners and the updated book to full book listeners.
+        Ends the update of the book, the full book is also kept as its snapshot.
+        """
+        delta = self._take_delta()
+        if delta is None:
+            if self.version & 1:
+                self._end_update()
+            return
+        if bus.has_subscribers(self.name, self.SENDER):
+            bids, asks = self._sort_book()
+            book = {'bids': bids, 'asks': asks}
+            self._commit(book)
+        else:
+            book = None
+            self._end_update()
+        if bus.has_subscribers(self.delta_name, self.SENDER):
+            bus.publish(self.delta_name, self.SENDER, ('delta', delta))
+        if book is not None:
+            bus.publish(self.name, self.SENDER, book)
+
+
+# ==========================================================================================
+#   Local order book
+# ==========================================================================================
+
+class LocalOrderBook(object):
+    """Listener side order book that is maintained from the messages published in the delta mode.
+    A listener feeds every received message to apply and reads the book from bids and asks,
+    which are sorted PriceLevels, so applying a delta only touches the changed price levels.
+    """
+
+    def __init__(self):
+        self.bids = PriceLevels()
+        self.asks = PriceLevels()
+
+    def __len__(self):
+        return len(self.bids) + len(self.asks)
+
+    def apply(self, data):
+        """Apply a message received from the order book channel
+        :param data:  ('snapshot', {'bids': OrderedDict, 'asks': OrderedDict}) or
+                      ('delta', {'bids': [(price, amount), ...], 'asks': [(price, amount), ...]})
+        :return: True if the message was recognized and applied
+        """
+        if not data:
+            return False
+        if data[0] == 'snapshot':
+            self.bids = PriceLevels(data[1]['bids'].items())
+            self.asks = PriceLevels(data[1]['asks'].items())
+        elif data[0] == 'delta':
+            self.bids.apply(data[1]['bids'])
+            self.asks.apply(data[1]['asks'])
+        else:
+            return False
+        return True
+
+    def clear(self):
+        """Remove all price levels"""
+        self.bids.clear()
+        self.asks.clear()
+
+    def snapshot(self):
+        """Returns the book in the same form as the full book, {'bids': bids, 'asks': asks}.
+        The price levels are returned as they are (not copied) and support the same
+        read interface as the OrderedDict objects of the full book.
+        """
+        return {'bids': self.bids, 'asks': self.asks}
@@ -0,0 +1,359 @@
+import os
+import threading
+import time
+from functools import partial
+
+from exchanges.WS.binance import BinanceWSClient, BinanceOrderBook, BinancePartialOrderBook, BinanceTicker, \
+    BinanceMiniTicker, BinanceAllTickers, BinanceAllMiniTickers, BinanceTrades, BinanceAggTrades, BinanceCandles, \
+    COMBINED, REST, _PARTIAL_DEPTH
+from exchanges.WS.bitfinex import BitfinexWSClient
+from exchanges.WS.capture import CaptureReader
+from exchanges.WS.decoder import BinanceNumericParser
+from exchanges.WS.events import bus, DispatcherKeyError
+from exchanges.WS.orderbook import delta_signal
+from exchanges.WS import conflation
+from exchanges.exception import ExchangeException
+
+
+REALTIME = 1.0      # the speed of a replay in real time, the speed N replays N times faster
+FASTEST  = None     # the speed of a replay as fast as possible
+
+CAPTURE_DIRECTORY = 'captures'  # the default directory of the replayed captures (see start_capture of the clients)
+
+
+# ==========================================================================================
+#   Replay of a capture
+# ==========================================================================================
+
+class Replayer(object):
+    """Delivers the frames of a capture in the order they were received, on a thread of its own.
+
+    The frames are paced by their receive times: in real time they are delivered with the gaps
+    they were received with, at the speed N the gaps are N times shorter and at FASTEST there
+    is no waiting at all. The frames are delivered one after another by a single thread,
+    so the channels go through the same sequence of states at any speed and in every replay,
+    only the time the listeners get between the updates differs.
+    """
+
+    def __init__(self, reader, deliver, speed=REALTIME, start=None, end=None, logger=None):
+        """Creates a replay (started by start)
+        :param reader:   CaptureReader of the capture
+        :param deliver:  a callback receiving every frame as (received, source, frame)
+        :param speed:    REALTIME, the multiple of the real-time speed or FASTEST
+        :param start:    the receive time in ms to start from, the beginning of the capture by default
+        :param end:      the receive time in ms to stop at, the end of the capture by default
+        :param logger:   the logger of the frames that failed to be delivered
+        """
+        self.reader = reader
+        self.deliver = deliver
+        self.speed = speed
+        self.start_time = start
+        self.end_time = end
+        self.frames = 0             # the number of delivered frames
+        self.errors = 0             # the number of frames whose delivery raised an exception
+        self.position = None        # the receive time of the last delivered frame in ms
+        self.finished = threading.Event()   # set when the replay delivered all frames or was stopped
+        self._logger = logger
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts the replay thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='replay')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stops the replay and waits for the thread to terminate"""
+        self._stopping.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def wait(self, timeout=None):
+        """Waits until the replay is finished
+        :return: True if the replay is finished
+        """
+        return self.finished.wait(timeout)
+
+    def _run(self):
+        origin = None       # (received, perf_counter) of the first frame
+        try:
+            for received, source, frame in self.reader.frames(self.start_time, self.end_time):
+                if self.speed:
+                    if origin is None:
+                        origin = received, time.perf_counter()
+                    delay = origin[1] + (received - origin[0]) / (1000 * self.speed) - time.perf_counter()
+                    if delay > 0 and self._stopping.wait(delay):
+                        break
+                if self._stopping.is_set():
+                    break
+                try:
+                    self.deliver(received, source, frame)
+                except Exception as e:
+                    self.errors += 1
+                    if self._logger:
+                        self._logger.error('Replay of a frame from {} failed: {}'.format(source, e))
+                self.frames += 1
+                self.position = received
+        finally:
+            self.finished.set()
+
+
+# ==========================================================================================
+#   Binance
+# ==========================================================================================
+
+class BinanceReplayOrderBook(BinanceOrderBook):
+    """Binance diff depth book synced with the depth snapshots of a capture.
+
+    A gap in the diff events does not load a new snapshot in the background: the events are buffered
+    until the book is synced by the next snapshot of the capture, which is the one the recording
+    client loaded to resync its own book.
+    """
+
+    def sync(self, snapshot):
+        """Applies a depth snapshot of the capture if the book is not synced"""
+        with self._lock:
+            if not self.synced and self._set_snapshot(snapshot):
+                self._publish_snapshot()
+
+    def _resync(self):
+        if self.synced:
+            self.resyncs += 1
+        self.synced = False
+
+
+class BinanceReplayClient(BinanceWSClient):
+    """Replays a capture of the Binance client (see start_capture) through the Binance channels.
+
+    The frames are handled by the same methods as the messages received from the exchange, so the books,
+    trades, candles and tickers are updated by the same code and publish the same events. The channel
+    of every stream of the capture is created with its first frame, so it goes through the same states
+    whenever, and whether at all, it is subscribed: subscribing only adds the listener and returns
+    the current snapshot. The REST responses the channels were initialized with while capturing
+    (depth snapshots, trades and candles) are replayed as well, so no connection to the exchange is needed.
+    The replay starts with connect (see Replayer).
+    """
+
+    def __init__(self, directory=CAPTURE_DIRECTORY, speed=REALTIME, start=None, end=None, prefix='binance',
+                 **kwargs):
+        """Creates Binance replay client
+        :param directory:  the directory of the capture
+        :param speed:      REALTIME, the multiple of the real-time speed or FASTEST
+        :param start:      the receive time in ms to start from, the beginning of the capture by default
+        :param end:        the receive time in ms to stop at, the end of the capture by default
+        :param prefix:     the name prefix of the segment files of the capture
+        :param kwargs:     the parameters of BinanceWSClient (i.e. decoder, numeric)
+        """
+        super(BinanceReplayClient, self).__init__(**kwargs)
+        self.directory = directory
+        self.replayer = Replayer(CaptureReader(directory, prefix), self._replay, speed, start, end, self.logger)
+        self._responses = {}    # (request, symbol, interval) -> the last replayed REST response
+
+    @staticmethod
+    def name():
+        return 'Binance replay'
+
+    @classmethod
+    def exchange(cls):
+        return BinanceWSClient.name()
+
+    def connect(self, info_handler=None):
+        """Registers the info handler and starts the replay
+        :raises ExchangeException if there is no capture directory
+        """
+        if not os.path.isdir(self.directory):
+            raise ExchangeException(self.name(), 'No capture to replay in {}'.format(self.directory),
+                                    logger=self.logger)
+        super(BinanceReplayClient, self).connect(info_handler)
+        self.replayer.start()
+
+    def disconnect(self):
+        """Stops the replay and disconnects the client"""
+        self.replayer.stop()
+        super(BinanceReplayClient, self).disconnect()
+
+    def unsubscribe(self, stream, update_handler=None):
+        """Removes the listener, the channel keeps following the capture"""
+        if update_handler:
+            for signal in (stream, delta_signal(stream)):
+                try:
+                    conflation.disconnect(update_handler, signal=signal, sender='binance')
+                    return
+                except DispatcherKeyError:
+                    pass
+
+    def _subscribe(self, stream):
+        # the frames of the stream come from the capture
+        self._subscriptions[stream] = None
+
+    def _unsubscribe(self, stream):
+        pass
+
+    def _new_order_book(self, stream, symbol):
+        return BinanceReplayOrderBook(stream, loader=partial(self._load_order_book, symbol))
+
+    def _load_order_book(self, symbol):
+        return self._responses.get(('depth', symbol, None))
+
+    def _load_trades(self, symbol):
+        return self._responses.get(('trades', symbol, None)) or []
+
+    def _load_candles(self, symbol, interval):
+        return self._responses.get(('candles', symbol, interval)) or []
+
+    def _replay(self, received, source, frame):
+        """Handles a frame of the capture the way the frame was handled while capturing"""
+        if source == REST:
+            self._replay_response(self._decoder.loads(frame))
+            return
+        stream = BinanceNumericParser.stream(frame) if source == COMBINED else source
+        if stream is not None and stream not in self._subscriptions:
+            self._add_stream(stream)
+        if source == COMBINED:
+            self._on_stream_message(frame)
+        else:
+            self._handle_message(source, frame)
+
+    def _replay_response(self, response):
+        """Keeps a REST response of the capture for the channels created later and syncs the books with it"""
+        symbol = response['symbol']
+        self._responses[(response['request'], symbol, response.get('interval'))] = response['data']
+        if response['request'] == 'depth':
+            for stream, data in list(self._data.items()):
+                if type(data) is BinanceReplayOrderBook and stream.split('@')[0] == symbol:
+                    data.sync(response['data'])
+
+    def _add_stream(self, stream):
+        """Creates the channel of a stream of the capture, as it was created by the subscription of the stream.
+        The user data streams are not replayed.
+        """
+        symbol = stream.split('@')[0]
+        if stream == '!ticker@arr':
+            data = BinanceAllTickers(stream)
+        elif stream == '!miniTicker@arr':
+            data = BinanceAllMiniTickers(stream)
+        elif stream.endswith('@ticker'):
+            data = BinanceTicker(stream)
+        elif stream.endswith('@miniTicker'):
+            data = BinanceMiniTicker(stream)
+        elif _PARTIAL_DEPTH.search(stream):
+            data = BinancePartialOrderBook(stream)
+        elif '@depth' in stream:
+            data = self._new_order_book(stream, symbol)
+            snapshot = self._load_order_book(symbol)
+            if snapshot:
+                data.sync(snapshot)
+        elif stream.endswith('@trade'):
+            data = BinanceTrades(stream, self._load_trades(symbol))
+        elif stream.endswith('@aggTrade'):
+            data = BinanceAggTrades(stream, self._load_trades(symbol))
+        elif '@kline_' in stream:
+            data = BinanceCandles(stream, self._load_candles(symbol, stream.split('_')[-1]))
+        else:
+            return
+        self._data[stream] = data
+        self._subscriptions[stream] = None
+
+
+# ==========================================================================================
+#   Bitfinex
+# ==========================================================================================
+
+class BitfinexReplayConnection(object):
+    """A connection of the Bitfinex client while capturing, whose messages come from the capture.
+    The connection keeps its flags and sequence numbers as the original one, and sends nothing.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.connected = True
+        self.flags = 0              # set by the conf event of the capture
+        self.sequence = None
+        self.sequence_gaps = 0
+        self.retired = False
+
+    def send(self, payload):
+        pass
+
+    def reconnect(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class BitfinexReplayClient(BitfinexWSClient):
+    """Replays a capture of the Bitfinex client (see start_capture) through the Bitfinex channels.
+
+    The frames of every connection of the capture are handled by the same methods as the messages
+    received from the exchange, on a replay connection of the same name, so the channels are created
+    by the subscription events and snapshots of the capture and updated by the same code, including
+    the checksums and the sequence numbers. Subscribing only adds the listener and returns the current
+    snapshot of the channel, if the capture already got to it. The replay starts with connect (see Replayer).
+    """
+
+    def __init__(self, directory=CAPTURE_DIRECTORY, speed=REALTIME, start=None, end=None, prefix='bitfinex',
+                 **kwargs):
+        """Creates Bitfinex replay client
+        :param directory:  the directory of the capture
+        :param speed:      REALTIME, the multiple of the real-time speed or FASTEST
+        :param start:      the receive time in ms to start from, the beginning of the capture by default
+        :param end:        the receive time in ms to stop at, the end of the capture by default
+        :param prefix:     the name prefix of the segment files of the capture
+        :param kwargs:     the parameters of BitfinexWSClient (i.e. decoder)
+        """
+        super(BitfinexReplayClient, self).__init__(**kwargs)
+        self.directory = directory
+        self.replayer = Replayer(CaptureReader(directory, prefix), self._replay, speed, start, end, self.logger)
+        self._replayed = {}     # connection name -> BitfinexReplayConnection
+
+    @staticmethod
+    def name():
+        return 'Bitfinex replay'
+
+    @classmethod
+    def exchange(cls):
+        return BitfinexWSClient.name()
+
+    @property
+    def sequence_gaps(self):
+        return sum(connection.sequence_gaps for connection in list(self._replayed.values()))
+
+    def connect(self, info_handler=None):
+        """Registers the info handler and starts the replay
+        :raises ExchangeException if there is no capture directory
+        """
+        if not os.path.isdir(self.directory):
+            raise ExchangeException(self.name(), 'No capture to replay in {}'.format(self.directory),
+                                    logger=self.logger)
+        self._info_handler = info_handler
+        if info_handler:
+            bus.subscribe(info_handler, signal='info', sender='bitfinex')
+        self.replayer.start()
+
+    def disconnect(self):
+        """Stops the replay and disconnects the client"""
+        self.replayer.stop()
+        super(BitfinexReplayClient, self).disconnect()
+
+    def _handle_subscription(self, channel_name, payload, channel_type, symbol, update_handler=None, delta=False,
+                             rate=None, policy=conflation.KeepLatest):
+        if update_handler:
+            signal = delta_signal(channel_name) if delta else channel_name
+            conflation.connect(update_handler, signal=signal, sender='bitfinex', rate=rate, policy=policy)
+        self._payloads[channel_name] = payload
+        key = self._get_channel_id(channel_name)
+        if key and key in self._data:
+            if delta:
+                return 'snapshot', self._data[key].snapshot()
+            return self._data[key].snapshot()
+        return None
+
+    def _replay(self, received, source, frame):
+        """Handles a frame of the capture on the replay connection of the connection that received it"""
+        connection = self._replayed.get(source)
+        if connection is None:
+            connection = self._replayed[source] = BitfinexReplayConnection(source)
+        self._on_message(connection, frame)
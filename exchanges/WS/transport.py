@@ -0,0 +1,391 @@
+import asyncio
+import random
+import ssl
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+from exchanges.exception import WSException
+
+
+THREAD_ENGINE  = 'thread'     # websocket-client run_forever loop in a dedicated thread per connection
+ASYNCIO_ENGINE = 'asyncio'    # connections run as coroutines on a single shared event loop thread
+
+PING_INTERVAL       = 20          # seconds between websocket pings
+RECONNECT_MIN_DELAY = 1           # the first reconnect delay in seconds
+RECONNECT_MAX_DELAY = 30          # the maximum reconnect delay in seconds
+MAX_MESSAGE_SIZE    = 2 ** 24     # all tickers messages of Binance are larger than the websockets default
+DEDUP_WINDOW        = 1000        # the number of recent messages remembered by a Deduplicator
+
+
+class Reconnector(object):
+    """Supervises the reopening of a dropped connection.
+
+    The delays before the reconnect attempts grow exponentially from min_delay up to max_delay.
+    Every delay is jittered to a random value between its half and its full length,
+    so the connections dropped at once (i.e. by an exchange restart) do not reconnect in lockstep.
+    The delays start over once the connection opens again.
+
+    The reconnects are measured as well: their number and the time from the drop
+    to the reopening of the connection (the reconnect latency), see metrics.
+    The connection calls dropped when it drops, waits for delay seconds before each attempt
+    and calls opened when it opens, after which reopened tells if it was a reconnect.
+    """
+    def __init__(self, min_delay=RECONNECT_MIN_DELAY, max_delay=RECONNECT_MAX_DELAY):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.reconnects = 0         # the number of reconnects
+        self.reopened = False       # True if the last opening was a reconnect
+        self.last_latency = None    # seconds from the last drop to the reopening
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+        self._opens = 0
+        self._attempt = 0
+        self._dropped = None        # time of the drop while the connection is down
+
+    def dropped(self):
+        """Records a drop of the connection (or a failed attempt to open it)"""
+        if self._dropped is None:
+            self._dropped = time.monotonic()
+
+    def delay(self):
+        """Returns the jittered delay in seconds before the next reconnect attempt"""
+        delay = min(self.max_delay, self.min_delay * 2 ** self._attempt)
+        self._attempt += 1
+        return random.uniform(delay / 2, delay)
+
+    def opened(self):
+        """Records the opening of the connection
+        :return: the reconnect latency in seconds or None if this was the first opening
+        """
+        self.reopened = self._opens > 0
+        self._opens += 1
+        self._attempt = 0
+        dropped, self._dropped = self._dropped, None
+        if not self.reopened:
+            return None
+        self.reconnects += 1
+        self.last_latency = time.monotonic() - dropped if dropped is not None else 0.0
+        self.max_latency = max(self.max_latency, self.last_latency)
+        self.total_latency += self.last_latency
+        return self.last_latency
+
+    def metrics(self):
+        """Returns the reconnect metrics
+        :return: {'reconnects': count, 'last': seconds, 'mean': seconds, 'max': seconds, 'down': bool}
+        """
+        return {'reconnects': self.reconnects,
+                'last': self.last_latency,
+                'mean': self.total_latency / self.reconnects if self.reconnects else None,
+                'max': self.max_latency,
+                'down': self._dropped is not None}
+
+
+class Deduplicator(object):
+    """Passes the first copy of the messages of a channel received redundantly over several connections.
+
+    Every message is identified by an exchange sequence identifier (i.e. a trade id or the last update id
+    of a depth event), which grows with every message. The first copy of a message is passed and
+    the copies arriving later from the other connections are dropped. Messages older than the last
+    passed message are dropped as well, since they were either matched already, or have fallen out
+    of the window of the remembered messages.
+
+    The arrivals are measured: for every message received on more connections, the connection
+    that delivered it first wins, and the time by which it was ahead is its margin (see metrics).
+    The messages delivered by a single connection only are counted as unmatched.
+    """
+    def __init__(self, window=DEDUP_WINDOW):
+        self.window = window
+        self.last = None            # sequence identifier of the last passed message
+        self.wins = {}              # connection -> number of matched messages it delivered first
+        self.unmatched = 0          # the number of messages delivered by one connection only
+        self._margins = {}          # connection -> [total, max] seconds ahead of the other connection
+        self._seen = OrderedDict()  # message id -> [connection, arrival time, matched]
+        self._lock = threading.Lock()
+
+    def accept(self, connection, sequence, key=None):
+        """Checks the arrival of a message
+        :param connection:  the name of the connection that received the message
+        :param sequence:    the sequence identifier of the message
+        :param key:         the identity of the message, if the sequence identifier is not unique
+                            (i.e. a timestamp), otherwise the sequence identifier is used
+        :return: True for the first copy of the message, False for the later copies
+        """
+        now = time.monotonic()
+        key = sequence if key is None else key
+        with self._lock:
+            seen = self._seen.get(key)
+            if seen is not None:
+                winner, arrival, matched = seen
+                if not matched and winner != connection:
+                    seen[2] = True
+                    margin = now - arrival
+                    self.wins[winner] = self.wins.get(winner, 0) + 1
+                    total, longest = self._margins.get(winner, (0.0, 0.0))
+                    self._margins[winner] = [total + margin, max(longest, margin)]
+                return False
+            if self.last is not None and sequence < self.last:
+                return False
+            self.last = sequence
+            self._seen[key] = [connection, now, False]
+            if len(self._seen) > self.window:
+                _, (_, _, matched) = self._seen.popitem(last=False)
+                if not matched:
+                    self.unmatched += 1
+            return True
+
+    def metrics(self):
+        """Returns the arrival metrics
+        :return: {'wins': {connection: count}, 'mean': {connection: ms}, 'max': {connection: ms}, 'unmatched': count}
+                 where mean and max are the margins by which the connection was first
+        """
+        with self._lock:
+            return {'wins': dict(self.wins),
+                    'mean': {c: total * 1000 / self.wins[c] for c, (total, _) in self._margins.items()},
+                    'max': {c: longest * 1000 for c, (_, longest) in self._margins.items()},
+                    'unmatched': self.unmatched}
+
+
+class RateMeter(object):
+    """Measures the rate of the messages of a stream.
+
+    The stream handler counts every message (count is a plain attribute, so counting costs
+    a single increment on the receiving thread). The rate is measured over periods:
+    metrics returns the mean rate since the start of the current period,
+    and with reset a new period starts, so periodic calls give the recent rate.
+    """
+    def __init__(self):
+        self.count = 0              # the number of messages
+        self.started = time.monotonic()
+        self._period_start = self.started
+        self._period_count = 0
+
+    def metrics(self, reset=False):
+        """Returns the message metrics
+        :param reset:  start a new measuring period
+        :return: {'messages': count, 'rate': messages per second in the period, 'mean': messages per second overall}
+        """
+        now = time.monotonic()
+        count = self.count
+        period = now - self._period_start
+        metrics = {'messages': count,
+                   'rate': (count - self._period_count) / period if period > 0 else 0.0,
+                   'mean': count / (now - self.started) if now > self.started else 0.0}
+        if reset:
+            self._period_start = now
+            self._period_count = count
+        return metrics
+
+
+class AsyncioEngine(object):
+    """A websocket engine that runs all connections as coroutines on a single event loop thread.
+
+    Connecting, reading, pinging and reconnecting of every connection is a coroutine,
+    so any number of connections is served by one OS thread.
+    The engine is shared by all clients (see instance) and is started on the first use.
+
+    Thread safety:
+      - Connections are opened, written to and closed from any thread.
+        The calls are only scheduled on the event loop and never block the caller.
+      - Connection callbacks are executed on the event loop thread, the same way websocket-client
+        calls them on the connection thread. Thus, the event bus and the callbacks of its listeners
+        (i.e. the gui posting Qt events) run on the event loop thread and have to return quickly.
+        Work that has to run in another thread should be posted to it (e.g. using QApplication.postEvent).
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        """Creates an engine (use instance to get the shared engine)
+        :raises WSException if the websockets package is not available
+        """
+        if websockets is None:
+            raise WSException('The asyncio engine requires the websockets package (pip3 install websockets)')
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name='ws-asyncio-engine')
+        self.thread.daemon = True
+        self._started = threading.Event()
+
+    @classmethod
+    def instance(cls):
+        """Returns the shared engine, starting it if necessary"""
+        with cls._instance_lock:
+            if cls._instance is None or not cls._instance.is_running():
+                cls._instance = cls()
+                cls._instance.start()
+            return cls._instance
+
+    def start(self):
+        """Starts the event loop thread and waits until the loop is running"""
+        self.thread.start()
+        self._started.wait()
+
+    def stop(self):
+        """Stops the event loop. Open connections are abandoned."""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=3)
+
+    def is_running(self):
+        return self.thread.is_alive()
+
+    def submit(self, coroutine):
+        """Schedules a coroutine on the event loop from any thread
+        :return: concurrent.futures.Future of the coroutine result
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def call_soon(self, callback, *args):
+        """Schedules a callback on the event loop from any thread"""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def open(self, url, on_message, on_open=None, on_close=None, on_error=None, **kwargs):
+        """Opens a new connection
+        :param url:         websocket url
+        :param on_message:  callback receiving a message:    on_message(message)
+        :param on_open:     callback called when the connection is (re)opened:  on_open()
+        :param on_close:    callback called when the connection is closed:      on_close()
+        :param on_error:    callback receiving an error:     on_error(error)
+        :param kwargs:      additional AsyncioConnection parameters
+        :return: AsyncioConnection
+        """
+        return AsyncioConnection(self, url, on_message, on_open, on_close, on_error, **kwargs)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._started.set)
+        self.loop.run_forever()
+
+
+class AsyncioConnection(object):
+    """A websocket connection served by the AsyncioEngine.
+
+    It is a drop-in replacement for the websocket-client WebSocketApp as used by the clients
+    (send and close), with the callbacks called in the same way as websocket-client calls
+    bound methods. The connection is opened immediately and, unless closed by the user,
+    it is reopened with a jittered exponential backoff whenever it drops (see Reconnector).
+    Every reopening calls on_open, so the clients can resubscribe their channels.
+    """
+    def __init__(self, engine, url, on_message, on_open=None, on_close=None, on_error=None,
+                 verify=True, ping_interval=PING_INTERVAL, reconnect=True, logger=None, reconnector=None):
+        """Creates and opens a new connection
+        :param engine:         AsyncioEngine
+        :param url:            websocket url
+        :param verify:         verify the ssl certificate of the server
+        :param ping_interval:  seconds between websocket pings (None disables pings)
+        :param reconnect:      reopen the connection when it drops
+        :param logger:         a logger for errors raised by the callbacks
+        :param reconnector:    Reconnector supervising the connection (a new one by default)
+        """
+        self.url = url
+        self.on_message = on_message
+        self.on_open = on_open
+        self.on_close = on_close
+        self.on_error = on_error
+        self.ping_interval = ping_interval
+        self.reconnect_enabled = reconnect
+        self.connected = False
+        self.connections = 0            # the number of times the connection was opened
+        self.reconnector = reconnector or Reconnector()
+        self._engine = engine
+        self._logger = logger
+        self._ws = None
+        self._task = None
+        self._closing = False
+        self._opened = threading.Event()
+        self._ssl = None
+        if url.startswith('wss') and not verify:
+            self._ssl = ssl.create_default_context()
+            self._ssl.check_hostname = False
+            self._ssl.verify_mode = ssl.CERT_NONE
+        self._future = engine.submit(self._run())
+
+    def wait_connected(self, timeout=None):
+        """Blocks until the connection is open
+        :return: True if the connection is open, False on timeout
+        """
+        return self._opened.wait(timeout)
+
+    def send(self, message):
+        """Sends a message from any thread"""
+        self._engine.submit(self._send(message))
+
+    def close(self):
+        """Closes the connection from any thread. It will not be reopened."""
+        self._closing = True
+        self._engine.submit(self._close())
+
+    def reconnect(self):
+        """Drops the current socket, so the connection is reopened"""
+        self._engine.submit(self._drop())
+
+    # Coroutines
+    # ---------------------------------------------------------------------------------
+
+    async def _run(self):
+        self._task = asyncio.current_task()
+        while not self._closing:
+            try:
+                async with websockets.connect(self.url, ssl=self._ssl, ping_interval=self.ping_interval,
+                                              max_size=MAX_MESSAGE_SIZE) as ws:
+                    self._ws = ws
+                    self.connected = True
+                    self.connections += 1
+                    self._opened.set()
+                    self.reconnector.opened()
+                    self._callback(self.on_open)
+                    async for message in ws:
+                        self._callback(self.on_message, message)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                self._callback(self.on_error, e)
+            finally:
+                was_connected = self.connected
+                self._ws = None
+                self.connected = False
+                self._opened.clear()
+                if was_connected:
+                    self._callback(self.on_close)
+
+            if self._closing or not self.reconnect_enabled:
+                break
+            self.reconnector.dropped()
+            try:
+                await asyncio.sleep(self.reconnector.delay())
+            except asyncio.CancelledError:
+                break
+
+    async def _send(self, message):
+        if self._ws is None:
+            self._callback(self.on_error, WSException('Sending on a connection that is not open: {}'.format(message)))
+            return
+        try:
+            await self._ws.send(message)
+        except Exception as e:
+            self._callback(self.on_error, e)
+
+    async def _close(self):
+        if self._ws is not None:
+            await self._ws.close()
+        elif self._task is not None:
+            # waiting to reconnect
+            self._task.cancel()
+
+    async def _drop(self):
+        if self._ws is not None:
+            await self._ws.close()
+
+    def _callback(self, callback, *args):
+        """Calls a user callback. The exceptions are logged, so they do not break the connection."""
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception as e:
+            if self._logger:
+                self._logger.exception('Exception in a websocket callback: {}'.format(e))
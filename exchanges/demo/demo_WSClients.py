@@ -50,7 +50,9 @@ class AllTickers:
               'DAY_CH_PERC', 'LAST_PRICE', 'VOLUME', 'HIGH', 'LOW']
     fmt = "{:^15}" * len(header)
     client_name = ''
-    tickers = []
+
+    def __init__(self):
+        self.tickers = {}
 
     def _show_header(self):
         os.system('clear')
@@ -61,19 +63,22 @@ class AllTickers:
 
     def show(self):
         self._show_header()
-        for ticker in self.tickers[:20]:
-            print(self.fmt.format(*ticker))
+        for symbol in sorted(self.tickers)[:20]:
+            print(self.fmt.format(symbol, *self.tickers[symbol]))
 
 
     def handle_updates(self, sender, data):
-        self.tickers = data
+        # only the changed tickers are received
+        symbols, values = data
+        for symbol, ticker in zip(symbols, values.tolist()):
+            self.tickers[symbol] = ticker
         self.show()
 
 
     def test(self, client):
         self.client_name = client.name()
         handle, snapshot = client.subscribe_all_tickers(update_handler=self.handle_updates)
-        if snapshot:
+        if snapshot and len(snapshot[0]):
             self.handle_updates(None, snapshot)
         time.sleep(10)
         client.unsubscribe(handle, update_handler=self.handle_updates)
@@ -1,6 +1,7 @@
 from exchanges.WS.api import WSClientAPI
 from exchanges.WS.binance import BinanceWSClient
 from exchanges.WS.bitfinex import BitfinexWSClient
+from exchanges.WS.replay import BinanceReplayClient, BitfinexReplayClient
 
 
 class ExchangeWSFactory(object):
@@ -21,17 +22,30 @@ class ExchangeWSFactory(object):
 
 
     @staticmethod
-    def create_client(name) -> WSClientAPI:
+    def register(client_class):
+        """Adds a client class that is not a direct implementation of WSClientAPI (i.e. a replay client).
+
+        :param client_class:  a WSClientAPI class, registered by its name()
+        """
+        ExchangeWSFactory.exchanges[client_class.name()] = client_class
+
+    @staticmethod
+    def create_client(name, **kwargs) -> WSClientAPI:
         """Create an exchange handling object.
 
         :param name:      name of the exchange
-        :param key_file:  an file with private API keys
+        :param kwargs:    client specific parameters (i.e. engine='asyncio')
         :return:          an object for handling requested exchange.
         :raises KeyError
 
         WSClientAPI is an abstract class implemented by all websocket-based exchange client classes
         """
         try:
-            return ExchangeWSFactory.exchanges[name]()
+            return ExchangeWSFactory.exchanges[name](**kwargs)
         except KeyError as e:
             raise KeyError('Exchange name not recognized') from e
+
+
+# the clients replaying the captures of the exchange clients (see exchanges.WS.replay)
+ExchangeWSFactory.register(BinanceReplayClient)
+ExchangeWSFactory.register(BitfinexReplayClient)
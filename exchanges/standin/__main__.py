@@ -0,0 +1,53 @@
+"""Runs a stand-in server of an exchange until interrupted, printing its counters periodically:
+    python3 -m exchanges.standin binance --port 9443 --rest-port 9080 --rate max
+"""
+import argparse
+import logging
+import time
+
+from exchanges.standin.server import SATURATION, DEFAULT_RATE
+from exchanges.standin.binance import BinanceStandin
+from exchanges.standin.bitfinex import BitfinexStandin
+
+
+STANDINS = {'binance': BinanceStandin, 'bitfinex': BitfinexStandin}
+
+
+def rate(value):
+    """Parses the rate argument: ticks per second, or 0 / 'max' for SATURATION"""
+    if value in ('0', 'max'):
+        return SATURATION
+    return float(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python3 -m exchanges.standin',
+                                     description='Local stand-in of the websocket and REST api of an exchange')
+    parser.add_argument('exchange', choices=sorted(STANDINS))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0, help='websocket port (default: a free port)')
+    parser.add_argument('--rest-port', type=int, default=0, help='REST port (default: a free port)')
+    parser.add_argument('--rate', type=rate, default=DEFAULT_RATE,
+                        help='ticks per second of every market, 0 or max for saturation (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--interval', type=float, default=5, help='seconds between the printed counters')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s')
+    with STANDINS[args.exchange](host=args.host, port=args.port, rest_port=args.rest_port, rate=args.rate,
+                                 seed=args.seed) as server:
+        print('websocket: {}\nREST:      {}'.format(server.ws_uri, server.rest_uri))
+        frames = 0
+        try:
+            while True:
+                time.sleep(args.interval)
+                stats = server.stats()
+                print('sessions: {:4d}   frames/s: {:10.1f}   ticks: {}'.format(
+                    stats['sessions'], (stats['frames'] - frames) / args.interval, stats['ticks']))
+                frames = stats['frames']
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,471 @@
+import json
+import re
+import uuid
+
+from exchanges.standin.market import interval_ms, now_ms, NEW, FILLED
+from exchanges.standin.server import StandinServer, Session, Feed, compact
+
+
+# the streams of a symbol: <symbol>@depth[<levels>][@100ms], @trade, @aggTrade, @kline_<interval>,
+# @ticker and @miniTicker, the update speeds are ignored, since the messages follow the ticks of the market
+_STREAM = re.compile(r'^([a-z0-9]+)@(depth(\d*)|trade|aggTrade|kline_(\w+)|ticker|miniTicker)(@\d+ms)?$')
+_ALL_TICKERS = {'!ticker@arr', '!miniTicker@arr'}
+
+_INTERVALS = ['1m', '3m', '5m', '15m', '30m', '1h', '2h', '4h', '6h', '8h', '12h', '1d', '3d', '1w', '1M']
+
+# the exchange error codes of the REST api
+INVALID_SYMBOL   = -1121
+UNKNOWN_ORDER    = -2011
+NO_SUCH_ORDER    = -2013
+INVALID_API_KEY  = -2014
+MISSING_PARAM    = -1102
+
+
+def _number(value):
+    """Formats a price or an amount the way Binance does (a string with 8 decimals)"""
+    return format(value, '.8f')
+
+
+def _levels(levels):
+    return [[_number(price), _number(amount)] for price, amount, _ in levels]
+
+
+# ==========================================================================================
+#   Feeds
+# ==========================================================================================
+
+class DepthFeed(Feed):
+    """The diff depth events of a book (<symbol>@depth).
+    The changes of the ticks since the previous event are merged, so every event continues
+    the update ids of the previous one (U == previous u + 1), and the events are in sync
+    with the depth snapshots of the REST api, which carry the update id of the book.
+    """
+    def __init__(self, name, market):
+        super(DepthFeed, self).__init__(name, market)
+        self._first = None          # the first update id of the pending changes
+        self._bids = {}             # price -> amount changed since the previous event
+        self._asks = {}
+        market.watch(self._change)
+
+    def _change(self, change):
+        bid, price, amount, _, _, _ = change
+        if self._first is None:
+            self._first = self.market.update_id
+        (self._bids if bid else self._asks)[price] = amount
+
+    def update(self):
+        if self._first is None:
+            return None
+        market = self.market
+        message = compact({'e': 'depthUpdate', 'E': now_ms(), 's': market.symbol,
+                           'U': self._first, 'u': market.update_id,
+                           'b': [[_number(p), _number(a)] for p, a in self._bids.items()],
+                           'a': [[_number(p), _number(a)] for p, a in self._asks.items()]})
+        self._first = None
+        self._bids = {}
+        self._asks = {}
+        return [message]
+
+    def close(self):
+        self.market.unwatch(self._change)
+
+
+class PartialDepthFeed(Feed):
+    """The top levels of a book (<symbol>@depth<levels>), sent after every tick"""
+    def __init__(self, name, market, levels):
+        super(PartialDepthFeed, self).__init__(name, market)
+        self.levels = levels
+
+    def update(self):
+        market = self.market
+        return [compact({'lastUpdateId': market.update_id,
+                         'bids': _levels(market.top(True, self.levels)),
+                         'asks': _levels(market.top(False, self.levels))})]
+
+
+class TradeFeed(Feed):
+    """The trades of a market (<symbol>@trade) or its aggregate trades (<symbol>@aggTrade)"""
+    def __init__(self, name, market, aggregate=False):
+        super(TradeFeed, self).__init__(name, market)
+        self.aggregate = aggregate
+        self._last = market.trade_id    # the id of the last sent trade
+
+    def update(self):
+        market = self.market
+        new = min(market.trade_id - self._last, len(market.trades))
+        self._last = market.trade_id
+        if new <= 0:
+            return None
+        symbol = market.symbol
+        messages = []
+        for i in range(new, 0, -1):
+            trade_id, timestamp, amount, price = market.trades[-i]
+            if self.aggregate:
+                message = {'e': 'aggTrade', 'E': now_ms(), 's': symbol, 'a': trade_id,
+                           'p': _number(price), 'q': _number(abs(amount)), 'f': trade_id, 'l': trade_id,
+                           'T': timestamp, 'm': amount < 0, 'M': True}
+            else:
+                message = {'e': 'trade', 'E': now_ms(), 's': symbol, 't': trade_id,
+                           'p': _number(price), 'q': _number(abs(amount)), 'b': trade_id * 2, 'a': trade_id * 2 + 1,
+                           'T': timestamp, 'm': amount < 0, 'M': True}
+            messages.append(compact(message))
+        return messages
+
+
+class KlineFeed(Feed):
+    """The current candle of an interval (<symbol>@kline_<interval>), sent after every tick"""
+    def __init__(self, name, market, interval):
+        super(KlineFeed, self).__init__(name, market)
+        self.interval = interval
+        self.period = interval_ms(interval)
+
+    def update(self):
+        market = self.market
+        start, open_price, high, low, close, volume = market.candle(self.interval)
+        return [compact({'e': 'kline', 'E': now_ms(), 's': market.symbol,
+                         'k': {'t': start, 'T': start + self.period - 1, 's': market.symbol, 'i': self.interval,
+                               'f': market.trade_id, 'L': market.trade_id,
+                               'o': _number(open_price), 'c': _number(close), 'h': _number(high),
+                               'l': _number(low), 'v': _number(volume), 'n': 1, 'x': False,
+                               'q': _number(volume * close), 'V': _number(volume / 2),
+                               'Q': _number(volume * close / 2), 'B': '0'}})]
+
+
+def _ticker(market, mini=False):
+    """Returns the 24h ticker event of a market (or the mini ticker)"""
+    t = market.ticker()
+    if mini:
+        return {'e': '24hrMiniTicker', 'E': now_ms(), 's': market.symbol,
+                'c': _number(t['last']), 'o': _number(t['open']), 'h': _number(t['high']), 'l': _number(t['low']),
+                'v': _number(t['volume']), 'q': _number(t['volume'] * t['last'])}
+    return {'e': '24hrTicker', 'E': now_ms(), 's': market.symbol,
+            'p': _number(t['change']), 'P': format(t['change_percent'], '.3f'), 'w': _number(t['last']),
+            'x': _number(t['open']), 'c': _number(t['last']), 'Q': '0.00000000',
+            'b': _number(t['bid']), 'B': _number(t['bid_size']), 'a': _number(t['ask']), 'A': _number(t['ask_size']),
+            'o': _number(t['open']), 'h': _number(t['high']), 'l': _number(t['low']),
+            'v': _number(t['volume']), 'q': _number(t['volume'] * t['last']),
+            'O': 0, 'C': now_ms(), 'F': 1, 'L': market.trade_id, 'n': market.trade_id}
+
+
+class TickerFeed(Feed):
+    """The 24h ticker of a market (<symbol>@ticker or <symbol>@miniTicker), sent after every tick"""
+    def __init__(self, name, market, mini=False):
+        super(TickerFeed, self).__init__(name, market)
+        self.mini = mini
+
+    def update(self):
+        return [compact(_ticker(self.market, self.mini))]
+
+
+class AllTickersFeed(Feed):
+    """The tickers of all markets (!ticker@arr or !miniTicker@arr), sent after every tick of the markets"""
+    def __init__(self, name, markets, mini=False):
+        super(AllTickersFeed, self).__init__(name)
+        self.markets = markets
+        self.mini = mini
+
+    def update(self):
+        return [compact([_ticker(market, self.mini) for market in self.markets.values()])]
+
+
+class UserDataFeed(Feed):
+    """The user data stream of a listen key, published on the changes of the account"""
+    clocked = False
+
+
+# ==========================================================================================
+#   Server
+# ==========================================================================================
+
+class BinanceSession(Session):
+    """A connection to the raw stream endpoint (/ws/<stream>) or to the combined stream endpoint
+    (/stream?streams=<stream>/<stream>...), whose messages are wrapped as {"stream": <name>, "data": <payload>}
+    """
+    def __init__(self, ws, path, limit, combined):
+        super(BinanceSession, self).__init__(ws, path, limit)
+        self.combined = combined
+        self.streams = set()
+
+
+class BinanceStandin(StandinServer):
+    """A local stand-in of the Binance websocket streams and REST api.
+
+    Serves BinanceWSClient (dedicated and multiplexed connections, all stream profiles and the user data
+    stream) and BinanceRESTClient. The streams are opened by the url of the connection or by live
+    SUBSCRIBE/UNSUBSCRIBE requests. The diff depth events are in sync with the depth snapshots
+    of the REST api. The signatures of the private requests are not verified, only the api key
+    header is required. The orders of the account are filled when the book crosses their price,
+    and every change is sent to the user data streams as executionReport and outboundAccountInfo events.
+        with BinanceStandin(rate=SATURATION) as server:
+            client = BinanceWSClient(stream_uri=server.ws_uri, rest_uri=server.rest_uri)
+    """
+    SYMBOLS = [('BTCUSDT', 'BTC', 'USDT'), ('ETHUSDT', 'ETH', 'USDT'), ('ETHBTC', 'ETH', 'BTC'),
+               ('BNBUSDT', 'BNB', 'USDT')]
+
+    def __init__(self, *args, **kwargs):
+        super(BinanceStandin, self).__init__(*args, **kwargs)
+        self.listen_keys = set()
+
+    @staticmethod
+    def name():
+        return 'Binance'
+
+    # Websocket
+    # ---------------------------------------------------------------------------------
+
+    def _session(self, ws, path):
+        if path.startswith('/stream'):
+            session = BinanceSession(ws, path, self.session_limit, combined=True)
+            streams = path.partition('streams=')[2]
+        elif path.startswith('/ws'):
+            session = BinanceSession(ws, path, self.session_limit, combined=False)
+            streams = path[len('/ws/'):]
+        else:
+            return None
+        for stream in streams.split('/'):
+            if stream:
+                self._subscribe(session, stream)
+        return session
+
+    def _receive(self, session, message):
+        """Handles the SUBSCRIBE, UNSUBSCRIBE and LIST_SUBSCRIPTIONS requests"""
+        try:
+            request = json.loads(message)
+            method, request_id = request['method'], request.get('id')
+        except (ValueError, KeyError, TypeError):
+            session.post(compact({'error': {'code': 3, 'msg': 'Invalid JSON: {}'.format(message)}}))
+            return
+        if method == 'SUBSCRIBE':
+            unknown = [stream for stream in request.get('params', []) if not self._subscribe(session, stream)]
+            if unknown:
+                session.post(compact({'error': {'code': 2, 'msg': 'Invalid request: unknown stream {}'
+                                                                  .format(','.join(unknown))}, 'id': request_id}))
+                return
+            session.post(compact({'result': None, 'id': request_id}))
+        elif method == 'UNSUBSCRIBE':
+            for stream in request.get('params', []):
+                session.streams.discard(stream)
+                self._leave(session, stream)
+            session.post(compact({'result': None, 'id': request_id}))
+        elif method == 'LIST_SUBSCRIPTIONS':
+            session.post(compact({'result': sorted(session.streams), 'id': request_id}))
+        else:
+            session.post(compact({'error': {'code': 2, 'msg': 'Invalid request: unknown method {}'.format(method)},
+                                  'id': request_id}))
+
+    def _close(self, session):
+        for stream in session.streams:
+            self._leave(session, stream)
+        session.streams.clear()
+
+    def _subscribe(self, session, stream):
+        """Subscribes a session to a stream
+        :return: False if the stream is unknown
+        """
+        if stream in session.streams:
+            return True
+        create = self._feed(stream)
+        if create is None:
+            return False
+        session.streams.add(stream)
+        self._join(session, stream, create, self._wrapper(stream) if session.combined else self._raw)
+        return True
+
+    def _feed(self, stream):
+        """Returns a function creating the feed of a stream or None if the stream is unknown"""
+        if stream in _ALL_TICKERS:
+            return lambda: AllTickersFeed(stream, self.markets, mini=stream.startswith('!mini'))
+        if stream in self.listen_keys:
+            return lambda: UserDataFeed(stream)
+        match = _STREAM.match(stream)
+        market = self._market(match.group(1)) if match else None
+        if market is None:
+            return None
+        kind, levels, interval = match.group(2), match.group(3), match.group(4)
+        if kind == 'depth':
+            return lambda: DepthFeed(stream, market)
+        if levels:
+            return lambda: PartialDepthFeed(stream, market, int(levels))
+        if kind in ('trade', 'aggTrade'):
+            return lambda: TradeFeed(stream, market, aggregate=kind == 'aggTrade')
+        if interval:
+            return (lambda: KlineFeed(stream, market, interval)) if interval in _INTERVALS else None
+        return lambda: TickerFeed(stream, market, mini=kind == 'miniTicker')
+
+    @staticmethod
+    def _raw(session, messages):
+        """Delivers the messages of a stream on the raw stream endpoint"""
+        return messages
+
+    @staticmethod
+    def _wrapper(stream):
+        """Returns a function delivering the messages of a stream wrapped for the combined stream endpoint"""
+        prefix = '{"stream":"' + stream + '","data":'
+        return lambda session, messages: [prefix + message + '}' for message in messages]
+
+    # Account
+    # ---------------------------------------------------------------------------------
+
+    def _account_event(self, event, order, trade=None):
+        if not self.listen_keys:
+            return
+        market = self.markets[order['symbol']]
+        execution = 'TRADE' if event == FILLED else event
+        report = compact({'e': 'executionReport', 'E': now_ms(), 's': order['symbol'], 'c': 'standin',
+                          'S': order['side'], 'o': order['type'], 'f': 'GTC',
+                          'q': _number(order['amount']), 'p': _number(order['price'] or 0.0),
+                          'P': '0.00000000', 'F': '0.00000000', 'g': -1, 'C': '', 'x': execution,
+                          'X': order['status'], 'r': 'NONE', 'i': order['id'],
+                          'l': _number(trade['amount'] if trade else 0.0), 'z': _number(order['filled']),
+                          'L': _number(trade['price'] if trade else 0.0), 'n': '0', 'N': None,
+                          'T': order['update_time'], 't': trade['id'] if trade else -1, 'I': order['id'],
+                          'w': order['status'] == NEW, 'm': False, 'M': False, 'O': order['time'],
+                          'Z': _number(trade['amount'] * trade['price'] if trade else 0.0),
+                          'Y': '0.00000000', 'Q': '0.00000000'})
+        messages = [report]
+        if event == FILLED:
+            balances = [{'a': asset, 'f': _number(self.account.balances[asset]), 'l': '0.00000000'}
+                        for asset in (market.base, market.quote)]
+            messages.append(compact({'e': 'outboundAccountInfo', 'E': now_ms(), 'B': balances}))
+        for listen_key in self.listen_keys:
+            self._publish(listen_key, messages)
+
+    # REST
+    # ---------------------------------------------------------------------------------
+
+    def _rest(self, method, path, query, headers, body):
+        version, _, endpoint = path.partition('/api/')[2].partition('/')
+        if version not in ('v1', 'v3'):
+            return 404, {'code': -1, 'msg': 'Unknown endpoint {}'.format(path)}
+        if endpoint in ('ping', 'time', 'exchangeInfo', 'ticker/24hr', 'depth', 'trades', 'klines'):
+            return self._public(endpoint, query)
+        if not headers.get('X-MBX-APIKEY'):
+            return 401, {'code': INVALID_API_KEY, 'msg': 'API-key format invalid.'}
+        if endpoint == 'userDataStream':
+            return self._user_data_stream(method, query)
+        return self._private(method, endpoint, query)
+
+    def _public(self, endpoint, query):
+        if endpoint == 'ping':
+            return 200, {}
+        if endpoint == 'time':
+            return 200, {'serverTime': now_ms()}
+        if endpoint == 'exchangeInfo':
+            return 200, {'timezone': 'UTC', 'serverTime': now_ms(), 'rateLimits': [],
+                         'symbols': [self._symbol_info(market) for market in self.markets.values()]}
+        if endpoint == 'ticker/24hr' and 'symbol' not in query:
+            return 200, [self._rest_ticker(market) for market in self.markets.values()]
+
+        market = self._market(query.get('symbol'))
+        if market is None:
+            return 400, {'code': INVALID_SYMBOL, 'msg': 'Invalid symbol.'}
+        limit = int(query.get('limit', 500 if endpoint != 'depth' else 100))
+        if endpoint == 'ticker/24hr':
+            return 200, self._rest_ticker(market)
+        if endpoint == 'depth':
+            return 200, {'lastUpdateId': market.update_id,
+                         'bids': _levels(market.top(True, limit)),
+                         'asks': _levels(market.top(False, limit))}
+        if endpoint == 'trades':
+            return 200, [{'id': trade_id, 'price': _number(price), 'qty': _number(abs(amount)),
+                          'time': timestamp, 'isBuyerMaker': amount < 0, 'isBestMatch': True}
+                         for trade_id, timestamp, amount, price in market.recent_trades(limit)]
+        # klines
+        interval = query.get('interval')
+        if interval not in _INTERVALS:
+            return 400, {'code': -1120, 'msg': 'Invalid interval.'}
+        period = interval_ms(interval)
+        start, end = query.get('startTime'), query.get('endTime')
+        candles = market.candles(interval, limit, start=int(start) if start else None, end=int(end) if end else None)
+        return 200, [[c[0], _number(c[1]), _number(c[2]), _number(c[3]), _number(c[4]), _number(c[5]),
+                      c[0] + period - 1, _number(c[5] * c[4]), 1, _number(c[5] / 2), _number(c[5] * c[4] / 2), '0']
+                     for c in candles]
+
+    @staticmethod
+    def _symbol_info(market):
+        return {'symbol': market.symbol, 'status': 'TRADING',
+                'baseAsset': market.base, 'baseAssetPrecision': 8,
+                'quoteAsset': market.quote, 'quotePrecision': 8,
+                'orderTypes': ['LIMIT', 'MARKET'], 'icebergAllowed': False,
+                'filters': [{'filterType': 'PRICE_FILTER', 'minPrice': _number(market.tick_size),
+                             'maxPrice': '100000.00000000', 'tickSize': _number(market.tick_size)},
+                            {'filterType': 'LOT_SIZE', 'minQty': '0.00100000',
+                             'maxQty': '100000.00000000', 'stepSize': '0.00100000'}]}
+
+    @staticmethod
+    def _rest_ticker(market):
+        t = market.ticker()
+        return {'symbol': market.symbol, 'priceChange': _number(t['change']),
+                'priceChangePercent': format(t['change_percent'], '.3f'), 'weightedAvgPrice': _number(t['last']),
+                'prevClosePrice': _number(t['open']), 'lastPrice': _number(t['last']), 'lastQty': '0.00000000',
+                'bidPrice': _number(t['bid']), 'askPrice': _number(t['ask']), 'openPrice': _number(t['open']),
+                'highPrice': _number(t['high']), 'lowPrice': _number(t['low']), 'volume': _number(t['volume']),
+                'quoteVolume': _number(t['volume'] * t['last']), 'openTime': 0, 'closeTime': now_ms(),
+                'firstId': 1, 'lastId': market.trade_id, 'count': market.trade_id}
+
+    def _user_data_stream(self, method, query):
+        if method == 'POST':
+            listen_key = uuid.uuid4().hex
+            self.listen_keys.add(listen_key)
+            return 200, {'listenKey': listen_key}
+        listen_key = query.get('listenKey')
+        if listen_key not in self.listen_keys:
+            return 400, {'code': -1125, 'msg': 'This listenKey does not exist.'}
+        if method == 'DELETE':
+            self.listen_keys.discard(listen_key)
+        return 200, {}
+
+    def _private(self, method, endpoint, query):
+        account = self.account
+        if endpoint == 'account':
+            return 200, {'makerCommission': 10, 'takerCommission': 10, 'canTrade': True, 'updateTime': now_ms(),
+                         'balances': [{'asset': asset, 'free': _number(balance), 'locked': '0.00000000'}
+                                      for asset, balance in sorted(account.balances.items())]}
+        if endpoint == 'openOrders' and 'symbol' not in query:
+            return 200, [self._order_status(order) for order in account.open_orders()]
+
+        market = self._market(query.get('symbol'))
+        if market is None:
+            return 400, {'code': INVALID_SYMBOL, 'msg': 'Invalid symbol.'}
+        if endpoint == 'openOrders':
+            return 200, [self._order_status(order) for order in account.open_orders(market.symbol)]
+        if endpoint == 'allOrders':
+            first = int(query.get('orderId', 0))
+            return 200, [self._order_status(order) for order in account.orders.values()
+                         if order['symbol'] == market.symbol and order['id'] >= first]
+        if endpoint == 'myTrades':
+            return 200, [{'symbol': trade['symbol'], 'id': trade['id'], 'orderId': trade['order_id'],
+                          'price': _number(trade['price']), 'qty': _number(trade['amount']),
+                          'commission': _number(trade['fee']), 'commissionAsset': trade['fee_asset'],
+                          'time': trade['time'], 'isBuyer': trade['side'] == 'BUY', 'isMaker': False,
+                          'isBestMatch': True}
+                         for trade in account.trades if trade['symbol'] == market.symbol]
+        if endpoint != 'order':
+            return 404, {'code': -1, 'msg': 'Unknown endpoint {}'.format(endpoint)}
+
+        if method == 'POST':
+            try:
+                side, order_type, amount = query['side'], query['type'], float(query['quantity'])
+                price = float(query.get('price') or 0.0)
+            except (KeyError, ValueError) as e:
+                return 400, {'code': MISSING_PARAM, 'msg': 'Mandatory parameter {} was not sent.'.format(e)}
+            order = self._place(market, side, order_type, amount, price)
+            return 200, dict(self._order_status(order), transactTime=order['time'])
+        order = account.orders.get(int(query.get('orderId', 0)))
+        if method == 'DELETE':
+            if order is None or self._cancel(order['id']) is None:
+                return 400, {'code': UNKNOWN_ORDER, 'msg': 'Unknown order sent.'}
+            return 200, self._order_status(order)
+        if order is None:
+            return 400, {'code': NO_SUCH_ORDER, 'msg': 'Order does not exist.'}
+        return 200, self._order_status(order)
+
+    @staticmethod
+    def _order_status(order):
+        return {'symbol': order['symbol'], 'orderId': order['id'], 'clientOrderId': 'standin',
+                'price': _number(order['price'] or 0.0), 'origQty': _number(order['amount']),
+                'executedQty': _number(order['filled']),
+                'cummulativeQuoteQty': _number(order['filled'] * (order['price'] or 0.0)),
+                'status': order['status'], 'timeInForce': 'GTC', 'type': order['type'], 'side': order['side'],
+                'stopPrice': '0.00000000', 'icebergQty': '0.00000000', 'time': order['time'],
+                'updateTime': order['update_time'], 'isWorking': order['status'] == NEW}
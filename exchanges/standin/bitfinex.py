@@ -0,0 +1,541 @@
+import asyncio
+import base64
+import json
+import time
+
+from exchanges.standin.market import now_ms, NEW, CANCELED, ADDED, REMOVED
+from exchanges.standin.server import StandinServer, Session, Feed, compact
+from exchanges.WS.bitfinex import _checksum, TIMESTAMP, SEQ_ALL, OB_CHECKSUM, BULK_UPDATES, \
+    CHANNELS_PER_CONNECTION, RAW_PRECISION
+
+
+HEARTBEAT_INTERVAL = 15     # seconds between the heartbeats of the channels
+CHECKSUM_DEPTH     = 25     # the number of price levels of each side covered by the checksums
+TRADES_SNAPSHOT    = 30     # the number of trades of a trades snapshot
+CANDLES_SNAPSHOT   = 240    # the number of candles of a candles snapshot
+
+_PRECISIONS = ['P0', 'P1', 'P2', 'P3', 'P4', RAW_PRECISION]
+_LENGTHS    = ['1', '25', '100', '250']
+_INTERVALS  = ['1m', '5m', '15m', '30m', '1h', '3h', '6h', '12h', '1D', '7D', '14D', '1M']
+
+# the exchange error codes
+UNKNOWN_EVENT  = 10000
+SUBSCRIBE_FAIL = 10300
+DUPLICATE      = 10301
+CHANNEL_LIMIT  = 10305
+NOT_SUBSCRIBED = 10401
+AUTH_FAILED    = 10100
+
+
+# ==========================================================================================
+#   Feeds
+# ==========================================================================================
+
+class TickerFeed(Feed):
+    """The ticker channel of a market, sent after every tick:
+        [BID, BID_SIZE, ASK, ASK_SIZE, DAILY_CHANGE, DAILY_CHANGE_RELATIVE, LAST_PRICE, VOLUME, HIGH, LOW]
+    """
+    def snapshot(self):
+        t = self.market.ticker()
+        return compact([t['bid'], t['bid_size'], t['ask'], t['ask_size'], t['change'],
+                        round(t['change_percent'] / 100, 6), t['last'], t['volume'], t['high'], t['low']])
+
+    def update(self):
+        return [self.snapshot()]
+
+
+class TradesFeed(Feed):
+    """The trades channel of a market: the snapshot of the recent trades from the most recent
+    and the executed trades "te" [ID, MTS, AMOUNT, PRICE]. The trade updates "tu" are not sent,
+    since they repeat the executed trades.
+    """
+    def __init__(self, name, market):
+        super(TradesFeed, self).__init__(name, market)
+        self._last = market.trade_id
+
+    def snapshot(self):
+        return compact([list(trade) for trade in reversed(self.market.recent_trades(TRADES_SNAPSHOT))])
+
+    def update(self):
+        market = self.market
+        new = min(market.trade_id - self._last, len(market.trades))
+        self._last = market.trade_id
+        if new <= 0:
+            return None
+        return ['"te",' + compact(list(market.trades[-i])) for i in range(new, 0, -1)]
+
+
+class CandlesFeed(Feed):
+    """The candles channel of a market: the snapshot from the most recent candle
+    and the current candle after every tick, as [MTS, OPEN, CLOSE, HIGH, LOW, VOLUME]
+    """
+    def __init__(self, name, market, interval):
+        super(CandlesFeed, self).__init__(name, market)
+        self.interval = interval
+
+    @staticmethod
+    def _candle(candle):
+        start, open_price, high, low, close, volume = candle
+        return [start, open_price, close, high, low, volume]
+
+    def snapshot(self):
+        return compact([self._candle(c) for c in reversed(self.market.candles(self.interval, CANDLES_SNAPSHOT))])
+
+    def update(self):
+        return [compact(self._candle(self.market.candle(self.interval)))]
+
+
+class BookFeed(Feed):
+    """The book channel of a market with a given length (the number of price levels of each side).
+
+    The changes of the book are translated to the orders of the channel the way the exchange does it:
+    only the changes within the top length levels are sent, and a level entering the top levels,
+    because a better level was removed, is sent as added, while a level pushed out of the top levels
+    is sent as removed. So the book of the client always holds the top length levels and its checksum
+    matches the checksum of the book (see checksum).
+    The price levels are sent as [PRICE, COUNT, AMOUNT] and removed as [PRICE, 0, 1] for bids and
+    [PRICE, 0, -1] for asks. Every price level of the market is a single order, which the raw book
+    (R0) sends as [ORDER_ID, PRICE, AMOUNT] and removes as [ORDER_ID, 0, 1] or [ORDER_ID, 0, -1].
+    The update of a tick is the list of its orders (see BitfinexStandin._deliver_book).
+    """
+    def __init__(self, name, market, length, raw=False):
+        super(BookFeed, self).__init__(name, market)
+        self.length = length
+        self.raw = raw
+        self._orders = []
+        self._checksum = None
+        market.watch(self._change)
+
+    def _order(self, bid, price, amount, order_id):
+        sign = 1 if bid else -1
+        if self.raw:
+            return [order_id, price, sign * amount] if amount else [order_id, 0, sign]
+        return [price, 1, sign * amount] if amount else [price, 0, sign]
+
+    def _change(self, change):
+        bid, price, amount, order_id, rank, kind = change
+        market, length = self.market, self.length
+        if rank < length:
+            self._orders.append(self._order(bid, price, amount, order_id))
+        if kind == ADDED and rank < length < market.depth(bid):
+            # the last level was pushed out of the top levels
+            price, _, order_id = market.level(bid, length)
+            self._orders.append(self._order(bid, price, 0, order_id))
+        elif kind == REMOVED and rank < length <= market.depth(bid):
+            # the next level entered the top levels
+            self._orders.append(self._order(bid, *market.level(bid, length - 1)))
+
+    def snapshot(self):
+        market = self.market
+        return compact([self._order(bid, price, amount, order_id) for bid in (True, False)
+                        for price, amount, order_id in market.top(bid, self.length)])
+
+    def checksum(self):
+        """Returns the checksum of the top levels (or orders) of the channel, computed once per tick"""
+        if self._checksum is None:
+            depth = min(CHECKSUM_DEPTH, self.length)
+            bids = self.market.top(True, depth)
+            asks = self.market.top(False, depth)
+            values = []
+            for i in range(depth):
+                if i < len(bids):
+                    price, amount, order_id = bids[i]
+                    values.extend((order_id if self.raw else price, amount))
+                if i < len(asks):
+                    price, amount, order_id = asks[i]
+                    values.extend((order_id if self.raw else price, -amount))
+            self._checksum = _checksum(values)
+        return self._checksum
+
+    def update(self):
+        self._checksum = None
+        if not self._orders:
+            return None
+        orders, self._orders = self._orders, []
+        return orders
+
+    def close(self):
+        self.market.unwatch(self._change)
+
+
+class WalletFeed(Feed):
+    """The account channel (chanId 0) of the authenticated sessions, published on the changes of the account"""
+    clocked = False
+
+
+# ==========================================================================================
+#   Server
+# ==========================================================================================
+
+class BitfinexSession(Session):
+    """A connection to the websocket API with its own configuration flags, sequence numbers and channel ids"""
+    def __init__(self, ws, path, limit):
+        super(BitfinexSession, self).__init__(ws, path, limit)
+        self.flags = 0
+        self.sequence = 0           # the sequence number of the last message (SEQ_ALL)
+        self.auth_sequence = 0      # the sequence number of the last message of the account channel
+        self.channels = {}          # chanId -> feed name
+        self.authenticated = False
+        self._next_id = 0
+
+    def channel_id(self):
+        self._next_id += 1
+        return self._next_id
+
+    def frame(self, channel_id, payload, auth=False):
+        """Frames a channel message as [CHANNEL_ID, <payload>, (SEQUENCE, (AUTH_SEQUENCE)), (TIMESTAMP)]
+        :param channel_id:  the channel id
+        :param payload:     the json text of the elements following the channel id
+        :param auth:        the message is an event of the account channel with its own sequence number
+        """
+        frame = '[' + str(channel_id) + ',' + payload
+        if self.flags & SEQ_ALL:
+            self.sequence += 1
+            frame += ',' + str(self.sequence)
+            if auth:
+                self.auth_sequence += 1
+                frame += ',' + str(self.auth_sequence)
+        if self.flags & TIMESTAMP:
+            frame += ',' + str(now_ms())
+        return frame + ']'
+
+
+class BitfinexStandin(StandinServer):
+    """A local stand-in of the Bitfinex websocket API v2 and REST api.
+
+    Serves BitfinexWSClient (the conf flags TIMESTAMP, SEQ_ALL, OB_CHECKSUM and BULK_UPDATES, the ticker,
+    book, raw book, trades and candles channels, heartbeats and the authenticated account channel)
+    and BitfinexRESTClient. A connection carries up to CHANNELS_PER_CONNECTION channels.
+    The aggregated precisions P1-P4 are served as P0 and the throttled frequency F1 as F0, since
+    the messages follow the ticks of the market. The signatures are not verified, only the api key
+    is required. The orders of the account are filled when the book crosses their price,
+    and every change is sent to the authenticated sessions as on, oc, tu and wu events.
+        with BitfinexStandin(rate=SATURATION) as server:
+            client = BitfinexWSClient(uri=server.ws_uri + '/ws/2')
+    """
+    SYMBOLS = [('BTCUSD', 'BTC', 'USD'), ('ETHUSD', 'ETH', 'USD'), ('ETHBTC', 'ETH', 'BTC'),
+               ('LTCUSD', 'LTC', 'USD')]
+
+    @staticmethod
+    def name():
+        return 'Bitfinex'
+
+    @property
+    def ws_uri(self):
+        """The url of the websocket API"""
+        return 'ws://{}:{}/ws/2'.format(self.host, self.port)
+
+    def _started(self):
+        self._spawn(self._heartbeat())
+
+    async def _heartbeat(self):
+        """Sends the heartbeats of all channels every HEARTBEAT_INTERVAL seconds"""
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            for session in list(self.sessions):
+                for channel_id in list(session.channels):
+                    session.post(session.frame(channel_id, '"hb"'))
+                if session.authenticated:
+                    session.post(session.frame(0, '"hb"'))
+
+    # Websocket
+    # ---------------------------------------------------------------------------------
+
+    def _session(self, ws, path):
+        if not path.startswith('/ws'):
+            return None
+        return BitfinexSession(ws, path, self.session_limit)
+
+    def _open(self, session):
+        session.post(compact({'event': 'info', 'version': 2, 'serverId': 'standin', 'platform': {'status': 1}}))
+
+    def _receive(self, session, message):
+        try:
+            request = json.loads(message)
+            event = request['event']
+        except (ValueError, KeyError, TypeError):
+            session.post(compact({'event': 'error', 'msg': 'unknown event', 'code': UNKNOWN_EVENT}))
+            return
+        if event == 'ping':
+            session.post(compact({'event': 'pong', 'ts': now_ms(), 'cid': request.get('cid')}))
+        elif event == 'conf':
+            session.flags = int(request.get('flags', 0))
+            session.post(compact({'event': 'conf', 'status': 'OK', 'flags': session.flags}))
+        elif event == 'subscribe':
+            self._subscribe(session, request)
+        elif event == 'unsubscribe':
+            channel_id = request.get('chanId')
+            name = session.channels.pop(channel_id, None)
+            if name is None:
+                session.post(compact({'event': 'error', 'msg': 'unsubscribe: invalid', 'code': NOT_SUBSCRIBED}))
+                return
+            self._leave(session, name)
+            session.post(compact({'event': 'unsubscribed', 'status': 'OK', 'chanId': channel_id}))
+        elif event == 'auth':
+            self._authenticate(session, request)
+        else:
+            session.post(compact({'event': 'error', 'msg': 'unknown event', 'code': UNKNOWN_EVENT}))
+
+    def _close(self, session):
+        for name in session.channels.values():
+            self._leave(session, name)
+        session.channels.clear()
+        if session.authenticated:
+            self._leave(session, 'account')
+
+    def _subscribe(self, session, request):
+        """Subscribes a channel: replies with the subscribed event followed by the snapshot of the channel"""
+        channel = request.get('channel')
+        if channel == 'candles':
+            _, interval, symbol = (request.get('key', '').split(':') + ['', ''])[:3]
+            if interval not in _INTERVALS:
+                symbol = ''
+        else:
+            symbol = request.get('symbol', '')
+        market = self._market(symbol[1:] if symbol.startswith('t') and len(symbol) > 6 else symbol)
+        if market is None or channel not in ('ticker', 'trades', 'book', 'candles'):
+            session.post(compact({'event': 'error', 'msg': 'subscribe: invalid', 'code': SUBSCRIBE_FAIL,
+                                  'channel': channel, 'symbol': symbol}))
+            return
+        pair = market.symbol
+        reply = {'event': 'subscribed', 'channel': channel, 'chanId': None}
+        if channel == 'ticker':
+            name, create = 'ticker_' + pair, lambda: TickerFeed(name, market)
+        elif channel == 'trades':
+            name, create = 'trades_' + pair, lambda: TradesFeed(name, market)
+        elif channel == 'candles':
+            name, create = 'candles_' + pair + '_' + interval, lambda: CandlesFeed(name, market, interval)
+            reply['key'] = 'trade:' + interval + ':t' + pair
+        else:
+            prec = request.get('prec', 'P0')
+            prec = prec if prec in _PRECISIONS else 'P0'
+            length = str(request.get('len', '25'))
+            length = length if length in _LENGTHS else '25'
+            raw = prec == RAW_PRECISION
+            name = 'book_' + pair + '_' + ('R0' if raw else 'P0') + '_' + length
+            create = lambda: BookFeed(name, market, int(length), raw=raw)
+            reply.update(prec=prec, freq=request.get('freq', 'F0'), len=length)
+        if channel != 'candles':
+            reply.update(symbol='t' + pair, pair=pair)
+
+        if name in session.channels.values():
+            session.post(compact({'event': 'error', 'msg': 'subscribe: dup', 'code': DUPLICATE,
+                                  'channel': channel, 'symbol': symbol}))
+            return
+        if len(session.channels) >= CHANNELS_PER_CONNECTION:
+            session.post(compact({'event': 'error', 'msg': 'subscribe: limit', 'code': CHANNEL_LIMIT,
+                                  'channel': channel, 'symbol': symbol}))
+            return
+        channel_id = session.channel_id()
+        session.channels[channel_id] = name
+        reply['chanId'] = channel_id
+        deliver = self._book_deliverer(channel_id, name) if channel == 'book' else self._deliverer(channel_id)
+        feed = self._join(session, name, create, deliver)
+        # the snapshot is taken between the ticks, so the following updates continue it
+        session.post(compact(reply), session.frame(channel_id, feed.snapshot()))
+
+    @staticmethod
+    def _deliverer(channel_id):
+        """Returns a function delivering the messages of a channel"""
+        return lambda session, messages: [session.frame(channel_id, message) for message in messages]
+
+    def _book_deliverer(self, channel_id, name):
+        """Returns a function delivering the orders of a book channel, batched if the session set BULK_UPDATES,
+        followed by the checksum of the book if the session set OB_CHECKSUM
+        """
+        def deliver(session, orders):
+            if session.flags & BULK_UPDATES:
+                frames = [session.frame(channel_id, compact(orders))]
+            else:
+                frames = [session.frame(channel_id, compact(order)) for order in orders]
+            if session.flags & OB_CHECKSUM:
+                frames.append(session.frame(channel_id, '"cs",' + str(self._feeds[name].checksum())))
+            return frames
+        return deliver
+
+    # Account
+    # ---------------------------------------------------------------------------------
+
+    def _authenticate(self, session, request):
+        """Authenticates a session and sends the snapshots of the open orders and the wallets"""
+        if not request.get('apiKey') or not request.get('authSig'):
+            session.post(compact({'event': 'auth', 'status': 'FAILED', 'chanId': 0, 'code': AUTH_FAILED,
+                                  'msg': 'apikey: invalid'}))
+            return
+        session.post(compact({'event': 'auth', 'status': 'OK', 'chanId': 0, 'userId': 1,
+                              'auth_id': 'standin', 'caps': {'orders': {'read': 1, 'write': 1},
+                                                              'wallets': {'read': 1, 'write': 0}}}))
+        if not session.authenticated:
+            session.authenticated = True
+            self._join(session, 'account', lambda: WalletFeed('account'), self._account_deliverer)
+        session.post(session.frame(0, '"os",' + compact([self._order_array(order)
+                                                            for order in self.account.open_orders()]), auth=True),
+                     session.frame(0, '"ws",' + compact([self._wallet(asset) for asset in self.account.balances]),
+                                   auth=True))
+
+    @staticmethod
+    def _account_deliverer(session, messages):
+        return [session.frame(0, message, auth=True) for message in messages]
+
+    def _account_event(self, event, order, trade=None):
+        messages = ['"on",' if event == NEW else '"oc",']
+        messages[0] += compact(self._order_array(order))
+        if trade is not None:
+            market = self.markets[order['symbol']]
+            sign = 1 if trade['side'] == 'BUY' else -1
+            messages.append('"tu",' + compact([trade['id'], 't' + trade['symbol'], trade['time'], trade['order_id'],
+                                               sign * trade['amount'], trade['price'], self._order_type(order),
+                                               order['price'] or trade['price'], -1, -trade['fee'],
+                                               trade['fee_asset']]))
+            messages.extend('"wu",' + compact(self._wallet(asset)) for asset in (market.base, market.quote))
+        self._publish('account', messages)
+
+    def _wallet(self, asset):
+        balance = self.account.balances[asset]
+        return ['exchange', asset, balance, 0, balance]
+
+    @staticmethod
+    def _order_type(order):
+        return 'EXCHANGE ' + order['type']
+
+    def _order_array(self, order):
+        """Returns an order in the form of the websocket API v2 (and of the order history of the REST api v2)"""
+        sign = 1 if order['side'] == 'BUY' else -1
+        if order['status'] == NEW:
+            status = 'ACTIVE'
+        elif order['status'] == CANCELED:
+            status = 'CANCELED'
+        else:
+            status = 'EXECUTED @ {}({})'.format(order['price'], sign * order['filled'])
+        return [order['id'], None, order['id'], 't' + order['symbol'], order['time'], order['update_time'],
+                sign * (order['amount'] - order['filled']), sign * order['amount'], self._order_type(order), None,
+                None, None, 0, status, None, None, order['price'], order['price'] if order['filled'] else 0,
+                0, 0, None, None, None, 0, 0, None, None, None, 'API>BFX', None, None, None]
+
+    # REST
+    # ---------------------------------------------------------------------------------
+
+    def _rest(self, method, path, query, headers, body):
+        if path.startswith('/v1/') and method == 'POST' or path.startswith('/v2/auth/'):
+            return self._private(path, headers, body)
+        if method != 'GET':
+            return 404, {'message': 'Unknown endpoint {}'.format(path)}
+        return self._public(path, query)
+
+    def _public(self, path, query):
+        markets = self.markets.values()
+        if path == '/v1/symbols':
+            return 200, [market.symbol.lower() for market in markets]
+        if path == '/v1/symbols_details':
+            return 200, [{'pair': market.symbol.lower(), 'price_precision': 5, 'initial_margin': '30.0',
+                          'minimum_margin': '15.0', 'maximum_order_size': '2000.0', 'minimum_order_size': '0.001',
+                          'expiration': 'NA', 'margin': False} for market in markets]
+        if path == '/v2/platform/status':
+            return 200, [1]
+        if path == '/v2/tickers':
+            symbols = query.get('symbols', 'ALL')
+            selected = [m for m in markets if symbols == 'ALL' or 't' + m.symbol in symbols.split(',')]
+            return 200, [['t' + m.symbol] + json.loads(TickerFeed('', m).snapshot()) for m in selected]
+
+        _, version, kind, name = (path.split('/', 3) + ['', '', ''])[:4]
+        if kind == 'candles':
+            # /v2/candles/trade:<interval>:t<SYMBOL>/hist
+            key = name.split('/')[0].split(':')
+            market = self._market(key[2][1:]) if len(key) == 3 else None
+            if market is None or key[1] not in _INTERVALS:
+                return 400, ['error', SUBSCRIBE_FAIL, 'symbol: invalid']
+            limit = int(query.get('limit', 120))
+            start, end = query.get('start'), query.get('end')
+            candles = market.candles(key[1], limit, start=int(start) if start else None,
+                                     end=int(end) if end else None)
+            return 200, [CandlesFeed._candle(c) for c in reversed(candles)]
+
+        market = self._market(name[1:] if version == 'v2' else name)
+        if market is None:
+            return 400, {'message': 'Unknown symbol'} if version == 'v1' else ['error', 10020, 'symbol: invalid']
+        if kind == 'ticker':
+            return 200, json.loads(TickerFeed('', market).snapshot())
+        if kind == 'book':
+            return 200, {side: [{'price': str(price), 'amount': str(amount), 'timestamp': str(time.time())}
+                                for price, amount, _ in market.top(bid, int(query.get('limit_' + side, 50)))]
+                         for bid, side in ((True, 'bids'), (False, 'asks'))}
+        if kind == 'trades':
+            return 200, [{'timestamp': timestamp // 1000, 'tid': trade_id, 'price': str(price),
+                          'amount': str(abs(amount)), 'exchange': 'bitfinex', 'type': 'buy' if amount > 0 else 'sell'}
+                         for trade_id, timestamp, amount, price in
+                         reversed(market.recent_trades(int(query.get('limit_trades', 50))))]
+        return 404, {'message': 'Unknown endpoint {}'.format(path)}
+
+    def _private(self, path, headers, body):
+        if path.startswith('/v1/'):
+            if not headers.get('X-BFX-APIKEY') or not headers.get('X-BFX-PAYLOAD'):
+                return 400, {'message': 'Could not find a key matching the given X-BFX-APIKEY.'}
+            params = json.loads(base64.standard_b64decode(headers['X-BFX-PAYLOAD']))
+        else:
+            if not headers.get('bfx-apikey'):
+                return 500, ['error', AUTH_FAILED, 'apikey: invalid']
+            params = json.loads(body) if body else {}
+
+        account = self.account
+        if path.startswith('/v2/auth/r/orders'):
+            # /v2/auth/r/orders[/t<SYMBOL>]/hist
+            parts = path.split('/')
+            symbol = parts[5][1:] if len(parts) == 7 else None
+            return 200, [self._order_array(order) for order in reversed(account.orders.values())
+                         if order['status'] != NEW and (symbol is None or order['symbol'] == symbol)]
+        if path == '/v1/balances':
+            return 200, [{'type': 'exchange', 'currency': asset.lower(), 'amount': str(balance),
+                          'available': str(balance)} for asset, balance in sorted(account.balances.items())]
+        if path == '/v1/orders':
+            return 200, [self._order_status(order) for order in account.open_orders()]
+        if path == '/v1/mytrades':
+            market = self._market(params.get('symbol'))
+            if market is None:
+                return 400, {'message': 'Unknown symbol'}
+            return 200, [{'price': str(trade['price']), 'amount': str(trade['amount']),
+                          'timestamp': str(trade['time'] / 1000), 'exchange': 'bitfinex',
+                          'type': 'Buy' if trade['side'] == 'BUY' else 'Sell', 'fee_currency': trade['fee_asset'],
+                          'fee_amount': str(-trade['fee']), 'tid': trade['id'], 'order_id': trade['order_id']}
+                         for trade in reversed(account.trades) if trade['symbol'] == market.symbol]
+        if path == '/v1/order/new':
+            market = self._market(params.get('symbol'))
+            if market is None:
+                return 400, {'message': 'Invalid pair'}
+            try:
+                amount, price = float(params['amount']), float(params.get('price') or 0.0)
+                side, order_type = params['side'], params.get('type', 'exchange limit')
+            except (KeyError, ValueError) as e:
+                return 400, {'message': 'Missing or invalid parameter {}'.format(e)}
+            order = self._place(market, side, 'MARKET' if order_type.endswith('market') else 'LIMIT', amount, price)
+            return 200, self._order_status(order)
+        if path == '/v1/order/cancel/multi':
+            for order_id in params.get('order_ids', []):
+                self._cancel(int(order_id))
+            return 200, {'result': 'Orders cancelled'}
+        if path == '/v1/order/cancel/all':
+            for order in account.open_orders():
+                self._cancel(order['id'])
+            return 200, {'result': 'All orders cancelled'}
+
+        order = account.orders.get(int(params.get('order_id', 0)))
+        if path == '/v1/order/status':
+            if order is None:
+                return 400, {'message': 'No such order found.'}
+            return 200, self._order_status(order)
+        if path == '/v1/order/cancel':
+            if order is None or self._cancel(order['id']) is None:
+                return 400, {'message': 'Order could not be cancelled.'}
+            return 200, self._order_status(order)
+        return 404, {'message': 'Unknown endpoint {}'.format(path)}
+
+    @staticmethod
+    def _order_status(order):
+        """Returns an order in the form of the REST api v1"""
+        price = str(order['price'])
+        return {'id': order['id'], 'order_id': order['id'], 'symbol': order['symbol'].lower(), 'exchange': 'bitfinex',
+                'price': price, 'avg_execution_price': price if order['filled'] else '0.0',
+                'side': order['side'].lower(), 'type': 'exchange ' + order['type'].lower(),
+                'timestamp': str(order['time'] / 1000), 'is_live': order['status'] == NEW,
+                'is_cancelled': order['status'] == CANCELED, 'is_hidden': False, 'was_forced': False,
+                'original_amount': str(order['amount']), 'remaining_amount': str(order['amount'] - order['filled']),
+                'executed_amount': str(order['filled'])}
@@ -0,0 +1,369 @@
+import random
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict, deque
+
+
+BOOK_LEVELS     = 100       # the maximum number of price levels of each side of a book
+TRADE_HISTORY   = 1000      # the number of recent trades kept for the REST api
+CANDLE_HISTORY  = 500       # the number of candles of an interval generated when it is first requested
+BALANCE         = 1000.0    # the initial balance of every asset of an account
+
+# the kinds of the book changes passed to the views of a market
+ADDED   = 'added'
+CHANGED = 'changed'
+REMOVED = 'removed'
+
+INTERVAL_UNITS = {'m': 60000, 'h': 3600000, 'd': 86400000, 'D': 86400000, 'w': 604800000, 'W': 604800000,
+                  'M': 2592000000}
+
+
+def interval_ms(interval):
+    """Returns the length of a candle interval ('1m', '4h', '1d', '1D', '7D', '1M', ...) in ms"""
+    return int(interval[:-1]) * INTERVAL_UNITS[interval[-1]]
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+# ==========================================================================================
+#   Market
+# ==========================================================================================
+
+class Market(object):
+    """A simulated market of a symbol: its order book, trades and candles.
+
+    The simulation is deterministic for a given seed and symbol: the same sequence of calls
+    produces the same prices and amounts (only the timestamps are taken from the clock).
+    The book keeps up to BOOK_LEVELS price levels on each side, on a grid of ticks around
+    a center price, which slowly drifts. Every step changes a single level: its amount is set,
+    or the level is removed or added. Every price level is a single order, so the same book
+    is also served as a raw book of orders. The trades take the best bid or ask.
+
+    The changes of the book are passed to the views of the market (see watch) as
+        (bid, price, amount, order id, rank, kind)
+    where rank is the position of the level from the best price (before a removal, after an addition)
+    and kind is ADDED, CHANGED or REMOVED. The views translate the changes to the messages of their
+    streams, so all streams of a book follow the same sequence of update ids.
+    """
+
+    def __init__(self, symbol, base, quote, seed=0, levels=BOOK_LEVELS):
+        """Creates a market with a full book, recent trades and a 24h ticker
+        :param symbol:  the name of the symbol as used by the exchange
+        :param base:    the base asset of the symbol
+        :param quote:   the quote asset of the symbol
+        :param seed:    the seed of the simulation
+        :param levels:  the maximum number of price levels of each side of the book
+        """
+        self.symbol = symbol
+        self.base = base
+        self.quote = quote
+        self.levels = levels
+        self.random = random.Random('{}:{}'.format(seed, symbol))
+        self.decimals = self.random.randint(2, 4)
+        self.tick_size = 10.0 ** -self.decimals
+        self.center = round(self.random.uniform(100, 1000), self.decimals)
+        self.update_id = 0          # increased by every change of the book
+        self.trade_id = 0
+        self.order_id = 0
+        self.bids = {}              # price -> (amount, order id)
+        self.asks = {}
+        self._bid_prices = []       # sorted prices from the lowest
+        self._ask_prices = []
+        self._views = []
+        for i in range(1, levels + 1):
+            self._add(True, self._price(-i), self._amount())
+            self._add(False, self._price(i), self._amount())
+
+        self.open = self.last = self.high = self.low = self.center
+        self.volume = 0.0
+        self.trades = deque(maxlen=TRADE_HISTORY)
+        self._candles = {}          # interval in ms -> [[open time, open, high, low, close, volume], ...]
+        now = now_ms()
+        for i in range(TRADE_HISTORY):
+            self.trade(now - (TRADE_HISTORY - i) * 100)
+
+    def tick(self):
+        """Advances the market: changes a price level of the book and executes a trade"""
+        self.step()
+        self.trade()
+
+    # Book
+    # ---------------------------------------------------------------------------------
+
+    def watch(self, view):
+        """Passes every following change of the book to a view"""
+        self._views.append(view)
+
+    def unwatch(self, view):
+        if view in self._views:
+            self._views.remove(view)
+
+    def step(self):
+        """Changes a random price level of the book and passes the change to the views
+        :return: the change (bid, price, amount, order id, rank, kind), the amount is 0 for a removed level
+        """
+        r = self.random
+        if r.random() < 0.05:
+            self.center = round(self.center + r.choice((-self.tick_size, self.tick_size)), self.decimals)
+        bid = r.random() < 0.5
+        levels = self.bids if bid else self.asks
+        prices = self._bid_prices if bid else self._ask_prices
+        action = r.random()
+        kind = CHANGED
+        if action < 0.2 and len(levels) > self.levels // 2:
+            price = r.choice(prices)
+            kind = REMOVED
+        elif action < 0.4 and len(levels) < self.levels:
+            distance = r.randint(1, self.levels + self.levels // 2)
+            price = self._price(-distance if bid else distance)
+            if price not in levels and self._inside(bid, price):
+                kind = ADDED
+            else:
+                price = r.choice(prices)
+        else:
+            price = r.choice(prices)
+
+        self.update_id += 1
+        if kind == REMOVED:
+            rank = self.rank(bid, price)
+            order_id = self._remove(bid, price)
+            change = (bid, price, 0.0, order_id, rank, kind)
+        elif kind == ADDED:
+            amount = self._amount()
+            order_id = self._add(bid, price, amount)
+            change = (bid, price, amount, order_id, self.rank(bid, price), kind)
+        else:
+            amount = self._amount()
+            order_id = levels[price][1]
+            levels[price] = (amount, order_id)
+            change = (bid, price, amount, order_id, self.rank(bid, price), kind)
+        for view in self._views:
+            view(change)
+        return change
+
+    def depth(self, bid):
+        """Returns the number of price levels of a side"""
+        return len(self.bids if bid else self.asks)
+
+    def rank(self, bid, price):
+        """Returns the position of a price level from the best price"""
+        if bid:
+            return len(self._bid_prices) - 1 - bisect_left(self._bid_prices, price)
+        return bisect_left(self._ask_prices, price)
+
+    def level(self, bid, rank):
+        """Returns the price level at a position from the best price as (price, amount, order id)"""
+        price = self._bid_prices[-1 - rank] if bid else self._ask_prices[rank]
+        amount, order_id = (self.bids if bid else self.asks)[price]
+        return price, amount, order_id
+
+    def top(self, bid, n=None):
+        """Returns the n best price levels of a side (all by default) as [(price, amount, order id), ...]"""
+        n = len(self.bids if bid else self.asks) if n is None else min(n, self.depth(bid))
+        return [self.level(bid, rank) for rank in range(n)]
+
+    def best(self, bid):
+        """Returns the best price of a side (the center price if the side is empty)"""
+        prices = self._bid_prices if bid else self._ask_prices
+        if not prices:
+            return self.center
+        return prices[-1] if bid else prices[0]
+
+    def _price(self, ticks):
+        return round(self.center + ticks * self.tick_size, self.decimals)
+
+    def _amount(self):
+        return round(self.random.uniform(0.01, 10.0), 4)
+
+    def _inside(self, bid, price):
+        """Checks that a new price level does not cross the other side of the book"""
+        return price < self.best(False) if bid else price > self.best(True)
+
+    def _add(self, bid, price, amount):
+        self.order_id += 1
+        (self.bids if bid else self.asks)[price] = (amount, self.order_id)
+        insort(self._bid_prices if bid else self._ask_prices, price)
+        return self.order_id
+
+    def _remove(self, bid, price):
+        prices = self._bid_prices if bid else self._ask_prices
+        del prices[bisect_left(prices, price)]
+        return (self.bids if bid else self.asks).pop(price)[1]
+
+    # Trades and candles
+    # ---------------------------------------------------------------------------------
+
+    def trade(self, timestamp=None):
+        """Executes a trade at the best bid or ask
+        :param timestamp:  the time of the trade in ms, now by default
+        :return: (trade id, timestamp, amount, price), the amount is negative for a sell
+        """
+        timestamp = now_ms() if timestamp is None else timestamp
+        buy = self.random.random() < 0.5
+        price = self.best(not buy)
+        amount = round(self.random.uniform(0.001, 2.0), 4)
+        self.trade_id += 1
+        trade = (self.trade_id, timestamp, amount if buy else -amount, price)
+        self.trades.append(trade)
+        self.last = price
+        self.high = max(self.high, price)
+        self.low = min(self.low, price)
+        self.volume += amount
+        for period, candles in self._candles.items():
+            self._roll(candles, period, timestamp)
+            candle = candles[-1]
+            candle[2] = max(candle[2], price)
+            candle[3] = min(candle[3], price)
+            candle[4] = price
+            candle[5] = round(candle[5] + amount, 4)
+        return trade
+
+    def recent_trades(self, limit=TRADE_HISTORY):
+        """Returns the most recent trades from the oldest"""
+        return list(self.trades)[-limit:]
+
+    def candles(self, interval, limit=CANDLE_HISTORY, start=None, end=None):
+        """Returns the candles of an interval from the oldest, the last one is the current candle
+        :param interval:  candle interval (i.e. '1m')
+        :param limit:     the maximum number of candles
+        :param start:     the open time in ms of the first candle
+        :param end:       the open time in ms of the last candle
+        :return: [[open time, open, high, low, close, volume], ...]
+        """
+        candles = self._series(interval)
+        selected = [c for c in candles if (start is None or c[0] >= start) and (end is None or c[0] <= end)]
+        return [list(c) for c in selected[-limit:]]
+
+    def candle(self, interval):
+        """Returns the current candle of an interval [open time, open, high, low, close, volume]"""
+        return list(self._series(interval)[-1])
+
+    def _series(self, interval):
+        """Returns the candles of an interval rolled to now, the history is generated on the first request"""
+        period = interval_ms(interval)
+        candles = self._candles.get(period)
+        if candles is None:
+            candles = self._candles[period] = self._history(period)
+        self._roll(candles, period, now_ms())
+        return candles
+
+    def _history(self, period):
+        """Generates the past candles of an interval, a random walk ending at the last price"""
+        start = (now_ms() // period - CANDLE_HISTORY + 1) * period
+        close = self.last
+        candles = []
+        for i in reversed(range(CANDLE_HISTORY)):
+            open_price = round(close * (1 + self.random.uniform(-0.01, 0.01)), self.decimals)
+            high = round(max(open_price, close) * (1 + self.random.uniform(0, 0.005)), self.decimals)
+            low = round(min(open_price, close) * (1 - self.random.uniform(0, 0.005)), self.decimals)
+            candles.append([start + i * period, open_price, high, low, close, round(self.random.uniform(1, 100), 4)])
+            close = open_price
+        candles.reverse()
+        return candles
+
+    def _roll(self, candles, period, timestamp):
+        """Starts the candles of the periods up to timestamp at the last close"""
+        while candles[-1][0] + period <= timestamp:
+            close = candles[-1][4]
+            candles.append([candles[-1][0] + period, close, close, close, close, 0.0])
+        if len(candles) > 2 * CANDLE_HISTORY:
+            del candles[:-CANDLE_HISTORY]
+
+    def ticker(self):
+        """Returns the 24h ticker
+        :return: {'bid', 'bid_size', 'ask', 'ask_size', 'change', 'change_percent', 'last', 'volume', 'high',
+                  'low', 'open'}
+        """
+        bid, ask = self.top(True, 1), self.top(False, 1)
+        change = round(self.last - self.open, self.decimals)
+        return {'bid':            bid[0][0] if bid else self.center,
+                'bid_size':       bid[0][1] if bid else 0.0,
+                'ask':            ask[0][0] if ask else self.center,
+                'ask_size':       ask[0][1] if ask else 0.0,
+                'change':         change,
+                'change_percent': round(100 * change / self.open, 4),
+                'last':           self.last,
+                'volume':         round(self.volume, 4),
+                'high':           self.high,
+                'low':            self.low,
+                'open':           self.open}
+
+
+# ==========================================================================================
+#   Account
+# ==========================================================================================
+
+NEW      = 'NEW'
+FILLED   = 'FILLED'
+CANCELED = 'CANCELED'
+
+
+class Account(object):
+    """The orders, trades and balances of the user of a stand-in server.
+
+    The account is shared by the private REST endpoints and the private streams, which format
+    its orders and trades the way their exchange does. An order is a dictionary:
+        {'id', 'symbol', 'side' ('BUY' or 'SELL'), 'type' ('LIMIT' or 'MARKET'), 'price', 'amount',
+         'filled', 'status' (NEW, FILLED or CANCELED), 'time', 'update_time'}
+    and a trade is {'id', 'order_id', 'symbol', 'side', 'price', 'amount', 'fee', 'fee_asset', 'time'}.
+    The limit orders stay open until they are canceled or filled, the market orders are filled at once.
+    """
+
+    def __init__(self, assets):
+        """:param assets:  the assets of the balances"""
+        self.balances = {asset: BALANCE for asset in assets}
+        self.orders = OrderedDict()     # order id -> order
+        self.trades = []
+        self._order_id = 0
+        self._trade_id = 0
+
+    def place(self, symbol, side, order_type, amount, price):
+        """Places a new order
+        :return: the order
+        """
+        self._order_id += 1
+        timestamp = now_ms()
+        order = {'id': self._order_id, 'symbol': symbol, 'side': side.upper(), 'type': order_type.upper(),
+                 'price': price, 'amount': amount, 'filled': 0.0, 'status': NEW,
+                 'time': timestamp, 'update_time': timestamp}
+        self.orders[order['id']] = order
+        return order
+
+    def cancel(self, order_id):
+        """Cancels an open order
+        :return: the order or None if there is no such open order
+        """
+        order = self.orders.get(order_id)
+        if order is None or order['status'] != NEW:
+            return None
+        order['status'] = CANCELED
+        order['update_time'] = now_ms()
+        return order
+
+    def fill(self, order_id, price, base, quote):
+        """Fills an open order and moves the amounts between the balances of its assets
+        :return: the trade or None if there is no such open order
+        """
+        order = self.orders.get(order_id)
+        if order is None or order['status'] != NEW:
+            return None
+        order['status'] = FILLED
+        order['filled'] = order['amount']
+        order['price'] = order['price'] or price
+        order['update_time'] = now_ms()
+        sign = 1 if order['side'] == 'BUY' else -1
+        self.balances[base] = round(self.balances.get(base, 0.0) + sign * order['amount'], 8)
+        self.balances[quote] = round(self.balances.get(quote, 0.0) - sign * order['amount'] * price, 8)
+        self._trade_id += 1
+        trade = {'id': self._trade_id, 'order_id': order_id, 'symbol': order['symbol'], 'side': order['side'],
+                 'price': price, 'amount': order['amount'], 'fee': 0.0, 'fee_asset': quote,
+                 'time': order['update_time']}
+        self.trades.append(trade)
+        return trade
+
+    def open_orders(self, symbol=None):
+        """Returns the open orders (of a symbol) from the oldest"""
+        return [order for order in self.orders.values()
+                if order['status'] == NEW and (symbol is None or order['symbol'] == symbol)]
@@ -0,0 +1,563 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+from exchanges.exception import WSException
+from exchanges.standin.market import Market, Account, NEW, FILLED, CANCELED
+
+
+logger = logging.getLogger(__name__)
+
+SATURATION     = None       # the rate of the clocks ticking as fast as the subscribers read the messages
+DEFAULT_RATE   = 10         # ticks per second of every market
+SESSION_LIMIT  = 1000       # the number of frames queued for a session before the clocks wait for it
+REST_TIMEOUT   = 10         # seconds to wait for the event loop to serve a REST request
+START_TIMEOUT  = 10         # seconds to wait for the servers to start
+
+# compact json, the formatting of the exchanges (the numeric parser of Binance relies on it)
+compact = partial(json.dumps, separators=(',', ':'))
+
+
+# ==========================================================================================
+#   Sessions and feeds
+# ==========================================================================================
+
+class Session(object):
+    """A websocket connection of a client.
+
+    The frames are sent in the order they were queued by a writer task, so a reply,
+    a snapshot and the updates following it are never reordered. The replies are queued
+    without waiting (post), while the clocks wait until the queue has room (send),
+    so a client that reads slower than the market ticks slows the clocks down
+    instead of making the queue grow.
+    """
+    def __init__(self, ws, path, limit=SESSION_LIMIT):
+        """
+        :param ws:     the websocket connection
+        :param path:   the path of the request (i.e. '/ws/btcusdt@depth')
+        :param limit:  the number of queued frames above which send waits
+        """
+        self.ws = ws
+        self.path = path
+        self.limit = limit
+        self.frames = 0             # the number of frames sent
+        self.closed = False
+        self._queue = deque()
+        self._queued = asyncio.Event()
+        self._room = asyncio.Event()
+        self._room.set()
+
+    def post(self, *frames):
+        """Queues frames without waiting"""
+        if self.closed:
+            return
+        self._queue.extend(frames)
+        self._queued.set()
+
+    async def send(self, frames):
+        """Queues frames, waiting while the queue is full"""
+        while len(self._queue) >= self.limit and not self.closed:
+            self._room.clear()
+            await self._room.wait()
+        self.post(*frames)
+
+    async def write(self):
+        """The writer task sending the queued frames until the connection closes"""
+        queue = self._queue
+        try:
+            while not self.closed:
+                if not queue:
+                    self._queued.clear()
+                    await self._queued.wait()
+                    continue
+                await self.ws.send(queue.popleft())
+                self.frames += 1
+                if len(queue) < self.limit // 2:
+                    self._room.set()
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        """Marks the session closed and releases the clocks waiting for it"""
+        self.closed = True
+        self._queue.clear()
+        self._queued.set()
+        self._room.set()
+
+
+class Feed(object):
+    """A stream of market data delivered to the subscribed sessions.
+
+    On every tick of its clock, the feed produces an update (see update) and every subscriber
+    turns it into the frames of its own session (i.e. wrapped with a channel id or a sequence number),
+    so the update is computed once for any number of subscribers. The feeds without a clock
+    (i.e. the private streams) are published directly (see StandinServer._publish).
+    """
+    clocked = True      # the feed is delivered on the ticks of a clock
+
+    def __init__(self, name, market=None):
+        """
+        :param name:    the name of the stream
+        :param market:  the market the feed follows, None for the feeds of all markets
+        """
+        self.name = name
+        self.market = market
+        self.subscribers = {}       # session -> deliver(session, update) returning a list of frames
+        self.messages = 0           # the number of produced updates
+
+    def update(self):
+        """Returns the update of the current tick or None if there is nothing to send"""
+        return None
+
+    def close(self):
+        """Releases the feed when its last subscriber leaves"""
+        pass
+
+
+class Clock(object):
+    """Advances the markets and delivers the updates of their feeds.
+
+    A clock ticks rate times per second (see StandinServer.rate) using absolute scheduling,
+    so the slow ticks are caught up. At SATURATION it ticks as fast as possible, yielding
+    to the event loop after every tick and waiting for the sessions whose queues are full,
+    so the rate settles at the throughput of the slowest subscriber.
+    The clock of a symbol advances its market, the clock of the feeds of all markets
+    advances the markets without their own clock. The clock stops when it has no feeds.
+    """
+    def __init__(self, server, symbol=None):
+        """
+        :param server:  StandinServer
+        :param symbol:  the symbol of the market or None for the feeds of all markets
+        """
+        self.server = server
+        self.symbol = symbol
+        self.feeds = []
+        self.ticks = 0
+        self.task = None
+
+    def _markets(self):
+        server = self.server
+        if self.symbol is not None:
+            return [server.markets[self.symbol]]
+        return [market for symbol, market in server.markets.items() if symbol not in server._clocks]
+
+    async def run(self):
+        server = self.server
+        rate, start, ticks = None, time.monotonic(), 0
+        try:
+            while self.feeds:
+                if server.rate is SATURATION:
+                    await asyncio.sleep(0)
+                else:
+                    if server.rate != rate:
+                        rate, start, ticks = server.rate, time.monotonic(), 0
+                    ticks += 1
+                    delay = start + ticks / rate - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    elif delay < -1:
+                        # too far behind, the missed ticks are not caught up
+                        start, ticks = time.monotonic(), 0
+                if not self.feeds:
+                    break
+                for market in self._markets():
+                    market.tick()
+                    server._match(market)
+                self.ticks += 1
+                for feed in list(self.feeds):
+                    update = feed.update()
+                    if update is None:
+                        continue
+                    feed.messages += 1
+                    for session, deliver in list(feed.subscribers.items()):
+                        frames = deliver(session, update)
+                        if frames:
+                            await session.send(frames)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.exception('Clock of {} failed: {}'.format(self.symbol, e))
+        finally:
+            if server._clocks.get(self.symbol) is self:
+                del server._clocks[self.symbol]
+
+
+# ==========================================================================================
+#   Server
+# ==========================================================================================
+
+class StandinServer(object):
+    """A local stand-in of an exchange: a websocket server of its streams and an HTTP server of its REST api.
+
+    The stand-in speaks enough of the protocol of an exchange to serve its websocket and REST clients
+    without a network, so the throughput of the clients can be measured up to their ceiling:
+    the markets (see Market) tick at a configurable rate, up to SATURATION, and every tick is
+    a message on every subscribed stream of the market (see Clock).
+
+    Both servers run on an event loop thread of the stand-in. The REST requests are received
+    by the threads of a standard library HTTP server, but they are served on the event loop,
+    so the markets and the account are only ever touched by a single thread.
+    The protocols are implemented by the subclasses (see exchanges.standin.binance and
+    exchanges.standin.bitfinex), which override:
+        _session(ws, path)            - creates the session of a new connection (None refuses it)
+        _open(session)                - greets the connection
+        _receive(session, message)    - handles a message of the client
+        _close(session)               - unsubscribes the streams of a closed session
+        _rest(method, path, query, headers, body)  - serves a REST request -> (status, data)
+        _account_event(event, order, trade)        - publishes a change of the account
+    Use it as a context manager, or start and stop it:
+        with BinanceStandin(rate=SATURATION) as server:
+            client = BinanceWSClient(stream_uri=server.ws_uri, rest_uri=server.rest_uri)
+    """
+    SYMBOLS = []        # the default (symbol, base asset, quote asset) of the markets
+
+    def __init__(self, host='127.0.0.1', port=0, rest_port=0, rate=DEFAULT_RATE, symbols=None, seed=0,
+                 levels=None, session_limit=SESSION_LIMIT):
+        """Creates a stand-in server (the server is started by start)
+        :param host:       the interface of both servers
+        :param port:       the port of the websocket server, 0 for a free port
+        :param rest_port:  the port of the REST server, 0 for a free port
+        :param rate:       ticks per second of every market or SATURATION
+        :param symbols:    a list of (symbol, base asset, quote asset) of the markets, SYMBOLS by default
+        :param seed:       the seed of the simulated markets
+        :param levels:     the number of price levels of each side of the books (BOOK_LEVELS by default)
+        :param session_limit:  the number of frames queued for a session before the clocks wait for it
+        :raises WSException if the websockets package is not available
+        """
+        if websockets is None:
+            raise WSException('The stand-in server requires the websockets package (pip3 install websockets)')
+        self.host = host
+        self.port = port
+        self.rest_port = rest_port
+        self.rate = rate
+        self.session_limit = session_limit
+        kwargs = {'levels': levels} if levels else {}
+        self.markets = {symbol: Market(symbol, base, quote, seed=seed, **kwargs)
+                        for symbol, base, quote in (symbols or self.SYMBOLS)}
+        self.account = Account({asset for market in self.markets.values() for asset in (market.base, market.quote)})
+        self.sessions = set()
+        self._feeds = {}            # stream name -> Feed
+        self._clocks = {}           # symbol (None for the feeds of all markets) -> Clock
+        self._tasks = set()
+        self._frames = 0            # the frames sent by the closed sessions
+        self._loop = None
+        self._thread = None
+        self._ws_server = None
+        self._http_server = None
+        self._http_thread = None
+
+    # Control
+    # ---------------------------------------------------------------------------------
+
+    def start(self):
+        """Starts the event loop thread and both servers
+        :return: self
+        """
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='standin-' + self.name())
+        self._thread.daemon = True
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result(START_TIMEOUT)
+
+        standin = self
+        handler = type('StandinRequestHandler', (StandinRequestHandler,), {'standin': standin})
+        self._http_server = ThreadingHTTPServer((self.host, self.rest_port), handler)
+        self._http_server.daemon_threads = True
+        self.rest_port = self._http_server.server_address[1]
+        self._http_thread = threading.Thread(target=self._http_server.serve_forever,
+                                             name='standin-' + self.name() + '-rest')
+        self._http_thread.daemon = True
+        self._http_thread.start()
+        logger.info('{} stand-in serving {} and {}'.format(self.name(), self.ws_uri, self.rest_uri))
+        return self
+
+    def stop(self):
+        """Stops both servers, closes the connections and stops the event loop thread"""
+        if self._http_server is not None:
+            self._http_server.shutdown()
+            self._http_server.server_close()
+            self._http_server = None
+        if self._loop is not None and self._thread.is_alive():
+            try:
+                asyncio.run_coroutine_threadsafe(self._stop(), self._loop).result(START_TIMEOUT)
+            finally:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join(timeout=3)
+        self._loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @staticmethod
+    def name():
+        return 'Exchange'
+
+    @property
+    def ws_uri(self):
+        """The url of the websocket server"""
+        return 'ws://{}:{}'.format(self.host, self.port)
+
+    @property
+    def rest_uri(self):
+        """The url of the REST server"""
+        return 'http://{}:{}'.format(self.host, self.rest_port)
+
+    def set_rate(self, rate):
+        """Changes the ticks per second of the markets (SATURATION ticks as fast as the clients read)"""
+        self.rate = rate
+
+    def drop_connections(self):
+        """Drops all websocket connections (the clients are expected to reconnect)"""
+        self._call(self._drop)
+
+    def stats(self):
+        """Returns the counters of the server
+        :return: {'sessions': count, 'frames': frames sent, 'ticks': {symbol: count}, 'feeds': {stream: messages}}
+        """
+        return self._call(self._stats)
+
+    def _call(self, func, *args):
+        """Runs a function on the event loop and returns its result"""
+        async def call():
+            return func(*args)
+        return asyncio.run_coroutine_threadsafe(call(), self._loop).result(REST_TIMEOUT)
+
+    async def _start(self):
+        self._ws_server = await websockets.serve(self._handle, self.host, self.port, compression=None,
+                                                 ping_interval=None, max_size=2 ** 24)
+        self.port = self._ws_server.sockets[0].getsockname()[1]
+        self._started()
+
+    async def _stop(self):
+        for task in list(self._tasks) + [clock.task for clock in self._clocks.values()]:
+            task.cancel()
+        self._ws_server.close()
+        await self._ws_server.wait_closed()
+
+    def _started(self):
+        """Called on the event loop once the websocket server is listening"""
+        pass
+
+    def _spawn(self, coroutine):
+        """Runs a task of the server, which is cancelled when the server stops"""
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _drop(self):
+        for session in list(self.sessions):
+            self._spawn(session.ws.close())
+
+    def _stats(self):
+        return {'sessions': len(self.sessions),
+                'frames': self._frames + sum(session.frames for session in self.sessions),
+                'ticks': {symbol: clock.ticks for symbol, clock in self._clocks.items()},
+                'feeds': {name: feed.messages for name, feed in self._feeds.items()}}
+
+    # Connections
+    # ---------------------------------------------------------------------------------
+
+    async def _handle(self, ws, *args):
+        """Serves a websocket connection (the legacy websockets api passes the path as an argument)"""
+        path = args[0] if args else ws.request.path
+        session = self._session(ws, path)
+        if session is None:
+            await ws.close(1008, 'Unknown path')
+            return
+        self.sessions.add(session)
+        writer = asyncio.ensure_future(session.write())
+        try:
+            self._open(session)
+            async for message in ws:
+                try:
+                    self._receive(session, message)
+                except Exception as e:
+                    logger.exception('Failed to handle {}: {}'.format(message, e))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            session.close()
+            self.sessions.discard(session)
+            self._frames += session.frames
+            self._close(session)
+            writer.cancel()
+
+    def _session(self, ws, path):
+        return Session(ws, path, self.session_limit)
+
+    def _open(self, session):
+        pass
+
+    def _receive(self, session, message):
+        pass
+
+    def _close(self, session):
+        pass
+
+    # Feeds
+    # ---------------------------------------------------------------------------------
+
+    def _join(self, session, name, create, deliver):
+        """Subscribes a session to a feed, creating the feed and starting its clock if needed
+        :param session:  the subscribed session
+        :param name:     the name of the feed
+        :param create:   a function returning a new Feed
+        :param deliver:  a function turning an update of the feed into the frames of the session:
+                         deliver(session, update) -> [frame, ...]
+        :return: Feed
+        """
+        feed = self._feeds.get(name)
+        if feed is None:
+            feed = self._feeds[name] = create()
+            if feed.clocked:
+                symbol = feed.market.symbol if feed.market is not None else None
+                clock = self._clocks.get(symbol)
+                if clock is None:
+                    clock = self._clocks[symbol] = Clock(self, symbol)
+                    clock.task = asyncio.ensure_future(clock.run())
+                clock.feeds.append(feed)
+        feed.subscribers[session] = deliver
+        return feed
+
+    def _leave(self, session, name):
+        """Unsubscribes a session from a feed, the feed is closed when it has no subscribers"""
+        feed = self._feeds.get(name)
+        if feed is None:
+            return
+        feed.subscribers.pop(session, None)
+        if not feed.subscribers:
+            del self._feeds[name]
+            feed.close()
+            for clock in self._clocks.values():
+                if feed in clock.feeds:
+                    clock.feeds.remove(feed)
+
+    def _publish(self, name, update):
+        """Delivers an update of an unclocked feed (i.e. a private stream) to its subscribers at once"""
+        feed = self._feeds.get(name)
+        if feed is None:
+            return
+        feed.messages += 1
+        for session, deliver in list(feed.subscribers.items()):
+            session.post(*deliver(session, update))
+
+    def _market(self, symbol):
+        """Returns the market of a symbol (in any case) or None"""
+        return self.markets.get(symbol.upper()) if symbol else None
+
+    # Account
+    # ---------------------------------------------------------------------------------
+
+    def _place(self, market, side, order_type, amount, price):
+        """Places an order of the account, a market order or a limit order crossing the book is filled at once
+        :return: the order
+        """
+        order = self.account.place(market.symbol, side, order_type, amount, price)
+        self._account_event(NEW, order)
+        self._fill(market, order)
+        return order
+
+    def _cancel(self, order_id):
+        """Cancels an open order of the account
+        :return: the order or None if there is no such open order
+        """
+        order = self.account.cancel(order_id)
+        if order is not None:
+            self._account_event(CANCELED, order)
+        return order
+
+    def _match(self, market):
+        """Fills the open orders of the account crossed by the book after a tick"""
+        if not self.account.orders:
+            return
+        for order in self.account.open_orders(market.symbol):
+            self._fill(market, order)
+
+    def _fill(self, market, order):
+        buy = order['side'] == 'BUY'
+        price = market.best(not buy)
+        if order['type'] != 'MARKET' and (price > order['price'] if buy else price < order['price']):
+            return
+        trade = self.account.fill(order['id'], price, market.base, market.quote)
+        if trade is not None:
+            self._account_event(FILLED, order, trade)
+
+    def _account_event(self, event, order, trade=None):
+        """Publishes a change of an order (NEW, CANCELED or FILLED with its trade) to the private streams"""
+        pass
+
+    # REST
+    # ---------------------------------------------------------------------------------
+
+    def _serve_rest(self, method, path, query, headers, body):
+        """Serves a REST request on the event loop (called by the request handler threads)
+        :return: (status, data)
+        """
+        async def serve():
+            return self._rest(method, path, query, headers, body)
+        return asyncio.run_coroutine_threadsafe(serve(), self._loop).result(REST_TIMEOUT)
+
+    def _rest(self, method, path, query, headers, body):
+        """Serves a REST request
+        :param method:   'GET', 'POST', 'PUT' or 'DELETE'
+        :param path:     the path of the url
+        :param query:    the parameters of the query string {name: value}
+        :param headers:  the headers of the request
+        :param body:     the body of the request (str)
+        :return: (status, data) where data is encoded to json
+        """
+        return 404, {'error': 'Unknown endpoint {}'.format(path)}
+
+
+class StandinRequestHandler(BaseHTTPRequestHandler):
+    """Passes the REST requests to the stand-in server (see StandinServer._rest)"""
+    standin = None
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._serve('GET')
+
+    def do_POST(self):
+        self._serve('POST')
+
+    def do_PUT(self):
+        self._serve('PUT')
+
+    def do_DELETE(self):
+        self._serve('DELETE')
+
+    def _serve(self, method):
+        url = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode() if length else ''
+        try:
+            status, data = self.standin._serve_rest(method, url.path, dict(parse_qsl(url.query)), self.headers, body)
+        except Exception as e:
+            logger.exception('Failed to serve {} {}: {}'.format(method, self.path, e))
+            status, data = 500, {'error': str(e)}
+        content = compact(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
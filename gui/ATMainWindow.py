@@ -10,6 +10,8 @@ class ATMainWindow(QtWidgets.QMainWindow):
     """The main GUI window."""
     keysDirectory = ''
 
+    STATS_INTERVAL = 1000   # milliseconds between the updates of the mailbox statistics in the status bar
+
     def __init__(self, width, height):
         super(ATMainWindow, self).__init__()
 
@@ -44,6 +46,13 @@ class ATMainWindow(QtWidgets.QMainWindow):
         self.setStyleSheet(qss.read())
         qss.close()
 
+        # live statistics of the channel mailboxes
+        self.statsLabel = QtWidgets.QLabel()
+        self.statusBar().addPermanentWidget(self.statsLabel)
+        self.statsTimer = QtCore.QTimer(self)
+        self.statsTimer.timeout.connect(self.showMailboxStats)
+        self.statsTimer.start(self.STATS_INTERVAL)
+
         # load configuration
         self.loadConfiguration()
 
@@ -89,6 +98,16 @@ class ATMainWindow(QtWidgets.QMainWindow):
         self.tabTrade.closeConnections()
         event.accept()
 
+    def showMailboxStats(self):
+        """Displays the depths of the channel mailboxes of the trading tab in the status bar.
+        Shows the current depth and the maximum depth since the last update of each channel,
+        followed by the total number of updates dropped over the mailbox capacities.
+        """
+        stats = self.tabTrade.mailboxStats()
+        depths = '  '.join(f"{channel} {s['depth']}/{s['max_depth']}" for channel, s in stats.items())
+        dropped = sum(s['dropped'] for s in stats.values())
+        self.statsLabel.setText(f'queue depth/max: {depths}  dropped: {dropped}')
+
     def load_keys_popup(self):
         """Displays a popup dialog for loading the exchange keys"""
         dlg = QtWidgets.QFileDialog()
@@ -5,10 +5,13 @@ from .overlays.factory import OverlayFactory
 from .indicators.factory import IndicatorFactory
 from .Separators import *
 
+from exchanges.WS.api import ChannelData
+from exchanges.WS.buffers import CandleBuffer
+
 
 class CandleChartWidget(QtWidgets.QWidget):
     """The widget for displaying candle chart."""
-    data = None
+    candles = None
     numCandlesVisible = 50
     minCandlesVisible = 20
     maxCandlesVisible = 200
@@ -97,32 +100,37 @@ class CandleChartWidget(QtWidgets.QWidget):
         """Sets/updates the candle values.
         :param data    candles snapshot or and update
         Data is one of the (type, data) tuples:
-            ('snapshot', list(candles))    data is a a complete snapshot
+            ('snapshot', candles)          data is a a complete snapshot (a list or an (n, 6) array)
             ('add', candle)                data is a new candle
             ('update', candle)             data is an update of the last candle
+        The candles are kept in a CandleBuffer, whose (6, n) view is passed to the chart,
+        the overlays and the indicators. A snapshot is copied into the buffer,
+        since the snapshot of a channel is shared with its other listeners.
         """
         if not data:
             return
         elif data[0] == 'snapshot':
-            self.data = np.transpose(np.array(data[1]))
+            self.candles = CandleBuffer(ChannelData.MAX_CANDLES)
+            self.candles.extend(data[1])
         elif data[0] == 'add':
-            self.data = np.c_[self.data, data[1]]
+            self.candles.append(data[1])
         elif data[0] == 'update':
-            self.data[:, -1] = data[1]
+            self.candles.update_last(data[1])
         else:
             pass
 
 
     def updateChart(self):
         """Updates the candle chart display"""
-        if self.data is None:
+        if not self.candles:
             return
-        self.candleGraph.updateCandleChart(self.data, self.numCandlesVisible)
+        data = self.candles.columns()
+        self.candleGraph.updateCandleChart(data, self.numCandlesVisible)
         for overlay in self.overlays.values():
-            overlay.update(self.data, self.numCandlesVisible)
+            overlay.update(data, self.numCandlesVisible)
         for indicator in self.indicators.values():
             if indicator[0].isVisible:
-                indicator[1].updateIndicator(self.data, self.numCandlesVisible)
+                indicator[1].updateIndicator(data, self.numCandlesVisible)
 
 
     def reset(self):
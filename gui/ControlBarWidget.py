@@ -1,6 +1,8 @@
+import numpy as np
 from .overlays.factory import OverlayFactory
 from .indicators.factory import IndicatorFactory
 from .CustomComboBoxes import *
+from exchanges.WS.buffers import TICKER_FIELDS
 
 
 # ------------------------------------------------------------------------------------
@@ -231,6 +233,19 @@ class ControlBarWidget(QtWidgets.QWidget):
         except Exception as e:
             print(e)
 
+    def updatePairList(self, tickers):
+        """Updates the pairs with the changed tickers of an all-market ticker channel.
+        :param tickers:  (symbols, values) with the values in the order of TICKER_FIELDS
+        Only the rows of the changed pairs are redrawn.
+        """
+        symbols, values = tickers
+        if not len(symbols):
+            return
+        price  = values[:, TICKER_FIELDS.index('last_price')]
+        change = values[:, TICKER_FIELDS.index('change_percent')]
+        volume = np.floor(price * values[:, TICKER_FIELDS.index('volume')])
+        self.ctrlPair.model().sourceModel().updateTableData(symbols, np.column_stack([price, change, volume]))
+
     def setIntervalList(self, intervalList):
         self.ctrlTime.blockSignals(True)
         self.ctrlTime.clear()
@@ -1,6 +1,7 @@
 import math
-import operator
+import numpy as np
 from PyQt5 import QtCore, QtWidgets, QtGui
+from exchanges.WS.buffers import TickerTable
 
 """
 This module defines a set of classes for customized combo boxes
@@ -78,21 +79,31 @@ class CheckableControlComboBox(QtWidgets.QComboBox):
 # Classes for the pair combobox
 # ------------------------------------------------------------------------------------
 
+PAIR_FIELDS = ('price', 'change', 'volume')
+
+
 class PairComboBoxModel(QtCore.QAbstractTableModel):
     """A combo box for displaying the exchange pairs.
     Each pair is displayed with the daily change percentage and daily volume.
     It is possible to sort the list of pairs based on the name of the pair or
     daily change percentage or daily volume.
+
+    The pairs are kept in a TickerTable with the PAIR_FIELDS columns, displayed in the order
+    of the order array (the table rows from the first displayed row) below the hidden row.
+    The live updates of the pairs change the table in place and signal dataChanged
+    only for the affected rows. The rows keep their order until they are sorted again,
+    so they do not jump around while the user picks a pair.
     """
     header    = ['', 'Price', 'Change', 'Volume']
-    hiddenRow = [['PAIR', '', '', '']]
+    hiddenRow = ['PAIR', '', '', '']
 
     def __init__(self, data=None):
         super(PairComboBoxModel, self).__init__()
-        if data is not None:
-            self.tableData = self.hiddenRow + data
-        else:
-            self.tableData = self.hiddenRow
+        self.table = TickerTable(PAIR_FIELDS)
+        self.order = np.zeros(0, dtype=np.int64)        # the table rows in the display order
+        self.position = np.zeros(0, dtype=np.int64)     # the display positions of the table rows
+        if data:
+            self.setTableData(data)
 
     def setTableData(self, data):
         """Sets the table data.
@@ -101,24 +112,56 @@ class PairComboBoxModel(QtCore.QAbstractTableModel):
         self.clear()
         # clear the data from non-traded pairs
         data = [d for d in data if d[1]]
+        if not data:
+            return
         self.beginInsertRows(QtCore.QModelIndex(), 1, len(data))
-        self.tableData = self.hiddenRow + data
+        self.table.update([d[0] for d in data], [d[1:4] for d in data])
+        self.order = np.arange(len(self.table), dtype=np.int64)
+        self.position = self.order.copy()
         self.endInsertRows()
 
+    def updateTableData(self, symbols, values):
+        """Updates the data of a number of pairs, adding the new pairs at the end.
+        :param symbols:  A list of pairs.
+        :param values:   An (n, 3) array of their price, daily percentage change and volume.
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(-1, len(PAIR_FIELDS))
+        # skip the non-traded pairs
+        traded = np.flatnonzero(values[:, 0])
+        count = len(self.order)
+        rows = self.table.update([symbols[i] for i in traded], values[traded])
+
+        changed = np.sort(self.position[rows[rows < count]]) + 1
+        if len(changed):
+            # a single signal for every run of adjacent rows
+            for run in np.split(changed, np.flatnonzero(np.diff(changed) != 1) + 1):
+                self.dataChanged.emit(self.index(int(run[0]), 1), self.index(int(run[-1]), len(self.header) - 1))
+
+        if len(self.table) > count:
+            self.beginInsertRows(QtCore.QModelIndex(), count + 1, len(self.table))
+            added = np.arange(count, len(self.table), dtype=np.int64)
+            self.order = np.concatenate([self.order, added])
+            self.position = np.concatenate([self.position, added])
+            self.endInsertRows()
+
     def clear(self):
         """Clears the table items (removes all the rows)."""
+        if not len(self.order):
+            return
         self.beginRemoveRows(QtCore.QModelIndex(), 1, self.rowCount()-1)
-        self.tableData = self.hiddenRow
+        self.table.clear()
+        self.order = np.zeros(0, dtype=np.int64)
+        self.position = np.zeros(0, dtype=np.int64)
         self.endRemoveRows()
 
 
     def rowCount(self, parent=None, *args, **kwargs):
         """Returns the number of rows."""
-        return len(self.tableData)
+        return len(self.order) + 1
 
     def columnCount(self, parent=None, *args, **kwargs):
         """Returns the number of columns"""
-        return len(self.tableData[0])
+        return len(self.header)
 
     def data(self, index, role):
         """Overrides the data method of the QTableView.
@@ -131,22 +174,25 @@ class PairComboBoxModel(QtCore.QAbstractTableModel):
             return QtCore.QVariant()
 
         if role == QtCore.Qt.DisplayRole:
-            data = self.tableData[index.row()][index.column()]
             if index.row() == 0:   # hidden row
-                return data
+                return self.hiddenRow[index.column()]
+            row = self.order[index.row() - 1]
+            if index.column() == 0:
+                return self.table.symbols[row]
+            data = float(self.table.values()[row, index.column() - 1])
             if index.column() == 1:
-                exp = math.ceil(math.log10(float(data)))
+                exp = math.ceil(math.log10(data))
                 data_precision = min(abs(exp - 6), 8)
                 return f'{data:.{data_precision}f}'
             elif index.column() == 2:
                 return f'{data:.2f}%'
             else:
-                return data
+                return int(data)
 
         if role == QtCore.Qt.ForegroundRole:
-            if index.column() == 2:
-                data = self.tableData[index.row()][index.column()]
-                if float(data) < 0.0:
+            if index.column() == 2 and index.row() > 0:
+                data = self.table.values()[self.order[index.row() - 1], 1]
+                if data < 0.0:
                     return QtGui.QBrush(QtGui.QColor('red'))
                 else:
                     return QtGui.QBrush(QtGui.QColor('lime'))
@@ -170,8 +216,11 @@ class PairComboBoxModel(QtCore.QAbstractTableModel):
         if column == 0:
             return
         self.layoutAboutToBeChanged.emit()
-        reverse = order == QtCore.Qt.DescendingOrder
-        self.tableData = self.hiddenRow + sorted(self.tableData[1:], key=operator.itemgetter(column), reverse=reverse)
+        self.order = np.argsort(self.table.values()[:, column - 1], kind='stable')
+        if order == QtCore.Qt.DescendingOrder:
+            self.order = self.order[::-1].copy()
+        self.position = np.empty_like(self.order)
+        self.position[self.order] = np.arange(len(self.order), dtype=np.int64)
         self.layoutChanged.emit()
 
 
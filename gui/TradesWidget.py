@@ -1,9 +1,10 @@
 import math
-from collections import deque
 from datetime import datetime
 from PyQt5 import QtCore, QtWidgets, QtGui
 from .CustomTables import CustomTableWidget
 
+from exchanges.WS.buffers import TradeTape
+
 
 # ======================================================================
 # TradesWidget class provides the trades column display
@@ -13,7 +14,6 @@ class TradesWidget(CustomTableWidget):
     """The widget for displaying recent trades."""
 
     MAX_TRADES = 100
-    trades = deque(maxlen=MAX_TRADES)
     symbol_details   = None
     price_precision  = None
     amount_precision = None
@@ -23,6 +23,7 @@ class TradesWidget(CustomTableWidget):
         super(TradesWidget, self).__init__()
         self.setObjectName('tradeTable')
         self.setColumnCount(3)
+        self.trades = TradeTape(self.MAX_TRADES)
 
 
     def setSymbolDetails(self, details):
@@ -43,18 +44,25 @@ class TradesWidget(CustomTableWidget):
         """Sets/updates the the trades data.
         :param data    trades snapshot or and update
         Data is received as one of the following two tuples
-            ('snapshot', list(trades))    data is a a complete snapshot
+            ('snapshot', trades)          data is a a complete snapshot from the most recent trade
             ('update', new_trade)         data is an update of the most recent trade
+            ('batch', list(trades))       data are new trades from the least to the most recent
+        The widget keeps its own TradeTape of the last MAX_TRADES trades, the displayed ones.
+        The channel keeps a much longer history and its snapshot is shared with the other listeners,
+        so only the displayed trades of a snapshot are copied into the tape of the widget.
         """
         if not data:
             return
 
         # handle update
         if data[0] == 'update':
-            self.trades.appendleft(data[1])
+            self.trades.append(*data[1][:3])
+        elif data[0] == 'batch':
+            self.trades.extend(data[1])
         elif data[0] == 'snapshot':
+            # the snapshot starts with the most recent trade
             self.trades.clear()
-            self.trades = deque(list(reversed(data[1])), maxlen=self.MAX_TRADES)
+            self.trades.extend(data[1][:self.MAX_TRADES][::-1])
         else:
             return
         self.displayTrades()
@@ -62,23 +70,29 @@ class TradesWidget(CustomTableWidget):
 
     def displayTrades(self):
         """Displays the current state of trades data."""
+        if not self.trades:
+            return
+        trades = self.trades.recent()
 
         # deduce the price precision if we didn't get it from the exchange
         if not self.price_precision:
-            exp = math.ceil(math.log10(float(self.trades[0][2])))
+            exp = math.ceil(math.log10(float(trades['price'][0])))
             self.price_precision = min(abs(exp - int(self.symbol_details['precision'])), 8)
 
         # get string representations of the values in trades
-        prices = [f'{x[2]:.{self.price_precision}f}' for x in self.trades]
-        amounts = [f'{abs(x[1]):.{self.amount_precision}f}' for x in self.trades]
-        timestamps = [datetime.fromtimestamp(x[0] / 1000).strftime('%H:%M:%S') for x in self.trades]
+        amounts_abs = abs(trades['amount'])
+        prices = [f'{x:.{self.price_precision}f}' for x in trades['price'].tolist()]
+        amounts = [f'{x:.{self.amount_precision}f}' for x in amounts_abs.tolist()]
+        timestamps = [datetime.fromtimestamp(x / 1000).strftime('%H:%M:%S') for x in trades['timestamp'].tolist()]
 
         # let Qt deduce the proper column dimensions for the trades
         self.tableData = [prices, amounts, timestamps]
         self.fitDataAndColumns()
 
         # the threshold for the amount to highlight
-        amount_threshold = 0.1 * sum([abs(x[1]) for x in self.trades])
+        amount_threshold = 0.1 * amounts_abs.sum()
+        sells = (trades['amount'] < 0).tolist()
+        highlighted = (amounts_abs > amount_threshold).tolist()
 
         # set table items
         for i in range(self.rowCount()):
@@ -86,7 +100,7 @@ class TradesWidget(CustomTableWidget):
 
             # prices
             price_item = QtWidgets.QTableWidgetItem(prices[i])
-            if self.trades[i][1] < 0:
+            if sells[i]:
                 price_item.setForeground(QtCore.Qt.red)
             else:
                 price_item.setForeground(QtCore.Qt.green)
@@ -95,7 +109,7 @@ class TradesWidget(CustomTableWidget):
             # amounts
             amount_tem = QtWidgets.QTableWidgetItem(amounts[i])
             amount_tem.setTextAlignment(QtCore.Qt.AlignRight)
-            if abs(self.trades[i][1]) > amount_threshold:
+            if highlighted[i]:
                 amount_tem.setForeground(QtCore.Qt.yellow)
             self.setItem(i, 1, amount_tem)
 
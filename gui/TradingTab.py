@@ -1,4 +1,5 @@
 import os.path
+from PyQt5 import QtCore, QtWidgets
 from .ControlBarWidget import ControlBarWidget
 from .CandleChartWidget import CandleChartWidget
 from .PlaceOrderWidget import PlaceOrderWidget
@@ -7,16 +8,26 @@ from .OrderBookGraphWidget import OrderBookGraphWidget
 from .OrderBookNumericWidget import OrderBookNumericWidget
 from .UserTradingWidget import UserTradingWidget
 from .Separators import *
-from .CustomEvents import *
 
 from exchanges.exchangeWSFactory import ExchangeWSFactory
 from exchanges.exchangeRESTFactory import ExchangeRESTFactory
 from exchanges.exception import ExchangeException
+from exchanges.WS.orderbook import LocalOrderBook
+from exchanges.WS.conflation import Mailbox, KeepLatest, MergeBookDeltas, BatchTrades, MergeCandles, MergeTickers
 
 
 class TradingTab(QtWidgets.QWidget):
     """The main trading tab that displays the candle chart, order book, trades and user order controls."""
 
+    # the updates of the channels are collected in mailboxes drained by the gui thread on a timer,
+    # so the gui does not redraw faster than this during the volatile periods
+    # and a stalled gui (i.e. showing a popup) only keeps the merged state of each channel
+    DRAIN_INTERVAL = 100    # milliseconds
+
+    # the book profile of the active pair: real time updates, 100 levels on Bitfinex
+    # (see STREAM_PROFILES of Binance and BOOK_PROFILES of Bitfinex)
+    BOOK_PROFILE = 'realtime'
+
     # set by a user
     keys_dir   = None
     exchange   = None
@@ -36,6 +47,7 @@ class TradingTab(QtWidgets.QWidget):
     book_channel    = None
     trade_channel   = None
     candles_channel = None
+    all_tickers_channel = None
 
     # user WS channels
     orders_channel      = None
@@ -47,6 +59,24 @@ class TradingTab(QtWidgets.QWidget):
         super(TradingTab, self).__init__()
         self.parentWidget = parent
 
+        # order book maintained from the deltas published by the ws client
+        self.orderBook = LocalOrderBook()
+
+        # bounded mailboxes of the channels, filled by the ws threads and drained by the gui thread
+        self.mailboxes = {
+            'book':        Mailbox(MergeBookDeltas),
+            'trades':      Mailbox(BatchTrades, capacity=TradesWidget.MAX_TRADES),
+            'ticker':      Mailbox(KeepLatest),
+            'candles':     Mailbox(MergeCandles),
+            'orders':      Mailbox(KeepLatest),
+            'user_trades': Mailbox(KeepLatest),
+            'balances':    Mailbox(KeepLatest),
+            'all_tickers': Mailbox(MergeTickers),
+        }
+        self.drainTimer = QtCore.QTimer(self)
+        self.drainTimer.timeout.connect(self.drainMailboxes)
+        self.drainTimer.start(self.DRAIN_INTERVAL)
+
         # left layout
         self.controlBarWidget = ControlBarWidget(self)
         self.chartWidget = CandleChartWidget()
@@ -119,9 +149,11 @@ class TradingTab(QtWidgets.QWidget):
     def reset(self):
         """Resets the widget controls"""
         self.tradesTable.clear()
+        self.orderBook.clear()
         self.orderBookGraph.reset()
         self.numericOrderBookWidget.clear()
         self.chartWidget.reset()
+        self._clear_mailboxes()
 
 
     # ------------------------------------------------------------------------------------
@@ -141,10 +173,10 @@ class TradingTab(QtWidgets.QWidget):
                 self.placeOrderWidget.setTicker(snapshot)
 
             # subscribe to an order book
-            self.book_channel, snapshot = self.ws_client.subscribe_order_book(self.pair, self.update_order_book)
-            if snapshot:
-                self.orderBookGraph.setData(snapshot)
-                self.numericOrderBookWidget.setData(snapshot)
+            self.book_channel, snapshot = self.ws_client.subscribe_order_book(self.pair, self.update_order_book,
+                                                                              delta=True, profile=self.BOOK_PROFILE)
+            if self.orderBook.apply(snapshot):
+                self._set_order_book()
 
             # subscribe to a trades channel
             self.tradesChannel, snapshot = self.ws_client.subscribe_trades(self.pair, self.update_trades)
@@ -182,12 +214,24 @@ class TradingTab(QtWidgets.QWidget):
                 self.ws_client.unsubscribe(self.candles_channel, self.update_candles)
         except ExchangeException as e:
             self.parentWidget.showExceptionPopup(e)
+        self._clear_mailboxes()
 
 
     # ------------------------------------------------------------------------------------
     # ControlBar interaction
     # ------------------------------------------------------------------------------------
 
+    def _subscribe_ws_all_tickers(self):
+        """Subscribes to the all-market tickers channel if the exchange has one,
+        so the pair list follows the prices, changes and volumes of the pairs live.
+        """
+        if not hasattr(self.ws_client, 'subscribe_all_tickers'):
+            return
+        self.all_tickers_channel, snapshot = self.ws_client.subscribe_all_tickers(self.update_all_tickers)
+        if snapshot:
+            self.controlBarWidget.updatePairList(snapshot)
+
+
     def _clear_channels(self):
         """Clears internal channel related state"""
         self.ticker_channel  = None
@@ -218,6 +262,8 @@ class TradingTab(QtWidgets.QWidget):
                 self.ws_client.disconnect()
                 self.ws_client = None
                 self.rest_client = None
+                self.all_tickers_channel = None
+                self.mailboxes['all_tickers'].clear()
 
             # set the key file for the newly selected exchange
             key_file = None
@@ -235,7 +281,8 @@ class TradingTab(QtWidgets.QWidget):
             self._clear_channels()
 
             # create a new client for the REST requests which will handle all user (authenticated) requests
-            self.rest_client = ExchangeRESTFactory.create_client(exchange_name, key_file=key_file)
+            # (the replay clients are paired with the REST client of the exchange they replay)
+            self.rest_client = ExchangeRESTFactory.create_client(self.ws_client.exchange(), key_file=key_file)
             self.placeOrderWidget.setClient(self.rest_client)
             self.userTradingWidget.setClient(self.rest_client)
 
@@ -248,6 +295,7 @@ class TradingTab(QtWidgets.QWidget):
             # update controls to match the new exchange
             self.userTradingWidget.setSymbolDetails(self.symbols_details)
             self.controlBarWidget.setPairList(self.all_tickers, self.rest_client.quote_currencies())
+            self._subscribe_ws_all_tickers()
             self.controlBarWidget.setIntervalList(self.rest_client.candle_intervals())
             self.controlBarWidget.setDisabled(True)
             self.pair = None
@@ -310,6 +358,7 @@ class TradingTab(QtWidgets.QWidget):
             self.interval = interval
             if self.candles_channel:
                 self.ws_client.unsubscribe(self.candles_channel, self.update_candles)
+            self.mailboxes['candles'].clear()
 
             # subscribe to a candles channel
             self.candles_channel, snapshot = self.ws_client.subscribe_candles(self.pair, self.interval,
@@ -336,7 +385,7 @@ class TradingTab(QtWidgets.QWidget):
         if self.rest_client:
             key_file = os.path.join(self.keys_dir, '{}.key'.format(self.exchange.lower()))
             key_file = key_file if os.path.isfile(key_file) else None
-            self.rest_client = ExchangeRESTFactory.create_client(self.exchange, key_file=key_file)
+            self.rest_client = ExchangeRESTFactory.create_client(self.ws_client.exchange(), key_file=key_file)
             self.ws_client.authenticate(key_file=key_file)
             self._subscribe_ws_user_channels()
 
@@ -351,85 +400,116 @@ class TradingTab(QtWidgets.QWidget):
     # Event Handlers
     # ------------------------------------------------------------------------------------
 
-    def customEvent(self, event):
-        """Handles update events triggered by the exchange dispatcher
-        :param event:  update event
-        A dispatcher send the updates via callbacks, each of which
-        only triggers appropriate event. Thus, keeping the overhead
-        for the dispatcher thread low and assuring that all gui updates
-        are handled by the gui thread.
+    def drainMailboxes(self):
+        """Applies the updates collected in the mailboxes of the channels.
+        Called by the drain timer, so all gui updates are handled by the gui thread,
+        while the callbacks of the ws threads only put the updates into the mailboxes.
+        The mailboxes are not drained while the tab is disabled (i.e. by an exception popup),
+        they keep merging the updates within their capacity meanwhile.
         """
         if not self.isEnabled():
             return
 
         try:
-            if event.type() == OrderBookUpdateEvent.EVENT_TYPE:
-                self.orderBookGraph.setData(event.book)
-                self.numericOrderBookWidget.setData(event.book)
-            elif event.type() == TradesUpdateEvent.EVENT_TYPE:
-                self.tradesTable.setData(event.trades)
-            elif event.type() == TickerUpdateEvent.EVENT_TYPE:
-                last_price = event.ticker[6]
+            for book in self.mailboxes['book'].drain():
+                if self.orderBook.apply(book):
+                    self._set_order_book()
+            for trades in self.mailboxes['trades'].drain():
+                self.tradesTable.setData(trades)
+            for ticker in self.mailboxes['ticker'].drain():
+                last_price = ticker[6]
                 self.numericOrderBookWidget.setLastPrice(last_price)
-                self.placeOrderWidget.setTicker(event.ticker)
-            elif event.type() == CandlesUpdateEvent.EVENT_TYPE:
-                self.chartWidget.setData(event.candles)
+                self.placeOrderWidget.setTicker(ticker)
+            candles = self.mailboxes['candles'].drain()
+            for candle in candles:
+                self.chartWidget.setData(candle)
+            if candles:
                 self.chartWidget.updateChart()
-            elif event.type() == OrdersUpdateEvent.EVENT_TYPE:
-                self.userTradingWidget.updateOrders(event.orders)
-            elif event.type() == UserTradesUpdateEvent.EVENT_TYPE:
-                self.userTradingWidget.updateUserTrades(event.trades)
-            elif event.type() == BalancesUpdateEvent.EVENT_TYPE:
-                self.placeOrderWidget.setBalances(event.balances)
+            for orders in self.mailboxes['orders'].drain():
+                self.userTradingWidget.updateOrders(orders)
+            for trades in self.mailboxes['user_trades'].drain():
+                self.userTradingWidget.updateUserTrades(trades)
+            for balances in self.mailboxes['balances'].drain():
+                self.placeOrderWidget.setBalances(balances)
+            for tickers in self.mailboxes['all_tickers'].drain():
+                self.controlBarWidget.updatePairList(tickers)
         except Exception as e:
             self.parentWidget.showExceptionPopup(e)
 
 
+    def mailboxStats(self):
+        """Returns the statistics of the channel mailboxes, see Mailbox.stats.
+        The maximum depths are tracked anew after every call.
+        """
+        return {channel: mailbox.stats(reset=True) for channel, mailbox in self.mailboxes.items()}
+
+
+    def _clear_mailboxes(self):
+        """Drops the pending updates of the public channels"""
+        for channel in ('book', 'trades', 'ticker', 'candles'):
+            self.mailboxes[channel].clear()
+
+
+    def _set_order_book(self):
+        """Displays the current state of the local order book"""
+        if not self.orderBook.bids or not self.orderBook.asks:
+            return
+        book = self.orderBook.snapshot()
+        self.orderBookGraph.setData(book)
+        self.numericOrderBookWidget.setData(book)
+
+
     # ------------------------------------------------------------------------------------
-    # Update methods (callbacks from dispatcher)
+    # Update methods (callbacks from the event bus, called by the ws threads)
     # ------------------------------------------------------------------------------------
 
     def update_order_book(self, data):
         """Callback handler for order book updates
-        :param data:  order book update
+        :param data:  order book update, ('snapshot', book) or ('delta', changed_levels)
         """
-        QtWidgets.QApplication.postEvent(self, OrderBookUpdateEvent(data))
+        self.mailboxes['book'].put(data)
 
     def update_trades(self, data):
         """Callback handler for trades updates
         :param data:  trades update
         """
-        QtWidgets.QApplication.postEvent(self, TradesUpdateEvent(data))
+        self.mailboxes['trades'].put(data)
 
     def update_ticker(self, data):
         """Callback handler for ticker updates
         :param data:  ticker update
         """
-        QtWidgets.QApplication.postEvent(self, TickerUpdateEvent(data))
+        self.mailboxes['ticker'].put(data)
 
     def update_candles(self, data):
         """Callback handler for candles updates
         :param data:  candles update
         """
-        QtWidgets.QApplication.postEvent(self, CandlesUpdateEvent(data))
+        self.mailboxes['candles'].put(data)
+
+    def update_all_tickers(self, data):
+        """Callback handler for all-market tickers updates
+        :param data:  the changed tickers, (symbols, values)
+        """
+        self.mailboxes['all_tickers'].put(data)
 
     def update_user_orders(self, data):
         """Callback handler for user orders updates
         :param data:  user orders update
         """
-        QtWidgets.QApplication.postEvent(self, OrdersUpdateEvent(data))
+        self.mailboxes['orders'].put(data)
 
     def update_user_trades(self, data):
         """Callback handler for user trades updates
         :param data:  user trades update
         """
-        QtWidgets.QApplication.postEvent(self, UserTradesUpdateEvent(data))
+        self.mailboxes['user_trades'].put(data)
 
     def update_balances(self, data):
         """Callback handler for balances updates
         :param data:  balances update
         """
-        QtWidgets.QApplication.postEvent(self, BalancesUpdateEvent(data))
+        self.mailboxes['balances'].put(data)
 
     # handle info messages
     def info_update(self, data):
@@ -0,0 +1,113 @@
+"""Compares the number of websocket messages per second decoded by the available decoders.
+
+Every message is decoded and its numbers are converted the same way the channels do it,
+so the numbers include the float conversion of Binance strings:
+    json       the json module of the standard library
+    orjson     orjson (if installed)
+    numeric    BinanceNumericParser (Binance depth and trades only)
+
+The payloads are generated in the exact format of the messages recorded from both exchanges,
+with the sizes of the busy BTC markets (a depth diff carries around 20 levels at 1s intervals).
+
+Run from the project root:
+    PYTHONPATH=$(pwd) python3 tests/benchmarks/benchmark_decoder.py
+"""
+import random
+import time
+
+from exchanges.WS.decoder import JSONDecoder, OrjsonDecoder, BinanceNumericParser
+
+
+NUM_MESSAGES     = 20000
+LEVELS_PER_DEPTH = 20
+MID_PRICE        = 10000.0
+
+
+def binance_depth(rnd, i):
+    levels = lambda sign: ','.join('["{:.8f}","{:.8f}"]'.format(MID_PRICE + sign * rnd.randint(1, 500) * 0.01,
+                                                               rnd.random() * (rnd.random() > 0.3))
+                                   for _ in range(LEVELS_PER_DEPTH // 2))
+    return ('{{"e":"depthUpdate","E":{},"s":"BTCUSDT","U":{},"u":{},"b":[{}],"a":[{}]}}'
+            .format(1525000000000 + i, 100 * i, 100 * i + 99, levels(-1), levels(1)))
+
+
+def binance_trade(rnd, i):
+    return ('{{"e":"trade","E":{0},"s":"BTCUSDT","t":{1},"p":"{2:.8f}","q":"{3:.8f}","b":{4},"a":{5},'
+            '"T":{0},"m":{6},"M":true}}'.format(1525000000000 + i, 28000000 + i,
+                                                MID_PRICE + rnd.randint(-50, 50) * 0.01, rnd.random(),
+                                                88000000 + i, 50000000 + i, 'true' if rnd.random() < 0.5 else 'false'))
+
+
+def bitfinex_book(rnd, i):
+    return '[17082,[{:.1f},{},{:.8f}]]'.format(MID_PRICE + rnd.randint(-250, 250) * 0.1, rnd.randint(0, 5),
+                                               rnd.uniform(-2, 2))
+
+
+def bitfinex_trade(rnd, i):
+    return '[17470,"te",[{},{},{:.8f},{:.1f}]]'.format(401597393 + i, 1525000000000 + i, rnd.uniform(-2, 2),
+                                                       MID_PRICE + rnd.randint(-50, 50) * 0.1)
+
+
+def generate(payload, seed=42):
+    rnd = random.Random(seed)
+    return [payload(rnd, i) for i in range(NUM_MESSAGES)]
+
+
+# Message handling as done by the channels
+# ---------------------------------------------------------------------------------
+
+def depth_json(loads):
+    def handle(message):
+        update = loads(message)
+        return (update['U'], update['u'],
+                [[float(bid[0]), float(bid[1])] for bid in update['b']],
+                [[float(ask[0]), float(ask[1])] for ask in update['a']])
+    return handle
+
+
+def trade_json(loads):
+    def handle(message):
+        trade = loads(message)
+        return (int(trade['T']), -float(trade['q']) if trade['m'] else float(trade['q']), float(trade['p']),
+                trade['t'])
+    return handle
+
+
+def bitfinex_json(loads):
+    def handle(message):
+        return loads(message)
+    return handle
+
+
+def run(handle, messages):
+    """Handles all messages and returns the number of messages per second and the results"""
+    start = time.perf_counter()
+    results = [handle(message) for message in messages]
+    elapsed = time.perf_counter() - start
+    return len(messages) / elapsed, results
+
+
+if __name__ == '__main__':
+    decoders = [JSONDecoder] + ([OrjsonDecoder] if OrjsonDecoder.available() else [])
+    benchmarks = [
+        ('binance depth',  generate(binance_depth),  depth_json,    BinanceNumericParser.parse_depth),
+        ('binance trade',  generate(binance_trade),  trade_json,    BinanceNumericParser.parse_trade),
+        ('bitfinex book',  generate(bitfinex_book),  bitfinex_json, None),
+        ('bitfinex trade', generate(bitfinex_trade), bitfinex_json, None),
+    ]
+    if not OrjsonDecoder.available():
+        print('orjson is not installed')
+
+    print(f'{NUM_MESSAGES} messages per payload type')
+    print(f'{"payload":<15} {"decoder":<8} {"msg/s":>12} {"speedup":>8}')
+    for name, messages, handler, numeric in benchmarks:
+        base_rate, base_results = run(handler(JSONDecoder.loads), messages)
+        print(f'{name:<15} {"json":<8} {base_rate:>12,.0f} {1.0:>7.1f}x')
+        candidates = [(decoder.name, handler(decoder.loads)) for decoder in decoders[1:]]
+        if numeric:
+            candidates.append(('numeric', numeric))
+        for decoder_name, handle in candidates:
+            rate, results = run(handle, messages)
+            # all decoders have to produce the same values
+            assert results == base_results
+            print(f'{name:<15} {decoder_name:<8} {rate:>12,.0f} {rate / base_rate:>7.1f}x')
@@ -0,0 +1,103 @@
+"""Compares the number of deliveries per second of the event bus and PyDispatcher.
+
+Every channel update published by the exchange clients goes through the event bus, so its cost
+is paid per message and per listener. The benchmark publishes to channels with a growing
+number of listeners, the way the gui subscribes (bound methods taking the data):
+    pydispatch   dispatcher.send of PyDispatcher (if installed), weak references and robustApply
+    bus          EventBus.publish
+    dispatcher   the PyDispatcher compatibility layer of the bus (events.dispatcher.send)
+The order book also checks for listeners before publishing each of its two modes,
+which is measured separately (getReceivers against has_subscribers).
+
+Run from the project root:
+    PYTHONPATH=$(pwd) python3 tests/benchmarks/benchmark_events.py
+"""
+import time
+
+try:
+    from pydispatch import dispatcher as pydispatcher
+except ImportError:
+    pydispatcher = None
+
+from exchanges.WS.events import EventBus, Dispatcher
+
+
+NUM_MESSAGES  = 200000
+LISTENERS     = [1, 2, 4]
+SENDER        = 'binance'
+SIGNAL        = 'btcusdt@trade'
+
+
+class Listener(object):
+    def __init__(self):
+        self.received = 0
+
+    def update(self, data):
+        self.received += 1
+
+
+def run(publish):
+    """Publishes all messages and returns the number of deliveries per second"""
+    data = ('update', [1561150152842, 0.010239, 9869.99])
+    start = time.perf_counter()
+    for _ in range(NUM_MESSAGES):
+        publish(data)
+    return NUM_MESSAGES / (time.perf_counter() - start)
+
+
+def check(check_receivers):
+    """Checks for listeners for all messages and returns the number of checks per second"""
+    start = time.perf_counter()
+    for _ in range(NUM_MESSAGES):
+        check_receivers()
+    return NUM_MESSAGES / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    if pydispatcher is None:
+        print('PyDispatcher is not installed, the bus is compared to its compatibility layer only')
+
+    print(f'{NUM_MESSAGES} messages per run')
+    print(f'{"listeners":<10} {"publisher":<11} {"deliveries/s":>14} {"speedup":>8}')
+    for count in LISTENERS:
+        listeners = [Listener() for _ in range(count)]
+        bus = EventBus()
+        compat = Dispatcher(EventBus())
+        for listener in listeners:
+            bus.subscribe(listener.update, signal=SIGNAL, sender=SENDER)
+            compat.connect(listener.update, signal=SIGNAL, sender=SENDER)
+            if pydispatcher:
+                pydispatcher.connect(listener.update, signal=SIGNAL, sender=SENDER)
+
+        publishers = [('bus', lambda data: bus.publish(SIGNAL, SENDER, data)),
+                      ('dispatcher', lambda data: compat.send(signal=SIGNAL, sender=SENDER, data=data))]
+        if pydispatcher:
+            publishers.insert(0, ('pydispatch', lambda data: pydispatcher.send(signal=SIGNAL, sender=SENDER,
+                                                                               data=data)))
+        base_rate = None
+        for name, publish in publishers:
+            rate = run(publish) * count
+            base_rate = base_rate or rate
+            print(f'{count:<10} {name:<11} {rate:>14,.0f} {rate / base_rate:>7.1f}x')
+
+        if pydispatcher:
+            for listener in listeners:
+                pydispatcher.disconnect(listener.update, signal=SIGNAL, sender=SENDER)
+        # every publisher delivered every message to every listener
+        expected = NUM_MESSAGES * len(publishers)
+        assert all(listener.received == expected for listener in listeners)
+
+    print()
+    print(f'{"receivers check":<24} {"checks/s":>14} {"speedup":>8}')
+    bus = EventBus()
+    bus.subscribe(Listener().update, signal=SIGNAL, sender=SENDER)
+    checks = [('bus.has_subscribers', lambda: bus.has_subscribers(SIGNAL, SENDER))]
+    if pydispatcher:
+        listener = Listener()
+        pydispatcher.connect(listener.update, signal=SIGNAL, sender=SENDER)
+        checks.insert(0, ('pydispatch.getReceivers', lambda: pydispatcher.getReceivers(sender=SENDER, signal=SIGNAL)))
+    base_rate = None
+    for name, check_receivers in checks:
+        rate = check(check_receivers)
+        base_rate = base_rate or rate
+        print(f'{name:<24} {rate:>14,.0f} {rate / base_rate:>7.1f}x')
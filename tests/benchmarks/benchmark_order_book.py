@@ -0,0 +1,148 @@
+"""Compares the number of order book updates per second of the sorted price-level book
+against the previous implementation that kept plain dictionaries and sorted them on every update.
+
+Each diff event is applied to the book and followed by one of the following reads:
+    snapshot   the full sorted book (what is published to the listeners on every update)
+    top 25     25 best bids and asks (what an order book view actually displays)
+    best       the best bid and ask
+
+Run from the project root:
+    PYTHONPATH=$(pwd) python3 tests/benchmarks/benchmark_order_book.py
+"""
+import random
+import time
+from collections import OrderedDict
+
+from exchanges.WS.orderbook import PriceLevels, SortedOrderBook
+
+
+SNAPSHOT_LEVELS   = 1000     # the size of a Binance REST depth snapshot
+TOP_LEVELS        = 25
+NUM_UPDATES       = 5000     # the number of diff events to apply
+LEVELS_PER_UPDATE = 10       # the number of changed price levels in a single diff event
+TICK              = 0.01
+MID_PRICE         = 10000.0
+
+
+class DictOrderBook(object):
+    """The previous implementation: plain dicts that are sorted on every published update"""
+
+    def __init__(self, snapshot):
+        self.bids = {float(bid[0]): float(bid[1]) for bid in snapshot['bids']}
+        self.asks = {float(ask[0]): float(ask[1]) for ask in snapshot['asks']}
+
+    def update(self, update):
+        for bid in update['b']:
+            price = float(bid[0])
+            quantity = float(bid[1])
+            if quantity == 0.0:
+                if self.bids.get(price, None):
+                    self.bids.pop(price)
+            else:
+                self.bids[price] = quantity
+        for ask in update['a']:
+            price = float(ask[0])
+            quantity = float(ask[1])
+            if quantity == 0.0:
+                if self.asks.get(price, None):
+                    self.asks.pop(price)
+            else:
+                self.asks[price] = quantity
+
+    def snapshot(self):
+        bids = OrderedDict(sorted(self.bids.items(), key=lambda t: t[0]))
+        asks = OrderedDict(sorted(self.asks.items(), key=lambda t: t[0]))
+        return {'bids': bids, 'asks': asks}
+
+    def top(self, n):
+        bids = sorted(self.bids.items(), key=lambda t: t[0], reverse=True)[:n]
+        asks = sorted(self.asks.items(), key=lambda t: t[0])[:n]
+        return bids, asks
+
+    def best(self):
+        return max(self.bids.items()), min(self.asks.items())
+
+
+class BenchOrderBook(SortedOrderBook):
+    """The sorted price-level book with the same update logic as BinanceOrderBook"""
+
+    def __init__(self, snapshot):
+        super(BenchOrderBook, self).__init__('benchmark')
+        self.bids = PriceLevels((float(bid[0]), float(bid[1])) for bid in snapshot['bids'])
+        self.asks = PriceLevels((float(ask[0]), float(ask[1])) for ask in snapshot['asks'])
+
+    def update(self, update):
+        for bid in update['b']:
+            price = float(bid[0])
+            quantity = float(bid[1])
+            if quantity == 0.0:
+                self.bids.remove(price)
+            else:
+                self.bids[price] = quantity
+        for ask in update['a']:
+            price = float(ask[0])
+            quantity = float(ask[1])
+            if quantity == 0.0:
+                self.asks.remove(price)
+            else:
+                self.asks[price] = quantity
+
+    def top(self, n):
+        return self.top_bids(n), self.top_asks(n)
+
+    def best(self):
+        return self.best_bid(), self.best_ask()
+
+
+def generate_data(seed=42):
+    """Creates a depth snapshot and a list of Binance-like diff events"""
+    rnd = random.Random(seed)
+    snapshot = {
+        'bids': [['{:.2f}'.format(MID_PRICE - TICK * (i + 1)), '{:.6f}'.format(rnd.random())]
+                 for i in range(SNAPSHOT_LEVELS)],
+        'asks': [['{:.2f}'.format(MID_PRICE + TICK * (i + 1)), '{:.6f}'.format(rnd.random())]
+                 for i in range(SNAPSHOT_LEVELS)]
+    }
+    updates = []
+    for _ in range(NUM_UPDATES):
+        update = {'b': [], 'a': []}
+        for _ in range(LEVELS_PER_UPDATE):
+            # most of the activity happens close to the top of the book
+            offset = int(abs(rnd.gauss(0, 50))) + 1
+            amount = '0' if rnd.random() < 0.3 else '{:.6f}'.format(rnd.random())
+            if rnd.random() < 0.5:
+                update['b'].append(['{:.2f}'.format(MID_PRICE - TICK * offset), amount])
+            else:
+                update['a'].append(['{:.2f}'.format(MID_PRICE + TICK * offset), amount])
+        updates.append(update)
+    return snapshot, updates
+
+
+def run(book_class, snapshot, updates, read):
+    """Applies all updates to a new book and returns the number of updates per second
+    :param read:  a function called with the book after every update
+    """
+    book = book_class(snapshot)
+    start = time.perf_counter()
+    for update in updates:
+        book.update(update)
+        read(book)
+    elapsed = time.perf_counter() - start
+    return len(updates) / elapsed, book
+
+
+if __name__ == '__main__':
+    snapshot, updates = generate_data()
+    scenarios = [('snapshot', lambda book: book.snapshot()),
+                 (f'top {TOP_LEVELS}', lambda book: book.top(TOP_LEVELS)),
+                 ('best', lambda book: book.best())]
+
+    print(f'{SNAPSHOT_LEVELS} levels per side, {NUM_UPDATES} updates, {LEVELS_PER_UPDATE} levels per update')
+    print(f'{"read":<10} {"dict + sort":>16} {"price levels":>16} {"speedup":>9}')
+    for name, read in scenarios:
+        old_rate, old_book = run(DictOrderBook, snapshot, updates, read)
+        new_rate, new_book = run(BenchOrderBook, snapshot, updates, read)
+        # both implementations have to end up with the same book
+        assert old_book.snapshot() == new_book.snapshot()
+        assert old_book.top(TOP_LEVELS) == new_book.top(TOP_LEVELS)
+        print(f'{name:<10} {old_rate:>12,.0f} u/s {new_rate:>12,.0f} u/s {new_rate / old_rate:>8.1f}x')
@@ -0,0 +1,104 @@
+"""Finds the throughput ceiling of the websocket clients against a local stand-in of their exchange.
+
+The stand-in server (see exchanges.standin) runs in a separate process, so it does not share
+the interpreter lock with the client. The client subscribes to the order books and trades
+of all markets of the stand-in, and the markets tick at increasing rates up to saturation,
+where the server sends as fast as the client reads. For every rate it prints
+    frames/s    the frames sent by the server per second
+    updates/s   the book and trade updates delivered to the handlers of the client per second
+    resyncs     the books resynced during the measurement (they should stay at 0)
+The client keeps up while the updates follow the frames, the frames/s at saturation is its ceiling.
+
+Run from the project root:
+    PYTHONPATH=$(pwd) python3 tests/benchmarks/benchmark_standin.py
+"""
+import time
+from multiprocessing import Process, Pipe
+
+from exchanges.standin.server import SATURATION
+from exchanges.standin.binance import BinanceStandin
+from exchanges.standin.bitfinex import BitfinexStandin
+from exchanges.WS.binance import BinanceWSClient
+from exchanges.WS.bitfinex import BitfinexWSClient
+from exchanges.WS.transport import ASYNCIO_ENGINE
+
+
+RATES    = [10, 100, 500, 1000, 5000, SATURATION]   # ticks per second of every market
+DURATION = 3        # seconds of a measurement
+WARMUP   = 1        # seconds before a measurement, so the client catches up with the new rate
+
+
+def serve(standin, connection):
+    """Runs a stand-in server in a process, controlled by the commands received on a pipe:
+    ('rate', rate), ('stats',) and ('stop',)
+    """
+    with standin(rate=RATES[0]) as server:
+        connection.send((server.ws_uri, server.rest_uri))
+        while True:
+            command = connection.recv()
+            if command[0] == 'rate':
+                server.set_rate(command[1])
+            elif command[0] == 'stats':
+                connection.send(server.stats())
+            else:
+                break
+
+
+def binance_client(ws_uri, rest_uri, handler):
+    client = BinanceWSClient(engine=ASYNCIO_ENGINE, stream_uri=ws_uri, rest_uri=rest_uri)
+    client.connect()
+    for symbol, _, _ in BinanceStandin.SYMBOLS:
+        client.subscribe_order_book(symbol, update_handler=handler)
+        client.subscribe_trades(symbol, update_handler=handler)
+    return client
+
+
+def bitfinex_client(ws_uri, rest_uri, handler):
+    client = BitfinexWSClient(engine=ASYNCIO_ENGINE, uri=ws_uri)
+    client.connect()
+    for symbol, _, _ in BitfinexStandin.SYMBOLS:
+        client.subscribe_order_book(symbol, update_handler=handler)
+        client.subscribe_trades(symbol, update_handler=handler)
+    return client
+
+
+def resyncs(client):
+    return sum(client.get_resyncs().values())
+
+
+def benchmark(standin, create_client):
+    connection, child = Pipe()
+    process = Process(target=serve, args=(standin, child))
+    process.daemon = True
+    process.start()
+    ws_uri, rest_uri = connection.recv()
+
+    updates = [0]
+
+    def handler(*args, **kwargs):
+        updates[0] += 1
+
+    client = create_client(ws_uri, rest_uri, handler)
+    print('\n{} ({} markets)'.format(standin.name(), len(standin.SYMBOLS)))
+    print('{:>12} {:>12} {:>12} {:>8}'.format('ticks/s', 'frames/s', 'updates/s', 'resyncs'))
+    try:
+        for rate in RATES:
+            connection.send(('rate', rate))
+            time.sleep(WARMUP)
+            connection.send(('stats',))
+            frames, received, resynced = connection.recv()['frames'], updates[0], resyncs(client)
+            time.sleep(DURATION)
+            connection.send(('stats',))
+            frames = connection.recv()['frames'] - frames
+            print('{:>12} {:>12.0f} {:>12.0f} {:>8}'.format('max' if rate is SATURATION else rate,
+                                                            frames / DURATION, (updates[0] - received) / DURATION,
+                                                            resyncs(client) - resynced))
+    finally:
+        client.disconnect()
+        connection.send(('stop',))
+        process.join(5)
+
+
+if __name__ == '__main__':
+    benchmark(BinanceStandin, binance_client)
+    benchmark(BitfinexStandin, bitfinex_client)
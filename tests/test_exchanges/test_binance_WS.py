@@ -1,7 +1,9 @@
 import unittest
+import json
 from os import path
 import time
 from collections import OrderedDict, deque
+import numpy as np
 from exchanges.WS.binance import *
 
 
@@ -39,10 +41,93 @@ class BinanceWSDataTestCase(unittest.TestCase):
                               })
         self.assertListEqual(binance_ticker.data, [0.0024, 10, 0.0026, 100, 0.0015, 250.0, 0.0025, 10000, 0.0025, 0.001])
         snapshot = binance_ticker.snapshot()
-        self.assertIs(type(snapshot), list)
+        self.assertIs(type(snapshot), Ticker)
         self.assertListEqual(snapshot, [0.0024, 10, 0.0026, 100, 0.0015, 250.0, 0.0025, 10000, 0.0025, 0.001])
 
 
+    def test_binance_all_tickers(self):
+        received = []
+        subscription = bus.subscribe(received.append, signal='!ticker@arr', sender='binance')
+        tickers = BinanceAllTickers('!ticker@arr')
+        self.assertIs(type(tickers.table), TickerTable)
+        message = [{'s': symbol, 'b': '0.0024', 'B': '10', 'a': '0.0026', 'A': '100', 'p': '0.0015',
+                    'P': '250.0', 'c': price, 'v': '10000', 'h': '0.0025', 'l': '0.001'}
+                   for symbol, price in [('BNBBTC', '0.0025'), ('ETHBTC', '0.03')]]
+        tickers.update(message)
+        message[1]['c'] = '0.031'
+        tickers.update(message)
+        # an unchanged message is not published
+        tickers.update(message)
+        subscription.cancel()
+
+        self.assertEqual(len(received), 2)
+        self.assertListEqual(received[0][0], ['BNBBTC', 'ETHBTC'])
+        # only the changed ticker is published
+        symbols, values = received[1]
+        self.assertListEqual(symbols, ['ETHBTC'])
+        self.assertIs(type(values), np.ndarray)
+        self.assertListEqual(values.tolist(), [[0.0024, 10, 0.0026, 100, 0.0015, 250.0, 0.031, 10000, 0.0025, 0.001]])
+        symbols, values = tickers.snapshot()
+        self.assertListEqual(symbols, ['BNBBTC', 'ETHBTC'])
+        self.assertEqual(values.shape, (2, 10))
+
+
+    def test_binance_mini_ticker(self):
+        ticker = BinanceMiniTicker('bnbbtc@miniTicker')
+        ticker.update({"e": "24hrMiniTicker", "E": 123456789, "s": "BNBBTC", "c": "0.0025", "o": "0.0020",
+                       "h": "0.0025", "l": "0.0010", "v": "10000", "q": "18"})
+        # the same ticker list as the full ticker, without the bid and ask
+        self.assertEqual(len(ticker.data), len(TICKER_KEYS))
+        self.assertTrue(all(np.isnan(ticker.data[:4])))
+        self.assertAlmostEqual(ticker.data[4], 0.0005)
+        self.assertAlmostEqual(ticker.data[5], 25.0)
+        self.assertListEqual(ticker.data[6:], [0.0025, 10000, 0.0025, 0.001])
+
+        tickers = BinanceAllMiniTickers('!miniTicker@arr')
+        message = [{"e": "24hrMiniTicker", "E": 1, "s": "BNBBTC", "c": "0.0025", "o": "0.0020",
+                    "h": "0.0025", "l": "0.0010", "v": "10000", "q": "18"}]
+        tickers.update(message)
+        received = []
+        subscription = bus.subscribe(received.append, signal='!miniTicker@arr', sender='binance')
+        # the unknown bid and ask do not make the ticker change
+        tickers.update(message)
+        subscription.cancel()
+        self.assertListEqual(received, [])
+        symbols, values = tickers.snapshot()
+        self.assertListEqual(symbols, ['BNBBTC'])
+        self.assertEqual(values[0, TICKER_FIELDS.index('last_price')], 0.0025)
+
+
+    def test_binance_partial_order_book(self):
+        received = []
+        subscription = bus.subscribe(received.append, signal=delta_signal('bnbbtc@depth5'), sender='binance')
+        book = BinancePartialOrderBook('bnbbtc@depth5')
+        book.update({"lastUpdateId": 160, "bids": [["0.0024", "10"], ["0.0023", "5"]],
+                     "asks": [["0.0026", "100"]]})
+        book.update({"lastUpdateId": 161, "bids": [["0.0024", "12"], ["0.0022", "1"]],
+                     "asks": [["0.0026", "100"]]})
+        # stale and unchanged books are not published
+        book.update({"lastUpdateId": 160, "bids": [], "asks": []})
+        book.update({"lastUpdateId": 162, "bids": [["0.0024", "12"], ["0.0022", "1"]],
+                     "asks": [["0.0026", "100"]]})
+        subscription.cancel()
+
+        self.assertEqual(len(received), 2)
+        self.assertEqual(received[0][0], 'delta')
+        self.assertDictEqual(dict(received[1][1]['bids']), {0.0024: 12.0, 0.0023: 0.0, 0.0022: 1.0})
+        self.assertListEqual(received[1][1]['asks'], [])
+        self.assertListEqual(list(book.snapshot()['bids'].items()), [(0.0022, 1.0), (0.0024, 12.0)])
+        self.assertEqual(book.lastUpdateId, 162)
+
+
+    def test_binance_agg_trades(self):
+        trades = BinanceAggTrades('bnbbtc@aggTrade', [])
+        trades.update({"e": "aggTrade", "E": 123456789, "s": "BNBBTC", "a": 26129, "p": "0.01633102",
+                       "q": "4.70443515", "f": 27781, "l": 27781, "T": 1498793709153, "m": True, "M": True})
+        self.assertListEqual(trades.trades[0], [1498793709153, -4.70443515, 0.01633102])
+        self.assertListEqual(trades.trades.records()['id'].tolist(), [26129])
+
+
     def test_binance_order_book_init(self):
         binance_book = BinanceOrderBook('dummy', {"lastUpdateId": 731076714,
                                                   "bids": [["9888.29000000", "0.45293400"],
@@ -54,7 +139,7 @@ class BinanceWSDataTestCase(unittest.TestCase):
                                                   })
         self.assertEqual(binance_book.name, 'dummy')
         self.assertEqual(binance_book.lastUpdateId, 731076714)
-        self.assertIs(type(binance_book.bids), dict)
+        self.assertIs(type(binance_book.bids), PriceLevels)
         self.assertIs(type(list(binance_book.bids.keys())[0]), float)
         self.assertIs(type(list(binance_book.bids.values())[-1]), float)
         self.assertIs(type(list(binance_book.asks.keys())[0]), float)
@@ -91,7 +176,7 @@ class BinanceWSDataTestCase(unittest.TestCase):
         # test if the old update is ignored
         binance_book.update(test_update)
         self.assertEqual(len(binance_book.bids), 3)
-        self.assertListEqual(list(binance_book.bids.values()), [0.452934, 0.058486, 0.02594])
+        self.assertListEqual(list(binance_book.bids.values()), [0.02594, 0.058486, 0.452934])
         self.assertEqual(len(binance_book.asks), 3)
         self.assertListEqual(list(binance_book.asks.keys()), [9889.41, 9890.44, 9890.79])
 
@@ -99,7 +184,7 @@ class BinanceWSDataTestCase(unittest.TestCase):
         test_update['u'] = 731076720
         binance_book.update(test_update)
         self.assertEqual(len(binance_book.bids), 4)
-        self.assertListEqual(list(binance_book.bids.values()), [0.452934, 1.34, 0.02594, 0.0432])
+        self.assertListEqual(list(binance_book.bids.values()), [0.02594, 1.34, 0.452934, 0.0432])
         # one price level from the asks should be removed (amount == 0)
         self.assertEqual(len(binance_book.asks), 2)
         self.assertRaises(KeyError, check_key, binance_book.bids, 9890.44)
@@ -155,13 +240,137 @@ class BinanceWSDataTestCase(unittest.TestCase):
         self.assertEqual(snapshot['asks'][9890.44], 0.028301)
 
 
+    def test_binance_order_book_sync(self):
+        snapshots = [{"lastUpdateId": 100,
+                      "bids": [["9888.29000000", "0.45293400"]],
+                      "asks": [["9889.41000000", "0.09927600"]]}]
+        binance_book = BinanceOrderBook('dummy', loader=lambda: snapshots[-1])
+        self.assertFalse(binance_book.synced)
+
+        def depth(first_id, last_id, bid):
+            return {"e": "depthUpdate", "U": first_id, "u": last_id, "b": [[bid, "1.00000000"]], "a": []}
+
+        # the events received before the snapshot are buffered
+        binance_book.update(depth(90, 95, "9888.20000000"))     # older than the snapshot
+        binance_book.update(depth(96, 102, "9888.21000000"))    # contains the snapshot
+        binance_book.update(depth(103, 105, "9888.22000000"))
+        self.assertEqual(len(binance_book.bids), 0)
+        binance_book.load()
+        self.assertTrue(binance_book.synced)
+        self.assertEqual(binance_book.lastUpdateId, 105)
+        self.assertListEqual(binance_book.bids.keys(), [9888.21, 9888.22, 9888.29])
+
+        # the events have to continue where the previous one ended
+        binance_book.update(depth(106, 107, "9888.23000000"))
+        self.assertEqual(binance_book.lastUpdateId, 107)
+        self.assertEqual(binance_book.resyncs, 0)
+
+        # a gap starts the resync in the background, the book is kept until the new snapshot is ready
+        snapshots.append({"lastUpdateId": 120,
+                          "bids": [["9888.30000000", "0.5"]],
+                          "asks": [["9889.40000000", "0.1"]]})
+        binance_book.update(depth(110, 112, "9888.24000000"))
+        self.assertEqual(binance_book.resyncs, 1)
+        binance_book.update(depth(113, 121, "9888.25000000"))
+        for _ in range(50):
+            if binance_book.synced:
+                break
+            time.sleep(0.1)
+        self.assertTrue(binance_book.synced)
+        self.assertEqual(binance_book.lastUpdateId, 121)
+        self.assertListEqual(binance_book.bids.keys(), [9888.25, 9888.3])
+        self.assertListEqual(binance_book.asks.keys(), [9889.4])
+
+
+    def test_binance_order_book_initial_load(self):
+        # the first snapshot predates the buffered events, the load is retried without counting a resync
+        snapshots = [{"lastUpdateId": 100, "bids": [["9888.29000000", "0.5"]], "asks": [["9889.41000000", "0.1"]]}]
+        binance_book = BinanceOrderBook('dummy', loader=lambda: snapshots.pop(0) if len(snapshots) > 1 else snapshots[0])
+        binance_book.update({"e": "depthUpdate", "U": 105, "u": 106, "b": [["9888.25000000", "1.0"]], "a": []})
+        snapshots.append({"lastUpdateId": 105, "bids": [["9888.30000000", "0.5"]], "asks": [["9889.40000000", "0.1"]]})
+        binance_book.load()
+        for _ in range(50):
+            if binance_book.synced:
+                break
+            time.sleep(0.1)
+        self.assertTrue(binance_book.synced)
+        self.assertEqual(binance_book.lastUpdateId, 106)
+        self.assertEqual(binance_book.resyncs, 0)
+
+    def test_binance_order_book_load_before_events(self):
+        # the snapshot is requested only after the first diff event is buffered
+        loaded = []
+        snapshots = [{"lastUpdateId": 100, "bids": [["9888.29000000", "0.5"]], "asks": [["9889.41000000", "0.1"]]}]
+        binance_book = BinanceOrderBook('dummy', loader=lambda: loaded.append(True) or snapshots[-1])
+        binance_book.EVENT_TIMEOUT = 0.1
+        binance_book.load()
+        self.assertFalse(binance_book.synced)
+        self.assertListEqual(loaded, [])
+        binance_book.update({"e": "depthUpdate", "U": 98, "u": 102, "b": [["9888.25000000", "1.0"]], "a": []})
+        for _ in range(50):
+            if binance_book.synced:
+                break
+            time.sleep(0.1)
+        self.assertTrue(binance_book.synced)
+        self.assertEqual(binance_book.lastUpdateId, 102)
+        binance_book.update({"e": "depthUpdate", "U": 103, "u": 104, "b": [], "a": []})
+        self.assertEqual(binance_book.resyncs, 0)
+
+        # the event revealing a gap is applied on top of the next snapshot, if it contains it
+        snapshots.append({"lastUpdateId": 120, "bids": [["9888.30000000", "0.5"]], "asks": [["9889.40000000", "0.1"]]})
+        binance_book.update({"e": "depthUpdate", "U": 110, "u": 125, "b": [["9888.26000000", "1.0"]], "a": []})
+        self.assertEqual(binance_book.resyncs, 1)
+        for _ in range(50):
+            if binance_book.synced:
+                break
+            time.sleep(0.1)
+        self.assertTrue(binance_book.synced)
+        self.assertEqual(binance_book.lastUpdateId, 125)
+        self.assertListEqual(binance_book.bids.keys(), [9888.26, 9888.3])
+        self.assertEqual(binance_book.resyncs, 1)
+
+    def test_binance_order_book_reload(self):
+        snapshots = [{"lastUpdateId": 100, "bids": [["9888.29000000", "0.5"]], "asks": [["9889.41000000", "0.1"]]}]
+        binance_book = BinanceOrderBook('dummy', loader=lambda: snapshots[-1])
+        binance_book.update({"e": "depthUpdate", "U": 95, "u": 100, "b": [], "a": []})
+        binance_book.load()
+        self.assertTrue(binance_book.synced)
+
+        # the stream was reopened, the book is resynchronized with the events received since then
+        snapshots.append({"lastUpdateId": 130, "bids": [["9888.30000000", "0.5"]], "asks": [["9889.40000000", "0.1"]]})
+        binance_book.reload()
+        self.assertEqual(binance_book.resyncs, 1)
+        binance_book.update({"e": "depthUpdate", "U": 125, "u": 131, "b": [["9888.25000000", "1.0"]], "a": []})
+        for _ in range(50):
+            if binance_book.synced:
+                break
+            time.sleep(0.1)
+        self.assertTrue(binance_book.synced)
+        self.assertEqual(binance_book.lastUpdateId, 131)
+        self.assertListEqual(binance_book.bids.keys(), [9888.25, 9888.3])
+
+
+    def test_binance_order_book_gap_without_loader(self):
+        binance_book = BinanceOrderBook('dummy', {"lastUpdateId": 100, "bids": [], "asks": []})
+        self.assertTrue(binance_book.synced)
+        self.assertRaises(WSException, binance_book.update, {"U": 105, "u": 110, "b": [], "a": []})
+
+    def test_binance_order_book_invalid_update(self):
+        binance_book = BinanceOrderBook('dummy', {"lastUpdateId": 100, "bids": [], "asks": []})
+        # the update fails after a level was set, it is ended anyway and the snapshots are taken again
+        self.assertRaises(WSException, binance_book.update,
+                          {"U": 101, "u": 101, "b": [["1.0", "1.0"], ["invalid", "1.0"]], "a": []})
+        self.assertFalse(binance_book.version & 1)
+        self.assertEqual(binance_book.versioned_snapshot()[0], binance_book.version)
+
+
     def test_binance_trades_init(self):
         binance_trades = BinanceTrades('dummy', [[1561150152842, "9869.99000000", "0.01023900", "buy"],
                                                  [1561150152854, "9868.52000000", "0.00202600", "sell"],
                                                  [1561150152913, "9869.99000000", "0.03398600", "buy"],
                                                  [1561150152913, "9870.00000000", "0.01147900", "buy"]])
         self.assertEqual(binance_trades.name, 'dummy')
-        self.assertIs(type(binance_trades.trades), deque)
+        self.assertIs(type(binance_trades.trades), TradeTape)
         self.assertIs(type(binance_trades.trades[0]), list)
         self.assertEqual(len(binance_trades.trades[0]), 3)
         self.assertIs(type(binance_trades.trades[0][0]), int)
@@ -217,7 +426,7 @@ class BinanceWSDataTestCase(unittest.TestCase):
         snapshot = binance_trades.snapshot()
         self.assertIs(type(snapshot), tuple)
         self.assertEqual(snapshot[0], 'snapshot')
-        self.assertIs(type(snapshot[1]), list)
+        self.assertIs(type(snapshot[1]), np.ndarray)
         snapshot_data = snapshot[1]
         self.assertEqual(len(snapshot_data), 5)
         for i in range(len(snapshot_data)-1):
@@ -225,6 +434,38 @@ class BinanceWSDataTestCase(unittest.TestCase):
                             'Order of trades violated for i = {}'.format(i))
 
 
+    def test_binance_trades_patch(self):
+        received = []
+        handler = lambda data: received.append(data)
+        subscription = bus.subscribe(handler, signal='dummy', sender='binance')
+        binance_trades = BinanceTrades('dummy', [[1561150152842, "9869.99000000", "0.01023900", "buy"],
+                                                 [1561150152854, "9868.52000000", "0.00202600", "sell"]])
+        # the REST trades overlap the kept ones
+        binance_trades.patch([[1561150152854, "9868.52000000", "0.00202600", "sell"],
+                              [1561150152900, "9869.00000000", "0.10000000", "sell"],
+                              [1561150152913, "9870.00000000", "0.20000000", "buy"]])
+        self.assertListEqual(received, [('batch', [[1561150152900, -0.1, 9869.0], [1561150152913, 0.2, 9870.0]])])
+        self.assertEqual(len(binance_trades.trades), 4)
+        self.assertEqual(binance_trades.trades[0][0], 1561150152913)
+
+        # the stream updates already included in the patch are dropped
+        trade = {"e": "trade", "p": "9870.00000000", "q": "0.20000000", "T": 1561150152913, "m": False}
+        binance_trades.update(trade)
+        self.assertEqual(len(binance_trades.trades), 4)
+        binance_trades.update(dict(trade, T=1561150152950))
+        self.assertEqual(len(binance_trades.trades), 5)
+        self.assertEqual(received[-1], ('update', [1561150152950, 0.2, 9870.0]))
+
+        # only the trades matching the kept ones of the same time are duplicates
+        binance_trades.patch([[1561150152950, "9870.00000000", "0.20000000", "buy"],
+                              [1561150152950, "9871.00000000", "0.30000000", "buy"]])
+        self.assertEqual(received[-1], ('batch', [[1561150152950, 0.3, 9871.0]]))
+        binance_trades.update(dict(trade, p="9871.00000000", q="0.30000000", T=1561150152950))
+        binance_trades.update(dict(trade, T=1561150152950))
+        self.assertEqual(len(binance_trades.trades), 7)
+        subscription.cancel()
+
+
     def test_binance_candles_init(self):
         binance_candles = BinanceCandles('dummy',
             [[1561239960000, "10623.26000000", "10625.00000000", "10620.10000000", "10623.05000000",
@@ -236,7 +477,7 @@ class BinanceWSDataTestCase(unittest.TestCase):
              [1561240140000, "10625.34000000", " 10632.10000000", "10617.36000000", "10626.14000000",
               "21.55120200", 1561240199999, "228973.71734709", 297, "10.58820700", "112507.52908365", "0"]])
         self.assertEqual(binance_candles.name, 'dummy')
-        self.assertIs(type(binance_candles.candles), deque)
+        self.assertIs(type(binance_candles.candles), CandleBuffer)
         self.assertIs(type(binance_candles.candles[0]), list)
         self.assertEqual(len(binance_candles.candles[0]), 6)
         self.assertIs(type(binance_candles.candles[0][0]), int)
@@ -325,7 +566,7 @@ class BinanceWSDataTestCase(unittest.TestCase):
         snapshot = binance_candles.snapshot()
         self.assertIs(type(snapshot), tuple)
         self.assertEqual(snapshot[0], 'snapshot')
-        self.assertIs(type(snapshot[1]), list)
+        self.assertIs(type(snapshot[1]), np.ndarray)
         snapshot_data = snapshot[1]
         self.assertEqual(len(snapshot_data), 5)
         for i in range(len(snapshot_data)-1):
@@ -333,6 +574,230 @@ class BinanceWSDataTestCase(unittest.TestCase):
                             'Order of trades violated for i = {}'.format(i))
 
 
+    def test_binance_candles_patch(self):
+        received = []
+        handler = lambda data: received.append(data)
+        subscription = bus.subscribe(handler, signal='dummy', sender='binance')
+        binance_candles = BinanceCandles('dummy',
+            [[1561239960000, "10623.26000000", "10625.00000000", "10620.10000000", "10623.05000000",
+              "11.95821200", 1561240019999, "127042.21574730", 179, "5.70639000", "60626.14985316", "0"],
+             [1561240020000, "10624.90000000", "10625.48000000", "10620.10000000", "10625.48000000",
+              "10.43007700", 1561240079999, "110800.04655437", 167, "6.23521700", "66242.40878971", "0"]])
+        snapshot = binance_candles.snapshot()[1]
+        # the candles are published after the update, the listeners can take a snapshot
+        versions = []
+        versions_subscription = bus.subscribe(lambda data: versions.append(binance_candles.versioned_snapshot()[0]),
+                                              signal='dummy', sender='binance')
+        binance_candles.patch(
+            [[1561239960000, "10623.26000000", "10625.00000000", "10620.10000000", "10623.05000000",
+              "11.95821200", 1561240019999, "127042.21574730", 179, "5.70639000", "60626.14985316", "0"],
+             [1561240020000, "10624.90000000", "10630.00000000", "10620.10000000", "10629.00000000",
+              "12.00000000", 1561240079999, "110800.04655437", 167, "6.23521700", "66242.40878971", "0"],
+             [1561240080000, "10629.00000000", "10633.25000000", "10622.73000000", "10625.31000000",
+              "10.44544800", 1561240139999, "111003.83256628", 232, "6.08958800", "64717.90785306", "0"]])
+        # the older candles are skipped, the last kept one is updated and the new one is added
+        self.assertListEqual(received, [('update', [1561240020000, 10624.9, 10630.0, 10620.1, 10629.0, 12.0]),
+                                        ('add', [1561240080000, 10629.0, 10633.25, 10622.73, 10625.31, 10.445448])])
+        self.assertEqual(len(binance_candles.candles), 3)
+        # the snapshot taken before does not follow the updates of the last candle
+        self.assertEqual(snapshot[-1][2], 10625.48)
+        self.assertListEqual(versions, [binance_candles.version] * 2)
+        self.assertFalse(binance_candles.version & 1)
+        versions_subscription.cancel()
+        subscription.cancel()
+
+
+class BinanceWSRotationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.client = BinanceWSClient(multiplex=True)
+        streams = ['bnbbtc@depth', 'bnbbtc@trade']
+        self.old = BinanceStreamConnection('old', streams, self.client._on_stream_message, self.client.logger)
+        self.new = BinanceStreamConnection('new', streams, self.client._on_stream_message, self.client.logger)
+        self.client._pool.append(self.old)
+        self.client._data['bnbbtc@depth'] = BinanceOrderBook('bnbbtc@depth', {"lastUpdateId": 100,
+                                                                               "bids": [["1.0", "1.0"]],
+                                                                               "asks": [["2.0", "1.0"]]})
+        self.client._data['bnbbtc@trade'] = BinanceTrades('bnbbtc@trade', [[1000, "1.5", "1.0", "buy"]])
+        for stream in streams:
+            self.client._connections[stream] = self.old
+        self.client._rotations[self.new] = self.old
+
+    def tearDown(self):
+        self.client._stop_logger()
+
+    @staticmethod
+    def depth(first_id, last_id):
+        return json.dumps({"stream": "bnbbtc@depth",
+                           "data": {"e": "depthUpdate", "E": 1, "s": "BNBBTC", "U": first_id, "u": last_id,
+                                    "b": [["1.0", str(last_id)]], "a": []}})
+
+    @staticmethod
+    def trade(trade_time, trade_id=None):
+        return json.dumps({"stream": "bnbbtc@trade",
+                           "data": {"e": "trade", "E": 1, "s": "BNBBTC", "t": trade_id or trade_time,
+                                    "p": "1.5", "q": "1.0",
+                                    "b": 1, "a": 2, "T": trade_time, "m": False, "M": True}})
+
+    def test_book_switch(self):
+        book = self.client._data['bnbbtc@depth']
+        # the replacement is ahead of the book, so its events would leave a gap
+        self.new._handle_message(self.depth(103, 105))
+        self.assertEqual(book.lastUpdateId, 100)
+        self.old._handle_message(self.depth(101, 102))
+        self.assertEqual(book.lastUpdateId, 102)
+        # the replacement continues the book, the stream is switched to it
+        self.new._handle_message(self.depth(103, 105))
+        self.assertEqual(book.lastUpdateId, 105)
+        self.assertIs(self.client._connections['bnbbtc@depth'], self.new)
+        self.old._handle_message(self.depth(106, 107))
+        self.assertEqual(book.lastUpdateId, 105)
+        self.assertEqual(book.resyncs, 0)
+
+    def test_trades_switch(self):
+        trades = self.client._data['bnbbtc@trade']
+        self.new._handle_message(self.trade(1100))
+        self.old._handle_message(self.trade(1100))
+        # the replacement caught up with the trades, the trade received from both connections is kept once
+        self.new._handle_message(self.trade(1100))
+        self.assertIs(self.client._connections['bnbbtc@trade'], self.new)
+        self.new._handle_message(self.trade(1200))
+        self.old._handle_message(self.trade(1300))
+        self.assertListEqual([trade[0] for trade in trades.trades], [1200, 1100, 1000])
+
+    def test_trades_switch_same_time(self):
+        trades = self.client._data['bnbbtc@trade']
+        self.old._handle_message(self.trade(1100, 1))
+        self.new._handle_message(self.trade(1100, 1))
+        self.assertIs(self.client._connections['bnbbtc@trade'], self.new)
+        # the trades of the replacement at the time of the last trade are not duplicates
+        self.new._handle_message(self.trade(1100, 2))
+        self.assertListEqual([trade[0] for trade in trades.trades], [1100, 1100, 1000])
+        self.assertEqual(trades.trades.last_id, 2)
+
+
+class BinanceWSRedundancyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.client = BinanceWSClient()
+        self.stream = 'bnbbtc@trade'
+        self.client._data[self.stream] = BinanceTrades(self.stream, [])
+        self.client._subscriptions[self.stream] = None
+        self.client._redundant[self.stream] = Deduplicator()
+        self.client._standby = BinanceStreamConnection('binance-standby', [self.stream],
+                                                       self.client._on_standby_message, self.client.logger)
+
+    def tearDown(self):
+        self.client._stop_logger()
+
+    @staticmethod
+    def trade(trade_id):
+        return json.dumps({"e": "trade", "E": 1, "s": "BNBBTC", "t": trade_id, "p": "1.5", "q": "1.0",
+                           "b": 1, "a": 2, "T": 1000 + trade_id, "m": False, "M": True})
+
+    def test_first_arrival(self):
+        self.client._handle_message(self.stream, self.trade(1))
+        self.client._standby._handle_message('{"stream":"%s","data":%s}' % (self.stream, self.trade(1)))
+        self.client._standby._handle_message('{"stream":"%s","data":%s}' % (self.stream, self.trade(2)))
+        self.client._handle_message(self.stream, self.trade(2))
+        self.assertListEqual([trade[0] for trade in self.client._data[self.stream].trades], [1002, 1001])
+        self.assertDictEqual(self.client.get_redundancy()[self.stream]['wins'], {PRIMARY: 1, STANDBY: 1})
+        self.assertRaises(ExchangeException, self.client.add_standby, 'ethbtc@trade')
+
+    def test_remove_standby(self):
+        standby = self.client._standby
+        self.client._remove_standby(self.stream)
+        self.assertIsNone(self.client._standby)
+        # the messages of the closed standby connection are not used anymore
+        standby._handle_message('{"stream":"%s","data":%s}' % (self.stream, self.trade(1)))
+        self.client._handle_message(self.stream, self.trade(1))
+        self.assertEqual(len(self.client._data[self.stream].trades), 1)
+
+
+class BinanceWSProfileTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.client = BinanceWSClient()
+
+    def tearDown(self):
+        self.client._stop_logger()
+
+    def test_profile_streams(self):
+        self.assertEqual(self.client._profile_stream('book', FULL_PROFILE), '@depth')
+        self.assertEqual(self.client._profile_stream('trades', OVERVIEW_PROFILE), '@aggTrade')
+        self.assertEqual(self.client._profile_stream('all_tickers', MINIMAL_PROFILE), '!miniTicker@arr')
+        self.assertRaises(ExchangeException, self.client.subscribe_trades, 'BNBBTC', profile='unknown')
+        self.assertRaises(ExchangeException, self.client.subscribe_order_book, 'BNBBTC', profile='unknown')
+
+    def test_message_rates(self):
+        stream = 'bnbbtc@aggTrade'
+        self.client._data[stream] = BinanceAggTrades(stream, [])
+        self.client._add_meter(stream, OVERVIEW_PROFILE)
+        for trade_id in range(3):
+            self.client._handle_message(stream, json.dumps({"e": "aggTrade", "E": 1, "s": "BNBBTC", "a": trade_id,
+                                                            "p": "1.5", "q": "1.0", "f": 1, "l": 1,
+                                                            "T": 1000 + trade_id, "m": False, "M": True}))
+        self.assertEqual(len(self.client._data[stream].trades), 3)
+        rates = self.client.get_message_rates()
+        self.assertListEqual(list(rates), [OVERVIEW_PROFILE])
+        self.assertEqual(rates[OVERVIEW_PROFILE]['messages'], 3)
+        self.assertEqual(rates[OVERVIEW_PROFILE]['streams'][stream]['messages'], 3)
+        self.assertGreater(rates[OVERVIEW_PROFILE]['rate'], 0)
+
+
+class BinanceWSEventTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.client = BinanceWSClient()
+        self.received = []
+        self.subscriptions = []
+
+    def tearDown(self):
+        for subscription in self.subscriptions:
+            subscription.cancel()
+        self.client._stop_logger()
+
+    def subscribe(self, stream, data):
+        self.client._data[stream] = data
+        self.subscriptions.append(bus.subscribe(self.received.append, signal=stream, sender='binance'))
+
+    def test_trade_event(self):
+        self.subscribe('bnbbtc@trade', BinanceTrades('bnbbtc@trade', []))
+        self.client._handle_message('bnbbtc@trade', '{"e":"trade","E":1561150152900,"s":"BNBBTC","t":12345,'
+                                                    '"p":"0.001","q":"100","b":88,"a":50,"T":1561150152842,'
+                                                    '"m":true,"M":true}')
+        kind, trade = self.received[-1]
+        self.assertEqual(kind, 'update')
+        self.assertIsInstance(trade, Trade)
+        self.assertListEqual(trade, [1561150152842, -100.0, 0.001])
+        self.assertEqual(trade.price, 0.001)
+        self.assertEqual(trade.trade_id, 12345)
+        self.assertEqual(trade.seq, 12345)
+        self.assertIsNotNone(trade.receive_ts)
+
+    def test_ticker_and_candle_events(self):
+        self.subscribe('bnbbtc@miniTicker', BinanceMiniTicker('bnbbtc@miniTicker'))
+        self.client._route('bnbbtc@miniTicker', {"e": "24hrMiniTicker", "E": 1561150152900, "s": "BNBBTC",
+                                                 "c": "0.0025", "o": "0.0020", "h": "0.0025", "l": "0.0010",
+                                                 "v": "10000", "q": "18"})
+        ticker = self.received[-1]
+        self.assertIsInstance(ticker, Ticker)
+        self.assertEqual(ticker[6], ticker.last_price)
+        self.assertEqual(ticker.exchange_ts, 1561150152900)
+        self.assertIsNone(ticker.seq)
+
+        self.subscribe('bnbbtc@kline_1m', BinanceCandles('bnbbtc@kline_1m', [[1561150140000, '1', '2', '0.5', '1.5',
+                                                                               '10']]))
+        self.client._route('bnbbtc@kline_1m', {"e": "kline", "E": 1561150152900, "s": "BNBBTC",
+                                               "k": {"t": 1561150140000, "o": "1", "c": "1.6", "h": "2",
+                                                     "l": "0.5", "v": "12"}})
+        kind, candle = self.received[-1]
+        self.assertEqual(kind, 'update')
+        self.assertIsInstance(candle, Candle)
+        self.assertEqual(candle.close, 1.6)
+        self.assertEqual(candle.as_dict()['exchange_ts'], 1561150152900)
+
+
 class BinanceWSPublicClientTestCase(unittest.TestCase):
     client = None
 
@@ -360,7 +825,7 @@ class BinanceWSPublicClientTestCase(unittest.TestCase):
         stream, snapshot  = self.client.subscribe_ticker('BNBBTC', update_handler=handle_update)
         ticker = self.client._data[stream]
         self.assertIsNotNone(ticker)
-        self.assertIs(type(ticker.data), list)
+        self.assertIsInstance(ticker.data, list)
         self.assertEqual(len(self.client._subscriptions), 1)
 
         # test that the second subscriber will reuse the stream already used by the first subscriber
@@ -384,7 +849,7 @@ class BinanceWSPublicClientTestCase(unittest.TestCase):
         stream, snapshot  = self.client.subscribe_order_book('BNBBTC', update_handler=handle_update)
         book = self.client._data[stream]
         self.assertIsNotNone(book)
-        self.assertIs(type(book.asks), dict)
+        self.assertIs(type(book.asks), PriceLevels)
         self.assertEqual(len(self.client._subscriptions), 1)
         self.assertTrue('asks' in snapshot.keys())
         self.assertTrue('bids' in snapshot.keys())
@@ -412,7 +877,7 @@ class BinanceWSPublicClientTestCase(unittest.TestCase):
         stream, snapshot  = self.client.subscribe_trades('BNBBTC', update_handler=handle_update)
         trades = self.client._data[stream]
         self.assertIsNotNone(trades)
-        self.assertIs(type(trades.trades), deque)
+        self.assertIs(type(trades.trades), TradeTape)
         self.assertEqual(len(self.client._subscriptions), 1)
         self.assertTrue(len(snapshot) > 0)
 
@@ -437,7 +902,7 @@ class BinanceWSPublicClientTestCase(unittest.TestCase):
         stream, snapshot  = self.client.subscribe_candles('BNBBTC', update_handler=handle_update)
         candles = self.client._data[stream]
         self.assertIsNotNone(candles)
-        self.assertIs(type(candles.candles), deque)
+        self.assertIs(type(candles.candles), CandleBuffer)
         self.assertEqual(len(self.client._subscriptions), 1)
         self.assertTrue(len(snapshot) > 0)
 
@@ -453,6 +918,59 @@ class BinanceWSPublicClientTestCase(unittest.TestCase):
         self.assertEqual(len(self.client._data), 0)
 
 
+class BinanceWSMultiplexedClientTestCase(unittest.TestCase):
+    client = None
+
+    @staticmethod
+    def handle_info(sender, data):
+        pass
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.client = BinanceWSClient(multiplex=True, max_streams=2)
+        cls.client.connect(BinanceWSMultiplexedClientTestCase.handle_info)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        time.sleep(2)
+        cls.client.disconnect()
+
+
+    def test_stream_routing(self):
+        self.client._data['ethbtc@ticker'] = BinanceTicker('ethbtc@ticker')
+        self.client._on_stream_message(json.dumps({
+            "stream": "ethbtc@ticker",
+            "data": {"e": "24hrTicker", "s": "ETHBTC", "p": "0.0015", "P": "250.00", "c": "0.0025",
+                     "b": "0.0024", "B": "10", "a": "0.0026", "A": "100", "h": "0.0025", "l": "0.0010",
+                     "v": "10000"}
+        }))
+        # responses to subscription requests are not routed to streams
+        self.client._on_stream_message(json.dumps({"result": None, "id": 1}))
+        self.assertListEqual(self.client._data['ethbtc@ticker'].data,
+                             [0.0024, 10, 0.0026, 100, 0.0015, 250.0, 0.0025, 10000, 0.0025, 0.001])
+        self.client._data.pop('ethbtc@ticker')
+
+
+    def test_sharding(self):
+        # two streams share the first connection
+        stream1, _ = self.client.subscribe_ticker('BNBBTC')
+        stream2, _ = self.client.subscribe_ticker('ETHBTC')
+        self.assertEqual(len(self.client._pool), 1)
+        self.assertIs(self.client._connections[stream1], self.client._connections[stream2])
+        # the third stream exceeds max_streams and opens a new connection
+        stream3, _ = self.client.subscribe_ticker('LTCBTC')
+        self.assertEqual(len(self.client._pool), 2)
+        time.sleep(2)
+
+        # unsubscribing all streams of a connection closes it
+        self.client.unsubscribe(stream3)
+        self.assertEqual(len(self.client._pool), 1)
+        self.client.unsubscribe(stream1)
+        self.client.unsubscribe(stream2)
+        self.assertEqual(len(self.client._pool), 0)
+        self.assertEqual(len(self.client._subscriptions), 0)
+
+
 class BinanceWSAuthenticatedClientTestCase(unittest.TestCase):
     client = None
 
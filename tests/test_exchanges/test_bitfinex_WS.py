@@ -1,8 +1,13 @@
 import unittest
 import time
+import json
+import zlib
+from threading import Thread
 from os import path
 from collections import OrderedDict, deque
+import numpy as np
 from exchanges.WS.bitfinex import *
+from exchanges.WS.marketdata import BookDelta
 
 
 class BitfinexWSDataTestCase(unittest.TestCase):
@@ -15,7 +20,7 @@ class BitfinexWSDataTestCase(unittest.TestCase):
         self.assertListEqual(bfx_ticker.data, [9074, 22.465169779999997, 9074.1, 30.91619495, -308.9,
                                                -0.0329, 9074.1, 12269.91735779, 9490, 8956.2])
         snapshot = bfx_ticker.snapshot()
-        self.assertIs(type(snapshot), list)
+        self.assertIs(type(snapshot), Ticker)
         self.assertListEqual(snapshot, [9074, 22.465169779999997, 9074.1, 30.91619495, -308.9,
                                         -0.0329, 9074.1, 12269.91735779, 9490, 8956.2])
 
@@ -24,7 +29,7 @@ class BitfinexWSDataTestCase(unittest.TestCase):
         bfx_book = BitfinexOrderBook('dummy', [[9085.7, 1, 0.5], [9085.4, 2, 0.1567], [9084.7, 1, 0.15],
                                                [9097, 2, -0.14315086], [9100.6, 1, -1.25], [9101, 1, -0.62]])
         self.assertEqual(bfx_book.name, 'dummy')
-        self.assertIs(type(bfx_book.bids), dict)
+        self.assertIs(type(bfx_book.bids), PriceLevels)
         self.assertIs(type(list(bfx_book.bids.keys())[0]), float)
         self.assertIs(type(list(bfx_book.bids.values())[-1]), float)
         self.assertIs(type(list(bfx_book.asks.keys())[0]), float)
@@ -91,7 +96,7 @@ class BitfinexWSDataTestCase(unittest.TestCase):
                                               [368737772, 1561056823759, 0.07130439, 9447.9],
                                               [368737773, 1561056823759, 0.03452574, 9448]])
         self.assertEqual(bfx_trades.name, 'dummy')
-        self.assertIs(type(bfx_trades.trades), deque)
+        self.assertIs(type(bfx_trades.trades), TradeTape)
         self.assertIs(type(bfx_trades.trades[0]), list)
         self.assertEqual(len(bfx_trades.trades[0]), 3)
         self.assertIs(type(bfx_trades.trades[0][0]), int)
@@ -123,12 +128,17 @@ class BitfinexWSDataTestCase(unittest.TestCase):
         snapshot = bfx_trades.snapshot()
         self.assertIs(type(snapshot), tuple)
         self.assertEqual(snapshot[0], 'snapshot')
-        self.assertIs(type(snapshot[1]), list)
+        self.assertIs(type(snapshot[1]), np.ndarray)
         snapshot_data = snapshot[1]
         self.assertEqual(len(snapshot_data), 5)
         for i in range(len(snapshot_data)-1):
             self.assertTrue(snapshot_data[i][0] >= snapshot_data[i+1][0],
                             'Order of trades violated for i = {}'.format(i))
+        # the snapshot is a copy, it is not changed by the following updates
+        self.assertFalse(np.shares_memory(snapshot_data, bfx_trades.trades.records()))
+        bfx_trades.update([368737792, 1561056830759, 0.5, 9445.0])
+        self.assertEqual(snapshot_data[0]['timestamp'], 1561056829759)
+        self.assertEqual(len(bfx_trades.snapshot()[1]), 6)
 
 
     def test_bitfinex_candles_init(self):
@@ -137,7 +147,7 @@ class BitfinexWSDataTestCase(unittest.TestCase):
                                                 [1561128120000, 9801.3, 9802.5, 9803.1, 9801.3, 0.77115941],
                                                 [1561128060000, 9805, 9802.6, 9807.05397991, 9800, 11.87870475]])
         self.assertEqual(bfx_candles.name, 'dummy')
-        self.assertIs(type(bfx_candles.candles), deque)
+        self.assertIs(type(bfx_candles.candles), CandleBuffer)
         self.assertIs(type(bfx_candles.candles[0]), list)
         self.assertEqual(len(bfx_candles.candles[0]), 6)
         self.assertIs(type(bfx_candles.candles[0][0]), int)
@@ -161,6 +171,19 @@ class BitfinexWSDataTestCase(unittest.TestCase):
                             'Order of candles violated for i = {}'.format(i))
 
 
+    def test_bitfinex_candles_resume(self):
+        bfx_candles = BitfinexCandles('dummy', [[1561128180000, 9802.1, 9808.5, 9811.5, 9797.1, 8.73577243],
+                                                [1561128120000, 9801.3, 9802.5, 9803.1, 9801.3, 0.77115941],
+                                                [1561128060000, 9805, 9802.6, 9807.05397991, 9800, 11.87870475]])
+        # the snapshot of a new subscription updates the last kept candle and adds the newer ones
+        bfx_candles.resume([[1561128240000, 9808.2, 9808.90200952, 9811.9, 9807, 1.14],
+                            [1561128180000, 9802.1, 9808.6, 9811.5, 9797.1, 9.0],
+                            [1561128120000, 9801.3, 9802.5, 9803.1, 9801.3, 0.77115941]])
+        self.assertEqual(len(bfx_candles.candles), 4)
+        self.assertListEqual(bfx_candles.candles[-2], [1561128180000, 9802.1, 9811.5, 9797.1, 9808.6, 9.0])
+        self.assertEqual(bfx_candles.candles[-1][0], 1561128240000)
+
+
     def test_bitfinex_candles_snapshot(self):
         bfx_candles = BitfinexCandles('dummy', [[1561128240000, 9808.2, 9808.90200952, 9811.9, 9807, 1.14],
                                                 [1561128180000, 9802.1, 9808.5, 9811.5, 9797.1, 8.73577243],
@@ -170,7 +193,7 @@ class BitfinexWSDataTestCase(unittest.TestCase):
         snapshot = bfx_candles.snapshot()
         self.assertIs(type(snapshot), tuple)
         self.assertEqual(snapshot[0], 'snapshot')
-        self.assertIs(type(snapshot[1]), list)
+        self.assertIs(type(snapshot[1]), np.ndarray)
         snapshot_data = snapshot[1]
         self.assertEqual(len(snapshot_data), 5)
         for i in range(len(snapshot_data)-1):
@@ -178,6 +201,368 @@ class BitfinexWSDataTestCase(unittest.TestCase):
                             'Order of trades violated for i = {}'.format(i))
 
 
+    def test_bitfinex_order_book_checksum(self):
+        bfx_book = BitfinexOrderBook('dummy', [[9085.7, 1, 0.5], [9085.4, 2, 0.1567], [9084, 1, 0.00001],
+                                               [9097, 2, -0.14315086], [9100.6, 1, -1.25]])
+        expected = zlib.crc32(b'9085.7:0.5:9097:-0.14315086:9085.4:0.1567:9100.6:-1.25:9084:0.00001')
+        expected = expected - (1 << 32) if expected >= (1 << 31) else expected
+        self.assertEqual(bfx_book.checksum(), expected)
+        self.assertTrue(bfx_book.verify(expected))
+        # only the top 25 levels of each side are covered
+        bfx_book.update([1000, 1, 1])
+        for i in range(25):
+            bfx_book.update([9200 + i, 1, -1])
+        top = BitfinexOrderBook('dummy', [[p, 1, a] for p, a in bfx_book.bids.top(25, descending=True)] +
+                                         [[p, 1, -a] for p, a in bfx_book.asks.top(25)])
+        bfx_book.update([9300, 1, -1])
+        self.assertEqual(bfx_book.checksum(), top.checksum())
+
+    def test_bitfinex_raw_order_book(self):
+        bfx_book = BitfinexRawOrderBook('dummy', [[101, 9085.7, 0.5], [102, 9085.7, 0.25], [103, 9085.4, 0.1567],
+                                                  [104, 9097, -0.14315086], [105, 9100.6, -1.25]])
+        self.assertEqual(len(bfx_book.orders), 5)
+        self.assertListEqual(bfx_book.bids.items(), [(9085.4, 0.1567), (9085.7, 0.75)])
+        self.assertListEqual(bfx_book.asks.items(), [(9097.0, 0.14315086), (9100.6, 1.25)])
+
+        received = []
+        handler = lambda data: received.append(data)
+        subscription = bus.subscribe(handler, signal=delta_signal('dummy'), sender='bitfinex')
+        try:
+            # an order moves to another price, an order is removed and a new one is added
+            bfx_book.update([[101, 9085.5, 0.5], [104, 0, -1], [106, 9098, -0.3]])
+        finally:
+            subscription.cancel()
+        self.assertListEqual(bfx_book.bids.items(), [(9085.4, 0.1567), (9085.5, 0.5), (9085.7, 0.25)])
+        self.assertListEqual(bfx_book.asks.items(), [(9098.0, 0.3), (9100.6, 1.25)])
+        self.assertEqual(len(received), 1)
+        self.assertListEqual(sorted(received[0][1]['bids']), [(9085.5, 0.5), (9085.7, 0.25)])
+        self.assertListEqual(sorted(received[0][1]['asks']), [(9097.0, 0.0), (9098.0, 0.3)])
+
+        # raw books are checksummed by the order ids
+        expected = zlib.crc32(b'102:0.25:106:-0.3:101:0.5:105:-1.25:103:0.1567')
+        expected = expected - (1 << 32) if expected >= (1 << 31) else expected
+        self.assertTrue(bfx_book.verify(expected))
+
+
+class FakeSocket(object):
+    """Records the messages sent by a connection instead of sending them to the exchange"""
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(json.loads(message))
+
+    def close(self):
+        pass
+
+
+def fake_connection(client):
+    """Creates an open client connection with a FakeSocket"""
+    connection = client._new_connection()
+    connection.ws = FakeSocket()
+    connection._handle_open()
+    connection._handle_message('{"event":"conf","status":"OK","flags":%d}' % client._flags)
+    return connection
+
+
+class BitfinexWSConfTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.client = BitfinexWSClient()
+        self.connection = fake_connection(self.client)
+        self.client._connections.append(self.connection)
+        self.client.subscribe_order_book('BTCUSD')
+        self.on_message('{"event":"subscribed","channel":"book","chanId":17,"symbol":"tBTCUSD",'
+                        '"prec":"P0","freq":"F0","len":"25","pair":"BTCUSD"}')
+        self.on_message('[17,[[9085.7,1,0.5],[9097,2,-0.14315086]],1]')
+        self.name = 'book_BTCUSD_P0_F0_25'
+        self.book = self.client._data[(self.connection, 17)]
+
+    def on_message(self, message):
+        self.connection._handle_message(message)
+
+    @property
+    def sent(self):
+        return self.connection.ws.sent
+
+    def test_conf(self):
+        flags = OB_CHECKSUM | SEQ_ALL | BULK_UPDATES | TIMESTAMP
+        self.assertIn({"event": "conf", "flags": flags}, self.sent)
+        self.assertEqual(self.connection.flags, flags)
+        # rejected flags are not expected in the messages
+        self.on_message('{"event":"conf","status":"FAILED","flags":%d}' % flags)
+        self.assertEqual(self.connection.flags, 0)
+        self.on_message('[17,[9085.7,0,1]]')
+        self.assertEqual(len(self.book.bids), 0)
+
+    def test_checksum_match(self):
+        checksum = self.book.checksum()
+        self.on_message('[17,"cs",{},2]'.format(checksum))
+        self.assertDictEqual(self.client.get_resyncs(), {})
+        self.assertEqual(self.client.sequence_gaps, 0)
+
+    def test_checksum_mismatch(self):
+        self.on_message('[17,"cs",12345,2]')
+        self.assertDictEqual(self.client.get_resyncs(), {self.name: 1})
+        self.assertDictEqual(self.sent[-1], {"event": "unsubscribe", "chanId": 17})
+        # updates and checksums are ignored until the channel is subscribed again
+        self.on_message('[17,[9085.7,0,1],3]')
+        self.on_message('[17,"cs",12345,4]')
+        self.assertEqual(len(self.book.bids), 1)
+        self.assertDictEqual(self.client.get_resyncs(), {self.name: 1})
+        # only the affected channel is subscribed again with the original request
+        self.on_message('{"event":"unsubscribed","status":"OK","chanId":17}')
+        self.assertEqual(self.sent[-1]['event'], 'subscribe')
+        self.assertEqual(self.sent[-1]['channel'], 'book')
+        self.assertEqual(self.sent[-1]['len'], '25')
+        self.on_message('{"event":"subscribed","channel":"book","chanId":18,"symbol":"tBTCUSD",'
+                        '"prec":"P0","freq":"F0","len":"25","pair":"BTCUSD"}')
+        self.on_message('[18,[[9085.7,1,0.5]],5]')
+        book = self.client._data[(self.connection, 18)]
+        self.assertTrue(book.verify(book.checksum()))
+        self.assertDictEqual(self.client.get_resyncs(), {self.name: 1})
+
+    def test_bulk_updates(self):
+        received = []
+        handler = lambda data: received.append(data)
+        subscription = bus.subscribe(handler, signal=self.name, sender='bitfinex')
+        try:
+            self.on_message('[17,[[9085.7,0,1],[9085.1,2,0.4],[9097,0,-1],[9098,1,-0.3]],2]')
+        finally:
+            subscription.cancel()
+        self.assertEqual(len(received), 1)
+        self.assertListEqual(list(received[0]['bids'].items()), [(9085.1, 0.4)])
+        self.assertListEqual(list(received[0]['asks'].items()), [(9098, 0.3)])
+
+    def test_timestamps(self):
+        now = int(time.time() * 1000)
+        self.on_message('[17,[9085.1,2,0.4],2,%d]' % (now - 50))
+        book = self.book
+        self.assertEqual(book.timestamp, now - 50)
+        self.assertGreaterEqual(book.latency, 50)
+        self.assertListEqual(list(self.client.get_latencies().keys()), [self.name])
+        self.assertEqual(len(book.bids), 2)
+        self.assertEqual(self.client.sequence_gaps, 0)
+        self.on_message('[17,"cs",%d,3,%d]' % (book.checksum(), now))
+        self.assertEqual(book.timestamp, now - 50)
+        self.assertDictEqual(self.client.get_resyncs(), {})
+
+    def test_event_metadata(self):
+        received = []
+        subscription = bus.subscribe(received.append, signal=delta_signal(self.name), sender='bitfinex')
+        try:
+            now = int(time.time() * 1000)
+            self.on_message('[17,[[9085.1,2,0.4]],2,%d]' % (now - 50))
+        finally:
+            subscription.cancel()
+        kind, delta = received[0]
+        self.assertEqual(kind, 'delta')
+        self.assertIsInstance(delta, BookDelta)
+        self.assertListEqual(delta.bids, [(9085.1, 0.4)])
+        self.assertEqual(delta.exchange_ts, now - 50)
+        self.assertGreaterEqual(delta.receive_ts, now)
+        self.assertEqual(delta.seq, 2)
+
+    def test_sequence_gap(self):
+        self.on_message('[17,"hb",2]')
+        self.on_message('[17,[9085.7,0,1],4]')
+        self.assertEqual(self.client.sequence_gaps, 1)
+        self.on_message('[0,"wu",["exchange","USD",10,0,null],5,1]')
+        self.assertEqual(self.client.sequence_gaps, 1)
+
+
+class BitfinexWSProfileTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.client = BitfinexWSClient()
+        self.connection = fake_connection(self.client)
+        self.client._connections.append(self.connection)
+
+    def test_profiles(self):
+        overview, _ = self.client.subscribe_order_book('ETHUSD', profile=OVERVIEW_PROFILE)
+        active, _ = self.client.subscribe_order_book('BTCUSD', profile=REALTIME_PROFILE)
+        self.assertEqual(overview, 'book_ETHUSD_P0_F1_25')
+        self.assertEqual(active, 'book_BTCUSD_P0_F0_100')
+        self.assertDictEqual(self.connection.ws.sent[-1], {"event": "subscribe", "channel": "book", "symbol": "BTCUSD",
+                                                           "prec": "P0", "freq": "F0", "len": "100"})
+        # the books of the same pair with other parameters are separate channels
+        full, _ = self.client.subscribe_order_book('BTCUSD')
+        self.assertEqual(full, 'book_BTCUSD_P0_F0_25')
+        self.assertRaises(ExchangeException, self.client.subscribe_order_book, 'BTCUSD', profile='unknown')
+
+    def test_raw_book(self):
+        channel_name, _ = self.client.subscribe_order_book('BTCUSD', profile=RAW_PROFILE)
+        self.assertEqual(channel_name, 'book_BTCUSD_R0_F0_100')
+        self.connection._handle_message('{"event":"subscribed","channel":"book","chanId":21,"symbol":"tBTCUSD",'
+                                        '"prec":"R0","freq":"F0","len":"100","pair":"BTCUSD"}')
+        self.connection._handle_message('[21,[[101,9085.7,0.5],[102,9085.7,0.25],[104,9097,-0.14]],1]')
+        book = self.client._data[(self.connection, 21)]
+        self.assertIsInstance(book, BitfinexRawOrderBook)
+        self.connection._handle_message('[21,[101,0,1],2]')
+        self.connection._handle_message('[21,"cs",%d,3]' % book.checksum())
+        self.assertListEqual(book.bids.items(), [(9085.7, 0.25)])
+        self.assertDictEqual(self.client.get_resyncs(), {})
+
+
+class BitfinexWSPoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.client = BitfinexWSClient(max_channels=2)
+        self.client._open_connection = lambda: fake_connection(self.client)
+        self.symbols = ['BTCUSD', 'ETHUSD', 'LTCUSD', 'XRPUSD', 'EOSUSD']
+        for i, symbol in enumerate(self.symbols):
+            self.client.subscribe_ticker(symbol)
+            self.confirm(self.client._channels['ticker_' + symbol], i + 1, symbol)
+
+    def confirm(self, connection, channel_id, symbol):
+        connection._handle_message('{"event":"subscribed","channel":"ticker","chanId":%d,"pair":"%s"}'
+                                   % (channel_id, symbol))
+
+    def test_pool(self):
+        connections = self.client._connections
+        self.assertEqual(len(connections), 3)
+        self.assertDictEqual(self.client.get_connections(),
+                             {connections[0].name: ['ticker_BTCUSD', 'ticker_ETHUSD'],
+                              connections[1].name: ['ticker_LTCUSD', 'ticker_XRPUSD'],
+                              connections[2].name: ['ticker_EOSUSD']})
+        # channel IDs are only unique per connection
+        self.confirm(connections[1], 1, 'DOGEUSD')
+        self.assertEqual(self.client._subscriptions[(connections[0], 1)], 'ticker_BTCUSD')
+        self.assertEqual(self.client._subscriptions[(connections[1], 1)], 'ticker_DOGEUSD')
+        connections[0]._handle_message('[1,[1,2,3,4,5,6,7,8,9,10],1]')
+        connections[1]._handle_message('[1,[2,2,3,4,5,6,7,8,9,10],1]')
+        self.assertEqual(self.client._data[(connections[0], 1)].data[0], 1)
+        self.assertEqual(self.client._data[(connections[1], 1)].data[0], 2)
+
+    def test_open_without_lock(self):
+        # the receiving threads need the lock, so it is not held while a new connection opens
+        locked = []
+
+        def open_connection():
+            locked.append(self.client._lock._is_owned())
+            return fake_connection(self.client)
+        self.client._open_connection = open_connection
+        self.client.subscribe_ticker('DOGEUSD')
+        self.client.subscribe_ticker('ADAUSD')
+        self.assertListEqual(locked, [False])
+        self.assertEqual(len(self.client._connections), 4)
+        self.assertIs(self.client._channels['ticker_ADAUSD'], self.client._connections[3])
+
+    def test_rebalance(self):
+        first, second, third = self.client._connections
+        self.client.unsubscribe('ticker_BTCUSD')
+        self.assertDictEqual(first.ws.sent[-1], {"event": "unsubscribe", "chanId": 1})
+        first._handle_message('{"event":"unsubscribed","status":"OK","chanId":1}')
+        # the remaining channels fit into two connections, so the last one is moved
+        self.assertDictEqual(third.ws.sent[-1], {"event": "unsubscribe", "chanId": 5})
+        third._handle_message('{"event":"unsubscribed","status":"OK","chanId":5}')
+        self.assertEqual(first.ws.sent[-1]['event'], 'subscribe')
+        self.assertEqual(first.ws.sent[-1]['symbol'], 'EOSUSD')
+        self.assertListEqual(self.client._connections, [first, second])
+        self.assertDictEqual(self.client.get_connections(),
+                             {first.name: ['ticker_EOSUSD', 'ticker_ETHUSD'],
+                              second.name: ['ticker_LTCUSD', 'ticker_XRPUSD']})
+
+    def test_rotation(self):
+        received = []
+        handler = lambda data: received.append(data[0])
+        subscription = bus.subscribe(handler, signal='ticker_BTCUSD', sender='bitfinex')
+        first = self.client._connections[0]
+        first._handle_message('[1,[1,2,3,4,5,6,7,8,9,10],1]')
+        rotation = Thread(target=self.client._rotate, args=(first,))
+        rotation.start()
+        for _ in range(50):
+            if self.client._rotations:
+                break
+            time.sleep(0.1)
+        replacement = list(self.client._rotations)[0]
+        self.assertListEqual([m['symbol'] for m in replacement.ws.sent if m['event'] == 'subscribe'],
+                             ['BTCUSD', 'ETHUSD'])
+
+        # the replacement buffers the messages until all channels received their snapshots,
+        # the old connection keeps publishing meanwhile
+        self.confirm(replacement, 7, 'BTCUSD')
+        self.confirm(replacement, 8, 'ETHUSD')
+        replacement._handle_message('[7,[2,2,3,4,5,6,7,8,9,10],1]')
+        first._handle_message('[1,[3,2,3,4,5,6,7,8,9,10],2]')
+        self.assertListEqual(received, [1, 3])
+        replacement._handle_message('[8,[1,2,3,4,5,6,7,8,9,10],2]')
+        rotation.join(timeout=5)
+        self.assertListEqual(received, [1, 3, 2])
+
+        # the channels are switched at once and the old connection is ignored
+        self.assertIs(self.client._connections[0], replacement)
+        self.assertTrue(first.retired)
+        self.assertDictEqual(self.client._subscriptions, {
+            (replacement, 7): 'ticker_BTCUSD', (replacement, 8): 'ticker_ETHUSD',
+            (self.client._connections[1], 3): 'ticker_LTCUSD', (self.client._connections[1], 4): 'ticker_XRPUSD',
+            (self.client._connections[2], 5): 'ticker_EOSUSD'})
+        self.assertListEqual(self.client.get_connections()[replacement.name], ['ticker_BTCUSD', 'ticker_ETHUSD'])
+        first._handle_message('[1,[4,2,3,4,5,6,7,8,9,10],3]')
+        replacement._handle_message('[7,[5,2,3,4,5,6,7,8,9,10],3]')
+        self.assertListEqual(received, [1, 3, 2, 5])
+        subscription.cancel()
+
+    def test_rotation_keeps_history(self):
+        received = []
+        subscription = bus.subscribe(lambda data: received.append(data), signal='trades_BTCUSD', sender='bitfinex')
+        connection = self.client._connections[2]
+        self.client.subscribe_trades('BTCUSD')
+        self.assertIs(self.client._channels['trades_BTCUSD'], connection)
+        connection._handle_message('{"event":"subscribed","channel":"trades","chanId":6,"symbol":"tBTCUSD","pair":"BTCUSD"}')
+        connection._handle_message('[5,[1,2,3,4,5,6,7,8,9,10],1]')
+        connection._handle_message('[6,[[2,1002,0.5,100.0],[1,1001,-0.1,101.0]],2]')
+        connection._handle_message('[6,"te",[3,1003,0.2,100.5],3]')
+        trades = self.client._data[(connection, 6)]
+        rotation = Thread(target=self.client._rotate, args=(connection,))
+        rotation.start()
+        for _ in range(50):
+            if self.client._rotations:
+                break
+            time.sleep(0.1)
+        replacement = list(self.client._rotations)[0]
+        self.confirm(replacement, 9, 'EOSUSD')
+        replacement._handle_message('{"event":"subscribed","channel":"trades","chanId":10,"symbol":"tBTCUSD","pair":"BTCUSD"}')
+        replacement._handle_message('[10,[[4,1004,0.3,100.0],[3,1003,0.2,100.5],[2,1002,0.5,100.0]],1]')
+        replacement._handle_message('[10,"te",[4,1004,0.3,100.0],2]')
+        replacement._handle_message('[10,"te",[5,1005,-0.4,99.5],3]')
+        replacement._handle_message('[9,[1,2,3,4,5,6,7,8,9,10],4]')
+        rotation.join(timeout=5)
+
+        # the tape is kept and continued with the newer trades of the replacement, without a new snapshot
+        self.assertIs(self.client._data[(replacement, 10)], trades)
+        self.assertListEqual(trades.trades.recent()['id'].tolist(), [5, 4, 3, 2, 1])
+        self.assertListEqual([data[0] for data in received], ['snapshot', 'update', 'batch', 'update'])
+        self.assertListEqual([trade.trade_id for trade in received[2][1]], [4])
+        subscription.cancel()
+
+    def test_standby(self):
+        received = []
+        handler = lambda data: received.append(data[0])
+        subscription = bus.subscribe(handler, signal='ticker_BTCUSD', sender='bitfinex')
+        primary = self.client._connections[0]
+        self.client.add_standby('ticker_BTCUSD')
+        standby = self.client._standby
+        self.assertDictEqual(standby.ws.sent[-1], {"event": "subscribe", "channel": "ticker", "symbol": "BTCUSD"})
+        self.confirm(standby, 9, 'BTCUSD')
+
+        # the snapshot is taken from the primary subscription, the updates from the first connection
+        standby._handle_message('[9,[0,2,3,4,5,6,7,8,9,10],1,1600000000000]')
+        primary._handle_message('[1,[1,2,3,4,5,6,7,8,9,10],1,1600000000000]')
+        standby._handle_message('[9,[2,2,3,4,5,6,7,8,9,10],2,1600000000001]')
+        primary._handle_message('[1,[2,2,3,4,5,6,7,8,9,10],2,1600000000001]')
+        primary._handle_message('[1,[3,2,3,4,5,6,7,8,9,10],3,1600000000002]')
+        standby._handle_message('[9,[3,2,3,4,5,6,7,8,9,10],3,1600000000002]')
+        self.assertListEqual(received, [1, 2, 3])
+        self.assertDictEqual(self.client.get_redundancy()['ticker_BTCUSD']['wins'], {PRIMARY: 1, STANDBY: 1})
+
+        # unsubscribing the channel closes the standby connection with its last channel
+        subscription.cancel()
+        self.client.unsubscribe('ticker_BTCUSD')
+        self.assertIsNone(self.client._standby)
+        self.assertDictEqual(self.client.get_redundancy(), {})
+
+
 class BitfinexWSPublicClientTestCase(unittest.TestCase):
     client = None
 
@@ -242,7 +627,7 @@ class BitfinexWSPublicClientTestCase(unittest.TestCase):
         stream_id = [ key for (key, value) in self.client._subscriptions.items() if value == stream][0]
         book = self.client._data[stream_id]
         self.assertIsNotNone(book)
-        self.assertIs(type(book.asks), dict)
+        self.assertIs(type(book.asks), PriceLevels)
         self.assertTrue(len(book.asks) > 0)
 
         # test that the second subscriber will reuse the stream already used by the first subscriber
@@ -273,7 +658,7 @@ class BitfinexWSPublicClientTestCase(unittest.TestCase):
         stream_id = [ key for (key, value) in self.client._subscriptions.items() if value == stream][0]
         trades = self.client._data[stream_id]
         self.assertIsNotNone(trades)
-        self.assertIs(type(trades.trades), deque)
+        self.assertIs(type(trades.trades), TradeTape)
         self.assertTrue(len(trades.trades) > 0)
 
         # test that the second subscriber will reuse the stream already used by the first subscriber
@@ -304,7 +689,7 @@ class BitfinexWSPublicClientTestCase(unittest.TestCase):
         stream_id = [ key for (key, value) in self.client._subscriptions.items() if value == stream][0]
         candles = self.client._data[stream_id]
         self.assertIsNotNone(candles)
-        self.assertIs(type(candles.candles), deque)
+        self.assertIs(type(candles.candles), CandleBuffer)
         self.assertTrue(len(candles.candles) > 0)
 
         # test that the second subscriber will reuse the stream already used by the first subscriber
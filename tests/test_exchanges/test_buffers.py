@@ -0,0 +1,136 @@
+import unittest
+import numpy as np
+from exchanges.WS.buffers import *
+
+
+class CandleBufferTestCase(unittest.TestCase):
+
+    def candle(self, i):
+        return [60000 * i, 1.0 + i, 2.0 + i, 0.5 + i, 1.5 + i, 10.0 * i]
+
+    def test_append_and_update(self):
+        candles = CandleBuffer(4)
+        self.assertIsNone(candles.last_timestamp)
+        self.assertRaises(IndexError, candles.update_last, self.candle(0))
+        for i in range(3):
+            candles.append(self.candle(i))
+        candles.update_last([120000, 3.0, 4.0, 2.0, 3.5, 25.0])
+        self.assertEqual(len(candles), 3)
+        self.assertEqual(candles.last_timestamp, 120000)
+        self.assertListEqual(candles[-1], [120000, 3.0, 4.0, 2.0, 3.5, 25.0])
+        self.assertIs(type(candles[0][0]), int)
+        self.assertIs(candles.timestamps().dtype, np.dtype(np.int64))
+        self.assertListEqual(candles.timestamps().tolist(), [0, 60000, 120000])
+        self.assertEqual(candles.columns().shape, (6, 3))
+        self.assertListEqual(candles.array()[-1].tolist(), [120000.0, 3.0, 4.0, 2.0, 3.5, 25.0])
+
+    def test_wrap_around(self):
+        candles = CandleBuffer(4)
+        for i in range(50):
+            candles.append(self.candle(i))
+            self.assertListEqual(candles.timestamps().tolist(), [60000 * j for j in range(max(0, i - 3), i + 1)])
+            self.assertListEqual(candles.columns()[4].tolist(), [1.5 + j for j in range(max(0, i - 3), i + 1)])
+
+    def test_views(self):
+        candles = CandleBuffer(4)
+        candles.extend([self.candle(i) for i in range(3)])
+        view = candles.array()
+        # the snapshots are views following the updates of the last candle
+        self.assertTrue(np.shares_memory(view, candles.columns()))
+        candles.update_last(self.candle(5))
+        self.assertEqual(view[-1][0], 300000)
+        # every column is contiguous
+        self.assertTrue(candles.columns()[4].flags['C_CONTIGUOUS'])
+
+    def test_extend(self):
+        candles = CandleBuffer(4)
+        candles.extend([self.candle(i) for i in range(3)])
+        candles.extend(np.array([self.candle(i) for i in range(3, 6)]))
+        self.assertListEqual(candles.timestamps().tolist(), [120000, 180000, 240000, 300000])
+        other = CandleBuffer(10)
+        other.extend(candles.array())
+        self.assertListEqual(other.columns().tolist(), candles.columns().tolist())
+        candles.extend([])
+        self.assertEqual(len(candles), 4)
+        candles.clear()
+        self.assertEqual(len(candles), 0)
+
+
+class TradeTapeTestCase(unittest.TestCase):
+
+    def test_append(self):
+        trades = TradeTape(3)
+        self.assertIsNone(trades.last_timestamp)
+        trades.append(1000, 0.5, 100.0, trade_id=1)
+        trades.append(1001, -0.2, 99.0, trade_id=2)
+        self.assertEqual(len(trades), 2)
+        self.assertEqual(trades.last_timestamp, 1001)
+        # indexed and iterated from the most recent trade
+        self.assertListEqual(trades[0], [1001, -0.2, 99.0])
+        self.assertListEqual(list(trades), [[1001, -0.2, 99.0], [1000, 0.5, 100.0]])
+        records = trades.records()
+        self.assertIs(records.dtype, TRADE_DTYPE)
+        self.assertListEqual(records['side'].tolist(), [BUY, SELL])
+        self.assertListEqual(records['id'].tolist(), [1, 2])
+
+    def test_wrap_around(self):
+        trades = TradeTape(5)
+        for i in range(23):
+            trades.append(i, 1.0, 100.0 + i)
+            self.assertListEqual(trades.records()['timestamp'].tolist(), list(range(max(0, i - 4), i + 1)))
+        self.assertListEqual(trades.recent(2)['timestamp'].tolist(), [22, 21])
+
+    def test_views(self):
+        trades = TradeTape(5)
+        trades.extend([[1, 1.0, 100.0], [2, -1.0, 101.0]])
+        snapshot = trades.recent()
+        self.assertTrue(np.shares_memory(snapshot, trades.records()))
+        # the records are indexed the same way as the trade lists
+        self.assertEqual(snapshot[0][0], 2)
+        self.assertEqual(snapshot[0][1], -1.0)
+        self.assertListEqual(trades.records()['id'].tolist(), [NO_TRADE_ID, NO_TRADE_ID])
+
+    def test_extend(self):
+        trades = TradeTape(3)
+        trades.extend([[1, 1.0, 100.0], [2, -1.0, 101.0]])
+        trades.extend([[3, 1.0, 102.0], [4, 1.0, 103.0]])
+        self.assertListEqual(trades.records()['timestamp'].tolist(), [2, 3, 4])
+        other = TradeTape(10)
+        other.extend(trades.recent()[::-1])
+        self.assertListEqual(list(other), list(trades))
+        trades.extend([])
+        self.assertEqual(len(trades), 3)
+
+
+class TickerTableTestCase(unittest.TestCase):
+
+    def test_update(self):
+        table = TickerTable(('price', 'change'), capacity=2)
+        changed = table.update(['BNBBTC', 'ETHBTC'], [[0.0025, 1.5], [0.03, -0.5]])
+        self.assertListEqual(changed.tolist(), [0, 1])
+        self.assertIn('ETHBTC', table)
+        # only the changed and the new symbols are returned, the table grows over its capacity
+        changed = table.update(['BNBBTC', 'ETHBTC', 'LTCBTC'], [[0.0025, 1.5], [0.031, -0.4], [0.01, 0.0]])
+        self.assertListEqual(changed.tolist(), [1, 2])
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table.index('LTCBTC'), 2)
+        self.assertListEqual(table.row('ETHBTC'), ['ETHBTC', 0.031, -0.4])
+        self.assertListEqual(table.column('price').tolist(), [0.0025, 0.031, 0.01])
+        symbols, values = table.take(changed)
+        self.assertListEqual(symbols, ['ETHBTC', 'LTCBTC'])
+        self.assertListEqual(values.tolist(), [[0.031, -0.4], [0.01, 0.0]])
+        self.assertListEqual(table.update([], []).tolist(), [])
+
+    def test_snapshot(self):
+        table = TickerTable()
+        table.update(['BNBBTC'], [['0.0024', '10', '0.0026', '100', '0.0015', '250.0',
+                                   '0.0025', '10000', '0.0025', '0.001']])
+        symbols, values = table.snapshot()
+        self.assertListEqual(symbols, ['BNBBTC'])
+        self.assertEqual(values.shape, (1, len(TICKER_FIELDS)))
+        # the snapshot is a copy
+        table.update(['BNBBTC'], [[0.0] * len(TICKER_FIELDS)])
+        self.assertEqual(values[0, TICKER_FIELDS.index('last_price')], 0.0025)
+        table.clear()
+        self.assertEqual(len(table), 0)
+        self.assertNotIn('BNBBTC', table)
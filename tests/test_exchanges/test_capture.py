@@ -0,0 +1,92 @@
+import unittest
+import tempfile
+from exchanges.WS.capture import *
+from exchanges.WS.binance import BinanceWSClient, COMBINED
+
+
+class CaptureTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_write_and_read(self):
+        writer = CaptureWriter(self.path, prefix='binance', compression='gzip', block_size=200)
+        for i in range(100):
+            writer.write('btcusdt@trade', '{"e":"trade","t":%d}' % i, received=1000.0 + i)
+        writer.write('raw', b'\x00\x01\xff', received=1100.0)
+        writer.close()
+        self.assertTrue(writer.closed)
+        self.assertIsNone(writer.error)
+        self.assertEqual(writer.written, 101)
+        self.assertEqual(writer.dropped, 0)
+
+        reader = CaptureReader(self.path, prefix='binance')
+        frames = list(reader.frames())
+        self.assertEqual(len(frames), 101)
+        self.assertTupleEqual(frames[0], (1000.0, 'btcusdt@trade', '{"e":"trade","t":0}'))
+        # the binary frames are read back as bytes
+        self.assertTupleEqual(frames[-1], (1100.0, 'raw', b'\x00\x01\xff'))
+
+        # the frames are compressed in several blocks, the reader seeks to the one including start
+        segment = reader.segments()[0]
+        self.assertGreater(len(segment.blocks), 1)
+        self.assertEqual(len(segment), 101)
+        frames = list(reader.frames(start=1050, end=1052))
+        self.assertListEqual([frame[0] for frame in frames], [1050.0, 1051.0, 1052.0])
+
+    def test_rotation(self):
+        writer = CaptureWriter(self.path, prefix='bitfinex', compression='gzip', block_size=1, segment_duration=10)
+        for i in range(30):
+            writer.write('bitfinex-0', '[1,"hb"]', received=i * 1000.0)
+        writer.close()
+        # a new segment is started every 10 seconds, at the end of a block
+        self.assertEqual(len(writer.segments), 3)
+        segments = CaptureReader(self.path, prefix='bitfinex').segments()
+        self.assertListEqual([(segment.start, segment.end) for segment in segments],
+                             [(0.0, 10000.0), (11000.0, 21000.0), (22000.0, 29000.0)])
+        self.assertListEqual([frame[0] for frame in CaptureReader(self.path, 'bitfinex').frames(start=20500)],
+                             [i * 1000.0 for i in range(21, 30)])
+
+    def test_incomplete_index(self):
+        writer = CaptureWriter(self.path, compression='gzip', block_size=1)
+        for i in range(3):
+            writer.write('stream', str(i), received=float(i))
+        writer.close()
+        # a writer killed while writing the index leaves an incomplete line, which is ignored
+        with open(writer.segments[0] + INDEX_SUFFIX, 'a') as index:
+            index.write('3.0 3.0')
+        self.assertListEqual([frame[2] for frame in CaptureReader(self.path).frames()], ['0', '1', '2'])
+
+    def test_compressions(self):
+        self.assertIs(get_compression('gzip'), GzipCompression)
+        self.assertRaises(WSException, get_compression, 'lz4')
+        if ZstdCompression.available():
+            self.assertIs(get_compression(), ZstdCompression)
+            writer = CaptureWriter(self.path, compression='zstd')
+            writer.write('stream', 'frame', received=1.0)
+            writer.close()
+            self.assertTrue(writer.segments[0].endswith('.cap.zst'))
+            self.assertListEqual(list(CaptureReader(self.path).frames()), [(1.0, 'stream', 'frame')])
+        else:
+            self.assertIs(get_compression(), GzipCompression)
+            self.assertRaises(WSException, get_compression, 'zstd')
+
+    def test_client_capture(self):
+        client = BinanceWSClient()
+        try:
+            client.start_capture(self.path, compression='gzip')
+            client._handle_message('btcusdt@trade', '{"e":"trade"}')
+            client._on_stream_message('{"result":null,"id":1}')
+            client.stop_capture()
+            self.assertListEqual([frame[1:] for frame in CaptureReader(self.path, 'binance').frames()],
+                                 [('btcusdt@trade', '{"e":"trade"}'), (COMBINED, '{"result":null,"id":1}')])
+        finally:
+            client.disconnect()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+import unittest
+import time
+from collections import OrderedDict
+import numpy as np
+from exchanges.WS.events import bus, DispatcherKeyError
+from exchanges.WS.conflation import *
+from exchanges.WS import conflation
+
+
+class ConflationPolicyTestCase(unittest.TestCase):
+
+    def test_keep_latest(self):
+        pending = []
+        KeepLatest.merge(pending, [1.0])
+        KeepLatest.merge(pending, [2.0])
+        self.assertListEqual(KeepLatest.finish(pending), [[2.0]])
+
+    def test_merge_book_deltas(self):
+        pending = []
+        MergeBookDeltas.merge(pending, ('delta', {'bids': [(9.0, 1.0)], 'asks': [(11.0, 1.0)]}))
+        MergeBookDeltas.merge(pending, ('delta', {'bids': [(9.0, 2.0), (8.0, 0.0)], 'asks': []}))
+        self.assertListEqual(MergeBookDeltas.finish(pending),
+                             [('delta', {'bids': [(9.0, 2.0), (8.0, 0.0)], 'asks': [(11.0, 1.0)]})])
+
+        # deltas following a snapshot are applied to it
+        pending = []
+        MergeBookDeltas.merge(pending, ('delta', {'bids': [(9.0, 1.0)], 'asks': []}))
+        MergeBookDeltas.merge(pending, ('snapshot', {'bids': OrderedDict([(8.0, 1.0), (9.0, 1.0)]),
+                                                     'asks': OrderedDict([(11.0, 1.0)])}))
+        MergeBookDeltas.merge(pending, ('delta', {'bids': [(8.5, 3.0), (8.0, 0.0)], 'asks': [(10.5, 1.0)]}))
+        kind, book = MergeBookDeltas.finish(pending)[0]
+        self.assertEqual(kind, 'snapshot')
+        self.assertIs(type(book['bids']), OrderedDict)
+        self.assertListEqual(list(book['bids'].items()), [(8.5, 3.0), (9.0, 1.0)])
+        self.assertListEqual(list(book['asks'].items()), [(10.5, 1.0), (11.0, 1.0)])
+
+    def test_batch_trades(self):
+        pending = []
+        BatchTrades.merge(pending, ('update', [1, 0.5, 10.0]))
+        BatchTrades.merge(pending, ('update', [2, -0.5, 10.1]))
+        self.assertListEqual(BatchTrades.finish(pending), [('batch', [[1, 0.5, 10.0], [2, -0.5, 10.1]])])
+        BatchTrades.merge(pending, ('snapshot', [[2, -0.5, 10.1]]))
+        BatchTrades.merge(pending, ('update', [3, 0.1, 10.2]))
+        self.assertListEqual(BatchTrades.finish(pending), [('snapshot', [[2, -0.5, 10.1]]),
+                                                           ('batch', [[3, 0.1, 10.2]])])
+
+    def test_merge_candles(self):
+        pending = []
+        MergeCandles.merge(pending, ('update', [60, 1, 2, 1, 2, 10]))
+        MergeCandles.merge(pending, ('update', [60, 1, 3, 1, 3, 11]))
+        MergeCandles.merge(pending, ('add', [120, 3, 3, 3, 3, 1]))
+        MergeCandles.merge(pending, ('update', [120, 3, 4, 3, 4, 2]))
+        self.assertListEqual(MergeCandles.finish(pending), [('update', [60, 1, 3, 1, 3, 11]),
+                                                            ('add', [120, 3, 4, 3, 4, 2])])
+        # the snapshot is not modified, the updates of its last candle are merged after it
+        snapshot = np.array([[60, 1, 3, 1, 3, 11], [120, 3, 4, 3, 4, 2]], dtype=np.float64)
+        MergeCandles.merge(pending, ('snapshot', snapshot))
+        MergeCandles.merge(pending, ('update', [120, 3, 5, 3, 5, 3]))
+        MergeCandles.merge(pending, ('update', [120, 3, 6, 3, 6, 4]))
+        self.assertEqual(snapshot[-1][4], 4)
+        self.assertEqual(len(pending), 2)
+        self.assertListEqual(pending[1][1], [120, 3, 6, 3, 6, 4])
+
+    def test_merge_tickers(self):
+        pending = []
+        MergeTickers.merge(pending, (['BNBBTC', 'ETHBTC'], np.array([[1.0, 2.0], [3.0, 4.0]])))
+        MergeTickers.merge(pending, (['ETHBTC', 'LTCBTC'], np.array([[3.5, 4.5], [5.0, 6.0]])))
+        self.assertEqual(MergeTickers.size(pending), 3)
+        [(symbols, values)] = MergeTickers.finish(pending)
+        self.assertListEqual(symbols, ['BNBBTC', 'ETHBTC', 'LTCBTC'])
+        self.assertListEqual(values.tolist(), [[1.0, 2.0], [3.5, 4.5], [5.0, 6.0]])
+
+
+class ConflatorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.received = []
+
+    def handler(self, data):
+        self.received.append(data)
+
+    def test_rate_limit(self):
+        conflator = Conflator(self.handler, rate=10)
+        for i in range(100):
+            conflator(i)
+        # the first update is delivered immediately, the rest is conflated
+        self.assertListEqual(self.received, [0])
+        time.sleep(0.3)
+        self.assertListEqual(self.received, [0, 99])
+        self.assertEqual(conflator.received, 100)
+        self.assertEqual(conflator.delivered, 2)
+
+    def test_close(self):
+        conflator = Conflator(self.handler, rate=10)
+        conflator(1)
+        conflator(2)
+        conflator.close()
+        conflator(3)
+        time.sleep(0.2)
+        self.assertListEqual(self.received, [1])
+
+    def test_handler_error(self):
+        def failing(data):
+            raise ValueError(data)
+        first, second = Conflator(failing, rate=10), Conflator(self.handler, rate=10)
+        self.assertRaises(ValueError, first, 1)
+        second(1)
+        first(2)
+        second(2)
+        # the error of the first handler is logged and the timer keeps flushing
+        with self.assertLogs(conflation.logger, level='ERROR'):
+            time.sleep(0.2)
+        self.assertListEqual(self.received, [1, 2])
+
+    def test_bus(self):
+        subscription = connect(self.handler, signal='test@trade', sender='test', rate=20, policy=BatchTrades)
+        self.assertIs(subscription.handler, get_conflator(self.handler, signal='test@trade', sender='test'))
+        for i in range(10):
+            bus.publish('test@trade', 'test', ('update', [i, 1.0, 1.0]))
+        time.sleep(0.2)
+        # no trade was dropped
+        trades = [t for kind, batch in self.received for t in batch]
+        self.assertListEqual([t[0] for t in trades], list(range(10)))
+        self.assertEqual(len(self.received), 2)
+
+        disconnect(self.handler, signal='test@trade', sender='test')
+        self.assertFalse(subscription.active)
+        self.assertFalse(bus.has_subscribers('test@trade', 'test'))
+        self.assertRaises(DispatcherKeyError, disconnect, self.handler, 'test@trade', 'test')
+
+    def test_no_rate(self):
+        connect(self.handler, signal='test@ticker', sender='test')
+        self.assertIsNone(get_conflator(self.handler, signal='test@ticker', sender='test'))
+        bus.publish('test@ticker', 'test', [1.0])
+        bus.publish('test@ticker', 'test', [2.0])
+        self.assertListEqual(self.received, [[1.0], [2.0]])
+        conflation.disconnect_all('test')
+        disconnect(self.handler, signal='test@ticker', sender='test')
+
+
+class MailboxTestCase(unittest.TestCase):
+
+    def test_keep_latest(self):
+        mailbox = Mailbox(KeepLatest)
+        for i in range(10):
+            mailbox.put([float(i)])
+        self.assertEqual(mailbox.depth(), 1)
+        self.assertListEqual(mailbox.drain(), [[9.0]])
+        self.assertListEqual(mailbox.drain(), [])
+        self.assertDictEqual(mailbox.stats(), {'depth': 0, 'max_depth': 1, 'received': 10, 'delivered': 1,
+                                               'dropped': 0})
+
+    def test_batch_trades_capacity(self):
+        mailbox = Mailbox(BatchTrades, capacity=3)
+        mailbox.put(('snapshot', [[0, 1.0, 1.0]]))
+        for i in range(1, 6):
+            mailbox.put(('update', [i, 1.0, 1.0]))
+        # the snapshot is kept, the oldest trades of the batch are dropped
+        self.assertEqual(mailbox.depth(), 3)
+        self.assertListEqual(mailbox.drain(), [('snapshot', [[0, 1.0, 1.0]]),
+                                               ('batch', [[4, 1.0, 1.0], [5, 1.0, 1.0]])])
+        stats = mailbox.stats(reset=True)
+        self.assertEqual(stats['dropped'], 3)
+        self.assertEqual(stats['max_depth'], 3)
+        self.assertEqual(mailbox.stats()['max_depth'], 0)
+
+    def test_merge_candles_capacity(self):
+        mailbox = Mailbox(MergeCandles, capacity=2)
+        mailbox.put(('add', [60, 1, 1, 1, 1, 1]))
+        mailbox.put(('update', [60, 1, 2, 1, 2, 2]))
+        mailbox.put(('add', [120, 2, 2, 2, 2, 1]))
+        mailbox.put(('add', [180, 2, 3, 2, 3, 1]))
+        self.assertListEqual(mailbox.drain(), [('add', [120, 2, 2, 2, 2, 1]), ('add', [180, 2, 3, 2, 3, 1])])
+        self.assertEqual(mailbox.dropped, 1)
+
+    def test_clear(self):
+        mailbox = Mailbox(MergeBookDeltas)
+        mailbox.put(('delta', {'bids': [(9.0, 1.0)], 'asks': []}))
+        mailbox.clear()
+        self.assertListEqual(mailbox.drain(), [])
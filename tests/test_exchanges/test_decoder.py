@@ -0,0 +1,71 @@
+import unittest
+import json
+from exchanges.WS.decoder import *
+from exchanges.WS.binance import BinanceOrderBook, BinanceTrades
+
+
+DEPTH = '{"e":"depthUpdate","E":123456789,"s":"BNBBTC","U":157,"u":160,' \
+        '"b":[["0.0024","10.00000000"],["0.0023","0.00000000"]],"a":[["0.0026","100.00000000"]]}'
+TRADE = '{"e":"trade","E":123456789,"s":"BNBBTC","t":12345,"p":"0.001","q":"100",' \
+        '"b":88,"a":50,"T":123456785,"m":true,"M":true}'
+
+
+class DecoderTestCase(unittest.TestCase):
+
+    def test_get_decoder(self):
+        self.assertIs(get_decoder('json'), JSONDecoder)
+        self.assertIs(get_decoder(), OrjsonDecoder if orjson else JSONDecoder)
+        self.assertRaises(WSException, get_decoder, 'unknown')
+        if orjson:
+            self.assertIs(get_decoder('orjson'), OrjsonDecoder)
+        else:
+            self.assertRaises(WSException, get_decoder, 'orjson')
+
+    def test_decoders(self):
+        for decoder in [JSONDecoder, OrjsonDecoder]:
+            if decoder.available():
+                self.assertDictEqual(decoder.loads(DEPTH), json.loads(DEPTH))
+                self.assertListEqual(decoder.loads('[17082,[7254.7,3,3.3]]'), [17082, [7254.7, 3, 3.3]])
+
+
+class BinanceNumericParserTestCase(unittest.TestCase):
+
+    def test_parse_depth(self):
+        first_id, last_id, bids, asks = BinanceNumericParser.parse_depth(DEPTH)
+        self.assertEqual(first_id, 157)
+        self.assertEqual(last_id, 160)
+        self.assertListEqual(bids, [[0.0024, 10.0], [0.0023, 0.0]])
+        self.assertListEqual(asks, [[0.0026, 100.0]])
+        self.assertTupleEqual(BinanceNumericParser.parse_depth(DEPTH.replace('"a":[["0.0026","100.00000000"]]',
+                                                                             '"a":[]')),
+                              (157, 160, [[0.0024, 10.0], [0.0023, 0.0]], []))
+        self.assertRaises(WSException, BinanceNumericParser.parse_depth, TRADE)
+
+    def test_parse_trade(self):
+        self.assertTupleEqual(BinanceNumericParser.parse_trade(TRADE), (123456785, -100.0, 0.001, 12345))
+        self.assertTupleEqual(BinanceNumericParser.parse_trade(TRADE.replace('"m":true', '"m":false')),
+                              (123456785, 100.0, 0.001, 12345))
+        self.assertRaises(WSException, BinanceNumericParser.parse_trade, DEPTH)
+
+    def test_combined_stream(self):
+        wrapped = '{"stream":"bnbbtc@depth","data":' + DEPTH + '}'
+        self.assertEqual(BinanceNumericParser.stream(wrapped), 'bnbbtc@depth')
+        self.assertIsNone(BinanceNumericParser.stream(DEPTH))
+        self.assertTupleEqual(BinanceNumericParser.parse_depth(wrapped), BinanceNumericParser.parse_depth(DEPTH))
+        wrapped = '{"stream":"bnbbtc@trade","data":' + TRADE + '}'
+        self.assertTupleEqual(BinanceNumericParser.parse_trade(wrapped), BinanceNumericParser.parse_trade(TRADE))
+
+    def test_numeric_channel_update(self):
+        snapshot = {'lastUpdateId': 156, 'bids': [['0.0023', '1.0']], 'asks': [['0.0027', '1.0']]}
+        book = BinanceOrderBook('dummy', snapshot)
+        numeric_book = BinanceOrderBook('dummy', snapshot)
+        book.update(json.loads(DEPTH))
+        numeric_book.update_numeric(BinanceNumericParser.parse_depth(DEPTH))
+        self.assertDictEqual(numeric_book.snapshot(), book.snapshot())
+        self.assertEqual(numeric_book.lastUpdateId, 160)
+
+        trades = BinanceTrades('dummy', [])
+        numeric_trades = BinanceTrades('dummy', [])
+        trades.update(json.loads(TRADE))
+        numeric_trades.update_numeric(BinanceNumericParser.parse_trade(TRADE))
+        self.assertEqual(numeric_trades.snapshot()[1].tolist(), trades.snapshot()[1].tolist())
@@ -0,0 +1,93 @@
+import unittest
+from exchanges.WS.events import *
+
+
+class EventBusTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = EventBus()
+        self.received = []
+
+    def handler(self, data):
+        self.received.append(data)
+
+    def test_publish(self):
+        subscription = self.bus.subscribe(self.handler, signal='btcusdt@trade', sender='binance')
+        self.assertTrue(subscription.active)
+        self.assertTrue(self.bus.has_subscribers('btcusdt@trade', 'binance'))
+        self.bus.publish('btcusdt@trade', 'binance', 1)
+        self.bus.publish('btcusdt@trade', 'bitfinex', 2)
+        self.bus.publish('ethusdt@trade', 'binance', 3)
+        self.assertListEqual(self.received, [1])
+
+        # subscribing again returns the same handle and does not duplicate the deliveries
+        self.assertIs(self.bus.subscribe(self.handler, signal='btcusdt@trade', sender='binance'), subscription)
+        self.bus.publish('btcusdt@trade', 'binance', 4)
+        self.assertListEqual(self.received, [1, 4])
+
+        subscription.cancel()
+        subscription.cancel()
+        self.assertFalse(subscription.active)
+        self.assertFalse(self.bus.has_subscribers('btcusdt@trade', 'binance'))
+        self.bus.publish('btcusdt@trade', 'binance', 5)
+        self.assertListEqual(self.received, [1, 4])
+
+    def test_unsubscribe_handler(self):
+        self.bus.subscribe(self.handler, signal='info', sender='binance')
+        other = self.bus.subscribe(lambda data: self.received.append(-data), signal='info', sender='binance')
+        self.bus.publish('info', 'binance', 1)
+        self.assertListEqual(self.received, [1, -1])
+        self.bus.unsubscribe_handler(self.handler, signal='info', sender='binance')
+        self.assertRaises(DispatcherKeyError, self.bus.unsubscribe_handler, self.handler, 'info', 'binance')
+        self.bus.publish('info', 'binance', 2)
+        self.assertListEqual(self.received, [1, -1, -2])
+        self.assertListEqual(self.bus.subscriptions('binance'), [other])
+
+    def test_unsubscribe_while_publishing(self):
+        subscriptions = []
+        subscriptions.append(self.bus.subscribe(lambda data: subscriptions[1].cancel(), 'info', 'binance'))
+        subscriptions.append(self.bus.subscribe(self.handler, 'info', 'binance'))
+        # the publish in progress still delivers to the receivers current at the time of the call
+        self.bus.publish('info', 'binance', 1)
+        self.bus.publish('info', 'binance', 2)
+        self.assertListEqual(self.received, [1])
+
+    def test_clear(self):
+        self.bus.subscribe(self.handler, 'btcusdt@trade', 'binance')
+        self.bus.subscribe(self.handler, 'btcusdt@depth', 'binance')
+        kept = self.bus.subscribe(self.handler, 'trades_BTCUSD', 'bitfinex')
+        self.bus.clear('binance')
+        self.assertListEqual(self.bus.subscriptions('binance'), [])
+        self.assertListEqual(self.bus.subscriptions('bitfinex'), [kept])
+
+    def test_handler_signatures(self):
+        received = []
+        self.bus.subscribe(lambda sender, data: received.append((sender, data)), 'info', 'binance')
+        self.bus.subscribe(lambda signal, sender, data: received.append((signal, sender, data)), 'info', 'binance')
+        self.bus.subscribe(lambda **kwargs: received.append(kwargs), 'info', 'binance')
+        self.bus.subscribe(lambda: received.append('called'), 'info', 'binance')
+        self.bus.subscribe(lambda message: received.append(message), 'info', 'binance')
+        self.bus.publish('info', 'binance', 1)
+        self.assertListEqual(received, [('binance', 1), ('info', 'binance', 1),
+                                        {'signal': 'info', 'sender': 'binance', 'data': 1}, 'called', 1])
+
+
+class DispatcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dispatcher = Dispatcher(EventBus())
+        self.received = []
+
+    def handler(self, data):
+        self.received.append(data)
+
+    def test_compatibility(self):
+        self.dispatcher.connect(self.handler, signal='info', sender='bitfinex')
+        self.dispatcher.send(signal='info', sender='bitfinex', data={'info': 'pause'})
+        self.assertListEqual(self.received, [{'info': 'pause'}])
+        self.assertListEqual(self.dispatcher.getReceivers(sender='bitfinex', signal='info'), [self.handler])
+        self.assertListEqual(self.dispatcher.getAllReceivers(sender='bitfinex'), [self.handler])
+        self.dispatcher.disconnect(self.handler, signal='info', sender='bitfinex')
+        self.assertListEqual(self.dispatcher.getReceivers(sender='bitfinex', signal='info'), [])
+        self.assertRaises(self.dispatcher.errors.DispatcherKeyError,
+                          self.dispatcher.disconnect, self.handler, signal='info', sender='bitfinex')
@@ -0,0 +1,44 @@
+import unittest
+import pickle
+import numpy as np
+from exchanges.WS.marketdata import *
+
+
+class MarketDataTestCase(unittest.TestCase):
+
+    def test_ticker(self):
+        ticker = Ticker([9074.0, 22.4, 9074.1, 30.9, -308.9, -0.0329, 9074.1, 12269.9, 9490.0, 8956.2],
+                        exchange_ts=1561150152842, receive_ts=1561150152900.5, seq=7)
+        # the events are the lists the listeners always received
+        self.assertIsInstance(ticker, list)
+        self.assertEqual(ticker[6], 9074.1)
+        self.assertEqual(ticker.last_price, 9074.1)
+        self.assertEqual(ticker.low, 8956.2)
+        self.assertEqual(ticker.as_dict()['seq'], 7)
+        self.assertRaises(AttributeError, setattr, ticker, 'symbol', 'BTCUSD')
+
+    def test_trade(self):
+        trade = Trade([1561150152842, -0.5, 9869.99], receive_ts=1561150152900, trade_id=12345)
+        self.assertListEqual(trade, [1561150152842, -0.5, 9869.99])
+        self.assertEqual(trade.amount, -0.5)
+        self.assertIsNone(trade.exchange_ts)
+        copy = pickle.loads(pickle.dumps(trade))
+        self.assertIs(type(copy), Trade)
+        self.assertEqual(copy.trade_id, 12345)
+        self.assertEqual(copy.receive_ts, 1561150152900)
+        # a batch of events converts to an array of the values
+        self.assertTupleEqual(np.asarray([trade, trade]).shape, (2, 3))
+
+    def test_candle(self):
+        candle = Candle([1561150140000, 1.0, 2.0, 0.5, 1.5, 10.0], seq=3)
+        self.assertEqual(candle.high, 2.0)
+        self.assertListEqual(list(candle.as_dict()), ['timestamp', 'open', 'high', 'low', 'close', 'volume',
+                                                      'exchange_ts', 'receive_ts', 'seq'])
+
+    def test_book_delta(self):
+        delta = BookDelta([(9085.7, 0.4)], [(9097.0, 0.0)], exchange_ts=1561150152842, seq=5)
+        self.assertDictEqual(delta, {'bids': [(9085.7, 0.4)], 'asks': [(9097.0, 0.0)]})
+        self.assertIs(delta.bids, delta['bids'])
+        copy = pickle.loads(pickle.dumps(delta))
+        self.assertEqual(copy.seq, 5)
+        self.assertListEqual(copy.asks, [(9097.0, 0.0)])
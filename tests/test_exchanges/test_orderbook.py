@@ -0,0 +1,207 @@
+import unittest
+from collections import OrderedDict
+from exchanges.WS.orderbook import *
+
+
+class PriceLevelsTestCase(unittest.TestCase):
+
+    def test_price_levels_init(self):
+        levels = PriceLevels([(9888.29, 0.452934), (9888.25, 0.058486), (9888.24, 0.02594)])
+        self.assertEqual(len(levels), 3)
+        self.assertListEqual(levels.keys(), [9888.24, 9888.25, 9888.29])
+        self.assertListEqual(levels.values(), [0.02594, 0.058486, 0.452934])
+        self.assertEqual(levels[9888.25], 0.058486)
+        self.assertTrue(9888.29 in levels)
+        self.assertIsNone(levels.get(1.0))
+
+
+    def test_price_levels_update(self):
+        def check_key(dct, key):
+            return dct[key]
+
+        levels = PriceLevels([(9888.29, 0.452934), (9888.25, 0.058486), (9888.24, 0.02594)])
+        levels[9888.27] = 0.0432
+        levels[9888.25] = 1.34
+        self.assertListEqual(levels.keys(), [9888.24, 9888.25, 9888.27, 9888.29])
+        self.assertEqual(levels[9888.25], 1.34)
+
+        self.assertTrue(levels.remove(9888.24))
+        self.assertFalse(levels.remove(9888.24))
+        self.assertRaises(KeyError, check_key, levels, 9888.24)
+        self.assertEqual(levels.pop(9888.29), 0.452934)
+        self.assertListEqual(levels.items(), [(9888.25, 1.34), (9888.27, 0.0432)])
+
+        levels.clear()
+        self.assertEqual(len(levels), 0)
+        self.assertIsNone(levels.lowest())
+        self.assertIsNone(levels.highest())
+
+
+    def test_price_levels_top(self):
+        levels = PriceLevels([(float(p), 1.0) for p in range(10)])
+        self.assertEqual(levels.lowest(), (0.0, 1.0))
+        self.assertEqual(levels.highest(), (9.0, 1.0))
+        self.assertListEqual([p for p, a in levels.top(3)], [0.0, 1.0, 2.0])
+        self.assertListEqual([p for p, a in levels.top(3, descending=True)], [9.0, 8.0, 7.0])
+        self.assertEqual(len(levels.top(20)), 10)
+        ordered = levels.ordered()
+        self.assertIs(type(ordered), OrderedDict)
+        self.assertListEqual(list(ordered.keys()), levels.keys())
+
+
+class DummyOrderBook(SortedOrderBook):
+
+    def update(self, data):
+        pass
+
+
+class SortedOrderBookTestCase(unittest.TestCase):
+
+    def test_best_prices(self):
+        book = DummyOrderBook('dummy')
+        self.assertIsNone(book.best_bid())
+        self.assertIsNone(book.best_ask())
+        book.bids = PriceLevels([(9084.7, 0.15), (9085.7, 0.5), (9085.4, 0.1567)])
+        book.asks = PriceLevels([(9101.0, 0.62), (9097.0, 0.14315086), (9100.6, 1.25)])
+        self.assertEqual(book.best_bid(), (9085.7, 0.5))
+        self.assertEqual(book.best_ask(), (9097.0, 0.14315086))
+        self.assertListEqual(book.top_bids(2), [(9085.7, 0.5), (9085.4, 0.1567)])
+        self.assertListEqual(book.top_asks(2), [(9097.0, 0.14315086), (9100.6, 1.25)])
+
+
+    def test_snapshot(self):
+        book = DummyOrderBook('dummy')
+        book.bids = PriceLevels([(9084.7, 0.15), (9085.7, 0.5), (9085.4, 0.1567)])
+        book.asks = PriceLevels([(9101.0, 0.62), (9097.0, 0.14315086), (9100.6, 1.25)])
+        snapshot = book.snapshot()
+        self.assertIs(type(snapshot['bids']), OrderedDict)
+        self.assertIs(type(snapshot['asks']), OrderedDict)
+        self.assertListEqual(list(snapshot['bids'].keys()), [9084.7, 9085.4, 9085.7])
+        self.assertListEqual(list(snapshot['asks'].keys()), [9097.0, 9100.6, 9101.0])
+
+
+    def test_delta(self):
+        book = DummyOrderBook('dummy')
+        book.bids = PriceLevels([(9084.7, 0.15), (9085.7, 0.5)])
+        book.asks = PriceLevels([(9097.0, 0.14315086), (9100.6, 1.25)])
+        self.assertIsNone(book._take_delta())
+        book._set_bid(9085.7, 0.3)
+        book._set_bid(9085.7, 0.4)      # repeated changes of the same level are merged
+        book._set_bid(9000.0, 0)        # removing a non existing level is not a change
+        book._set_ask(9100.6, 0)
+        delta = book._take_delta()
+        self.assertListEqual(delta['bids'], [(9085.7, 0.4)])
+        self.assertListEqual(delta['asks'], [(9100.6, 0.0)])
+        self.assertIsNone(book._take_delta())
+        self.assertEqual(book.delta_name, delta_signal('dummy'))
+
+    def test_versioned_snapshot(self):
+        book = DummyOrderBook('dummy')
+        book.bids = PriceLevels([(9084.7, 0.15), (9085.7, 0.5)])
+        version, snapshot = book.versioned_snapshot()
+        self.assertEqual(version, 0)
+        # the snapshot is taken once per version and shared
+        self.assertIs(book.snapshot(), snapshot)
+
+        # a snapshot taken during an update is not kept
+        book._set_bid(9085.7, 0.3)
+        self.assertEqual(book.version, 1)
+        book.SNAPSHOT_RETRIES = 1
+        self.assertEqual(book.versioned_snapshot()[0], 1)
+        self.assertIs(book._snapshot[1], snapshot)
+        # if the data cannot be read, the last snapshot is returned
+        book._take_snapshot = lambda: {}['bids']
+        self.assertEqual(book.versioned_snapshot(), (0, snapshot))
+        # without any snapshot taken before, the error is raised
+        book._snapshot = (-1, None)
+        self.assertRaises(KeyError, book.versioned_snapshot)
+        del book._take_snapshot
+
+        # the full book published by the update becomes the snapshot of the new version
+        received = []
+        subscription = bus.subscribe(received.append, signal='dummy', sender=None)
+        try:
+            book._publish()
+        finally:
+            subscription.cancel()
+        self.assertEqual(book.version, 2)
+        self.assertIs(book.snapshot(), received[0])
+        self.assertEqual(book.snapshot()['bids'][9085.7], 0.3)
+        # the earlier snapshot is not changed by the update
+        self.assertEqual(snapshot['bids'][9085.7], 0.5)
+        # nothing changed, the version stays the same
+        book._publish()
+        self.assertEqual(book.version, 2)
+
+
+class LocalOrderBookTestCase(unittest.TestCase):
+
+    def test_apply(self):
+        book = DummyOrderBook('dummy')
+        book.bids = PriceLevels([(9084.7, 0.15), (9085.7, 0.5), (9085.4, 0.1567)])
+        book.asks = PriceLevels([(9101.0, 0.62), (9097.0, 0.14315086), (9100.6, 1.25)])
+
+        local_book = LocalOrderBook()
+        self.assertFalse(local_book.apply(None))
+        self.assertTrue(local_book.apply(('snapshot', book.snapshot())))
+        self.assertEqual(len(local_book), 6)
+
+        book._set_bid(9085.5, 0.675)
+        book._set_bid(9084.7, 0)
+        book._set_ask(9097.0, 0.2)
+        self.assertTrue(local_book.apply(('delta', book._take_delta())))
+        self.assertListEqual(local_book.bids.items(), book.bids.items())
+        self.assertListEqual(local_book.asks.items(), book.asks.items())
+
+        snapshot = local_book.snapshot()
+        self.assertIs(snapshot['bids'], local_book.bids)
+        self.assertListEqual(list(snapshot['asks'].keys()), [9097.0, 9100.6, 9101.0])
+        self.assertFalse(local_book.apply(('unknown', None)))
+
+
+class OrderTableTestCase(unittest.TestCase):
+
+    def test_orders(self):
+        table = OrderTable(capacity=2)
+        self.assertIsNone(table.set(101, 9085.7, 0.5))
+        self.assertIsNone(table.set(102, 9085.7, 0.25))
+        self.assertIsNone(table.set(103, 9097.0, -0.14))
+        self.assertEqual(len(table), 3)
+        self.assertIn(102, table)
+        self.assertTupleEqual(table.set(101, 9085.7, 0.75), (9085.7, 0.5))
+        self.assertTupleEqual(table.get(101), (9085.7, 0.75))
+
+        # the last order takes the slot of the removed one
+        self.assertTupleEqual(table.remove(101), (9085.7, 0.75))
+        self.assertIsNone(table.remove(101))
+        self.assertNotIn(101, table)
+        self.assertTupleEqual(table.get(103), (9097.0, -0.14))
+        self.assertEqual(len(table), 2)
+        table.clear()
+        self.assertEqual(len(table), 0)
+        self.assertIsNone(table.get(102))
+
+    def test_aggregate(self):
+        table = OrderTable()
+        for order_id, price, amount in [(1, 9085.7, 0.5), (2, 9085.4, 0.1), (3, 9085.7, 0.25),
+                                        (4, 9097.0, -0.1), (5, 9100.6, -1.25), (6, 9097.0, -0.3)]:
+            table.set(order_id, price, amount)
+        self.assertEqual(table.level(9085.7, bid=True), 0.75)
+        self.assertAlmostEqual(table.level(9097.0, bid=False), 0.4)
+        self.assertEqual(table.level(9085.7, bid=False), 0.0)
+        self.assertEqual(table.level(9000.0, bid=True), 0.0)
+
+        bids, asks = table.aggregate()
+        self.assertListEqual(bids.items(), [(9085.4, 0.1), (9085.7, 0.75)])
+        self.assertListEqual(asks.keys(), [9097.0, 9100.6])
+        self.assertAlmostEqual(asks[9097.0], 0.4)
+
+        # from the best price, the orders of the same price in the order of arrival
+        ids, prices, amounts = table.orders(bid=True)
+        self.assertListEqual(ids.tolist(), [1, 3, 2])
+        table.remove(1)
+        table.set(1, 9085.7, 0.5)
+        self.assertListEqual(table.orders(bid=True)[0].tolist(), [3, 1, 2])
+        ids, prices, amounts = table.orders(bid=False)
+        self.assertListEqual(ids.tolist(), [4, 6, 5])
+        self.assertListEqual(amounts.tolist(), [-0.1, -0.3, -1.25])
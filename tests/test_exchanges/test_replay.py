@@ -0,0 +1,141 @@
+import unittest
+import json
+import tempfile
+import time
+from exchanges.WS.replay import *
+from exchanges.WS.capture import CaptureWriter
+from exchanges.exchangeWSFactory import ExchangeWSFactory
+
+
+class ListReader(object):
+    """A capture of frames in a list"""
+    def __init__(self, frames):
+        self._frames = frames
+
+    def frames(self, start=None, end=None):
+        return iter(self._frames)
+
+
+class ReplayerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.delivered = []
+
+    def deliver(self, received, source, frame):
+        if frame == 'error':
+            raise ValueError(frame)
+        self.delivered.append((received, time.perf_counter()))
+
+    def test_speed(self):
+        frames = [(1000.0, 's', 'a'), (1200.0, 's', 'b'), (1400.0, 's', 'error'), (1400.0, 's', 'c')]
+        replayer = Replayer(ListReader(frames), self.deliver, speed=4)
+        replayer.start()
+        self.assertTrue(replayer.wait(5))
+        # the gaps of 200ms are 4 times shorter, the failed deliveries are counted
+        self.assertEqual(replayer.frames, 4)
+        self.assertEqual(replayer.errors, 1)
+        self.assertEqual(replayer.position, 1400.0)
+        self.assertGreaterEqual(self.delivered[-1][1] - self.delivered[0][1], 0.09)
+
+        self.delivered = []
+        replayer = Replayer(ListReader(frames), self.deliver, speed=FASTEST)
+        replayer.start()
+        self.assertTrue(replayer.wait(5))
+        self.assertListEqual([d[0] for d in self.delivered], [1000.0, 1200.0, 1400.0])
+        self.assertLess(self.delivered[-1][1] - self.delivered[0][1], 0.09)
+
+    def test_stop(self):
+        replayer = Replayer(ListReader([(0.0, 's', 'a'), (60000.0, 's', 'b')]), self.deliver, speed=REALTIME)
+        replayer.start()
+        time.sleep(0.05)
+        replayer.stop(5)
+        self.assertTrue(replayer.finished.is_set())
+        self.assertEqual(replayer.frames, 1)
+
+
+class ReplayClientTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+        self.received = []
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def handler(self, data):
+        self.received.append(data)
+
+    def test_binance(self):
+        writer = CaptureWriter(self.path, prefix='binance', compression='gzip')
+        writer.write('btcusdt@depth', json.dumps({'e': 'depthUpdate', 'E': 1, 'U': 99, 'u': 101,
+                                                  'b': [['100.0', '3.0']], 'a': []}), received=1.0)
+        writer.write('rest', json.dumps({'request': 'depth', 'symbol': 'btcusdt',
+                                         'data': {'lastUpdateId': 100, 'bids': [['100.0', '1.0']],
+                                                  'asks': [['101.0', '2.0']]}}), received=2.0)
+        writer.write('btcusdt@depth', json.dumps({'e': 'depthUpdate', 'E': 3, 'U': 102, 'u': 102,
+                                                  'b': [], 'a': [['101.0', '0']]}), received=3.0)
+        writer.write('', json.dumps({'stream': 'btcusdt@trade',
+                                     'data': {'e': 'trade', 'E': 4, 't': 7, 'p': '100.5', 'q': '0.5',
+                                              'T': 4, 'm': True}}, separators=(',', ':')), received=4.0)
+        writer.write('', '{"result":null,"id":1}', received=5.0)
+        writer.close()
+
+        client = ExchangeWSFactory.create_client('Binance replay', directory=self.path, speed=FASTEST)
+        try:
+            self.assertEqual(client.exchange(), 'Binance')
+            # the book subscribed before the replay is synced by the depth snapshot of the capture
+            stream, snapshot = client.subscribe_order_book('BTCUSDT', self.handler, delta=True)
+            self.assertEqual(snapshot, ('snapshot', {'bids': {}, 'asks': {}}))
+            client.connect()
+            self.assertTrue(client.replayer.wait(5))
+            self.assertEqual(client.replayer.errors, 0)
+            self.assertEqual(self.received[0][0], 'snapshot')
+            self.assertDictEqual(dict(self.received[0][1]['bids']), {100.0: 3.0})
+            self.assertEqual(self.received[-1][0], 'delta')
+            self.assertDictEqual(dict(client._data[stream].snapshot()['asks']), {})
+
+            # the trades stream of the capture was created when its first frame was replayed
+            stream, snapshot = client.subscribe_trades('btcusdt')
+            self.assertEqual(stream, 'btcusdt@trade')
+            self.assertEqual(len(snapshot[1]), 1)
+            self.assertEqual(float(snapshot[1][0]['amount']), -0.5)
+        finally:
+            client.disconnect()
+
+    def test_bitfinex(self):
+        writer = CaptureWriter(self.path, prefix='bitfinex', compression='gzip')
+        frames = ['{"event":"info","version":2}',
+                  '{"event":"subscribed","channel":"trades","chanId":17,"symbol":"tBTCUSD","pair":"BTCUSD"}',
+                  '[17,[[1,1561150152842,0.5,9869.99]]]',
+                  '[17,"te",[2,1561150152900,-0.1,9870.0]]',
+                  '[17,"hb"]']
+        for i, frame in enumerate(frames):
+            writer.write('bitfinex-1', frame, received=float(i))
+        writer.close()
+
+        client = ExchangeWSFactory.create_client('Bitfinex replay', directory=self.path, speed=FASTEST)
+        try:
+            self.assertEqual(client.exchange(), 'Bitfinex')
+            client.connect()
+            self.assertTrue(client.replayer.wait(5))
+            self.assertEqual(client.replayer.errors, 0)
+            # the channel of the capture is kept without a subscription, subscribing returns its snapshot
+            channel_name, snapshot = client.subscribe_trades('BTCUSD', self.handler)
+            self.assertEqual(channel_name, 'trades_BTCUSD')
+            self.assertListEqual(snapshot[1]['id'].tolist(), [2, 1])
+            client.unsubscribe(channel_name, self.handler)
+            self.assertEqual(client.sequence_gaps, 0)
+        finally:
+            client.disconnect()
+
+    def test_no_capture(self):
+        client = BitfinexReplayClient(directory=self.path + '/missing')
+        try:
+            self.assertRaises(ExchangeException, client.connect)
+        finally:
+            client.disconnect()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,226 @@
+import unittest
+import time
+import requests
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+from exchanges.standin.market import Market, ADDED, REMOVED
+from exchanges.standin.server import SATURATION
+from exchanges.standin.binance import BinanceStandin
+from exchanges.standin.bitfinex import BitfinexStandin
+from exchanges.WS.binance import BinanceWSClient
+from exchanges.WS.bitfinex import BitfinexWSClient
+from exchanges.WS.transport import ASYNCIO_ENGINE
+from exchanges.REST.binance import BinanceRESTClient
+from exchanges.REST.bitfinex import BitfinexRESTClient
+
+
+def wait_for(condition, timeout=5):
+    """Waits until a condition holds, returns its last value"""
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        time.sleep(0.02)
+    return condition()
+
+
+class MarketTestCase(unittest.TestCase):
+
+    def test_deterministic(self):
+        first, second = Market('BTCUSD', 'BTC', 'USD', seed=3), Market('BTCUSD', 'BTC', 'USD', seed=3)
+        for _ in range(200):
+            self.assertEqual(first.step(), second.step())
+            self.assertEqual(first.trade()[2:], second.trade()[2:])
+        self.assertEqual(first.top(True, 10), second.top(True, 10))
+
+    def test_book(self):
+        market = Market('BTCUSD', 'BTC', 'USD', levels=20)
+        changes = []
+        market.watch(changes.append)
+        for _ in range(500):
+            market.step()
+        self.assertEqual(len(changes), 500)
+        self.assertEqual(market.update_id, 500)
+        self.assertTrue({ADDED, REMOVED} <= {change[5] for change in changes})
+        bids, asks = market.top(True), market.top(False)
+        self.assertLessEqual(len(bids), 20)
+        self.assertListEqual([b[0] for b in bids], sorted((b[0] for b in bids), reverse=True))
+        self.assertListEqual([a[0] for a in asks], sorted(a[0] for a in asks))
+        self.assertLess(bids[0][0], asks[0][0])
+        self.assertEqual(market.level(True, 0), bids[0])
+        self.assertEqual(market.rank(False, asks[3][0]), 3)
+
+    def test_candles(self):
+        market = Market('BTCUSD', 'BTC', 'USD')
+        candles = market.candles('1m', 10)
+        self.assertEqual(len(candles), 10)
+        self.assertEqual(candles[1][0] - candles[0][0], 60000)
+        trade = market.trade()
+        self.assertEqual(market.candle('1m')[4], trade[3])
+
+
+@unittest.skipIf(websockets is None, 'websockets package is not installed')
+class BinanceStandinTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = BinanceStandin(rate=200).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def client(self, **kwargs):
+        return BinanceWSClient(engine=ASYNCIO_ENGINE, stream_uri=self.server.ws_uri, rest_uri=self.server.rest_uri,
+                               **kwargs)
+
+    def test_streams(self):
+        for kwargs in ({}, {'multiplex': True, 'numeric': True}):
+            client = self.client(**kwargs)
+            updates = []
+            try:
+                client.connect()
+                client.subscribe_order_book('BTCUSDT', update_handler=lambda *args, **kw: updates.append(kw))
+                client.subscribe_trades('ETHUSDT')
+                client.subscribe_ticker('BTCUSDT')
+                client.subscribe_candles('BTCUSDT', '1m')
+                self.assertTrue(wait_for(lambda: len(updates) >= 100))
+                # the diff events continue the snapshot without gaps
+                self.assertDictEqual(client.get_resyncs(), {'btcusdt@depth': 0})
+                book = client._data['btcusdt@depth'].snapshot()
+                self.assertLess(max(book['bids']), min(book['asks']))
+                self.assertGreater(len(client._data['ethusdt@trade'].snapshot()), 0)
+            finally:
+                client.disconnect()
+        stats = self.server.stats()
+        self.assertGreater(stats['frames'], 200)
+
+    def test_user_data(self):
+        client = self.client()
+        orders, balances = [], []
+        try:
+            client.connect()
+            self.assertTrue(client.authenticate(key='key', secret='secret'))
+            client.subscribe_user_orders(lambda *args, **kw: orders.append(kw['data']))
+            client.subscribe_balances(lambda *args, **kw: balances.append(kw['data']))
+            rest = BinanceRESTClient(key='key', secret='secret', url=self.server.rest_uri)
+            ask = self.server.markets['BTCUSDT'].best(False)
+            # a buy above the best ask is filled at once, a buy far below it stays open
+            self.assertEqual(rest.place_limit_order('buy', 'BTCUSDT', 0.5, ask * 1.1)['status'], 'EXECUTED')
+            order = rest.place_limit_order('buy', 'BTCUSDT', 0.5, ask / 2)
+            self.assertEqual(order['status'], 'LIVE')
+            self.assertTrue(wait_for(lambda: orders and orders[-1] and orders[-1][0][0] == order['orderId']))
+            self.assertTrue(wait_for(lambda: balances and float(balances[-1]['BTC']) == 1000.5))
+            self.assertListEqual([o['orderId'] for o in rest.open_orders()], [order['orderId']])
+            self.assertTrue(rest.cancel_order(order['orderId'], 'BTCUSDT'))
+            self.assertListEqual(rest.open_orders(), [])
+            self.assertEqual(len(rest.user_trades('BTCUSDT')), 1)
+            self.assertEqual(float(rest.balance()['BTC']), 1000.5)
+        finally:
+            client.disconnect()
+
+    def test_rest(self):
+        rest = BinanceRESTClient(url=self.server.rest_uri)
+        self.assertTrue(rest.ping())
+        self.assertListEqual(rest.symbols(), ['BTCUSDT', 'ETHUSDT', 'ETHBTC', 'BNBUSDT'])
+        self.assertEqual(rest.symbols_details()['ETHBTC']['quoteAsset'], 'BTC')
+        book = rest.order_book('ETHUSDT', limit=10)
+        self.assertEqual(len(book['bids']), 10)
+        self.assertEqual(len(rest.candles('ETHUSDT', '5m', limit=20)), 20)
+        self.assertEqual(len(rest.trades('ETHUSDT', limit=30)), 30)
+        # the private endpoints require the api key
+        self.assertEqual(requests.post(self.server.rest_uri + '/api/v3/order').status_code, 401)
+
+
+@unittest.skipIf(websockets is None, 'websockets package is not installed')
+class BitfinexStandinTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = BitfinexStandin(rate=200).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_channels(self):
+        for kwargs in ({}, {'bulk': False, 'timestamps': False}):
+            client = BitfinexWSClient(engine=ASYNCIO_ENGINE, uri=self.server.ws_uri, **kwargs)
+            updates = []
+            try:
+                client.connect()
+                client.subscribe_order_book('BTCUSD', update_handler=lambda *args, **kw: updates.append(kw))
+                client.subscribe_order_book('ETHUSD', prec='R0', len='100')
+                client.subscribe_trades('BTCUSD')
+                client.subscribe_ticker('ETHUSD')
+                client.subscribe_candles('LTCUSD', '1m')
+                self.assertTrue(wait_for(lambda: len(updates) >= 50))
+                # the books match the checksums and every message follows the previous one
+                self.assertDictEqual(client.get_resyncs(), {})
+                self.assertEqual(client.sequence_gaps, 0)
+            finally:
+                client.disconnect()
+        self.assertGreater(self.server.stats()['frames'], 100)
+
+    def test_auth(self):
+        client = BitfinexWSClient(engine=ASYNCIO_ENGINE, uri=self.server.ws_uri)
+        orders, balances, trades = [], [], []
+        try:
+            client.connect()
+            self.assertTrue(client.authenticate(key='key', secret='secret'))
+            self.assertTrue(wait_for(lambda: client.authenticated))
+            client.subscribe_user_orders(lambda *args, **kw: orders.append(kw['data']))
+            client.subscribe_balances(lambda *args, **kw: balances.append(kw['data']))
+            client.subscribe_user_trades(lambda *args, **kw: trades.append(kw['data']))
+            self.assertTrue(wait_for(lambda: balances))
+            rest = BitfinexRESTClient(key='key', secret='secret', url=self.server.rest_uri)
+            ask = self.server.markets['BTCUSD'].best(False)
+            self.assertEqual(rest.place_limit_order('buy', 'BTCUSD', 0.5, ask * 1.1)['status'], 'EXECUTED')
+            order = rest.place_limit_order('sell', 'BTCUSD', 0.5, ask * 2)
+            self.assertEqual(order['status'], 'LIVE')
+            self.assertTrue(wait_for(lambda: trades and balances[-1]['BTC'] == 1000.5))
+            self.assertTrue(wait_for(lambda: orders and orders[-1] and orders[-1][0][0] == order['orderId']))
+            self.assertTrue(rest.cancel_order(order['orderId'], 'BTCUSD'))
+            self.assertEqual(rest.order(order['orderId'], 'BTCUSD')['status'], 'CANCELED')
+            self.assertListEqual(rest.open_orders(), [])
+            self.assertEqual(len(rest.all_orders('BTCUSD')), 2)
+            self.assertEqual(len(rest.user_trades('BTCUSD')), 1)
+            self.assertEqual(rest.balance()['BTC'], '1000.5')
+            self.assertEqual(client.sequence_gaps, 0)
+        finally:
+            client.disconnect()
+
+    def test_rest(self):
+        rest = BitfinexRESTClient(url=self.server.rest_uri)
+        self.assertTrue(rest.ping())
+        self.assertListEqual(rest.symbols(), ['BTCUSD', 'ETHUSD', 'ETHBTC', 'LTCUSD'])
+        self.assertEqual(rest.symbols_details()['ETHBTC']['baseAsset'], 'ETH')
+        self.assertSetEqual(set(rest.all_tickers()), {'BTCUSD', 'ETHUSD', 'ETHBTC', 'LTCUSD'})
+        self.assertEqual(len(rest.ticker('BTCUSD')), 8)
+        self.assertEqual(len(rest.order_book('BTCUSD', limit_bids=5, limit_asks=5)['asks']), 5)
+        self.assertEqual(len(rest.candles('BTCUSD', '1m', limit=20)), 20)
+        self.assertEqual(len(rest.trades('BTCUSD', limit_trades=10)), 10)
+
+
+@unittest.skipIf(websockets is None, 'websockets package is not installed')
+class SaturationTestCase(unittest.TestCase):
+
+    def test_saturation(self):
+        with BitfinexStandin(rate=SATURATION, session_limit=100) as server:
+            client = BitfinexWSClient(engine=ASYNCIO_ENGINE, uri=server.ws_uri)
+            try:
+                client.connect()
+                client.subscribe_order_book('BTCUSD', prec='R0', len='100')
+                client.subscribe_trades('BTCUSD')
+                # the market ticks as fast as the client reads and the client keeps up
+                self.assertTrue(wait_for(lambda: server.stats()['ticks'].get('BTCUSD', 0) > 1000, timeout=10))
+                self.assertDictEqual(client.get_resyncs(), {})
+                self.assertEqual(client.sequence_gaps, 0)
+                server.set_rate(10)
+                ticks = server.stats()['ticks']['BTCUSD']
+                time.sleep(0.5)
+                self.assertLess(server.stats()['ticks']['BTCUSD'] - ticks, 20)
+            finally:
+                client.disconnect()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+import unittest
+import asyncio
+import threading
+import time
+from exchanges.WS.transport import *
+
+
+class EchoServer(object):
+    """A local websocket server, running on the engine loop, that echoes messages back"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.server = None
+        self.port = None
+
+    async def _handler(self, ws, *args):
+        async for message in ws:
+            await ws.send(message)
+
+    async def _start(self):
+        self.server = await websockets.serve(self._handler, 'localhost', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def _drop_clients(self):
+        for ws in list(getattr(self.server, 'websockets', None) or self.server.connections):
+            await ws.close()
+
+    async def _stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def start(self):
+        self.engine.submit(self._start()).result(timeout=5)
+        return 'ws://localhost:{}'.format(self.port)
+
+    def drop_clients(self):
+        self.engine.submit(self._drop_clients()).result(timeout=5)
+
+    def stop(self):
+        self.engine.submit(self._stop()).result(timeout=5)
+
+
+class ReconnectorTestCase(unittest.TestCase):
+
+    def test_delays(self):
+        reconnector = Reconnector(min_delay=1, max_delay=8)
+        reconnector.dropped()
+        delays = [reconnector.delay() for _ in range(6)]
+        # jittered exponential backoff limited by max_delay
+        for delay, limit in zip(delays, [1, 2, 4, 8, 8, 8]):
+            self.assertGreaterEqual(delay, limit / 2)
+            self.assertLessEqual(delay, limit)
+        # the delays start over when the connection opens
+        reconnector.opened()
+        self.assertLessEqual(reconnector.delay(), 1)
+
+    def test_metrics(self):
+        reconnector = Reconnector()
+        self.assertIsNone(reconnector.opened())
+        self.assertFalse(reconnector.reopened)
+        reconnector.dropped()
+        self.assertTrue(reconnector.metrics()['down'])
+        time.sleep(0.05)
+        reconnector.dropped()   # a failed attempt does not restart the measurement
+        latency = reconnector.opened()
+        self.assertTrue(reconnector.reopened)
+        self.assertGreaterEqual(latency, 0.05)
+        metrics = reconnector.metrics()
+        self.assertEqual(metrics['reconnects'], 1)
+        self.assertEqual(metrics['last'], latency)
+        self.assertEqual(metrics['mean'], latency)
+        self.assertEqual(metrics['max'], latency)
+        self.assertFalse(metrics['down'])
+
+
+class DeduplicatorTestCase(unittest.TestCase):
+
+    def test_first_arrival(self):
+        deduplicator = Deduplicator()
+        self.assertTrue(deduplicator.accept('primary', 1))
+        time.sleep(0.02)
+        self.assertFalse(deduplicator.accept('standby', 1))
+        self.assertTrue(deduplicator.accept('standby', 2))
+        self.assertFalse(deduplicator.accept('primary', 2))
+        # a message older than the last passed one is dropped
+        self.assertFalse(deduplicator.accept('primary', 0))
+        # messages with the same sequence identifier are told apart by their keys
+        self.assertTrue(deduplicator.accept('primary', 3, (3, 'a')))
+        self.assertTrue(deduplicator.accept('primary', 3, (3, 'b')))
+        self.assertFalse(deduplicator.accept('standby', 3, (3, 'a')))
+        metrics = deduplicator.metrics()
+        self.assertDictEqual(metrics['wins'], {'primary': 2, 'standby': 1})
+        self.assertGreaterEqual(metrics['max']['primary'], 20)
+        self.assertLessEqual(metrics['mean']['primary'], metrics['max']['primary'])
+        self.assertEqual(metrics['unmatched'], 0)
+
+    def test_window(self):
+        deduplicator = Deduplicator(window=2)
+        for sequence in range(4):
+            deduplicator.accept('primary', sequence)
+        # the messages fallen out of the window were never matched
+        self.assertEqual(deduplicator.metrics()['unmatched'], 2)
+        self.assertFalse(deduplicator.accept('standby', 0))
+
+
+class RateMeterTestCase(unittest.TestCase):
+
+    def test_metrics(self):
+        meter = RateMeter()
+        meter.count += 10
+        time.sleep(0.05)
+        metrics = meter.metrics(reset=True)
+        self.assertEqual(metrics['messages'], 10)
+        self.assertGreater(metrics['rate'], 0)
+        self.assertLessEqual(metrics['rate'], 200)
+        # a new period starts after a reset
+        time.sleep(0.01)
+        metrics = meter.metrics()
+        self.assertEqual(metrics['messages'], 10)
+        self.assertEqual(metrics['rate'], 0.0)
+        self.assertGreater(metrics['mean'], 0)
+
+
+@unittest.skipIf(websockets is None, 'websockets package is not installed')
+class AsyncioEngineTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = AsyncioEngine.instance()
+        self.server = EchoServer(self.engine)
+        self.url = self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_shared_engine(self):
+        self.assertIs(AsyncioEngine.instance(), self.engine)
+        self.assertTrue(self.engine.is_running())
+
+    def test_send_receive(self):
+        received = []
+        done = threading.Event()
+        opened = []
+
+        def on_message(message):
+            received.append((message, threading.current_thread().name))
+            if len(received) == 3:
+                done.set()
+
+        connection = self.engine.open(self.url, on_message, on_open=lambda: opened.append(True))
+        self.assertTrue(connection.wait_connected(timeout=5))
+        for i in range(3):
+            connection.send('message {}'.format(i))
+        self.assertTrue(done.wait(timeout=5))
+        self.assertListEqual([m for m, t in received], ['message 0', 'message 1', 'message 2'])
+        # the callbacks run on the engine thread
+        self.assertSetEqual({t for m, t in received}, {'ws-asyncio-engine'})
+        self.assertListEqual(opened, [True])
+        connection.close()
+
+    def test_reconnect(self):
+        opened = threading.Semaphore(0)
+        connection = self.engine.open(self.url, lambda m: None, on_open=opened.release)
+        self.assertTrue(opened.acquire(timeout=5))
+        self.server.drop_clients()
+        # the connection is reopened and on_open is called again
+        self.assertTrue(opened.acquire(timeout=RECONNECT_MIN_DELAY + 5))
+        self.assertEqual(connection.connections, 2)
+        self.assertEqual(connection.reconnector.reconnects, 1)
+        self.assertTrue(connection.reconnector.reopened)
+        self.assertLess(connection.reconnector.last_latency, RECONNECT_MIN_DELAY + 5)
+        connection.close()
+
+    def test_callback_exception(self):
+        received = threading.Event()
+
+        def on_message(message):
+            if message == 'raise':
+                raise ValueError(message)
+            received.set()
+
+        connection = self.engine.open(self.url, on_message)
+        self.assertTrue(connection.wait_connected(timeout=5))
+        connection.send('raise')
+        connection.send('ok')
+        # an exception in a callback does not break the connection
+        self.assertTrue(received.wait(timeout=5))
+        self.assertTrue(connection.connected)
+        connection.close()